@@ -0,0 +1,114 @@
+# AI Dock Admin Diagnostics API
+# Runtime logging controls, profiling and DB pool status for the worker that serves the request
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Optional, Literal
+import logging
+
+from ...core.security import get_current_admin_user
+from ...core.logging_config import update_logging, get_logging_state
+from ...core.profiler import get_profiler, dump_tasks, ProfilerBusyError
+from ...core.database import get_pool_status
+from ...models.user import User
+
+router = APIRouter(prefix="/diagnostics")
+logger = logging.getLogger(__name__)
+
+
+class LoggingUpdate(BaseModel):
+    """Fields left out are not changed."""
+    hot_path_debug: Optional[bool] = Field(None, description="Per-message / per-chunk detail logs")
+    sample_rates: Optional[Dict[str, float]] = Field(
+        None, description="Share of INFO/DEBUG lines kept per logger prefix, e.g. {\"app.services.usage_service\": 0.1}"
+    )
+
+
+class ProfileRequest(BaseModel):
+    duration_seconds: float = Field(10.0, gt=0, description="Profile length (capped by PROFILER_MAX_DURATION_SECONDS)")
+    interval_ms: float = Field(5.0, gt=0, description="Time between stack samples")
+    slow_callback_ms: Optional[float] = Field(
+        100.0, ge=0, description="Report event-loop callbacks running longer than this; 0 turns it off"
+    )
+    include_idle: bool = Field(False, description="Keep samples of threads that are waiting (select, locks, queues)")
+    format: Literal["json", "collapsed"] = Field(
+        "json", description="'collapsed' returns only the flamegraph input as a file"
+    )
+
+
+@router.get("/logging")
+async def get_logging_settings(current_admin: User = Depends(get_current_admin_user)):
+    """Current log level, sampling rates and hot-path debug switch of this worker."""
+    return get_logging_state()
+
+
+@router.put("/logging")
+async def update_logging_settings(
+    update: LoggingUpdate,
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """
+    Change sampling or the hot-path debug switch without a restart.
+
+    Applies to the worker that handles this request only; with several
+    workers, use the LOG_* settings for a fleet-wide change.
+    """
+    try:
+        update_logging(sample_rates=update.sample_rates, hot_path_debug=update.hot_path_debug)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    logger.warning(f"🔧 Logging settings changed by {current_admin.email}: {update.model_dump(exclude_none=True)}")
+    return get_logging_state()
+
+
+@router.post("/profile")
+async def profile_worker(
+    profile_request: ProfileRequest,
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """
+    Sample this worker's stacks for a bounded time and return where it spends it.
+
+    The worker keeps serving traffic while the profile runs. The collapsed
+    stacks feed straight into flamegraph.pl or speedscope; the JSON format
+    also includes slow event-loop callbacks and the asyncio tasks pending at
+    the end. One profile per worker at a time.
+    """
+    logger.warning(f"🔬 Profile requested by {current_admin.email}: {profile_request.model_dump()}")
+    try:
+        result = await get_profiler().profile(
+            duration_seconds=profile_request.duration_seconds,
+            interval_ms=profile_request.interval_ms,
+            slow_callback_ms=profile_request.slow_callback_ms,
+            include_idle=profile_request.include_idle
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    if profile_request.format == "collapsed":
+        filename = f"profile-{result['summary']['pid']}-{result['summary']['started_at'][:19].replace(':', '')}.collapsed"
+        return PlainTextResponse(
+            result["collapsed"],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    return result
+
+
+@router.get("/tasks")
+async def get_asyncio_tasks(current_admin: User = Depends(get_current_admin_user)):
+    """Pending asyncio tasks of this worker and where each one is suspended."""
+    tasks = dump_tasks()
+    return {"count": len(tasks), "profiling": get_profiler().running, "tasks": tasks}
+
+
+@router.get("/db-pool")
+async def get_db_pool_status(current_admin: User = Depends(get_current_admin_user)):
+    """
+    Connection budget and pool usage of this worker, plus connections held
+    for at least half the leak threshold with the stack that checked them out.
+    """
+    return get_pool_status()
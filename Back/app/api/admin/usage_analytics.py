@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 # Import our dependencies
-from ...core.database import get_async_db, AsyncSessionLocal
+from ...core.database import get_async_db, get_async_read_db, get_async_read_session
 from ...core.security import get_current_admin_user
 from ...models.user import User
 from ...services.usage_service import usage_service
@@ -44,7 +44,7 @@ async def get_provider_usage_stats_fixed(
     from sqlalchemy import select, func, and_
     from ...models.usage_log import UsageLog
     
-    async with AsyncSessionLocal() as session:
+    async with get_async_read_session() as session:
         try:
             # 🔧 FIX: Add cache-busting parameter and handle NULL costs properly
             cache_buster = datetime.utcnow().microsecond
@@ -128,6 +128,60 @@ async def get_provider_usage_stats_fixed(
             logger.error(f"Failed to get provider usage stats: {str(e)}")
             raise
 
+async def get_response_cache_usage_stats(
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[str, Any]:
+    """
+    Response cache effectiveness for a period, computed from usage logs.
+    
+    Only cacheable requests (cache_status 'hit' or 'miss') count towards the
+    hit rate; dollars saved is the upstream cost avoided by cache hits.
+    Coalesced requests are reported separately with their share of savings.
+    
+    Args:
+        start_date: Start of analysis period
+        end_date: End of analysis period
+        
+    Returns:
+        Dictionary with hits, misses, hit rate and cost saved
+    """
+    from sqlalchemy import select, func, and_
+    from ...models.usage_log import UsageLog
+    
+    async with get_async_read_session() as session:
+        cache_query = select(
+            UsageLog.cache_status,
+            func.count(UsageLog.id).label('requests'),
+            func.sum(func.coalesce(UsageLog.cost_saved, 0.0)).label('cost_saved')
+        ).where(
+            and_(
+                UsageLog.created_at >= start_date,
+                UsageLog.created_at <= end_date,
+                UsageLog.cache_status.is_not(None)
+            )
+        ).group_by(UsageLog.cache_status)
+        
+        result = await session.execute(cache_query)
+        rows = {row.cache_status: row for row in result.fetchall()}
+    
+    hits = rows["hit"].requests if "hit" in rows else 0
+    misses = rows["miss"].requests if "miss" in rows else 0
+    coalesced = rows["coalesced"].requests if "coalesced" in rows else 0
+    cacheable = hits + misses
+    cost_saved = float(rows["hit"].cost_saved or 0) if "hit" in rows else 0.0
+    coalescing_saved = float(rows["coalesced"].cost_saved or 0) if "coalesced" in rows else 0.0
+    
+    return {
+        "cacheable_requests": cacheable,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate_percent": (hits / cacheable * 100) if cacheable > 0 else 0,
+        "cost_saved_usd": round(cost_saved, 4),
+        "coalesced_requests": coalesced,
+        "coalescing_cost_saved_usd": round(coalescing_saved, 4)
+    }
+
 # =============================================================================
 # USAGE SUMMARY ENDPOINTS
 # =============================================================================
@@ -136,7 +190,7 @@ async def get_provider_usage_stats_fixed(
 async def get_usage_summary(
     days: int = Query(30, description="Number of days to analyze", ge=1, le=365),
     current_admin: User = Depends(get_current_admin_user),
-    session: AsyncSession = Depends(get_async_db)
+    session: AsyncSession = Depends(get_async_read_db)
 ) -> Dict[str, Any]:
     """
     Get overall usage summary for the specified period.
@@ -168,6 +222,7 @@ async def get_usage_summary(
         
         # 🔧 FIX: Use improved provider statistics with NULL cost handling
         provider_stats = await get_provider_usage_stats_fixed(start_date, end_date)
+        response_cache_stats = await get_response_cache_usage_stats(start_date, end_date)
         
         # Calculate overall totals from provider stats
         total_requests = sum(p["requests"]["total"] for p in provider_stats)
@@ -203,6 +258,7 @@ async def get_usage_summary(
                 "average_tokens_per_request": round(total_tokens / total_successful) if total_successful > 0 else 0
             },
             "providers": provider_stats,
+            "response_cache": response_cache_stats,
             "generated_at": datetime.utcnow().isoformat()
         }
         
@@ -217,7 +273,7 @@ async def get_user_usage(
     user_id: int,
     days: int = Query(30, description="Number of days to analyze", ge=1, le=365),
     current_admin: User = Depends(get_current_admin_user),
-    session: AsyncSession = Depends(get_async_db)
+    session: AsyncSession = Depends(get_async_read_db)
 ) -> Dict[str, Any]:
     """
     Get detailed usage statistics for a specific user.
@@ -288,7 +344,7 @@ async def get_department_usage(
     department_id: int,
     days: int = Query(30, description="Number of days to analyze", ge=1, le=365),
     current_admin: User = Depends(get_current_admin_user),
-    session: AsyncSession = Depends(get_async_db)
+    session: AsyncSession = Depends(get_async_read_db)
 ) -> Dict[str, Any]:
     """
     Get usage statistics for a specific department.
@@ -360,7 +416,7 @@ async def get_recent_usage_logs(
     provider: Optional[str] = Query(None, description="Filter by LLM provider"),
     success_only: bool = Query(False, description="Show only successful requests"),
     current_admin: User = Depends(get_current_admin_user),
-    session: AsyncSession = Depends(get_async_db)
+    session: AsyncSession = Depends(get_async_read_db)
 ) -> Dict[str, Any]:
     """
     Get recent usage logs with filtering options.
@@ -498,7 +554,7 @@ async def get_top_users_by_usage(
     limit: int = Query(10, description="Number of top users to return", ge=1, le=50),
     metric: str = Query("total_cost", description="Metric to sort by: total_cost, total_tokens, or request_count"),
     current_admin: User = Depends(get_current_admin_user),
-    session: AsyncSession = Depends(get_async_db)
+    session: AsyncSession = Depends(get_async_read_db)
 ) -> Dict[str, Any]:
     """
     Get top users by various usage metrics.
@@ -739,6 +795,46 @@ async def get_pricing_cache_stats(
             detail=f"Failed to get cache stats: {str(e)}"
         )
 
+@router.get("/response-cache")
+async def get_response_cache_analytics(
+    days: int = Query(30, description="Number of days to analyze", ge=1, le=365),
+    current_admin: User = Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """
+    Get response cache hit rate and dollars saved.
+    
+    Combines historical numbers from usage logs with the live statistics of
+    this worker's in-memory response cache.
+    
+    Args:
+        days: Number of days to include in analysis (default: 30)
+        
+    Returns:
+        Response cache analytics
+    """
+    try:
+        from ...services.llm.response_cache import get_response_cache_manager
+        
+        end_date = datetime.utcnow().replace(microsecond=0)
+        start_date = (end_date - timedelta(days=days)).replace(microsecond=0)
+        
+        return {
+            "period": {
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "days": days
+            },
+            "usage": await get_response_cache_usage_stats(start_date, end_date),
+            "live_cache": await get_response_cache_manager().get_cache_stats(),
+            "generated_at": datetime.utcnow().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get response cache analytics: {str(e)}"
+        )
+
 # =============================================================================
 # HEALTH CHECK FOR USAGE SYSTEM
 # =============================================================================
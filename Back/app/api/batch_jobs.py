@@ -0,0 +1,138 @@
+# AI Dock Batch Job API Endpoints
+# Offline batch completions: upload a JSONL of chat requests, poll progress, download results
+
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.database import get_async_db
+from ..core.security import get_current_user
+from ..models.llm_config import LLMConfiguration
+from ..models.user import User
+from ..schemas.batch_job import BatchJobResponse, BatchJobListResponse
+from ..services.batch_job_service import get_batch_job_service, BatchJobInputError
+from ..services.llm.provider_factory import get_provider_factory
+
+router = APIRouter(prefix="/batch-jobs", tags=["Batch Jobs"])
+
+
+@router.post("/", response_model=BatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_batch_job(
+    file: UploadFile = File(..., description="JSONL file, one chat request per line"),
+    config_id: int = Form(..., description="LLM configuration to run the requests against"),
+    name: Optional[str] = Form(None),
+    model: Optional[str] = Form(None, description="Model for lines that don't set one"),
+    concurrency: Optional[int] = Form(None, description="Parallel requests (concurrent mode)"),
+    use_provider_batch: bool = Form(False, description="Use the provider's batch API (cheaper, slower)"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Submit a batch of chat requests.
+
+    Each line is {"custom_id": "...", "messages": [...], "model", "temperature", "max_tokens"}
+    or an OpenAI batch line ({"custom_id": "...", "body": {...}}). The job runs in the
+    background; poll GET /batch-jobs/{id} for progress and fetch /results when done.
+    """
+    service = get_batch_job_service()
+
+    config = await db.get(LLMConfiguration, config_id)
+    if not config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"LLM configuration {config_id} not found"
+        )
+    if not config.is_available_for_user(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Access denied to configuration '{config.name}'"
+        )
+    if use_provider_batch and not get_provider_factory().get_provider(config).supports_batch_api:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Configuration '{config.name}' does not support provider batch jobs"
+        )
+
+    try:
+        items = service.parse_jsonl(await file.read())
+    except BatchJobInputError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return await service.create_job(
+        db, current_user, config, items,
+        name=name or file.filename,
+        model=model,
+        concurrency=concurrency,
+        use_provider_batch=use_provider_batch
+    )
+
+
+@router.get("/", response_model=BatchJobListResponse)
+async def list_batch_jobs(
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List the current user's batch jobs, newest first."""
+    jobs = await get_batch_job_service().list_jobs(db, current_user, limit, offset)
+    return BatchJobListResponse(
+        jobs=[BatchJobResponse.model_validate(job) for job in jobs],
+        total_count=len(jobs)
+    )
+
+
+@router.get("/{job_id}", response_model=BatchJobResponse)
+async def get_batch_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a batch job's status and progress (poll this while it runs)."""
+    job = await get_batch_job_service().get_job(db, job_id, current_user)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch job not found")
+    return job
+
+
+@router.get("/{job_id}/results")
+async def get_batch_job_results(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Download results as JSONL, one line per request in input order:
+    {"custom_id", "line_number", "status", "response", "error"}.
+
+    Available while the job runs; unfinished requests have status "pending".
+    """
+    service = get_batch_job_service()
+    job = await service.get_job(db, job_id, current_user)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch job not found")
+
+    items = await service.get_job_items(db, job.id)
+    lines = (json.dumps(item.to_result_dict()) + "\n" for item in items)
+    return StreamingResponse(
+        lines,
+        media_type="application/jsonl",
+        headers={"Content-Disposition": f'attachment; filename="batch_job_{job.id}_results.jsonl"'}
+    )
+
+
+@router.post("/{job_id}/cancel", response_model=BatchJobResponse)
+async def cancel_batch_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Cancel a batch job. Requests that already finished keep their results."""
+    service = get_batch_job_service()
+    job = await service.get_job(db, job_id, current_user)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch job not found")
+    return await service.cancel_job(db, job)
@@ -19,6 +19,7 @@ from ...core.database import get_async_db
 
 # LLM service
 from ...services.llm_service import llm_service
+from ...services.llm.tokenizer import get_tokenizer_service
 
 # Schemas
 from ...schemas.chat_api import (
@@ -163,6 +164,11 @@ async def estimate_cost(
             max_tokens=request.max_tokens
         )
         
+        # Input token count from the same tokenizer used for quota checks
+        estimated_input_tokens = get_tokenizer_service().count_messages(
+            messages, config.provider, request.model or config.default_model
+        )
+        
         if estimated_cost is not None:
             message = f"Estimated cost: ${estimated_cost:.6f} USD"
         else:
@@ -171,6 +177,7 @@ async def estimate_cost(
         return CostEstimateResponse(
             estimated_cost=estimated_cost,
             has_cost_tracking=config.has_cost_tracking,
+            estimated_input_tokens=estimated_input_tokens,
             message=message
         )
         
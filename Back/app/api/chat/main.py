@@ -13,6 +13,7 @@ from datetime import datetime
 
 # Authentication and database dependencies
 from ...core.security import get_current_user
+from ...core.logging_config import hot_path_debug_enabled
 from ...models.user import User
 from ...models.llm_config import LLMConfiguration
 from ...core.database import get_async_db
@@ -25,12 +26,14 @@ from ...services.llm_service import (
     LLMServiceError, 
     LLMProviderError, 
     LLMConfigurationError, 
+    LLMContextWindowError,
     LLMQuotaExceededError,
     LLMDepartmentQuotaExceededError
 )
 
 # Import LLM service instance
 from ...services.llm_service import llm_service
+from ...services.llm.core.priority_lanes import resolve_request_priority
 from ...services.usage_service import usage_service
 from ...services.conversation_service import conversation_service
 
@@ -251,15 +254,11 @@ async def send_chat_message(
                 db=db
             )
             
-            logger.info(f"📄 File context result - Length: {len(file_context)} characters")
-            if file_context:
-                logger.info(f"📄 File context preview: {file_context[:200]}...")
-            else:
+            if not file_context:
                 logger.warning(f"⚠️ File processing returned empty context for files: {chat_request.file_attachment_ids}")
                 
-            logger.info(f"Processed {len(chat_request.file_attachment_ids)} file attachments, total context length: {len(file_context)} characters")
-        else:
-            logger.info(f"🔍 No file attachments in request")
+            logger.info("Processed %d file attachments, total context length: %d characters",
+                        len(chat_request.file_attachment_ids), len(file_context))
         
         # =============================================================================
         # STEP 6: INJECT ASSISTANT SYSTEM PROMPT
@@ -299,13 +298,14 @@ async def send_chat_message(
         
         # Add file context to the last user message if we have attachments
         if file_context and messages:
-            logger.info(f"📄 Adding file context to message. Context length: {len(file_context)}")
             # Find the last user message and append file context
             for i in range(len(messages) - 1, -1, -1):
                 if messages[i]["role"] == "user":
                     original_content = messages[i]["content"]
                     messages[i]["content"] = f"{messages[i]['content']}\\n\\n{file_context}"
-                    logger.info(f"📄 Added file context to user message. Original length: {len(original_content)}, New length: {len(messages[i]['content'])}")
+                    if hot_path_debug_enabled():
+                        logger.debug("📄 Added file context to user message: %d -> %d chars",
+                                     len(original_content), len(messages[i]['content']))
                     break
             else:
                 # No user message found, add a system message with file context
@@ -332,18 +332,23 @@ async def send_chat_message(
                     first_user_message = msg.content
                     break
         
-        # Debug: Log final message that will be sent to LLM
-        logger.info(f"📤 Sending {len(messages)} messages to LLM")
-        for i, msg in enumerate(messages):
-            content_preview = msg['content'][:100] + '...' if len(msg['content']) > 100 else msg['content']
-            logger.info(f"📤 Message {i+1} - Role: {msg['role']}, Content length: {len(msg['content'])}, Preview: {content_preview}")
+        # Per-message detail is only logged with the hot-path debug switch on
+        # (never the content itself)
+        if hot_path_debug_enabled():
+            for i, msg in enumerate(messages):
+                logger.debug("📤 Message %d - role=%s, %d chars", i + 1, msg['role'], len(msg['content']))
         
         # =============================================================================
         # STEP 8: SEND REQUEST THROUGH LLM SERVICE
         # =============================================================================
-        
-        logger.info(f"🔍 About to call llm_service.send_chat_request for user {current_user.id}, request_id {request_id}")
-        logger.info(f"🔍 Config: {chat_request.config_id}, Model: {validated_model}, Messages: {len(messages)}")
+
+        # Steps 1-7 only read: end the transaction so the pooled connection is
+        # free during the provider call (usage logging needs one of its own);
+        # step 9 checks a connection out again
+        await db.commit()
+
+        logger.debug("🔍 Calling llm_service.send_chat_request for user %s, request_id %s: config=%s, model=%s, %d messages",
+                     current_user.id, request_id, chat_request.config_id, validated_model, len(messages))
         
         # Send the actual request with assistant preferences
         response = await llm_service.send_chat_request(
@@ -357,11 +362,16 @@ async def send_chat_message(
             request_id=request_id,
             ip_address=client_ip,
             user_agent=user_agent,
-            assistant_id=chat_request.assistant_id
+            assistant_id=chat_request.assistant_id,
+            conversation_id=chat_request.conversation_id,
+            priority=resolve_request_priority(current_user, chat_request.priority)
         )
         
-        logger.info(f"✅ LLM service call completed for user {current_user.id}, request_id {request_id}")
-        logger.info(f"✅ Response: {len(response.content)} chars, {response.usage.get('total_tokens', 0)} tokens, ${response.cost:.4f if response.cost else 0:.4f}")
+        logger.info(
+            "✅ LLM response for user %s, request_id %s: %d chars, %d tokens, $%.4f",
+            current_user.id, request_id, len(response.content),
+            (response.usage or {}).get("total_tokens", 0), response.cost or 0
+        )
         
         # =============================================================================
         # STEP 9: SAVE MESSAGES TO CONVERSATION
@@ -488,6 +498,12 @@ async def send_chat_message(
         
         return chat_response
         
+    except LLMContextWindowError as e:
+        logger.warning(f"Request over the input token budget: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except LLMConfigurationError as e:
         logger.error(f"Configuration error: {str(e)}")
         raise HTTPException(
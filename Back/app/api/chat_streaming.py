@@ -5,16 +5,17 @@ import asyncio
 import json
 import uuid
 import logging
-from typing import AsyncGenerator, Dict, Any, Optional, List
+from typing import AsyncGenerator, Dict, Any, Optional, List, Literal, Tuple
 from fastapi import APIRouter, HTTPException, Depends, status, Request
 from fastapi.responses import StreamingResponse
+from starlette.requests import HTTPConnection
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Import our authentication and database dependencies
 from ..core.security import get_current_user
 from ..models.user import User
 from ..models.llm_config import LLMConfiguration
-from ..core.database import get_async_db
+from ..core.database import get_async_db, AsyncSessionLocal
 from sqlalchemy import select
 
 # Import our LLM service and schemas
@@ -22,10 +23,19 @@ from ..services.llm_service import (
     LLMServiceError, 
     LLMProviderError, 
     LLMConfigurationError, 
+    LLMContextWindowError,
     LLMQuotaExceededError,
     LLMDepartmentQuotaExceededError
 )
 from ..services.llm_service import llm_service
+from ..services.llm.streaming_encoder import (
+    StreamingFrameEncoder, encode_stream, encode_event, DONE_FRAME, ERROR_FRAME
+)
+from ..services.llm.stream_replay import get_stream_replay_manager, StreamReplayUnavailableError
+from ..services.llm.core.priority_lanes import resolve_request_priority
+from ..core.config import settings
+from ..core.tracing import get_tracer, traced_stream
+from ..core.logging_config import hot_path_debug_enabled
 
 # Import existing chat schemas (we'll reuse them)
 from ..schemas.chat_api.requests import ChatRequest, ChatMessage
@@ -39,6 +49,8 @@ from ..services.chat import (
     generate_conversation_title
 )
 from ..services.conversation_service import conversation_service
+from ..services.message_persistence_queue import get_message_persistence_queue
+from ..services.health_probe import get_readiness_probe
 
 # =============================================================================
 # STREAMING REQUEST/RESPONSE SCHEMAS
@@ -64,8 +76,13 @@ class StreamingChatRequest(BaseModel):
     max_tokens: Optional[int] = Field(None, ge=1, le=32000, description="Maximum response tokens")
     
     # 🆕 Streaming-specific options
-    stream_delay_ms: Optional[int] = Field(100, ge=10, le=1000, description="Delay between chunks in milliseconds")
+    stream_delay_ms: Optional[int] = Field(0, ge=0, le=1000, description="Artificial delay between frames in milliseconds, for testing (0 = model speed)")
+    coalesce_bytes: Optional[int] = Field(None, ge=0, le=65536, description="Flush a frame once this much content is buffered (0 = every token, default from server settings)")
+    coalesce_ms: Optional[int] = Field(None, ge=0, le=1000, description="Flush buffered content after this many milliseconds (0 = no time bound, default from server settings)")
     include_usage_in_stream: Optional[bool] = Field(True, description="Include usage info in final chunk")
+    priority: Optional[Literal["interactive", "background", "batch"]] = Field(
+        None, description="Priority lane; defaults to the role's lane and cannot be higher than it"
+    )
     
     # 🤖 NEW: Add conversation and assistant parameters
     assistant_id: Optional[int] = Field(None, description="ID of assistant")
@@ -81,7 +98,8 @@ class StreamingChatRequest(BaseModel):
                 ],
                 "temperature": 0.7,
                 "max_tokens": 1000,
-                "stream_delay_ms": 50,
+                "coalesce_bytes": 64,
+                "coalesce_ms": 50,
                 "include_usage_in_stream": True,
                 "assistant_id": 1,
                 "conversation_id": 1,
@@ -93,7 +111,9 @@ class StreamingChunk(BaseModel):
     """
     Schema for individual streaming chunks.
     
-    🎓 Learning: Each chunk represents a piece of the AI response
+    🎓 Learning: Each chunk represents a piece of the AI response. Frames are
+    written by StreamingFrameEncoder without building this model; frames
+    between the first and the final one omit the null metadata fields.
     """
     
     # Chunk identification
@@ -152,19 +172,22 @@ from fastapi import Query
 @router.get("/stream")
 async def stream_chat_message_sse(
     request_id: str,
-    config_id: int,
-    messages: str,  # JSON-encoded messages
+    config_id: Optional[int] = None,  # Required unless resuming
+    messages: Optional[str] = None,  # JSON-encoded messages (required unless resuming)
     token: str = Query(..., description="JWT token for authentication (EventSource cannot send headers)"),
     file_attachment_ids: Optional[str] = None,  # 📁 NEW: JSON-encoded file attachment IDs
     model: Optional[str] = None,
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
-    stream_delay_ms: Optional[int] = 100,
+    stream_delay_ms: Optional[int] = 0,
+    coalesce_bytes: Optional[int] = None,
+    coalesce_ms: Optional[int] = None,
     include_usage_in_stream: Optional[bool] = True,
     # 🤖 NEW: Add conversation and assistant parameters
     assistant_id: Optional[int] = None,
     conversation_id: Optional[int] = None,
     project_id: Optional[int] = None,
+    last_event_id: Optional[int] = Query(None, description="Resume after this event id (alternative to the Last-Event-ID header)"),
     request: Request = None,
     db: AsyncSession = Depends(get_async_db)
 ):
@@ -177,6 +200,11 @@ async def stream_chat_message_sse(
     This provides the same functionality as the POST endpoint but
     accepts all data via URL query parameters for EventSource compatibility.
     
+    🔁 Resuming: when a connection drops, EventSource reconnects to the same
+    URL with a Last-Event-ID header. If the stream for this request_id is
+    still buffered, the client receives the frames after that id (and the
+    rest of the generation) instead of starting a new, paid request.
+    
     Args:
         request_id: Unique request identifier from frontend
         config_id: ID of LLM configuration to use
@@ -185,8 +213,11 @@ async def stream_chat_message_sse(
         model: Optional model override
         temperature: Response randomness (0-2)
         max_tokens: Maximum response tokens
-        stream_delay_ms: Delay between chunks in milliseconds
+        stream_delay_ms: Artificial delay between frames in milliseconds (testing only)
+        coalesce_bytes: Flush a frame once this much content is buffered
+        coalesce_ms: Flush buffered content after this many milliseconds
         include_usage_in_stream: Include usage info in final chunk
+        last_event_id: Resume after this event id (Last-Event-ID header also accepted)
         request: FastAPI request object
         db: Database session
         
@@ -236,6 +267,33 @@ async def stream_chat_message_sse(
                 detail="Authentication failed"
             )
         
+        # 🔁 Reconnect to a stream that is still buffered for this request_id
+        resume_after = _get_last_event_id(request, last_event_id)
+        if settings.stream_resume_enabled:
+            replay = get_stream_replay_manager()
+            owner_id = await replay.get_owner(request_id)
+            if owner_id is not None:
+                if owner_id != current_user.id:
+                    raise HTTPException(
+                        status_code=status.HTTP_403_FORBIDDEN,
+                        detail="Stream belongs to another user"
+                    )
+                return _sse_response(
+                    _client_stream(replay.subscribe(request_id, resume_after), request, request_id),
+                    request_id
+                )
+        if resume_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Stream is no longer available for resuming; please resend the request"
+            )
+        
+        if config_id is None or messages is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="config_id and messages are required to start a stream"
+            )
+        
         # 📝 Parse JSON messages from query parameter
         try:
             parsed_messages = json.loads(messages)
@@ -248,22 +306,18 @@ async def stream_chat_message_sse(
         
         # 📁 NEW: Parse file attachment IDs from query parameter
         parsed_file_ids = None
-        logger.info(f"🔍 DEBUG: Raw file_attachment_ids parameter: {file_attachment_ids}")
         
         if file_attachment_ids:
             try:
                 parsed_file_ids = json.loads(file_attachment_ids)
                 if not isinstance(parsed_file_ids, list):
                     raise ValueError("file_attachment_ids must be a list")
-                logger.info(f"🔍 DEBUG: Successfully parsed file attachment IDs: {parsed_file_ids}")
             except (json.JSONDecodeError, ValueError) as e:
-                logger.error(f"❌ DEBUG: Invalid file_attachment_ids format: {str(e)}")
+                logger.error(f"❌ Invalid file_attachment_ids format: {str(e)}")
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Invalid file_attachment_ids format: {str(e)}"
                 )
-        else:
-            logger.info(f"🔍 DEBUG: No file_attachment_ids in query parameters")
         
         # 📝 Create StreamingChatRequest from query parameters
         stream_request = StreamingChatRequest(
@@ -274,6 +328,8 @@ async def stream_chat_message_sse(
             temperature=temperature,
             max_tokens=max_tokens,
             stream_delay_ms=stream_delay_ms,
+            coalesce_bytes=coalesce_bytes,
+            coalesce_ms=coalesce_ms,
             include_usage_in_stream=include_usage_in_stream,
             # 🤖 NEW: Add conversation and assistant parameters
             assistant_id=assistant_id,
@@ -356,80 +412,37 @@ async def stream_chat_message_internal(
         StreamingResponse with Server-Sent Events format
     """
     try:
-        # 🔐 Validate configuration and user access (same as regular chat)
-        config = await db.get(LLMConfiguration, stream_request.config_id)
-        if not config:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"LLM configuration {stream_request.config_id} not found"
-            )
-        
-        if not config.is_available_for_user(current_user):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Access denied to configuration '{config.name}'"
-            )
-        
-        logger.info(f"User {current_user.email} starting streaming chat via {config.name}")
+        validated_model = await resolve_stream_model(stream_request, current_user, db)
+        client_ip, user_agent, session_id = get_client_info(request, current_user)
         
-        # 📊 Extract client information for usage logging (same as regular chat)
-        client_ip = None
-        if hasattr(request, 'client') and request.client:
-            client_ip = request.client.host
-        
-        # Check for forwarded IP headers
-        forwarded_for = request.headers.get('X-Forwarded-For')
-        if forwarded_for:
-            client_ip = forwarded_for.split(',')[0].strip()
-        elif request.headers.get('X-Real-IP'):
-            client_ip = request.headers.get('X-Real-IP')
-        
-        user_agent = request.headers.get('User-Agent')
-        session_id = f"user_{current_user.id}_{int(request.state.__dict__.get('start_time', 0) * 1000) if hasattr(request.state, 'start_time') else 'unknown'}"
+        generator_args = dict(
+            stream_request=stream_request,
+            current_user=current_user,
+            validated_model=validated_model,
+            request_id=request_id,
+            session_id=session_id,
+            client_ip=client_ip,
+            user_agent=user_agent
+        )
         
-        # 🎛️ Model validation (same logic as regular chat)
-        validated_model = stream_request.model
-        if stream_request.model and stream_request.model != config.default_model:
-            try:
-                # Get dynamic models to validate against
-                dynamic_models_data = await llm_service.get_dynamic_models(
-                    config_id=stream_request.config_id,
-                    db=db,
-                    use_cache=True
-                )
-                
-                available_models = dynamic_models_data.get("models", [])
-                if stream_request.model not in available_models:
-                    default_model = dynamic_models_data.get("default_model", config.default_model)
-                    logger.warning(f"Model '{stream_request.model}' not available for streaming. Using '{default_model}' instead.")
-                    validated_model = default_model
-                    
-            except Exception as model_validation_error:
-                logger.warning(f"Model validation failed for streaming: {str(model_validation_error)}. Using default model.")
-                validated_model = config.default_model
+        if settings.stream_resume_enabled:
+            # 🔁 Generate in the background into the replay buffer, so a dropped
+            # connection can resume; the client reads from the buffer
+            replay = get_stream_replay_manager()
+            await replay.start(request_id, current_user.id, _detached_stream(generator_args))
+            body = replay.subscribe(request_id)
+        else:
+            body = stream_chat_generator(db=db, **generator_args)  # 📁 DB session for file processing
         
         # 🚀 Create streaming response with proper SSE headers
-        return StreamingResponse(
-            stream_chat_generator(
-                stream_request=stream_request,
-                current_user=current_user,
-                validated_model=validated_model,
-                request_id=request_id,
-                session_id=session_id,
-                client_ip=client_ip,
-                user_agent=user_agent,
-                db=db  # 📁 NEW: Pass database session for file processing
-            ),
-            media_type="text/event-stream",  # 🔑 KEY CHANGE: Proper SSE media type
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",  # 🆕 CORS for EventSource
-                "Access-Control-Allow-Headers": "Authorization, Content-Type",
-                "X-Accel-Buffering": "no"  # Disable nginx buffering for real-time streaming
-            }
-        )
+        return _sse_response(_client_stream(body, request, request_id), request_id)
         
+    except LLMContextWindowError as e:
+        logger.warning(f"Request over the input token budget: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except LLMConfigurationError as e:
         logger.error(f"Configuration error in streaming: {str(e)}")
         # Preserve the specific configuration error message for actionable feedback
@@ -467,10 +480,226 @@ async def stream_chat_message_internal(
             detail="An unexpected error occurred while processing your streaming chat request"
         )
 
+# =============================================================================
+# REQUEST PREPARATION (SHARED WITH THE WEBSOCKET TRANSPORT)
+# =============================================================================
+
+async def resolve_stream_model(
+    stream_request: StreamingChatRequest,
+    current_user: User,
+    db: AsyncSession
+) -> Optional[str]:
+    """
+    Check access to the requested configuration and pick the model to use.
+    
+    Args:
+        stream_request: Streaming chat request
+        current_user: Authenticated user
+        db: Database session
+        
+    Returns:
+        Model to request (the override if it is available, else the default)
+        
+    Raises:
+        HTTPException: 404 if the configuration does not exist, 403 if the
+            user may not use it
+    """
+    # 🔐 Validate configuration and user access (same as regular chat)
+    config = await db.get(LLMConfiguration, stream_request.config_id)
+    if not config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"LLM configuration {stream_request.config_id} not found"
+        )
+    
+    if not config.is_available_for_user(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Access denied to configuration '{config.name}'"
+        )
+    
+    logger.info(f"User {current_user.email} starting streaming chat via {config.name}")
+    
+    # 🎛️ Model validation (same logic as regular chat)
+    validated_model = stream_request.model
+    if stream_request.model and stream_request.model != config.default_model:
+        try:
+            # Get dynamic models to validate against
+            dynamic_models_data = await llm_service.get_dynamic_models(
+                config_id=stream_request.config_id,
+                db=db,
+                use_cache=True
+            )
+            
+            available_models = dynamic_models_data.get("models", [])
+            if stream_request.model not in available_models:
+                default_model = dynamic_models_data.get("default_model", config.default_model)
+                logger.warning(f"Model '{stream_request.model}' not available for streaming. Using '{default_model}' instead.")
+                validated_model = default_model
+                
+        except Exception as model_validation_error:
+            logger.warning(f"Model validation failed for streaming: {str(model_validation_error)}. Using default model.")
+            validated_model = config.default_model
+    
+    return validated_model
+
+
+def get_client_info(connection: HTTPConnection, current_user: User) -> Tuple[Optional[str], Optional[str], str]:
+    """
+    Extract client details for usage logging (same as regular chat).
+    
+    Args:
+        connection: HTTP request or WebSocket
+        current_user: Authenticated user
+        
+    Returns:
+        Tuple of (client_ip, user_agent, session_id)
+    """
+    client_ip = None
+    if hasattr(connection, 'client') and connection.client:
+        client_ip = connection.client.host
+    
+    # Check for forwarded IP headers
+    forwarded_for = connection.headers.get('X-Forwarded-For')
+    if forwarded_for:
+        client_ip = forwarded_for.split(',')[0].strip()
+    elif connection.headers.get('X-Real-IP'):
+        client_ip = connection.headers.get('X-Real-IP')
+    
+    user_agent = connection.headers.get('User-Agent')
+    session_id = f"user_{current_user.id}_{int(connection.state.__dict__.get('start_time', 0) * 1000) if hasattr(connection.state, 'start_time') else 'unknown'}"
+    return client_ip, user_agent, session_id
+
+# =============================================================================
+# CLIENT CONNECTION HANDLING (DISCONNECTS AND RESUME)
+# =============================================================================
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Access-Control-Allow-Origin": "*",  # 🆕 CORS for EventSource
+    "Access-Control-Allow-Headers": "Authorization, Content-Type, Last-Event-ID",
+    "X-Accel-Buffering": "no"  # Disable nginx buffering for real-time streaming
+}
+
+
+def _sse_response(body: AsyncGenerator[str, None], request_id: str) -> StreamingResponse:
+    """Wrap SSE frames in a streaming response (request id exposed for resuming)."""
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",  # 🔑 KEY CHANGE: Proper SSE media type
+        headers={**SSE_HEADERS, "X-Request-ID": request_id}
+    )
+
+
+def _get_last_event_id(request: Optional[Request], last_event_id: Optional[int]) -> Optional[int]:
+    """Event id to resume after, from the query parameter or the Last-Event-ID header."""
+    if last_event_id is not None:
+        return last_event_id
+    header = request.headers.get("Last-Event-ID") if request is not None else None
+    if header and header.strip().lstrip("-").isdigit():
+        return int(header)
+    return None
+
+
+async def _detached_stream(generator_args: Dict[str, Any]) -> AsyncGenerator[str, None]:
+    """
+    Generate a response independently of the client request.
+    
+    🎓 Learning: The request's DB session closes when its connection does,
+    but a resumable generation can outlive the connection, so it owns a
+    session of its own. The generator closes it once setup is done, so a
+    pool connection is only held around the setup queries, not while the
+    provider streams.
+    """
+    async with AsyncSessionLocal() as session:
+        async for frame in stream_chat_generator(db=session, **generator_args):
+            yield frame
+
+
+async def _client_stream(
+    frames: AsyncGenerator[str, None],
+    request: Optional[Request],
+    request_id: str
+) -> AsyncGenerator[str, None]:
+    """
+    Deliver frames to one client connection, stopping when it goes away.
+    
+    With stream resume enabled the frames come from the replay buffer and a
+    disconnect only detaches this client (generation continues for a grace
+    period); otherwise the generation runs in this task and is cancelled.
+    """
+    watcher = _start_disconnect_watcher(request)
+    try:
+        async for frame in frames:
+            yield frame
+    except StreamReplayUnavailableError as e:
+        logger.warning(f"⚠️ Cannot resume stream {request_id}: {str(e)}")
+        yield encode_event({
+            "error": True,
+            "error_type": "resume_unavailable",
+            "error_message": "The rest of this response is no longer available; please resend the request"
+        })
+        yield ERROR_FRAME
+    except asyncio.CancelledError:
+        if watcher is None or not watcher.disconnected:
+            raise
+        # We cancelled ourselves: whatever we were awaiting was cancelled
+        # with us (a provider read is logged as cancelled by the handler)
+        asyncio.current_task().uncancel()
+        logger.info(f"🔌 Client disconnected from stream {request_id}")
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        await frames.aclose()
+
+
+class _DisconnectWatcher:
+    """
+    Polls the client connection while a stream is generated.
+    
+    🎓 Learning: The generator only notices a closed connection when a write
+    fails, and nothing is written while we wait on the provider. Polling
+    Request.is_disconnected lets us cancel the stream (and the provider call
+    underneath it) within one poll interval of the browser going away.
+    """
+    
+    def __init__(self, request: Request, task: asyncio.Task, poll_seconds: float):
+        self.disconnected = False
+        self._request = request
+        self._task = task
+        self._poll_seconds = poll_seconds
+        self._watch_task = asyncio.create_task(self._watch())
+    
+    async def _watch(self) -> None:
+        while not self._task.done():
+            await asyncio.sleep(self._poll_seconds)
+            if await self._request.is_disconnected():
+                self.disconnected = True
+                self._task.cancel()
+                return
+    
+    def stop(self) -> None:
+        self._watch_task.cancel()
+
+
+def _start_disconnect_watcher(request: Optional[Request]) -> Optional[_DisconnectWatcher]:
+    """Watch the client connection of the current stream (disabled if poll interval is 0)."""
+    if request is None or not settings.streaming_disconnect_poll_ms:
+        return None
+    return _DisconnectWatcher(
+        request, asyncio.current_task(), settings.streaming_disconnect_poll_ms / 1000.0
+    )
+
 # =============================================================================
 # STREAMING GENERATOR FUNCTION
 # =============================================================================
 
+@traced_stream("stream_chat_generator", attributes=lambda kwargs: {
+    "user_id": kwargs["current_user"].id,
+    "config_id": kwargs["stream_request"].config_id,
+    "model": kwargs.get("validated_model")
+})
 async def stream_chat_generator(
     stream_request: StreamingChatRequest,
     current_user: User,
@@ -509,7 +738,17 @@ async def stream_chat_generator(
         str: Server-Sent Events formatted chunks
     """
     
-    chunk_index = 0
+    # 📦 Frame coalescing can be tuned per client; server settings are the default
+    encoder = StreamingFrameEncoder(
+        coalesce_bytes=(
+            stream_request.coalesce_bytes if stream_request.coalesce_bytes is not None
+            else settings.streaming_coalesce_bytes
+        ),
+        coalesce_ms=(
+            stream_request.coalesce_ms if stream_request.coalesce_ms is not None
+            else settings.streaming_coalesce_ms
+        )
+    )
     start_time = asyncio.get_event_loop().time()
     
     # 🤖 STEP 1: PROCESS ASSISTANT INTEGRATION AND CONVERSATION SETUP
@@ -520,12 +759,13 @@ async def stream_chat_generator(
     try:
         # Process assistant integration if assistant_id provided
         if stream_request.assistant_id or stream_request.conversation_id:
-            assistant_integration = await process_assistant_integration(
-                assistant_id=stream_request.assistant_id,
-                conversation_id=stream_request.conversation_id,
-                user=current_user,
-                db=db
-            )
+            with get_tracer().start_span("process_assistant_integration", assistant_id=stream_request.assistant_id):
+                assistant_integration = await process_assistant_integration(
+                    assistant_id=stream_request.assistant_id,
+                    conversation_id=stream_request.conversation_id,
+                    user=current_user,
+                    db=db
+                )
             
             # Extract assistant data
             assistant = assistant_integration.get("assistant")
@@ -593,11 +833,8 @@ async def stream_chat_generator(
     try:
         # 📁 NEW: Process file attachments for streaming chat
         file_context = ""
-        logger.info(f"🔍 DEBUG: Checking for file attachments in stream_request: {stream_request.file_attachment_ids}")
         
         if stream_request.file_attachment_ids:
-            logger.info(f"🔍 DEBUG: Starting file processing for {len(stream_request.file_attachment_ids)} files")
-            
             try:
                 from ..models.file_upload import FileUpload
                 from ..services.file_service import get_file_service
@@ -605,31 +842,27 @@ async def stream_chat_generator(
                 # Import the file processing function from chat services
                 from ..services.chat import process_file_attachments
                 
-                logger.info(f"🔍 DEBUG: About to call process_file_attachments with IDs: {stream_request.file_attachment_ids}")
-                
                 # Use the passed database session for file processing
-                file_context = await process_file_attachments(
-                    file_ids=stream_request.file_attachment_ids,
-                    user=current_user,
-                    db=db
-                )
+                with get_tracer().start_span(
+                    "process_file_attachments", file_count=len(stream_request.file_attachment_ids)
+                ) as span:
+                    file_context = await process_file_attachments(
+                        file_ids=stream_request.file_attachment_ids,
+                        user=current_user,
+                        db=db
+                    )
+                    span.set_attribute("context_chars", len(file_context))
                 
-                logger.info(f"🔍 DEBUG: process_file_attachments returned context length: {len(file_context)}")
-                if file_context:
-                    logger.info(f"🔍 DEBUG: File context preview: {file_context[:100]}...")
-                else:
-                    logger.warning(f"⚠️ DEBUG: process_file_attachments returned empty context!")
+                if not file_context:
+                    logger.warning("⚠️ process_file_attachments returned empty context!")
                     
-                logger.info(f"Processed {len(stream_request.file_attachment_ids)} file attachments for streaming, total context length: {len(file_context)} characters")
+                logger.info("Processed %d file attachments for streaming, total context length: %d characters",
+                            len(stream_request.file_attachment_ids), len(file_context))
                 
             except Exception as file_error:
-                logger.error(f"❌ DEBUG: Error processing file attachments: {str(file_error)}")
-                import traceback
-                logger.error(f"❌ DEBUG: File processing traceback: {traceback.format_exc()}")
+                logger.error(f"❌ Error processing file attachments: {str(file_error)}", exc_info=True)
                 # Continue without file context instead of failing the entire request
                 file_context = ""
-        else:
-            logger.info(f"🔍 DEBUG: No file attachments to process")
         
         # 📝 Convert to service format (same as regular chat)
         messages = [
@@ -638,39 +871,42 @@ async def stream_chat_generator(
         ]
         
         # 📁 Add file context to the last user message if we have attachments
-        logger.info(f"🔍 DEBUG: About to add file context to messages. file_context length: {len(file_context)}, messages count: {len(messages)}")
-        
         if file_context and messages:
-            logger.info(f"🔍 DEBUG: Adding file context to last user message")
             # Find the last user message and append file context
             for i in range(len(messages) - 1, -1, -1):
                 if messages[i]["role"] == "user":
                     original_content = messages[i]["content"]
                     messages[i]["content"] = f"{messages[i]['content']}\n\n{file_context}"
-                    logger.info(f"🔍 DEBUG: Updated user message. Original length: {len(original_content)}, New length: {len(messages[i]['content'])}")
+                    if hot_path_debug_enabled():
+                        logger.debug("📄 Added file context to user message: %d -> %d chars",
+                                     len(original_content), len(messages[i]['content']))
                     break
             else:
                 # No user message found, add a system message with file context
-                logger.info(f"🔍 DEBUG: No user message found, adding system message with file context")
+                logger.debug("📄 No user message found, adding system message with file context")
                 messages.insert(0, {
                     "role": "system", 
                     "content": f"The user has provided the following files for context:\n\n{file_context}"
                 })
         elif file_context and not messages:
-            logger.warning(f"⚠️ DEBUG: Have file context but no messages!")
+            logger.warning("⚠️ Have file context but no messages!")
         elif not file_context and stream_request.file_attachment_ids:
-            logger.warning(f"⚠️ DEBUG: Have file attachment IDs but no file context was generated!")
-        else:
-            logger.info(f"🔍 DEBUG: No file context to add to messages")
+            logger.warning("⚠️ Have file attachment IDs but no file context was generated!")
         
-        # 🔍 DEBUG: Log final messages being sent to LLM
-        logger.info(f"🙎 DEBUG: Sending {len(messages)} messages to LLM service:")
-        for i, msg in enumerate(messages):
-            content_preview = msg['content'][:100] + '...' if len(msg['content']) > 100 else msg['content']
-            logger.info(f"🙎 DEBUG: Message {i+1} - Role: {msg['role']}, Content length: {len(msg['content'])}, Preview: '{content_preview}'")
+        # Per-message detail is only logged with the hot-path debug switch on
+        # (never the content itself)
+        if hot_path_debug_enabled():
+            for i, msg in enumerate(messages):
+                logger.debug("📤 Message %d - role=%s, %d chars", i + 1, msg['role'], len(msg['content']))
+        
+        # 🔌 Setup is the only database work here: commit it (an auto-created
+        # conversation is only flushed so far) and hand the connection back
+        # before the provider stream, which can run for minutes
+        await db.commit()
+        await db.close()
         
         # 🚀 Call the NEW streaming method in LLM service
-        async for chunk_data in llm_service.stream_chat_request(
+        chunk_stream = llm_service.stream_chat_request(
             config_id=stream_request.config_id,
             messages=messages,
             user_id=current_user.id,
@@ -680,87 +916,65 @@ async def stream_chat_generator(
             session_id=session_id,
             request_id=request_id,
             ip_address=client_ip,
-            user_agent=user_agent
-        ):
-            # 📦 Format each chunk as Server-Sent Events
-            chunk = StreamingChunk(
-                chunk_id=f"chunk_{chunk_index:03d}",
-                chunk_index=chunk_index,
-                content=chunk_data.get("content", ""),
-                is_final=chunk_data.get("is_final", False),
-                model=chunk_data.get("model") if chunk_index == 0 else None,
-                provider=chunk_data.get("provider") if chunk_index == 0 else None,
-                usage=chunk_data.get("usage") if chunk_data.get("is_final") else None,
-                cost=chunk_data.get("cost") if chunk_data.get("is_final") else None,
-                response_time_ms=chunk_data.get("response_time_ms") if chunk_data.get("is_final") else None,
-                timestamp=chunk_data.get("timestamp", "")
-            )
-            
-            # 📡 Send chunk in SSE format
-            sse_data = f"data: {chunk.json()}\n\n"
-            yield sse_data
-            
-            # 🧮 Accumulate response content for conversation saving
-            accumulated_response_content += chunk_data.get("content", "")
+            user_agent=user_agent,
+            assistant_id=assistant.id if assistant else None,
+            conversation_id=stream_request.conversation_id,
+            priority=resolve_request_priority(current_user, stream_request.priority)
+        )
+        
+        # 📦 Frames go out at model speed (optionally coalesced by the encoder)
+        async for frame in encode_stream(chunk_stream, encoder):
+            yield frame
             
-            # 🕐 Add small delay for better streaming visualization
-            if stream_request.stream_delay_ms and stream_request.stream_delay_ms > 0:
+            # 🕐 Artificial pacing, only when a client asks for it (testing)
+            if stream_request.stream_delay_ms:
                 await asyncio.sleep(stream_request.stream_delay_ms / 1000.0)
-            
-            chunk_index += 1
-            
-            # 🏁 Break if this was the final chunk
-            if chunk_data.get("is_final"):
-                break
         
-        # 💾 STEP 3: SAVE MESSAGES TO CONVERSATION AFTER STREAMING COMPLETES
+        chunk_data = encoder.last_chunk
+        accumulated_response_content = encoder.content
+        
+        # 💾 STEP 3: QUEUE THE CONVERSATION WRITE AND FINISH THE STREAM
+        # The user message and reply are saved in one transaction by a
+        # background queue, so [DONE] is not held back by database writes
         if chat_conversation and accumulated_response_content:
-            try:
-                # Save the user message
-                last_user_message = None
-                for msg in reversed(stream_request.messages):
-                    if msg.role == "user":
-                        last_user_message = msg.content
-                        break
-                
-                if last_user_message:
-                    await conversation_service.save_message_to_conversation(
-                        db=db,
-                        conversation_id=chat_conversation.id,
-                        role="user",
-                        content=last_user_message,
-                        metadata={"file_attachments": stream_request.file_attachment_ids or []}
-                    )
-                    logger.info(f"💾 Saved user message to conversation {chat_conversation.id}")
-                
-                # Save the assistant response
-                await conversation_service.save_message_to_conversation(
-                    db=db,
-                    conversation_id=chat_conversation.id,
-                    role="assistant",
-                    content=accumulated_response_content,
-                    tokens_used=chunk_data.get("usage", {}).get("total_tokens"),
-                    cost=str(chunk_data.get("cost")) if chunk_data.get("cost") else None,
-                    response_time_ms=chunk_data.get("response_time_ms"),
-                    metadata={
-                        "provider": chunk_data.get("provider"),
-                        "assistant_id": assistant.id if assistant else None,
-                        "streaming": True
-                    }
-                )
-                logger.info(f"💾 Saved assistant response to conversation {chat_conversation.id}")
-                
-            except Exception as save_error:
-                logger.error(f"Failed to save messages to conversation (non-critical): {str(save_error)}")
+            last_user_message = None
+            for msg in reversed(stream_request.messages):
+                if msg.role == "user":
+                    last_user_message = msg.content
+                    break
+            
+            exchange = []
+            if last_user_message:
+                exchange.append({
+                    "role": "user",
+                    "content": last_user_message,
+                    "metadata": {"file_attachments": stream_request.file_attachment_ids or []}
+                })
+            exchange.append({
+                "role": "assistant",
+                "content": accumulated_response_content,
+                "tokens_used": (chunk_data.get("usage") or {}).get("total_tokens"),
+                "cost": str(chunk_data.get("cost")) if chunk_data.get("cost") else None,
+                "response_time_ms": chunk_data.get("response_time_ms"),
+                "metadata": {
+                    "provider": chunk_data.get("provider"),
+                    "assistant_id": assistant.id if assistant else None,
+                    "streaming": True
+                }
+            })
+            get_message_persistence_queue().enqueue(chat_conversation.id, exchange)
         elif chat_conversation:
             logger.warning(f"📝 No accumulated content to save for conversation {chat_conversation.id}")
         else:
             logger.info(f"📝 No conversation to save messages to (messages sent but not persisted)")
         
         # 🎯 Send completion marker
-        yield "data: [DONE]\n\n"
+        yield DONE_FRAME
         
-        logger.info(f"Streaming completed for user {current_user.email}: {chunk_index} chunks sent")
+        logger.info(
+            f"Streaming completed for user {current_user.email}: "
+            f"{encoder.chunks_received} chunks received, {encoder.frame_index} frames sent"
+        )
         
     except LLMDepartmentQuotaExceededError as e:
         # 🚫 Quota exceeded during streaming
@@ -768,10 +982,10 @@ async def stream_chat_generator(
             "error": True,
             "error_type": "quota_exceeded",
             "error_message": str(e),
-            "chunk_index": chunk_index
+            "chunk_index": encoder.frame_index
         }
-        yield f"data: {json.dumps(error_chunk)}\n\n"
-        yield "data: [ERROR]\n\n"
+        yield encode_event(error_chunk)
+        yield ERROR_FRAME
         
     except LLMConfigurationError as e:
         # 🔧 Configuration error during streaming (API keys, etc.)
@@ -779,10 +993,10 @@ async def stream_chat_generator(
             "error": True,
             "error_type": "configuration_error", 
             "error_message": str(e),
-            "chunk_index": chunk_index
+            "chunk_index": encoder.frame_index
         }
-        yield f"data: {json.dumps(error_chunk)}\n\n"
-        yield "data: [ERROR]\n\n"
+        yield encode_event(error_chunk)
+        yield ERROR_FRAME
         
     except LLMProviderError as e:
         # 🔌 Provider error during streaming
@@ -790,10 +1004,10 @@ async def stream_chat_generator(
             "error": True,
             "error_type": "provider_error", 
             "error_message": str(e),
-            "chunk_index": chunk_index
+            "chunk_index": encoder.frame_index
         }
-        yield f"data: {json.dumps(error_chunk)}\n\n"
-        yield "data: [ERROR]\n\n"
+        yield encode_event(error_chunk)
+        yield ERROR_FRAME
         
     except Exception as e:
         # 💥 Unexpected error during streaming
@@ -802,10 +1016,10 @@ async def stream_chat_generator(
             "error": True,
             "error_type": "unexpected_error",
             "error_message": "An unexpected error occurred during streaming",
-            "chunk_index": chunk_index
+            "chunk_index": encoder.frame_index
         }
-        yield f"data: {json.dumps(error_chunk)}\n\n"
-        yield "data: [ERROR]\n\n"
+        yield encode_event(error_chunk)
+        yield ERROR_FRAME
 
 # =============================================================================
 # HEALTH CHECK FOR STREAMING
@@ -816,11 +1030,13 @@ async def streaming_health_check(
     current_user: User = Depends(get_current_user)  # ✅ Re-added auth for health endpoint
 ):
     """Health check for streaming chat services."""
+    readiness = get_readiness_probe().readiness()
     return {
-        "status": "healthy",
+        "status": "healthy" if readiness["status"] == "ready" else readiness["status"],
         "message": "Chat streaming service is running",
         "streaming_endpoints": {
-            "stream_chat": "/chat/stream"
+            "stream_chat": "/chat/stream",
+            "websocket": "/chat/ws"
         },
         "streaming_features": {
             "server_sent_events": "Real-time streaming using SSE",
@@ -830,11 +1046,17 @@ async def streaming_health_check(
             "usage_logging": "Complete usage logging for streaming requests"
         },
         "supported_formats": {
-            "request": "StreamingChatRequest with optional stream_delay_ms",
+            "request": "StreamingChatRequest with optional coalesce_bytes/coalesce_ms",
             "response": "Server-Sent Events with StreamingChunk format",
             "completion": "[DONE] marker",
-            "errors": "[ERROR] marker with error details"
-        }
+            "errors": "[ERROR] marker with error details",
+            "resume": "Reconnect with Last-Event-ID to continue a dropped stream"
+        },
+        "stream_resume": (
+            get_stream_replay_manager().get_stats() if settings.stream_resume_enabled else {"enabled": False}
+        ),
+        "message_persistence": get_message_persistence_queue().get_stats(),
+        "readiness": readiness
     }
 
 # =============================================================================
@@ -0,0 +1,368 @@
+# AI Dock Chat WebSocket Endpoint
+# Multiplexes many streamed chat generations over one authenticated connection
+
+import asyncio
+import json
+import time
+import uuid
+import logging
+from typing import Dict, Any, Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Query
+from pydantic import ValidationError
+from sqlalchemy.orm import selectinload
+
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.security import verify_token as verify_jwt
+from ..models.user import User
+from ..services.llm_service import llm_service
+from ..services.llm.streaming_encoder import dumps
+from .chat_streaming import (
+    StreamingChatRequest,
+    stream_chat_generator,
+    resolve_stream_model,
+    get_client_info
+)
+
+router = APIRouter(
+    prefix="/chat",
+    tags=["Chat WebSocket"]
+)
+
+logger = logging.getLogger(__name__)
+
+# Application-defined close codes (4000-4999)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_AUTH_TIMEOUT = 4408
+
+# Streamed frames are wrapped as-is: the SSE payload is already JSON
+_CHUNK_TEMPLATE = '{"type":"chunk","stream_id":%s,"data":%s}'
+
+# =============================================================================
+# PROTOCOL
+# =============================================================================
+
+"""
+All frames are JSON text messages with a "type".
+
+Client → server:
+    {"type": "auth", "token": "..."}         First frame, unless ?token= was given;
+                                             may be resent to refresh an expiring token
+    {"type": "chat", "stream_id": "s1", ...}  Start a generation; the other fields are
+                                             those of StreamingChatRequest
+    {"type": "cancel", "stream_id": "s1"}    Stop a generation (partial usage is logged)
+    {"type": "quota"}                        Ask for a quota update now
+    {"type": "ping"}
+
+Server → client:
+    {"type": "ready", "user_id": 1, "max_streams": 8}
+    {"type": "chunk", "stream_id": "s1", "data": {...}}   Same payload as an SSE frame
+    {"type": "end", "stream_id": "s1", "status": "done" | "error" | "cancelled"}
+    {"type": "error", "stream_id": "s1" | null, "error_type": "...", "error_message": "..."}
+    {"type": "usage", "streams": 3, "total_tokens": 1234, "total_cost": 0.01}
+    {"type": "quota", "status": {...}}                    Department quota status
+    {"type": "pong"}
+"""
+
+# =============================================================================
+# WEBSOCKET ENDPOINT
+# =============================================================================
+
+@router.websocket("/ws")
+async def chat_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None, description="JWT token (or send an auth frame first)")
+):
+    """
+    🔌 WebSocket transport for streaming chat.
+
+    🎓 Learning: Each SSE stream is its own HTTP request, so every message
+    pays for authentication, config resolution and a fresh connection. Here
+    the client authenticates once and runs any number of generations on the
+    same socket, told apart by the stream_id it chooses. Generations use the
+    same pipeline as /chat/stream (stream_chat_generator → StreamingHandler).
+    """
+    await websocket.accept()
+    connection = ChatSocketConnection(websocket)
+    try:
+        if not await connection.authenticate(token):
+            return
+        await connection.run()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await connection.close()
+
+
+class ChatSocketConnection:
+    """
+    State of one chat WebSocket: the user, its running streams and totals.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.user: Optional[User] = None
+        self.token_expires_at: Optional[float] = None
+        self.streams: Dict[str, asyncio.Task] = {}
+        self.max_streams = settings.websocket_max_streams_per_connection
+
+        self._send_lock = asyncio.Lock()
+        self._closed = False
+        self._quota_task: Optional[asyncio.Task] = None
+        self._last_quota_push = 0.0
+        self._usage = {"streams": 0, "total_tokens": 0, "total_cost": 0.0}
+
+    # =========================================================================
+    # AUTHENTICATION
+    # =========================================================================
+
+    async def authenticate(self, token: Optional[str]) -> bool:
+        """Authenticate from the query token or the first frame; closes the socket on failure."""
+        if token is None:
+            try:
+                message = await asyncio.wait_for(
+                    self.websocket.receive_text(), timeout=settings.websocket_auth_timeout_seconds
+                )
+            except asyncio.TimeoutError:
+                await self.websocket.close(code=CLOSE_AUTH_TIMEOUT, reason="Authentication timeout")
+                return False
+            frame = self._parse(message)
+            token = frame.get("token") if frame and frame.get("type") == "auth" else None
+
+        if not await self._apply_token(token):
+            await self.websocket.close(code=CLOSE_UNAUTHORIZED, reason="Invalid or expired authentication token")
+            return False
+
+        logger.info(f"🔌 WebSocket authenticated for user: {self.user.email}")
+        await self.send_json({"type": "ready", "user_id": self.user.id, "max_streams": self.max_streams})
+        return True
+
+    async def _apply_token(self, token: Optional[str]) -> bool:
+        token_data = verify_jwt(token) if token else None
+        user_id = token_data.get("user_id") if token_data else None
+        if not user_id:
+            return False
+        if self.user is not None and self.user.id != user_id:
+            return False  # A connection stays bound to one user
+
+        async with AsyncSessionLocal() as session:
+            user = await session.get(User, user_id, options=[selectinload(User.role)])  # Role picks the priority lane
+        if not user or not user.is_active:
+            return False
+
+        self.user = user
+        self.token_expires_at = token_data.get("exp")
+        return True
+
+    async def _refresh_user(self, session) -> bool:
+        """
+        Reload the user (active flag, role) for a new stream.
+
+        Access is checked again on every chat frame rather than cached per
+        connection, so deactivation, role changes and revoked config access
+        apply to the next generation on an open socket.
+        """
+        user = await session.get(
+            User, self.user.id, options=[selectinload(User.role)], populate_existing=True
+        )
+        if not user or not user.is_active:
+            return False
+        self.user = user
+        return True
+
+    def _token_expired(self) -> bool:
+        return self.token_expires_at is not None and time.time() >= self.token_expires_at
+
+    # =========================================================================
+    # MESSAGE LOOP
+    # =========================================================================
+
+    async def run(self) -> None:
+        """Dispatch client frames until the socket closes."""
+        while True:
+            frame = self._parse(await self.websocket.receive_text())
+            if frame is None:
+                await self.send_error(None, "invalid_frame", "Frames must be JSON objects with a type")
+                continue
+
+            frame_type = frame.get("type")
+            if frame_type == "chat":
+                await self._start_stream(frame)
+            elif frame_type == "cancel":
+                await self._cancel_stream(frame.get("stream_id"))
+            elif frame_type == "auth":
+                if not await self._apply_token(frame.get("token")):
+                    await self.send_error(None, "unauthorized", "Invalid or expired authentication token")
+            elif frame_type == "quota":
+                await self._push_quota()
+            elif frame_type == "ping":
+                await self.send_json({"type": "pong"})
+            else:
+                await self.send_error(None, "invalid_frame", f"Unknown frame type: {frame_type}")
+
+    async def close(self) -> None:
+        """Cancel running streams (their partial usage is logged) and background pushes."""
+        self._closed = True
+        cancelled = len(self.streams)
+        tasks = list(self.streams.values())
+        if self._quota_task is not None:
+            tasks.append(self._quota_task)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if self.user is not None:
+            logger.info(f"🔌 WebSocket closed for user {self.user.email} ({cancelled} streams cancelled)")
+
+    # =========================================================================
+    # STREAMS
+    # =========================================================================
+
+    async def _start_stream(self, frame: Dict[str, Any]) -> None:
+        stream_id = frame.get("stream_id")
+        if not isinstance(stream_id, str) or not stream_id:
+            await self.send_error(None, "invalid_frame", "chat frames need a stream_id")
+            return
+        if stream_id in self.streams:
+            await self.send_error(stream_id, "duplicate_stream", "A stream with this id is already running")
+            return
+        if len(self.streams) >= self.max_streams:
+            await self.send_error(stream_id, "too_many_streams", f"At most {self.max_streams} concurrent streams per connection")
+            return
+        if self._token_expired():
+            await self.send_error(stream_id, "token_expired", "Authentication token expired; send a new auth frame")
+            return
+
+        try:
+            stream_request = StreamingChatRequest(
+                **{key: value for key, value in frame.items() if key not in ("type", "stream_id")}
+            )
+        except ValidationError as e:
+            await self.send_error(stream_id, "invalid_request", str(e))
+            return
+
+        self.streams[stream_id] = asyncio.create_task(self._run_stream(stream_id, stream_request))
+
+    async def _cancel_stream(self, stream_id: Optional[str]) -> None:
+        task = self.streams.get(stream_id)
+        if task is None:
+            await self.send_error(stream_id, "unknown_stream", "No running stream with this id")
+            return
+        task.cancel()
+
+    async def _run_stream(self, stream_id: str, stream_request: StreamingChatRequest) -> None:
+        """Generate one response and forward its frames, tagged with the stream id."""
+        status = "error"
+        frames = None
+        try:
+            async with AsyncSessionLocal() as session:
+                if not await self._refresh_user(session):
+                    await self.send_error(stream_id, "unauthorized", "User is no longer active")
+                    return
+                try:
+                    validated_model = await resolve_stream_model(stream_request, self.user, session)
+                except HTTPException as e:
+                    await self.send_error(stream_id, "request_rejected", str(e.detail))
+                    return
+
+                client_ip, user_agent, session_id = get_client_info(self.websocket, self.user)
+                frames = stream_chat_generator(
+                    stream_request=stream_request,
+                    current_user=self.user,
+                    validated_model=validated_model,
+                    request_id=str(uuid.uuid4()),
+                    session_id=session_id,
+                    client_ip=client_ip,
+                    user_agent=user_agent,
+                    db=session
+                )
+                async for frame in frames:
+                    if self._token_expired():
+                        # Stop generating for a token that was not refreshed in time
+                        await self.send_error(stream_id, "token_expired", "Authentication token expired; send a new auth frame")
+                        break
+                    payload = frame[6:-2]  # Strip "data: " and the blank line
+                    if payload == "[DONE]":
+                        status = "done"
+                    elif payload == "[ERROR]":
+                        status = "error"
+                    else:
+                        if payload.startswith('{"chunk_id"') and '"is_final":true' in payload:
+                            self._record_usage(json.loads(payload))
+                        await self.send_text(_CHUNK_TEMPLATE % (dumps(stream_id), payload))
+        except asyncio.CancelledError:
+            if self._closed:
+                raise
+            # Cancelled by a cancel frame: the handler has logged partial usage
+            asyncio.current_task().uncancel()
+            status = "cancelled"
+        except Exception as e:
+            logger.error(f"❌ WebSocket stream {stream_id} failed: {str(e)}")
+        finally:
+            if frames is not None:
+                await frames.aclose()
+            self.streams.pop(stream_id, None)
+
+        await self.send_json({"type": "end", "stream_id": stream_id, "status": status})
+        if status == "done":
+            await self.send_json({"type": "usage", **self._usage})
+            self._schedule_quota_push()
+
+    def _record_usage(self, final_chunk: Dict[str, Any]) -> None:
+        usage = final_chunk.get("usage") or {}
+        self._usage["streams"] += 1
+        self._usage["total_tokens"] += usage.get("total_tokens") or 0
+        self._usage["total_cost"] += final_chunk.get("cost") or 0.0
+
+    # =========================================================================
+    # QUOTA PUSH
+    # =========================================================================
+
+    def _schedule_quota_push(self) -> None:
+        """Push quota status after a generation, at most once per push interval."""
+        if self._quota_task is not None and not self._quota_task.done():
+            return  # A push is already scheduled and will include this usage
+        delay = max(self._last_quota_push + settings.websocket_quota_push_seconds - time.monotonic(), 0.0)
+        self._quota_task = asyncio.create_task(self._push_quota(delay))
+
+    async def _push_quota(self, delay: float = 0.0) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        self._last_quota_push = time.monotonic()
+        status = await llm_service.get_user_quota_status(self.user.id)
+        await self.send_json({"type": "quota", "status": status})
+
+    # =========================================================================
+    # SENDING
+    # =========================================================================
+
+    async def send_text(self, text: str) -> None:
+        """Send one frame (frames from concurrent streams are never interleaved)."""
+        if self._closed:
+            return
+        async with self._send_lock:
+            try:
+                await self.websocket.send_text(text)
+            except (WebSocketDisconnect, RuntimeError):
+                # Socket is gone; the receive loop notices and cancels the streams
+                self._closed = True
+
+    async def send_json(self, payload: Dict[str, Any]) -> None:
+        await self.send_text(dumps(payload))
+
+    async def send_error(self, stream_id: Optional[str], error_type: str, error_message: str) -> None:
+        await self.send_json({
+            "type": "error",
+            "stream_id": stream_id,
+            "error_type": error_type,
+            "error_message": error_message
+        })
+
+    @staticmethod
+    def _parse(message: str) -> Optional[Dict[str, Any]]:
+        try:
+            frame = json.loads(message)
+        except ValueError:
+            return None
+        return frame if isinstance(frame, dict) else None
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from ..core.database import get_async_db
+from ..core.database import get_async_db, get_async_read_db
 from ..core.security import get_current_user
 from ..models.user import User
 from ..services.conversation_service import conversation_service
@@ -93,7 +93,7 @@ async def list_conversations(
     limit: int = 50,
     offset: int = 0,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get user's conversations with pagination"""
     try:
@@ -234,7 +234,7 @@ async def search_conversations(
 @router.get("/stats/summary", response_model=ConversationStatsResponse)
 async def get_conversation_stats(
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get user's conversation statistics"""
     try:
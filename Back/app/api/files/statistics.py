@@ -9,7 +9,7 @@ This module handles file statistics and system monitoring including:
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-
+from ...core.database import get_db, get_read_db
 from ...core.database import get_db
 from ...core.security import get_current_user
 from ...models.user import User
@@ -29,7 +29,7 @@ router = APIRouter()
 async def get_file_statistics(
     current_user: User = Depends(get_current_user),
     file_service: FileService = Depends(get_file_service),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get file upload statistics for current user.
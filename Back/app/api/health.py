@@ -0,0 +1,37 @@
+# AI Dock Health Probes
+# Liveness and readiness endpoints for load balancers and orchestrators
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from ..services.health_probe import get_readiness_probe
+
+router = APIRouter(prefix="/health", tags=["Monitoring"])
+
+
+@router.get("/live")
+async def liveness():
+    """
+    Liveness probe: 200 while the worker's event loop answers requests.
+
+    Checks no dependencies, so a database outage does not get healthy
+    workers restarted.
+    """
+    return get_readiness_probe().liveness()
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    Readiness probe: 200 while this worker should receive traffic, 503 otherwise.
+
+    Returns the result of the background checks (database ping, pool
+    headroom, event-loop lag, write queue depth, provider pauses) without
+    running them. "degraded" is still ready: only provider pauses, which
+    affect every worker alike, are failing.
+    """
+    result = get_readiness_probe().readiness()
+    return JSONResponse(
+        content=result,
+        status_code=status.HTTP_200_OK if result["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
@@ -8,7 +8,7 @@ from datetime import datetime
 import logging
 
 # Import core dependencies
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 from ...core.security import get_current_user
 from ...models.user import User
 from ...services.manager_service import get_manager_service, ManagerService
@@ -69,6 +69,10 @@ def get_manager_service_dep(db: Session = Depends(get_db)) -> ManagerService:
     """Get a ManagerService instance via dependency injection"""
     return get_manager_service(db)
 
+def get_manager_read_service_dep(db: Session = Depends(get_read_db)) -> ManagerService:
+    """ManagerService on a read-only session (read replica when configured) for dashboards"""
+    return get_manager_service(db)
+
 # =============================================================================
 # UNIFIED DASHBOARD ENDPOINT
 # =============================================================================
@@ -81,7 +85,7 @@ def get_manager_service_dep(db: Session = Depends(get_db)) -> ManagerService:
 )
 async def get_department_dashboard(
     current_manager: User = Depends(get_manager_user),
-    manager_service: ManagerService = Depends(get_manager_service_dep)
+    manager_service: ManagerService = Depends(get_manager_read_service_dep)
 ):
     """
     Get comprehensive dashboard data for the manager's department.
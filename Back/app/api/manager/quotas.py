@@ -7,7 +7,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 from ...core.security import get_current_user
 from ...models.user import User
 from ...models.quota import QuotaType, QuotaPeriod, QuotaStatus
@@ -74,6 +74,10 @@ def get_manager_service_dep(db: Session = Depends(get_db)) -> ManagerService:
     """Get a ManagerService instance via dependency injection"""
     return get_manager_service(db)
 
+def get_manager_read_service_dep(db: Session = Depends(get_read_db)) -> ManagerService:
+    """ManagerService on a read-only session (read replica when configured) for dashboards"""
+    return get_manager_service(db)
+
 # =============================================================================
 # QUOTA LISTING AND SEARCH ENDPOINTS
 # =============================================================================
@@ -526,7 +530,7 @@ async def reset_department_quota(
 )
 async def get_department_quota_dashboard(
     current_manager: User = Depends(get_manager_user),
-    manager_service: ManagerService = Depends(get_manager_service_dep)
+    manager_service: ManagerService = Depends(get_manager_read_service_dep)
 ):
     """
     Get comprehensive quota and usage dashboard for the manager's department.
@@ -607,7 +611,7 @@ async def get_department_quota_dashboard(
 )
 async def get_department_quota_statistics(
     current_manager: User = Depends(get_manager_user),
-    manager_service: ManagerService = Depends(get_manager_service_dep)
+    manager_service: ManagerService = Depends(get_manager_read_service_dep)
 ):
     """
     Get quota statistics for the manager's department.
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 from ...core.security import get_current_user
 from ...models.user import User
 from ...models.role import PermissionConstants
@@ -72,6 +72,10 @@ def get_manager_service_dep(db: Session = Depends(get_db)) -> ManagerService:
     """Get a ManagerService instance via dependency injection"""
     return get_manager_service(db)
 
+def get_manager_read_service_dep(db: Session = Depends(get_read_db)) -> ManagerService:
+    """ManagerService on a read-only session (read replica when configured) for dashboards"""
+    return get_manager_service(db)
+
 # =============================================================================
 # USER LISTING AND SEARCH ENDPOINTS
 # =============================================================================
@@ -631,7 +635,7 @@ async def deactivate_department_user(
 )
 async def get_department_user_statistics(
     current_manager: User = Depends(get_manager_user),
-    manager_service: ManagerService = Depends(get_manager_service_dep)
+    manager_service: ManagerService = Depends(get_manager_read_service_dep)
 ):
     """
     Get comprehensive user statistics for the manager's department.
@@ -0,0 +1,46 @@
+# AI Dock Metrics Endpoint
+# Prometheus scrape target for this worker process
+
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from ..core.config import settings
+from ..core.metrics import render_metrics
+
+router = APIRouter(tags=["Monitoring"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(request: Request):
+    """
+    Prometheus metrics: HTTP and LLM latency histograms, TTFT, tokens and
+    cost, quota-check latency, DB pool usage, model cache hit ratio and
+    event-loop lag.
+
+    Requires the METRICS_AUTH_TOKEN bearer token. Without a token configured
+    it is refused unless METRICS_ALLOW_UNAUTHENTICATED is set.
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    if settings.metrics_auth_token:
+        authorization = request.headers.get("Authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not secrets.compare_digest(token, settings.metrics_auth_token):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid metrics token",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+    elif not settings.metrics_allow_unauthenticated:
+        # Cost and usage per config and model are not for anonymous callers
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Metrics require METRICS_AUTH_TOKEN (or METRICS_ALLOW_UNAUTHENTICATED=true)"
+        )
+
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 # Import our dependencies
-from ..core.database import get_async_db
+from ..core.database import get_async_read_db
 from ..core.security import get_current_user
 from ..models.user import User
 from ..services.usage_service import usage_service
@@ -24,7 +24,7 @@ router = APIRouter(prefix="/usage", tags=["User Usage Analytics"])
 async def get_my_usage_stats(
     days: int = Query(30, description="Number of days to analyze", ge=1, le=365),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_async_db)
+    session: AsyncSession = Depends(get_async_read_db)
 ) -> Dict[str, Any]:
     """
     Get detailed usage statistics for the current user.
@@ -95,7 +95,7 @@ async def get_my_usage_stats(
 async def get_my_recent_activity(
     limit: int = Query(20, description="Number of recent activities to return", ge=1, le=100),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_async_db)
+    session: AsyncSession = Depends(get_async_read_db)
 ) -> Dict[str, Any]:
     """
     Get recent usage activity for the current user.
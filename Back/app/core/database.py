@@ -6,10 +6,21 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import text
-from typing import AsyncGenerator, Generator
+from typing import AsyncGenerator, Generator, Dict, Any, List
 import logging
+import uuid
 
 from .config import settings
+from .db_pool import (
+    split_budget, InstrumentedQueuePool, InstrumentedAsyncQueuePool,
+    InstrumentedReadQueuePool, InstrumentedAsyncReadQueuePool,
+    ConnectionTracker, PoolMonitor
+)
+from .db_replica import ReplicaRouter
+from .sqlite_tuning import (
+    sqlite_pragmas, install_sqlite_pragmas, install_immediate_transactions, SQLiteWriter
+)
+from .schema_state import schema_revision, read_schema_revision, write_schema_revision
 
 # =============================================================================
 # LOGGING SETUP
@@ -32,6 +43,31 @@ if not hasattr(Base, 'metadata') or Base.metadata is None:
     logger.error("❌ SQLAlchemy Base metadata not properly initialized")
     raise Exception("Database Base class metadata initialization failed")
 
+# Per-process connection budget split between the two engines (10+20 each
+# without a budget): {"async": (pool_size, max_overflow), "sync": (...)}
+# A read replica gets the same split again ("async_read", "sync_read").
+POOL_LIMITS = split_budget(settings.db_connection_budget, settings.db_sync_pool_share)
+ASYNC_POOL_SIZE, ASYNC_MAX_OVERFLOW = POOL_LIMITS["async"]
+SYNC_POOL_SIZE, SYNC_MAX_OVERFLOW = POOL_LIMITS["sync"]
+
+
+def _connect_args(for_async: bool, database_url: str = settings.database_url) -> dict:
+    if database_url.startswith("sqlite"):
+        return {
+            "check_same_thread": False,
+            "timeout": settings.sqlite_busy_timeout_ms / 1000,  # How long to wait for the write lock
+            "isolation_level": None  # Use autocommit for better concurrency
+        }
+    if settings.db_pgbouncer_mode and for_async:
+        # In transaction mode each transaction may land on a different server
+        # connection, so asyncpg must not cache or reuse prepared statements by name
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__"
+        }
+    return {}
+
 # =============================================================================
 # DATABASE ENGINE CONFIGURATION (ASYNC)
 # =============================================================================
@@ -43,22 +79,15 @@ async_engine = create_async_engine(
     # Echo SQL queries in development (helpful for learning!)
     echo=settings.debug,
     
-    # Connection pool settings - these control how many database connections we keep open
-    pool_size=10,                    # Keep 10 connections ready
-    max_overflow=20,                 # Allow 20 more if needed
+    # Connection pool settings - the async engine's share of the connection budget
+    poolclass=InstrumentedAsyncQueuePool,  # Records checkout wait times
+    pool_size=ASYNC_POOL_SIZE,
+    max_overflow=ASYNC_MAX_OVERFLOW,
+    pool_timeout=settings.db_pool_timeout_seconds,
     pool_pre_ping=True,             # Test connections before using them
     pool_recycle=3600,              # Refresh connections every hour
     
-    # For SQLite only - allows multiple threads to access the database
-    connect_args=(
-        {
-            "check_same_thread": False,
-            "timeout": 30,  # 30 second timeout for lock waits
-            "isolation_level": None  # Use autocommit for better concurrency
-        } 
-        if settings.database_url.startswith("sqlite") 
-        else {}
-    )
+    connect_args=_connect_args(for_async=True)
 )
 
 # =============================================================================
@@ -73,24 +102,116 @@ sync_engine = create_engine(
     # Echo SQL queries in development
     echo=settings.debug,
     
-    # Connection pool settings
-    pool_size=10,
-    max_overflow=20,
+    # Connection pool settings - the rest of the budget
+    poolclass=InstrumentedQueuePool,
+    pool_size=SYNC_POOL_SIZE,
+    max_overflow=SYNC_MAX_OVERFLOW,
+    pool_timeout=settings.db_pool_timeout_seconds,
     pool_pre_ping=True,
     pool_recycle=3600,
     
-    # For SQLite only
-    connect_args=(
-        {
-            "check_same_thread": False,
-            "timeout": 30,  # 30 second timeout for lock waits
-            "isolation_level": None  # Use autocommit for better concurrency
-        } 
-        if settings.database_url.startswith("sqlite") 
-        else {}
+    connect_args=_connect_args(for_async=False)
+)
+
+# Remember who holds each connection so long-held ones can be reported
+connection_tracker = ConnectionTracker(settings.db_leak_threshold_seconds)
+connection_tracker.attach("async", async_engine.sync_engine.pool)
+connection_tracker.attach("sync", sync_engine.pool)
+pool_monitor = PoolMonitor(connection_tracker)
+
+# =============================================================================
+# READ REPLICA ENGINES (OPTIONAL)
+# =============================================================================
+
+# Analytics, dashboards and listings read from DATABASE_READ_URL when it is set.
+# Same pool settings as the primary engines; nothing here ever writes.
+if settings.database_read_url:
+    POOL_LIMITS["async_read"] = POOL_LIMITS["async"]
+    POOL_LIMITS["sync_read"] = POOL_LIMITS["sync"]
+
+    read_async_engine = create_async_engine(
+        settings.async_database_read_url,
+        echo=settings.debug,
+        poolclass=InstrumentedAsyncReadQueuePool,
+        pool_size=ASYNC_POOL_SIZE,
+        max_overflow=ASYNC_MAX_OVERFLOW,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        connect_args=_connect_args(for_async=True, database_url=settings.database_read_url)
     )
+    read_sync_engine = create_engine(
+        settings.database_read_url,
+        echo=settings.debug,
+        poolclass=InstrumentedReadQueuePool,
+        pool_size=SYNC_POOL_SIZE,
+        max_overflow=SYNC_MAX_OVERFLOW,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        connect_args=_connect_args(for_async=False, database_url=settings.database_read_url)
+    )
+    connection_tracker.attach("async_read", read_async_engine.sync_engine.pool)
+    connection_tracker.attach("sync_read", read_sync_engine.pool)
+else:
+    read_async_engine = None
+    read_sync_engine = None
+
+# Decides per session whether reads go to the replica or fall back to the primary
+replica_router = ReplicaRouter(
+    read_async_engine,
+    max_lag_seconds=settings.db_read_max_lag_seconds,
+    interval_seconds=settings.db_read_lag_check_interval_seconds
 )
 
+# Every engine of this process by name (pool metrics and diagnostics)
+ENGINES = {"async": async_engine, "sync": sync_engine}
+if read_async_engine is not None:
+    ENGINES.update({"async_read": read_async_engine, "sync_read": read_sync_engine})
+
+# =============================================================================
+# SQLITE PERFORMANCE PROFILE
+# =============================================================================
+
+if settings.database_url.startswith("sqlite") and settings.sqlite_performance_mode:
+    SQLITE_PRAGMAS = sqlite_pragmas(
+        settings.sqlite_busy_timeout_ms, settings.sqlite_cache_size_mb, settings.sqlite_mmap_size_mb
+    )
+    for _engine in ENGINES.values():
+        if _engine.dialect.name == "sqlite":
+            install_sqlite_pragmas(getattr(_engine, "sync_engine", _engine), SQLITE_PRAGMAS)
+else:
+    SQLITE_PRAGMAS = []
+
+# One extra connection that background writes queue for (see SQLiteWriter)
+if settings.database_url.startswith("sqlite") and settings.sqlite_single_writer:
+    POOL_LIMITS["sqlite_writer"] = (1, 0)
+    sqlite_writer_engine = create_async_engine(
+        settings.async_database_url,
+        echo=settings.debug,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        connect_args=_connect_args(for_async=True)
+    )
+    if SQLITE_PRAGMAS:
+        install_sqlite_pragmas(sqlite_writer_engine.sync_engine, SQLITE_PRAGMAS)
+    install_immediate_transactions(sqlite_writer_engine.sync_engine)
+    connection_tracker.attach("sqlite_writer", sqlite_writer_engine.sync_engine.pool)
+    ENGINES["sqlite_writer"] = sqlite_writer_engine
+    sqlite_writer = SQLiteWriter(async_sessionmaker(
+        sqlite_writer_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=True,
+        autocommit=False
+    ))
+else:
+    sqlite_writer_engine = None
+    sqlite_writer = None
+
 # =============================================================================
 # SESSION FACTORIES
 # =============================================================================
@@ -113,6 +234,27 @@ SyncSessionLocal = sessionmaker(
     autocommit=False
 )
 
+# Read-only session factories: the replica when configured, else the primary
+# (routing between them happens per session in the read dependencies below)
+if read_async_engine is not None:
+    AsyncReadSessionLocal = async_sessionmaker(
+        read_async_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+        autocommit=False
+    )
+    SyncReadSessionLocal = sessionmaker(
+        read_sync_engine,
+        class_=Session,
+        expire_on_commit=False,
+        autoflush=False,
+        autocommit=False
+    )
+else:
+    AsyncReadSessionLocal = AsyncSessionLocal
+    SyncReadSessionLocal = SyncSessionLocal
+
 # =============================================================================
 # DATABASE SESSION DEPENDENCIES
 # =============================================================================
@@ -160,6 +302,76 @@ def get_sync_db() -> Generator[Session, None, None]:
 # Default to sync for backward compatibility with existing code
 get_db = get_sync_db
 
+def get_async_read_session() -> AsyncSession:
+    """
+    Open a read-only async session: on the replica while it is caught up,
+    on the primary otherwise. Use as `async with get_async_read_session() as session:`
+    in services that open their own sessions.
+    
+    Only for queries that tolerate data a few seconds old (analytics,
+    dashboards, listings) - never for read-then-write logic.
+    """
+    return replica_router.choose(AsyncReadSessionLocal, AsyncSessionLocal)()
+
+def get_write_session():
+    """
+    Open an async session for a background write that owns its session
+    and has to read before it writes (streamed conversation turns). Use as
+    `async with get_write_session() as session:`.
+    
+    On SQLite with the single writer enabled the session waits for, and
+    runs as one transaction on, the writer connection; everywhere else it is
+    a regular AsyncSessionLocal() session.
+    """
+    if sqlite_writer is not None:
+        return sqlite_writer.session()
+    return AsyncSessionLocal()
+
+async def insert_objects(objects: List[Any]) -> None:
+    """
+    Insert new ORM objects in their own transaction (background writes
+    such as usage logs). On SQLite with the single writer enabled they are
+    group-committed with other queued inserts.
+    """
+    if sqlite_writer is not None:
+        await sqlite_writer.insert(objects)
+        return
+    async with AsyncSessionLocal() as session:
+        try:
+            session.add_all(objects)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency like get_async_db, for read-only endpoints that may
+    be served by the read replica (see get_async_read_session).
+    """
+    async with get_async_read_session() as session:
+        try:
+            yield session
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Async read session error: {e}")
+            raise
+
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    FastAPI dependency like get_db, for read-only sync endpoints that may
+    be served by the read replica.
+    """
+    session = replica_router.choose(SyncReadSessionLocal, SyncSessionLocal)()
+    try:
+        yield session
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Sync read session error: {e}")
+        raise
+    finally:
+        session.close()
+
 # Export engines for scripts that need direct access
 engine = sync_engine  # For backward compatibility
 
@@ -167,6 +379,25 @@ engine = sync_engine  # For backward compatibility
 # DATABASE INITIALIZATION
 # =============================================================================
 
+# PostgreSQL enum types the models use, created ahead of the tables
+POSTGRES_ENUMS = [
+    ('llmprovider', ['openai', 'anthropic', 'google', 'mistral', 'cohere', 'huggingface', 'azure_openai', 'custom']),
+    ('quotatype', ['cost', 'tokens', 'requests']),
+    ('quotaperiod', ['daily', 'weekly', 'monthly', 'yearly']),
+    ('quotastatus', ['active', 'suspended', 'exceeded', 'inactive'])
+]
+
+def register_models():
+    """
+    Import all model modules so their tables are registered with Base.
+    """
+    from ..models import (
+        user, role, department, llm_config, 
+        usage_log, quota, conversation, assistant,
+        file_upload, folder, chat, project, chat_conversation,
+        batch_job
+    )
+
 async def create_database_tables():
     """
     Create all database tables defined by our models.
@@ -175,23 +406,10 @@ async def create_database_tables():
     and creates the corresponding tables in the database.
     """
     async with async_engine.begin() as conn:
-        # Import all models here to ensure they're registered with Base
-        # This imports all model files which registers them with SQLAlchemy
-        from ..models import (
-            user, role, department, llm_config, 
-            usage_log, quota, conversation, assistant,
-            file_upload, folder, chat, project, chat_conversation
-        )
+        register_models()
         
         # Create PostgreSQL enums first if they don't exist
-        enums_to_create = [
-            ('llmprovider', ['openai', 'anthropic', 'google', 'mistral', 'cohere', 'huggingface', 'azure_openai', 'custom']),
-            ('quotatype', ['cost', 'tokens', 'requests']),
-            ('quotaperiod', ['daily', 'weekly', 'monthly', 'yearly']),
-            ('quotastatus', ['active', 'suspended', 'exceeded', 'inactive'])
-        ]
-        
-        for enum_name, enum_values in enums_to_create:
+        for enum_name, enum_values in POSTGRES_ENUMS if is_postgresql() else []:
             try:
                 # Check if enum exists, if not create it
                 result = await conn.execute(
@@ -215,25 +433,12 @@ def create_database_tables_sync():
     """
     Synchronous version of table creation.
     """
-    # Import all models here to ensure they're registered with Base
-    # This imports all model files which registers them with SQLAlchemy
-    from ..models import (
-        user, role, department, llm_config, 
-        usage_log, quota, conversation, assistant,
-        file_upload, folder, chat, project, chat_conversation
-    )
+    register_models()
     
     # Create PostgreSQL enums first if they don't exist
-    enums_to_create = [
-        ('llmprovider', ['openai', 'anthropic', 'google', 'mistral', 'cohere', 'huggingface', 'azure_openai', 'custom']),
-        ('quotatype', ['cost', 'tokens', 'requests']),
-        ('quotaperiod', ['daily', 'weekly', 'monthly', 'yearly']),
-        ('quotastatus', ['active', 'suspended', 'exceeded', 'inactive'])
-    ]
-    
     try:
         with sync_engine.connect() as conn:
-            for enum_name, enum_values in enums_to_create:
+            for enum_name, enum_values in POSTGRES_ENUMS if is_postgresql() else []:
                 # Check if enum exists, if not create it
                 result = conn.execute(
                     text("SELECT 1 FROM pg_type WHERE typname = :enum_name"),
@@ -253,6 +458,35 @@ def create_database_tables_sync():
     Base.metadata.create_all(sync_engine)
     logger.info("✅ Database tables created successfully (sync)")
 
+def ensure_database_schema() -> bool:
+    """
+    Create missing tables unless the database is known to be up to date.
+    
+    With DB_FAST_BOOT the revision recorded by the last successful creation
+    is compared with the current models first; when they match, the enum
+    probes and create_all (a round trip per table) are skipped. Returns
+    whether table creation ran.
+    """
+    register_models()
+    revision = schema_revision(Base.metadata)
+    
+    if settings.db_fast_boot:
+        try:
+            with sync_engine.connect() as conn:
+                recorded = read_schema_revision(conn)
+        except Exception as e:
+            logger.warning(f"Could not read the recorded schema revision: {e}")
+            recorded = None
+        if recorded == revision:
+            logger.info(f"⚡ Schema revision {revision} already applied, skipping table creation")
+            return False
+        logger.info(f"🧱 Schema revision {recorded or 'none'} -> {revision}, creating missing tables")
+    
+    create_database_tables_sync()
+    with sync_engine.begin() as conn:
+        write_schema_revision(conn, revision)
+    return True
+
 async def drop_database_tables():
     """
     Drop all database tables. 
@@ -323,16 +557,44 @@ async def startup_database():
         logger.error(f"   Sync connection: {'✅' if sync_healthy else '❌'}")
         raise Exception("Database connection failed")
     
-    # Create tables using sync method (more reliable for startup)
-    create_database_tables_sync()
+    budget = settings.db_connection_budget if settings.db_connection_budget > 0 else "off"
+    logger.info(
+        f"🗄️ DB connection budget {budget} per process: "
+        f"async {ASYNC_POOL_SIZE}+{ASYNC_MAX_OVERFLOW}, sync {SYNC_POOL_SIZE}+{SYNC_MAX_OVERFLOW}"
+        f"{' (PgBouncer mode)' if settings.db_pgbouncer_mode else ''}"
+    )
+    if is_sqlite():
+        profile = (
+            f"WAL, synchronous=NORMAL, {settings.sqlite_cache_size_mb} MB cache, {settings.sqlite_mmap_size_mb} MB mmap"
+            if SQLITE_PRAGMAS else "SQLite defaults"
+        )
+        writer = ", single writer for background writes" if sqlite_writer is not None else ""
+        logger.info(f"🪶 SQLite profile: {profile}{writer}")
+    
+    # Create tables using sync method (more reliable for startup),
+    # unless the recorded schema revision says they already exist
+    ensure_database_schema()
+    
+    # Report connections held past DB_LEAK_THRESHOLD_SECONDS
+    pool_monitor.start()
+    
+    # Route reads to the replica once it is known to be caught up
+    await replica_router.start()
 
 async def shutdown_database():
     """
     Clean up database connections on application shutdown.
     """
     logger.info("🔌 Closing database connections...")
+    await pool_monitor.stop()
+    await replica_router.stop()
     await async_engine.dispose()
     sync_engine.dispose()
+    if read_async_engine is not None:
+        await read_async_engine.dispose()
+        read_sync_engine.dispose()
+    if sqlite_writer_engine is not None:
+        await sqlite_writer_engine.dispose()
     logger.info("✅ Database connections closed")
 
 # =============================================================================
@@ -347,6 +609,32 @@ def get_async_database_url() -> str:
     """Get the current async database URL (useful for debugging)."""
     return settings.async_database_url
 
+def get_pool_status() -> Dict[str, Any]:
+    """Budget, usage and long-held connections of every pool, plus replica routing (for diagnostics)."""
+    engines = {}
+    for engine_name, engine in ENGINES.items():
+        pool = engine.pool
+        pool_size, max_overflow = POOL_LIMITS[engine_name]
+        engines[engine_name] = {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow()
+        }
+    threshold = settings.db_leak_threshold_seconds
+    return {
+        "budget": settings.db_connection_budget if settings.db_connection_budget > 0 else None,
+        "pgbouncer_mode": settings.db_pgbouncer_mode,
+        "pool_timeout_seconds": settings.db_pool_timeout_seconds,
+        "leak_threshold_seconds": threshold,
+        "leaks_reported": connection_tracker.leaks_reported,
+        "engines": engines,
+        "read_replica": replica_router.get_status(),
+        "sqlite_writer": sqlite_writer.get_stats() if sqlite_writer is not None else None,
+        "held_connections": connection_tracker.held_connections(min_seconds=threshold / 2 if threshold else 0.0)
+    }
+
 def is_sqlite() -> bool:
     """Check if we're using SQLite database."""
     return settings.database_url.startswith("sqlite")
@@ -0,0 +1,236 @@
+# AI Dock Database Pool Telemetry
+# Connection budget split, checkout wait timing and leak detection for the SQLAlchemy pools
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from .metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_CHECKOUT_TIMEOUTS, DB_CONNECTION_LEAKS
+
+logger = logging.getLogger(__name__)
+
+# Acquisition stacks keep only application frames (under app/)
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_STACK_FRAMES = 25
+
+# =============================================================================
+# CONNECTION BUDGET
+# =============================================================================
+
+# (pool_size, max_overflow) of each engine when no budget is set
+UNBUDGETED_POOL_LIMITS = (10, 20)
+
+
+def split_budget(budget: int, sync_share: float) -> Dict[str, Tuple[int, int]]:
+    """
+    Split the per-process connection budget into (pool_size, max_overflow)
+    for the async and sync engines. Half of each engine's share stays open,
+    the rest is opened on demand.
+
+    A budget of 0 or less means no budget: both engines get
+    UNBUDGETED_POOL_LIMITS.
+    """
+    if budget <= 0:
+        return {"async": UNBUDGETED_POOL_LIMITS, "sync": UNBUDGETED_POOL_LIMITS}
+    budget = max(budget, 2)
+    sync_capacity = min(max(1, round(budget * sync_share)), budget - 1)
+    limits = {}
+    for engine_name, capacity in (("async", budget - sync_capacity), ("sync", sync_capacity)):
+        pool_size = max(1, (capacity + 1) // 2)
+        limits[engine_name] = (pool_size, capacity - pool_size)
+    return limits
+
+
+# =============================================================================
+# INSTRUMENTED POOLS
+# =============================================================================
+
+class _TimedCheckout:
+    """Times how long a checkout waits for a free connection."""
+
+    engine_name = "unknown"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc(engine=self.engine_name)
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, engine=self.engine_name)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    """QueuePool for the sync engine with checkout wait metrics."""
+    engine_name = "sync"
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool for the async engine with checkout wait metrics."""
+    engine_name = "async"
+
+
+class InstrumentedReadQueuePool(InstrumentedQueuePool):
+    """Pool of the sync read-replica engine."""
+    engine_name = "sync_read"
+
+
+class InstrumentedAsyncReadQueuePool(InstrumentedAsyncQueuePool):
+    """Pool of the async read-replica engine."""
+    engine_name = "async_read"
+
+
+# =============================================================================
+# LEAK DETECTION
+# =============================================================================
+
+def _acquisition_stack() -> List[str]:
+    """
+    Application frames that led to the current checkout.
+
+    Async checkouts run inside SQLAlchemy's greenlet, so the walk continues
+    in the parent greenlet where the awaiting coroutine lives.
+    """
+    frames = []
+    frame = sys._getframe(2)
+    parent = None
+    try:
+        import greenlet
+        current = greenlet.getcurrent()
+        parent = current.parent.gr_frame if current.parent is not None else None
+    except ImportError:
+        pass
+
+    while frame is not None and len(frames) < MAX_STACK_FRAMES:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_ROOT) and filename != __file__:
+            frames.append(f"{os.path.relpath(filename, os.path.dirname(_APP_ROOT))}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+        if frame is None and parent is not None:
+            frame, parent = parent, None
+    return frames
+
+
+class ConnectionTracker:
+    """
+    Remembers every checked-out connection with when and where it was taken.
+
+    Connections held longer than `threshold_seconds` are reported once each
+    (log warning plus aidock_db_connection_leaks_total) by `check()`, which
+    the pool monitor calls periodically.
+    """
+
+    def __init__(self, threshold_seconds: float):
+        self.threshold = threshold_seconds
+        self._held: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.leaks_reported = 0
+
+    def attach(self, engine_name: str, pool) -> None:
+        event.listen(pool, "checkout", lambda dbapi_conn, record, proxy: self._checkout(engine_name, record))
+        event.listen(pool, "checkin", lambda dbapi_conn, record: self._checkin(record))
+
+    def _checkout(self, engine_name: str, record) -> None:
+        task_name = None
+        try:
+            task = asyncio.current_task()
+            task_name = task.get_name() if task else None
+        except RuntimeError:
+            pass
+        entry = {
+            "engine": engine_name,
+            "checked_out_at": time.time(),
+            "thread": threading.current_thread().name,
+            "task": task_name,
+            "stack": _acquisition_stack() if self.threshold else [],
+            "reported": False
+        }
+        with self._lock:
+            self._held[id(record)] = entry
+
+    def _checkin(self, record) -> None:
+        with self._lock:
+            entry = self._held.pop(id(record), None)
+        if entry and entry["reported"]:
+            held = time.time() - entry["checked_out_at"]
+            logger.info(f"🔓 Long-held {entry['engine']} connection returned after {held:.1f}s")
+
+    def held_connections(self, min_seconds: float = 0.0) -> List[Dict[str, Any]]:
+        """Checked-out connections held at least `min_seconds`, longest first."""
+        now = time.time()
+        with self._lock:
+            entries = list(self._held.values())
+        held = [
+            {**{key: value for key, value in entry.items() if key != "reported"},
+             "held_seconds": round(now - entry["checked_out_at"], 1)}
+            for entry in entries if now - entry["checked_out_at"] >= min_seconds
+        ]
+        return sorted(held, key=lambda entry: entry["held_seconds"], reverse=True)
+
+    def check(self) -> int:
+        """Report connections that crossed the threshold since the last check."""
+        if not self.threshold:
+            return 0
+        now = time.time()
+        new_leaks = []
+        with self._lock:
+            for entry in self._held.values():
+                if not entry["reported"] and now - entry["checked_out_at"] >= self.threshold:
+                    entry["reported"] = True
+                    new_leaks.append(entry)
+        for entry in new_leaks:
+            self.leaks_reported += 1
+            DB_CONNECTION_LEAKS.inc(engine=entry["engine"])
+            stack = "\n    ".join(entry["stack"]) or "(no application frames)"
+            logger.warning(
+                f"⚠️ {entry['engine']} DB connection held for {now - entry['checked_out_at']:.0f}s "
+                f"(thread {entry['thread']}, task {entry['task']}); checked out at:\n    {stack}"
+            )
+        return len(new_leaks)
+
+
+class PoolMonitor:
+    """Runs the leak check periodically on the event loop."""
+
+    def __init__(self, tracker: ConnectionTracker):
+        self.tracker = tracker
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.tracker.threshold and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🔍 DB connection leak detection on (threshold {self.tracker.threshold:g}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        interval = min(max(self.tracker.threshold / 4, 1.0), 15.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.tracker.check()
+            except Exception as e:
+                logger.error(f"Connection leak check failed: {e}")
+
+
+__all__ = [
+    'split_budget', 'InstrumentedQueuePool', 'InstrumentedAsyncQueuePool',
+    'InstrumentedReadQueuePool', 'InstrumentedAsyncReadQueuePool',
+    'ConnectionTracker', 'PoolMonitor'
+]
@@ -0,0 +1,152 @@
+# AI Dock Read Replica Routing
+# Sends read-only sessions to a replica while it is reachable and caught up, and to the primary otherwise
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, Callable, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .metrics import DB_REPLICA_LAG, DB_REPLICA_IN_USE, DB_READ_SESSIONS
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = TypeVar("SessionFactory", bound=Callable)
+
+# Seconds since the last replayed transaction, 0 when the replica has replayed
+# everything it received (an idle primary writes nothing, so replay timestamps
+# alone would report growing lag) or when the server is not in recovery at all
+POSTGRES_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaRouter:
+    """
+    Decides where read-only sessions go.
+
+    A background check measures replication lag every `interval_seconds`.
+    Reads use the replica while the check succeeds and the lag is at most
+    `max_lag_seconds`; otherwise they fall back to the primary until the lag
+    is back under half the limit (so a replica hovering at the limit does not
+    flap). Without a replica engine every read goes to the primary.
+
+    Sessions opened between a replica failure and the next check still go to
+    the replica and fail; routing switches at the next check.
+    """
+
+    def __init__(self, engine: Optional[AsyncEngine], max_lag_seconds: float, interval_seconds: float):
+        self.engine = engine
+        self.max_lag = max_lag_seconds
+        self.interval = max(interval_seconds, 0.5)
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_check_at: Optional[float] = None
+        self.fallbacks = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def configured(self) -> bool:
+        return self.engine is not None
+
+    @property
+    def use_replica(self) -> bool:
+        return self.configured and self.healthy
+
+    def choose(self, replica_factory: SessionFactory, primary_factory: SessionFactory) -> SessionFactory:
+        """Pick the session factory for one read-only session."""
+        if self.use_replica:
+            DB_READ_SESSIONS.inc(target="replica")
+            return replica_factory
+        DB_READ_SESSIONS.inc(target="primary")
+        return primary_factory
+
+    async def _measure_lag(self) -> float:
+        async with self.engine.connect() as conn:
+            if self.engine.dialect.name == "postgresql":
+                result = await conn.execute(POSTGRES_LAG_QUERY)
+                return float(result.scalar() or 0.0)
+            # Other backends have no portable lag query: reachable counts as caught up
+            await conn.execute(text("SELECT 1"))
+            return 0.0
+
+    async def check(self) -> bool:
+        """Measure the lag once and update routing; returns whether reads use the replica."""
+        if not self.configured:
+            return False
+        try:
+            lag = await asyncio.wait_for(self._measure_lag(), timeout=self.interval)
+            self.lag_seconds = lag
+            self.last_error = None
+            DB_REPLICA_LAG.set(lag)
+            healthy = lag <= (self.max_lag / 2 if not self.healthy else self.max_lag)
+            reason = f"replication lag {lag:.1f}s (limit {self.max_lag:g}s)"
+        except Exception as e:
+            message = str(e).splitlines()[0] if str(e) else ""
+            self.last_error = f"{type(e).__name__}: {message}" if message else type(e).__name__
+            healthy = False
+            reason = f"replica check failed: {self.last_error}"
+        first_check = self.last_check_at is None
+        self.last_check_at = time.time()
+
+        if healthy != self.healthy:
+            if healthy:
+                if not first_check:
+                    logger.info(f"📗 Read replica back in use ({reason})")
+            else:
+                self.fallbacks += 1
+                logger.warning(f"📕 Reads fall back to the primary: {reason}")
+        self.healthy = healthy
+        DB_REPLICA_IN_USE.set(1 if healthy else 0)
+        return healthy
+
+    async def start(self) -> None:
+        """Check once (so routing is decided before the first request), then keep checking."""
+        if not self.configured:
+            return
+        await self.check()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"📚 Read replica routing on: {'replica' if self.healthy else 'primary (fallback)'}, "
+            f"max lag {self.max_lag:g}s, checked every {self.interval:g}s"
+        )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Read replica check failed: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "configured": self.configured,
+            "in_use": self.use_replica,
+            "lag_seconds": round(self.lag_seconds, 3) if self.lag_seconds is not None else None,
+            "max_lag_seconds": self.max_lag,
+            "check_interval_seconds": self.interval,
+            "last_check_age_seconds": round(time.time() - self.last_check_at, 1) if self.last_check_at else None,
+            "last_error": self.last_error,
+            "fallbacks": self.fallbacks
+        }
+
+
+__all__ = ['ReplicaRouter', 'POSTGRES_LAG_QUERY']
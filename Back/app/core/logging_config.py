@@ -0,0 +1,243 @@
+# AI Dock Logging Configuration
+# Structured (JSON or text) logging with per-logger sampling and a runtime hot-path debug switch
+
+import json
+import logging
+import random
+import sys
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Union
+
+from .tracing import get_tracer
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+# (uvicorn adds color_message to its own records)
+_RESERVED_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "color_message"}
+
+# =============================================================================
+# HOT-PATH DEBUG SWITCH
+# =============================================================================
+
+class _HotPathDebug:
+    """
+    Runtime switch for per-message / per-chunk detail logs.
+
+    Call sites check the flag before building any arguments:
+
+        if hot_path_debug_enabled():
+            logger.debug("Message %d: role=%s, %d chars", i, role, len(content))
+
+    Turning it on also lowers the "app" logger to DEBUG so the lines are
+    emitted; turning it off restores the previous level.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._previous_level: Optional[int] = None
+
+    def set(self, enabled: bool) -> None:
+        app_logger = logging.getLogger("app")
+        if enabled and not self.enabled:
+            self._previous_level = app_logger.level
+            if app_logger.getEffectiveLevel() > logging.DEBUG:
+                app_logger.setLevel(logging.DEBUG)
+        elif not enabled and self.enabled and self._previous_level is not None:
+            app_logger.setLevel(self._previous_level)
+            self._previous_level = None
+        self.enabled = enabled
+
+
+_hot_path_debug = _HotPathDebug()
+
+
+def hot_path_debug_enabled() -> bool:
+    """True when per-message and per-chunk detail logging is switched on."""
+    return _hot_path_debug.enabled
+
+
+def set_hot_path_debug(enabled: bool) -> None:
+    _hot_path_debug.set(enabled)
+
+
+# =============================================================================
+# SAMPLING
+# =============================================================================
+
+def parse_sample_rates(spec: Union[str, Dict[str, float], None]) -> Dict[str, float]:
+    """
+    Parse "logger=rate,..." (e.g. "app.services.usage_service=0.1") into a dict.
+
+    Rates apply to the named logger and its children; the most specific
+    prefix wins.
+    """
+    if not spec:
+        return {}
+    if isinstance(spec, dict):
+        items = spec.items()
+    else:
+        items = (part.split("=", 1) for part in spec.split(",") if "=" in part)
+    rates = {}
+    for name, rate in items:
+        rate = float(rate)
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"Sample rate for '{name}' must be between 0 and 1")
+        rates[name.strip()] = rate
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of INFO/DEBUG records per logger; warnings and errors
+    always pass.
+
+    Inside a traced request the decision is made per request_id, so a
+    sampled request keeps all of its lines instead of a random subset.
+    Also stamps records with request_id/trace_id for the formatters.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rates: Dict[str, float] = rates or {}
+        self._cache: Dict[str, float] = {}
+
+    def set_rates(self, rates: Dict[str, float]) -> None:
+        self.rates = dict(rates)
+        self._cache = {}
+
+    def _rate_for(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, prefix_rate in self.rates.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                    rate, best = prefix_rate, len(prefix)
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = get_tracer().current_span()
+        trace = getattr(span, "trace", None)
+        record.request_id = trace.request_id if trace else None
+        record.trace_id = trace.trace_id if trace else None
+
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate_for(record.name)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        if record.request_id:
+            return (zlib.crc32(record.request_id.encode()) % 10000) < rate * 10000
+        return random.random() < rate
+
+
+# =============================================================================
+# FORMATTERS
+# =============================================================================
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {
+        key: value for key, value in vars(record).items()
+        if key not in _RESERVED_ATTRIBUTES and key not in ("request_id", "trace_id")
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, request ids and `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+            entry["trace_id"] = record.trace_id
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The default "LEVEL:logger:message" layout, plus request_id and `extra` fields as key=value."""
+
+    def __init__(self):
+        super().__init__("%(levelname)s:%(name)s:%(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if getattr(record, "request_id", None):
+            fields = {"request_id": record.request_id, **fields}
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+# =============================================================================
+# SETUP
+# =============================================================================
+
+_sampling_filter = SamplingFilter()
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    sample_rates: Optional[str] = None,
+    hot_path_debug: Optional[bool] = None
+) -> None:
+    """
+    Install the root handler (stderr) with the configured format and sampling.
+
+    Arguments default to the LOG_* settings.
+    """
+    from .config import settings
+
+    level = (level or settings.log_level).upper()
+    log_format = (log_format or settings.log_format).lower()
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    handler.addFilter(_sampling_filter)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _sampling_filter.set_rates(parse_sample_rates(
+        settings.log_sample_rates if sample_rates is None else sample_rates
+    ))
+    set_hot_path_debug(settings.log_hot_path_debug if hot_path_debug is None else hot_path_debug)
+
+
+def update_logging(sample_rates: Optional[Union[str, Dict[str, float]]] = None, hot_path_debug: Optional[bool] = None) -> None:
+    """Change sampling and the hot-path debug switch at runtime (this worker only)."""
+    if sample_rates is not None:
+        _sampling_filter.set_rates(parse_sample_rates(sample_rates))
+    if hot_path_debug is not None:
+        set_hot_path_debug(hot_path_debug)
+
+
+def get_logging_state() -> Dict[str, Any]:
+    return {
+        "level": logging.getLevelName(logging.getLogger().level),
+        "app_level": logging.getLevelName(logging.getLogger("app").getEffectiveLevel()),
+        "sample_rates": dict(_sampling_filter.rates),
+        "hot_path_debug": hot_path_debug_enabled()
+    }
+
+
+__all__ = [
+    'hot_path_debug_enabled', 'set_hot_path_debug', 'parse_sample_rates',
+    'SamplingFilter', 'JsonFormatter', 'TextFormatter',
+    'configure_logging', 'update_logging', 'get_logging_state'
+]
@@ -0,0 +1,495 @@
+# AI Dock Metrics
+# In-process Prometheus metrics: counters, gauges and histograms rendered in the text exposition format
+
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds: fast endpoints up to long LLM generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Short operations such as quota checks and event-loop lag
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# =============================================================================
+# METRIC TYPES
+# =============================================================================
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """
+    Base class: a named metric with a fixed set of label names.
+
+    Values are kept per label-value tuple. Updates take a lock so worker
+    threads (sync DB sessions, thread pools) can record too.
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple("" if labels[name] is None else str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        """(suffix, label names, label values, value) for every series."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """Monotonically increasing value (requests, tokens, dollars)."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("_total", self.labelnames, key, value) for key, value in items]
+
+
+class Gauge(Metric):
+    """
+    Value that goes up and down.
+
+    Either set directly, or give a callback returning {label values: value}
+    that is evaluated at scrape time (pool usage, cache ratios).
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        if self.callback is not None:
+            try:
+                values = self.callback()
+            except Exception as e:
+                logger.warning(f"⚠️ Metrics callback for {self.name} failed: {str(e)}")
+                values = {}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [("", self.labelnames, key, value) for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets (latencies, sizes)."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def get_count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        names = self.labelnames + ("le",)
+        result = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                result.append(("_bucket", names, key + (_format_value(bound),), cumulative))
+            result.append(("_bucket", names, key + ("+Inf",), count))
+            result.append(("_sum", self.labelnames, key, total))
+            result.append(("_count", self.labelnames, key, count))
+        return result
+
+
+# =============================================================================
+# REGISTRY
+# =============================================================================
+
+class MetricsRegistry:
+    """
+    Holds every metric of this worker process and renders them for /metrics.
+
+    Each uvicorn worker has its own registry; Prometheus scrapes workers
+    individually (or through the load balancer) and aggregates.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), callback=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Text exposition format 0.0.4."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Reset all values (keeps the metric definitions)."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+
+registry = MetricsRegistry()
+
+# =============================================================================
+# GATEWAY METRICS
+# =============================================================================
+
+# HTTP (recorded by SecurityHeadersMiddleware; streaming routes measure time to response headers)
+HTTP_REQUESTS = registry.counter(
+    "aidock_http_requests", "HTTP requests by route template, method and status",
+    ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "aidock_http_request_duration_seconds", "HTTP request duration until the response starts",
+    ("method", "route")
+)
+
+# LLM provider calls (recorded by LLMOrchestrator and StreamingHandler)
+LLM_REQUESTS = registry.counter(
+    "aidock_llm_requests", "LLM requests by configuration, model, mode and outcome",
+    ("config_id", "model", "mode", "outcome")
+)
+LLM_REQUEST_DURATION = registry.histogram(
+    "aidock_llm_request_duration_seconds", "End-to-end LLM request duration (streaming: until the last chunk)",
+    ("config_id", "model", "mode")
+)
+LLM_PROVIDER_LATENCY = registry.histogram(
+    "aidock_llm_provider_latency_seconds", "Provider call latency (chat: as reported on the response, streaming: until the last chunk)",
+    ("config_id", "model")
+)
+LLM_TTFT = registry.histogram(
+    "aidock_llm_time_to_first_token_seconds", "Streaming time to first chunk, including admission queueing",
+    ("config_id", "model")
+)
+QUOTA_CHECK_DURATION = registry.histogram(
+    "aidock_quota_check_duration_seconds", "Department quota check latency before provider calls",
+    ("outcome",), buckets=FAST_BUCKETS
+)
+
+# Tokens and cost (recorded by UsageService when usage logs are written)
+LLM_TOKENS = registry.counter(
+    "aidock_llm_tokens", "Tokens by configuration, model and direction (input/output)",
+    ("config_id", "model", "direction")
+)
+LLM_COST = registry.counter(
+    "aidock_llm_cost_usd", "Actual LLM cost in USD by configuration and model",
+    ("config_id", "model")
+)
+USAGE_LOGS = registry.counter(
+    "aidock_usage_logs_written", "Usage log rows written, by request outcome",
+    ("success",)
+)
+USAGE_LOG_FAILURES = registry.counter(
+    "aidock_usage_log_failures", "Usage log writes that failed (usage was lost)"
+)
+
+# Model list cache (recorded by ModelCacheManager.get_models)
+MODEL_CACHE_LOOKUPS = registry.counter(
+    "aidock_model_cache_lookups", "Model list cache lookups by result (hit/miss)",
+    ("result",)
+)
+
+
+def _model_cache_hit_ratio() -> Dict[Tuple[str, ...], float]:
+    hits = MODEL_CACHE_LOOKUPS.get(result="hit")
+    total = hits + MODEL_CACHE_LOOKUPS.get(result="miss")
+    return {(): hits / total if total else 0.0}
+
+
+registry.gauge(
+    "aidock_model_cache_hit_ratio", "Share of model list lookups served from cache since start",
+    callback=_model_cache_hit_ratio
+)
+
+
+def _db_pool_values(attribute: str) -> Dict[Tuple[str, ...], float]:
+    from .database import ENGINES
+
+    values = {}
+    for engine_name, engine in ENGINES.items():
+        method = getattr(engine.pool, attribute, None)
+        if callable(method):
+            values[(engine_name,)] = method()
+    return values
+
+
+registry.gauge(
+    "aidock_db_pool_checked_out", "Connections currently checked out of the pool",
+    ("engine",), callback=lambda: _db_pool_values("checkedout")
+)
+registry.gauge(
+    "aidock_db_pool_overflow", "Connections open beyond pool_size (negative while the pool is not full)",
+    ("engine",), callback=lambda: _db_pool_values("overflow")
+)
+registry.gauge(
+    "aidock_db_pool_size", "Configured pool_size",
+    ("engine",), callback=lambda: _db_pool_values("size")
+)
+
+
+def _db_pool_capacity() -> Dict[Tuple[str, ...], float]:
+    from .database import POOL_LIMITS
+    return {(engine_name,): size + overflow for engine_name, (size, overflow) in POOL_LIMITS.items()}
+
+
+registry.gauge(
+    "aidock_db_pool_capacity", "Connections the engine may open (its share of the connection budget)",
+    ("engine",), callback=_db_pool_capacity
+)
+DB_POOL_CHECKOUT_WAIT = registry.histogram(
+    "aidock_db_pool_checkout_wait_seconds", "Time spent getting a connection from the pool",
+    ("engine",), buckets=LATENCY_BUCKETS
+)
+DB_POOL_CHECKOUT_TIMEOUTS = registry.counter(
+    "aidock_db_pool_checkout_timeouts", "Checkouts that gave up waiting for a free connection",
+    ("engine",)
+)
+DB_CONNECTION_LEAKS = registry.counter(
+    "aidock_db_connection_leaks", "Connections held longer than the leak threshold",
+    ("engine",)
+)
+
+# Read replica (recorded by ReplicaRouter)
+DB_REPLICA_LAG = registry.gauge(
+    "aidock_db_replica_lag_seconds", "Replication lag measured by the last replica check"
+)
+DB_REPLICA_IN_USE = registry.gauge(
+    "aidock_db_replica_in_use", "1 while reads are routed to the replica, 0 while they fall back to the primary"
+)
+DB_READ_SESSIONS = registry.counter(
+    "aidock_db_read_sessions", "Read-only sessions opened, by where they were routed (replica/primary)",
+    ("target",)
+)
+
+
+# SQLite single writer (recorded by SQLiteWriter)
+def _sqlite_writer_pending() -> Dict[Tuple[str, ...], float]:
+    from .database import sqlite_writer
+    return {(): sqlite_writer.pending} if sqlite_writer is not None else {}
+
+
+registry.gauge(
+    "aidock_sqlite_writer_pending", "Writes waiting for or holding the SQLite writer connection",
+    callback=_sqlite_writer_pending
+)
+SQLITE_WRITE_WAIT = registry.histogram(
+    "aidock_sqlite_write_wait_seconds", "Time a write waited for the SQLite writer connection",
+    buckets=LATENCY_BUCKETS
+)
+SQLITE_WRITES = registry.counter(
+    "aidock_sqlite_writes", "Transactions run on the SQLite writer connection, by outcome",
+    ("outcome",)
+)
+
+# Event loop (recorded by EventLoopLagMonitor)
+EVENT_LOOP_LAG = registry.histogram(
+    "aidock_event_loop_lag_seconds", "How late the event loop runs a scheduled callback",
+    buckets=FAST_BUCKETS
+)
+EVENT_LOOP_LAG_LAST = registry.gauge(
+    "aidock_event_loop_lag_last_seconds", "Most recent event-loop lag sample"
+)
+
+# Readiness probe (recorded by ReadinessProbe)
+READINESS = registry.gauge(
+    "aidock_ready", "1 while the readiness probe passes, 0 while this worker reports not ready"
+)
+READINESS_CHECK_FAILURES = registry.counter(
+    "aidock_readiness_check_failures", "Readiness probe runs in which a check failed, by check",
+    ("check",)
+)
+DB_PING_DURATION = registry.histogram(
+    "aidock_db_ping_seconds", "Database round trip measured by the readiness probe",
+    buckets=FAST_BUCKETS
+)
+
+
+def outcome_label(success: bool) -> str:
+    return "success" if success else "error"
+
+
+# =============================================================================
+# EVENT LOOP LAG MONITOR
+# =============================================================================
+
+class EventLoopLagMonitor:
+    """
+    Measures event-loop lag: how much later than requested a short sleep
+    wakes up. Anything blocking the loop (sync DB calls, CPU work) shows up
+    here directly.
+    """
+
+    def __init__(self, interval_seconds: float = 0.5):
+        self.interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"📈 Event-loop lag monitor started ({self.interval}s interval)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started - self.interval, 0.0)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_LAST.set(lag)
+
+
+_loop_lag_monitor: Optional[EventLoopLagMonitor] = None
+
+
+def get_loop_lag_monitor() -> EventLoopLagMonitor:
+    """Get the process-wide event-loop lag monitor."""
+    global _loop_lag_monitor
+    if _loop_lag_monitor is None:
+        from .config import settings
+        _loop_lag_monitor = EventLoopLagMonitor(settings.metrics_loop_lag_interval_seconds)
+    return _loop_lag_monitor
+
+
+def render_metrics() -> str:
+    """Render the registry for the /metrics endpoint."""
+    return registry.render()
+
+
+__all__ = [
+    'Counter', 'Gauge', 'Histogram', 'MetricsRegistry', 'registry',
+    'HTTP_REQUESTS', 'HTTP_REQUEST_DURATION',
+    'LLM_REQUESTS', 'LLM_REQUEST_DURATION', 'LLM_PROVIDER_LATENCY', 'LLM_TTFT', 'QUOTA_CHECK_DURATION',
+    'LLM_TOKENS', 'LLM_COST', 'USAGE_LOGS', 'USAGE_LOG_FAILURES', 'MODEL_CACHE_LOOKUPS',
+    'DB_POOL_CHECKOUT_WAIT', 'DB_POOL_CHECKOUT_TIMEOUTS', 'DB_CONNECTION_LEAKS',
+    'DB_REPLICA_LAG', 'DB_REPLICA_IN_USE', 'DB_READ_SESSIONS', 'SQLITE_WRITE_WAIT', 'SQLITE_WRITES',
+    'EVENT_LOOP_LAG', 'EVENT_LOOP_LAG_LAST', 'READINESS', 'READINESS_CHECK_FAILURES', 'DB_PING_DURATION',
+    'outcome_label',
+    'EventLoopLagMonitor', 'get_loop_lag_monitor', 'render_metrics'
+]
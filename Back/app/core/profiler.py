@@ -0,0 +1,332 @@
+# AI Dock Sampling Profiler
+# Time-bounded statistical stack sampling, asyncio task dumps and slow-callback detection for a running worker
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Python frames a thread sits in while it waits rather than runs; skipped
+# unless idle samples are requested
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("futures/thread.py", "_worker"),
+    ("aiosqlite/core.py", "run"),
+}
+
+# Frames are labelled relative to this directory when they live under it
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MAX_SLOW_CALLBACKS = 200
+
+
+class ProfilerBusyError(Exception):
+    """A profile is already running in this worker."""
+    pass
+
+
+# =============================================================================
+# STACK SAMPLING
+# =============================================================================
+
+def _frame_label(code) -> str:
+    """"qualname (path:first line)", stable across samples so frames merge."""
+    filename = code.co_filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    else:
+        # Library code: keep it readable, e.g. "site-packages/sqlalchemy/orm/session.py"
+        parts = filename.replace("\\", "/").split("/")
+        filename = "/".join(parts[-3:])
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of every thread from a background thread.
+
+    Each tick walks `sys._current_frames()` and counts one collapsed stack
+    per thread ("thread;outer;...;inner"). The time spent walking stacks is
+    tracked against wall time; when it exceeds `max_overhead` the interval
+    is doubled, so a busy worker is never slowed down by more than that.
+    """
+
+    def __init__(self, interval: float, max_overhead: float, include_idle: bool = False):
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        self.backoffs = 0
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ai-dock-profiler", daemon=True)
+        self._started = 0.0
+        self._stopped = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._stopped = time.perf_counter()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    @staticmethod
+    def _is_idle(code) -> bool:
+        filename = code.co_filename.replace("\\", "/")
+        return any(
+            code.co_name == name and filename.endswith("/" + suffix)
+            for suffix, name in _IDLE_FRAMES
+        )
+
+    def _sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            if not self.include_idle and self._is_idle(frame.f_code):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            tick = time.perf_counter()
+            self._sample()
+            self.sampling_seconds += time.perf_counter() - tick
+
+            elapsed = time.perf_counter() - self._started
+            if elapsed > 0.5 and self.sampling_seconds / elapsed > self.max_overhead:
+                self.interval *= 2
+                self.backoffs += 1
+
+    @property
+    def elapsed(self) -> float:
+        end = self._stopped or time.perf_counter()
+        return end - self._started
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format: "frame;frame;frame count" per line."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+# =============================================================================
+# ASYNCIO INTROSPECTION
+# =============================================================================
+
+def dump_tasks(loop: Optional[asyncio.AbstractEventLoop] = None, stack_limit: int = 20) -> List[Dict[str, Any]]:
+    """Every pending task of the loop with the coroutine it runs and where it is suspended."""
+    loop = loop or asyncio.get_running_loop()
+    current = asyncio.current_task(loop)
+    tasks = []
+    for task in asyncio.all_tasks(loop):
+        coro = task.get_coro()
+        frames = [
+            f"{_frame_label(frame.f_code)} line {frame.f_lineno}"
+            for frame in task.get_stack(limit=stack_limit)
+        ]
+        tasks.append({
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", repr(coro)),
+            "current": task is current,
+            "stack": frames
+        })
+    tasks.sort(key=lambda entry: entry["coroutine"])
+    return tasks
+
+
+class SlowCallbackRecorder:
+    """
+    Records event-loop callbacks that run longer than
+    `loop.slow_callback_duration` - the check asyncio's debug mode makes,
+    without debug mode's traceback capture on every scheduled callback.
+
+    Wraps `asyncio.Handle._run` while installed; callbacks of other loops
+    are ignored.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.callbacks: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self._original = None
+
+    def install(self) -> None:
+        original = self._original = asyncio.events.Handle._run
+        recorder = self
+
+        def timed_run(handle):
+            started = time.perf_counter()
+            try:
+                return original(handle)
+            finally:
+                duration = time.perf_counter() - started
+                if duration >= recorder.loop.slow_callback_duration and handle._loop is recorder.loop:
+                    recorder.record(handle, duration)
+
+        asyncio.events.Handle._run = timed_run
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            asyncio.events.Handle._run = self._original
+            self._original = None
+
+    def record(self, handle: asyncio.Handle, duration: float) -> None:
+        if len(self.callbacks) >= MAX_SLOW_CALLBACKS:
+            self.dropped += 1
+            return
+        # Task steps are the common case: name the task and where it is suspended now
+        task = getattr(handle._callback, "__self__", None)
+        if isinstance(task, asyncio.Task):
+            coro = task.get_coro()
+            stack = task.get_stack(limit=1)
+            callback = f"Task {task.get_name()} {getattr(coro, '__qualname__', repr(coro))}"
+            if stack:
+                callback += f", now at {_frame_label(stack[0].f_code)} line {stack[0].f_lineno}"
+        else:
+            callback = repr(handle)
+        self.callbacks.append({
+            "callback": callback,
+            "duration_ms": round(duration * 1000, 1),
+            "at": datetime.now().isoformat(timespec="milliseconds")
+        })
+
+
+# =============================================================================
+# PROFILER
+# =============================================================================
+
+class Profiler:
+    """
+    Runs one time-bounded profile at a time in this worker.
+
+    A profile samples all thread stacks at `interval_ms` and, when
+    `slow_callback_ms` is set, lowers `loop.slow_callback_duration` to it for
+    the window and records every callback that blocks the loop for longer.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.last_profile_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _validate(self, duration_seconds: float, interval_ms: float) -> None:
+        if not settings.profiler_enabled:
+            raise ValueError("Profiling is disabled (PROFILER_ENABLED=false)")
+        if not 0 < duration_seconds <= settings.profiler_max_duration_seconds:
+            raise ValueError(f"duration_seconds must be between 0 and {settings.profiler_max_duration_seconds}")
+        if interval_ms < settings.profiler_min_interval_ms:
+            raise ValueError(f"interval_ms must be at least {settings.profiler_min_interval_ms}")
+
+    async def profile(
+        self,
+        duration_seconds: float = 10.0,
+        interval_ms: float = 5.0,
+        slow_callback_ms: Optional[float] = 100.0,
+        include_idle: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Profile the worker for `duration_seconds` while it keeps serving requests.
+
+        Returns the collapsed stacks plus a summary, the slow callbacks seen
+        and a dump of the asyncio tasks pending at the end.
+
+        Raises:
+            ValueError: Limits exceeded or profiling disabled
+            ProfilerBusyError: Another profile is running
+        """
+        self._validate(duration_seconds, interval_ms)
+        if self._lock.locked():
+            raise ProfilerBusyError("A profile is already running in this worker")
+
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            sampler = StackSampler(interval_ms / 1000, settings.profiler_max_overhead, include_idle)
+
+            slow_recorder = None
+            previous_slow = loop.slow_callback_duration
+            if slow_callback_ms:
+                slow_recorder = SlowCallbackRecorder(loop)
+                loop.slow_callback_duration = slow_callback_ms / 1000
+                slow_recorder.install()
+
+            started_at = datetime.now()
+            cpu_started = time.process_time()
+            logger.warning(f"🔬 Profiling worker {os.getpid()} for {duration_seconds}s at {interval_ms}ms intervals")
+            sampler.start()
+            try:
+                await asyncio.sleep(duration_seconds)
+            finally:
+                sampler.stop()
+                if slow_recorder is not None:
+                    slow_recorder.uninstall()
+                    loop.slow_callback_duration = previous_slow
+
+            cpu_seconds = time.process_time() - cpu_started
+            self.last_profile_at = started_at
+            wall = sampler.elapsed
+
+            return {
+                "summary": {
+                    "pid": os.getpid(),
+                    "started_at": started_at.isoformat(),
+                    "duration_seconds": round(wall, 3),
+                    "samples": sampler.samples,
+                    "requested_interval_ms": interval_ms,
+                    "final_interval_ms": round(sampler.interval * 1000, 3),
+                    "overhead_backoffs": sampler.backoffs,
+                    "sampler_overhead": round(sampler.sampling_seconds / wall, 4) if wall else 0.0,
+                    "process_cpu_percent": round(cpu_seconds / wall * 100, 1) if wall else 0.0,
+                    "distinct_stacks": len(sampler.stacks),
+                    "slow_callback_ms": slow_callback_ms or None
+                },
+                "collapsed": sampler.collapsed(),
+                "slow_callbacks": slow_recorder.callbacks if slow_recorder else [],
+                "slow_callbacks_dropped": slow_recorder.dropped if slow_recorder else 0,
+                "tasks": dump_tasks(loop)
+            }
+
+
+_profiler: Optional[Profiler] = None
+
+
+def get_profiler() -> Profiler:
+    """Get the worker-wide profiler."""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+
+__all__ = ['ProfilerBusyError', 'StackSampler', 'SlowCallbackRecorder', 'Profiler', 'dump_tasks', 'get_profiler']
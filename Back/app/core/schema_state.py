@@ -0,0 +1,67 @@
+# AI Dock Schema State
+# Records which schema revision the database was created for, so startup can skip create_all
+
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, UniqueConstraint, delete, inspect, select
+from sqlalchemy.engine import Connection
+
+# Kept out of Base.metadata: the bookkeeping table is not part of the revision it records
+schema_state_metadata = MetaData()
+
+schema_state_table = Table(
+    "aidock_schema_state",
+    schema_state_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("revision", String(64), nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+
+def schema_revision(metadata: MetaData) -> str:
+    """
+    A short hash of everything create_all would create from `metadata`.
+
+    Covers tables, column names, types, nullability, primary and foreign keys,
+    indexes and unique constraints, so adding a model, column or index
+    changes the revision. Computed from the models, it plays the part an
+    Alembic head revision would.
+    """
+    parts = []
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            foreign_keys = ",".join(sorted(fk.target_fullname for fk in column.foreign_keys))
+            parts.append(
+                f"  column {column.name} {column.type!r} nullable={column.nullable} "
+                f"pk={column.primary_key} fk={foreign_keys}"
+            )
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            parts.append(f"  index {index.name} unique={index.unique} ({','.join(c.name for c in index.columns)})")
+        for constraint in sorted(
+            (c for c in table.constraints if isinstance(c, UniqueConstraint)),
+            key=lambda c: ",".join(col.name for col in c.columns)
+        ):
+            parts.append(f"  unique ({','.join(c.name for c in constraint.columns)})")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def read_schema_revision(conn: Connection) -> Optional[str]:
+    """The revision recorded in the database, or None if it never recorded one."""
+    if not inspect(conn).has_table(schema_state_table.name):
+        return None
+    return conn.execute(select(schema_state_table.c.revision).limit(1)).scalar()
+
+
+def write_schema_revision(conn: Connection, revision: str) -> None:
+    """Record `revision` as the one the database matches (call inside a transaction)."""
+    schema_state_metadata.create_all(conn)
+    conn.execute(delete(schema_state_table))
+    conn.execute(schema_state_table.insert().values(id=1, revision=revision, updated_at=datetime.utcnow()))
+
+
+__all__ = [
+    'schema_state_table', 'schema_revision', 'read_schema_revision', 'write_schema_revision'
+]
@@ -15,7 +15,7 @@ from jwt.exceptions import InvalidTokenError
 from app.core.config import settings
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 # We'll import get_db when needed to avoid circular imports
 
@@ -270,10 +270,12 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     # Import here to avoid circular imports
     # (User model imports security, so we can't import User at module level)
     from ..models.user import User
-    from ..core.database import get_db
+    from ..core.database import SyncSessionLocal
     
-    # Get database session
-    db = next(get_db())
+    # Short-lived session: closed before the endpoint runs, so a long request
+    # (e.g. a stream) does not hold a pooled connection for its whole duration.
+    # Role and department are loaded up front since the user is detached after.
+    db = SyncSessionLocal()
     
     try:
         # Extract the token from the credentials
@@ -301,7 +303,9 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             )
         
         # Look up the user in the database
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.query(User).options(
+            joinedload(User.role), joinedload(User.department)
+        ).filter(User.id == user_id).first()
         
         if not user:
             # User doesn't exist in database (maybe deleted after token was issued)
@@ -334,6 +338,9 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             detail="Authentication failed",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    finally:
+        db.close()
 
 
 def get_current_admin_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> "User":
@@ -419,10 +426,7 @@ def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depe
         # Try to get the user using the same logic as get_current_user
         # but return None instead of raising exceptions
         from ..models.user import User
-        from ..core.database import get_db
-        
-        # Get database session
-        db = next(get_db())
+        from ..core.database import SyncSessionLocal
         
         token = credentials.credentials
         token_data = verify_token(token)
@@ -433,8 +437,11 @@ def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depe
         user_id = token_data.get("user_id")
         if not user_id:
             return None
-            
-        user = db.query(User).filter(User.id == user_id).first()
+        
+        with SyncSessionLocal() as db:
+            user = db.query(User).options(
+                joinedload(User.role), joinedload(User.department)
+            ).filter(User.id == user_id).first()
         
         if not user or not user.is_active:
             return None
@@ -0,0 +1,198 @@
+# AI Dock SQLite Tuning
+# Connect-time pragmas for SQLite and a single-writer queue for background writes
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .metrics import SQLITE_WRITE_WAIT, SQLITE_WRITES
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# PRAGMAS
+# =============================================================================
+
+def sqlite_pragmas(busy_timeout_ms: int, cache_size_mb: int, mmap_size_mb: int) -> List[str]:
+    """
+    The performance profile, applied to every new connection.
+
+    - journal_mode=WAL: readers see the last committed state while a write
+      is in progress instead of waiting for it (persistent in the file)
+    - synchronous=NORMAL: fsync at checkpoints instead of every commit;
+      safe against corruption in WAL mode, a power cut may lose the last commits
+    - cache_size (negative = KiB) and mmap_size: keep hot pages in memory
+    - busy_timeout: how long a connection waits for the write lock
+    """
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(busy_timeout_ms)}",
+        f"PRAGMA cache_size=-{int(cache_size_mb) * 1024}",
+        f"PRAGMA mmap_size={int(mmap_size_mb) * 1024 * 1024}",
+    ]
+
+
+def install_sqlite_pragmas(engine: Engine, pragmas: List[str]) -> None:
+    """Run `pragmas` on every connection the (sync or async's sync) engine opens."""
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def install_immediate_transactions(engine: Engine) -> None:
+    """
+    Start every transaction of the engine with BEGIN IMMEDIATE.
+
+    The connections run with the driver in autocommit mode
+    (isolation_level=None), so without this each statement commits on its
+    own. BEGIN IMMEDIATE takes the write lock up front: the transaction is
+    atomic and never fails halfway when a read has to turn into a write.
+    """
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+# =============================================================================
+# SINGLE WRITER
+# =============================================================================
+
+class SQLiteWriter:
+    """
+    Serializes writes through one connection.
+
+    SQLite allows one writer at a time; when many tasks write at once they
+    spin in the busy handler (sleeping up to 100ms between attempts) and
+    fail with "database is locked" once busy_timeout runs out. Here writers
+    take turns in an in-process FIFO instead, each turn one BEGIN IMMEDIATE
+    transaction on the writer connection. Reads keep using the regular pools
+    and, in WAL mode, are not blocked by the writer.
+
+    Plain inserts (`insert`) are group-committed: whoever gets the next turn
+    writes every row queued so far in one transaction, so a burst of usage
+    logs costs a few commits instead of one turn each.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+        self.pending = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._queued_inserts: List[Tuple[List[Any], asyncio.Future]] = []
+        self._stats = {
+            "turns": 0, "failed": 0, "insert_batches": 0, "inserted_rows": 0, "largest_batch": 0,
+            "max_wait_ms": 0.0, "total_wait_seconds": 0.0
+        }
+
+    @asynccontextmanager
+    async def _turn(self) -> AsyncIterator[None]:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        self.pending += 1
+        queued_at = time.perf_counter()
+        try:
+            async with self._lock:
+                wait = time.perf_counter() - queued_at
+                SQLITE_WRITE_WAIT.observe(wait)
+                self._stats["total_wait_seconds"] += wait
+                self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait * 1000)
+                self._stats["turns"] += 1
+                yield
+        finally:
+            self.pending -= 1
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Wait for a turn and open a session on the writer connection.
+
+        For writes that read first or manage their own transaction; use like
+        `AsyncSessionLocal()`. Keep the block short - every other writer waits for it.
+        """
+        async with self._turn():
+            try:
+                async with self.session_factory() as session:
+                    yield session
+            except Exception:
+                self._stats["failed"] += 1
+                SQLITE_WRITES.inc(outcome="error")
+                raise
+            SQLITE_WRITES.inc(outcome="success")
+
+    async def insert(self, objects: List[Any]) -> None:
+        """
+        Insert new ORM objects, batched with whatever else is queued.
+
+        Returns once the objects are committed; raises if they could not be.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queued_inserts.append((list(objects), future))
+        async with self._turn():
+            if not future.done():
+                batch, self._queued_inserts = self._queued_inserts, []
+                try:
+                    await self._insert_batch(batch)
+                finally:
+                    # Cancelled halfway: the writers waiting on this batch must not hang
+                    for _, queued in batch:
+                        if not queued.done():
+                            queued.set_exception(RuntimeError("SQLite batch insert was interrupted"))
+        return future.result()
+
+    async def _insert_batch(self, batch: List[Tuple[List[Any], asyncio.Future]]) -> None:
+        rows = [obj for objects, _ in batch for obj in objects]
+        try:
+            async with self.session_factory() as session:
+                try:
+                    session.add_all(rows)
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+                    raise
+        except Exception as e:
+            if len(batch) == 1:
+                self._stats["failed"] += 1
+                SQLITE_WRITES.inc(outcome="error")
+                batch[0][1].set_exception(e)
+                return
+            # One bad row must not take the rest of the batch down with it
+            logger.warning(f"SQLite batch insert of {len(rows)} rows failed, retrying one by one: {e}")
+            for item in batch:
+                await self._insert_batch([item])
+            return
+
+        self._stats["insert_batches"] += 1
+        self._stats["inserted_rows"] += len(rows)
+        self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+        SQLITE_WRITES.inc(outcome="success")
+        for _, future in batch:
+            future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        turns = self._stats["turns"]
+        return {
+            "pending": self.pending,
+            "turns": turns,
+            "failed": self._stats["failed"],
+            "insert_batches": self._stats["insert_batches"],
+            "inserted_rows": self._stats["inserted_rows"],
+            "largest_batch": self._stats["largest_batch"],
+            "mean_wait_ms": round(self._stats["total_wait_seconds"] * 1000 / turns, 2) if turns else 0.0,
+            "max_wait_ms": round(self._stats["max_wait_ms"], 2)
+        }
+
+
+__all__ = ['sqlite_pragmas', 'install_sqlite_pragmas', 'install_immediate_transactions', 'SQLiteWriter']
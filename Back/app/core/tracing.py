@@ -0,0 +1,473 @@
+# AI Dock Request Tracing
+# Lightweight OpenTelemetry-style spans for the chat pipeline, exported as OTLP/JSON or JSONL
+
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, List, Callable, AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+# The span new spans attach to (propagates into awaited calls and created tasks)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("aidock_current_span", default=None)
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# =============================================================================
+# SPANS AND TRACES
+# =============================================================================
+
+class Trace:
+    """All spans of one request, correlated by its request_id."""
+
+    def __init__(self, request_id: Optional[str], sampled: bool):
+        self.request_id = request_id
+        self.trace_id = trace_id_for_request(request_id)
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+
+
+class Span:
+    """
+    One timed operation. Use as a context manager (sync or inside async
+    code); it becomes the parent of spans started while it is active.
+    """
+
+    def __init__(self, tracer: "Tracer", trace: Trace, name: str, parent: Optional["Span"], kind: int, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace = trace
+        self.name = name
+        self.parent = parent
+        self.kind = kind
+        self.span_id = os.urandom(8).hex()
+        self.attributes: Dict[str, Any] = {k: v for k, v in attributes.items() if v is not None}
+        self.events: List[Dict[str, Any]] = []
+        self.status = STATUS_OK
+        self.status_message: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"[:500]
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self.tracer._on_end(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None and not isinstance(exc, (GeneratorExit, asyncio.CancelledError)):
+            self.record_error(exc)
+        elif isinstance(exc, (GeneratorExit, asyncio.CancelledError)):
+            self.set_attribute("cancelled", True)
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Exited from another context (generator closed by a different task)
+                pass
+            self._token = None
+        self.end()
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON representation."""
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, **({"message": self.status_message} if self.status_message else {})}
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        if self.events:
+            span["events"] = [
+                {"timeUnixNano": str(e["time_ns"]), "name": e["name"], "attributes": _otlp_attributes(e["attributes"])}
+                for e in self.events
+            ]
+        return span
+
+
+class _NoopSpan:
+    """Returned outside a trace (or with tracing off) so call sites need no checks."""
+
+    span_id = None
+    duration_ms = 0.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def trace_id_for_request(request_id: Optional[str]) -> str:
+    """
+    Trace ID derived from the request_id, so a trace can be found from the
+    X-Request-ID header, usage logs or log lines without a lookup table.
+    """
+    if not request_id:
+        return os.urandom(16).hex()
+    try:
+        return uuid.UUID(str(request_id)).hex
+    except ValueError:
+        return hashlib.sha256(str(request_id).encode()).hexdigest()[:32]
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+# =============================================================================
+# EXPORTERS
+# =============================================================================
+
+class SpanExporter:
+    """Receives finished, sampled spans in batches."""
+
+    async def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends one OTLP/JSON span per line (for tests and local debugging)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, lines: List[str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    async def export(self, spans: List[Span]) -> None:
+        lines = [json.dumps(span.to_otlp()) + "\n" for span in spans]
+        await asyncio.to_thread(self._write, lines)
+
+
+class OTLPHttpExporter(SpanExporter):
+    """Posts spans to an OTLP/HTTP collector (JSON encoding, /v1/traces)."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout_seconds: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout_seconds
+        self._client = None
+
+    async def export(self, spans: List[Span]) -> None:
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "aidock.tracing"},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+        response = await self._client.post(self.url, json=payload)
+        response.raise_for_status()
+
+    async def shutdown(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# =============================================================================
+# TRACER
+# =============================================================================
+
+class Tracer:
+    """
+    Creates spans, batches sampled ones for the exporter and dumps the span
+    tree of requests slower than the slow-request threshold.
+
+    Spans only exist inside a trace started with start_trace(); elsewhere
+    start_span() returns a no-op span, so instrumented helpers cost next to
+    nothing when called outside a traced request.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        exporter: Optional[SpanExporter] = None,
+        sample_rate: float = 1.0,
+        slow_request_ms: int = 0,
+        slow_request_path: str = "",
+        export_interval_seconds: float = 2.0,
+        max_queue_size: int = 10000
+    ):
+        self.enabled = enabled
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_request_ms = slow_request_ms
+        self.slow_request_path = slow_request_path
+        self.export_interval = export_interval_seconds
+        self.max_queue_size = max_queue_size
+        self._queue: List[Span] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._stats = {"traces": 0, "spans": 0, "exported": 0, "dropped": 0, "export_errors": 0, "slow_requests": 0}
+
+    # -------------------------------------------------------------------------
+    # Span creation
+    # -------------------------------------------------------------------------
+
+    def start_trace(self, name: str, request_id: Optional[str] = None, **attributes) -> Any:
+        """Start the root span of a request (use as a context manager)."""
+        if not self.enabled:
+            return NOOP_SPAN
+        sampled = self.exporter is not None and random.random() < self.sample_rate
+        trace = Trace(request_id, sampled)
+        self._stats["traces"] += 1
+        return Span(self, trace, name, None, SPAN_KIND_SERVER, {"request_id": request_id, **attributes})
+
+    def start_span(self, name: str, **attributes) -> Any:
+        """Start a child of the current span (no-op outside a trace)."""
+        parent = _current_span.get()
+        if parent is None or not self.enabled:
+            return NOOP_SPAN
+        return Span(self, parent.trace, name, parent, SPAN_KIND_INTERNAL, attributes)
+
+    def current_span(self) -> Any:
+        return _current_span.get() or NOOP_SPAN
+
+    def _on_end(self, span: Span) -> None:
+        self._stats["spans"] += 1
+        span.trace.spans.append(span)
+        if span.trace.sampled:
+            if len(self._queue) >= self.max_queue_size:
+                self._stats["dropped"] += 1
+            else:
+                self._queue.append(span)
+        if span.parent is None and self.slow_request_ms and span.duration_ms >= self.slow_request_ms:
+            self._dump_slow_trace(span)
+
+    # -------------------------------------------------------------------------
+    # Slow-request sampler
+    # -------------------------------------------------------------------------
+
+    def format_tree(self, root: Span) -> str:
+        """Indented span tree with offsets from the request start."""
+        children: Dict[Optional[str], List[Span]] = {}
+        for span in root.trace.spans:
+            children.setdefault(span.parent.span_id if span.parent else None, []).append(span)
+
+        lines = []
+
+        def walk(span: Span, depth: int) -> None:
+            offset_ms = (span.start_ns - root.start_ns) / 1_000_000
+            flag = " ❌" if span.status == STATUS_ERROR else ""
+            attributes = ", ".join(f"{k}={v}" for k, v in span.attributes.items() if k != "request_id")
+            lines.append(
+                f"{'  ' * depth}{span.name} +{offset_ms:.0f}ms {span.duration_ms:.0f}ms{flag}"
+                + (f" [{attributes}]" if attributes else "")
+            )
+            for child in sorted(children.get(span.span_id, []), key=lambda s: s.start_ns):
+                walk(child, depth + 1)
+
+        walk(root, 0)
+        return "\n".join(lines)
+
+    def _dump_slow_trace(self, root: Span) -> None:
+        self._stats["slow_requests"] += 1
+        logger.warning(
+            f"🐢 Slow request {root.trace.request_id} ({root.duration_ms:.0f}ms > {self.slow_request_ms}ms), "
+            f"trace {root.trace.trace_id}:\n{self.format_tree(root)}"
+        )
+        if self.slow_request_path:
+            record = {
+                "request_id": root.trace.request_id,
+                "trace_id": root.trace.trace_id,
+                "duration_ms": round(root.duration_ms, 1),
+                "spans": [span.to_otlp() for span in root.trace.spans]
+            }
+            try:
+                with open(self.slow_request_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning(f"⚠️ Could not write slow request trace: {str(e)}")
+
+    # -------------------------------------------------------------------------
+    # Export
+    # -------------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the background export loop (needs a running event loop)."""
+        if self.exporter is not None and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._export_loop())
+            logger.info(f"🔭 Trace export started ({type(self.exporter).__name__}, sample rate {self.sample_rate})")
+
+    async def _export_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.export_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._queue or self.exporter is None:
+            return
+        batch, self._queue = self._queue, []
+        try:
+            await self.exporter.export(batch)
+            self._stats["exported"] += len(batch)
+        except Exception as e:
+            self._stats["export_errors"] += 1
+            logger.warning(f"⚠️ Trace export failed, {len(batch)} spans dropped: {str(e)}")
+
+    async def shutdown(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        if self.exporter is not None:
+            await self.exporter.shutdown()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "queued": len(self._queue), "enabled": self.enabled}
+
+
+# =============================================================================
+# DECORATORS
+# =============================================================================
+
+def traced(name: Optional[str] = None):
+    """Run an async function inside a child span of the current request."""
+
+    def decorator(func: Callable):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with get_tracer().start_span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_stream(name: str, attributes: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+    """
+    Make an async generator the root span of a request trace.
+
+    The generator must take request_id as a keyword argument. The span stays
+    current while the generator runs, so everything it awaits is nested under
+    it; it ends when the stream finishes, fails or is closed.
+    """
+
+    def decorator(func: Callable[..., AsyncIterator]):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            extra = attributes(kwargs) if attributes else {}
+            with get_tracer().start_trace(name, request_id=kwargs.get("request_id"), **extra):
+                async for item in func(*args, **kwargs):
+                    yield item
+
+        return wrapper
+
+    return decorator
+
+
+# =============================================================================
+# SINGLETON
+# =============================================================================
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer configured from settings."""
+    global _tracer
+    if _tracer is None:
+        from .config import settings
+
+        exporter: Optional[SpanExporter] = None
+        if settings.tracing_exporter == "file":
+            exporter = FileSpanExporter(settings.tracing_file_path)
+        elif settings.tracing_exporter == "otlp":
+            exporter = OTLPHttpExporter(settings.tracing_otlp_endpoint, settings.tracing_service_name)
+        elif settings.tracing_exporter not in ("", "none"):
+            logger.warning(f"⚠️ Unknown TRACING_EXPORTER '{settings.tracing_exporter}', spans will not be exported")
+
+        _tracer = Tracer(
+            enabled=settings.tracing_enabled,
+            exporter=exporter,
+            sample_rate=settings.tracing_sample_rate,
+            slow_request_ms=settings.tracing_slow_request_ms,
+            slow_request_path=settings.tracing_slow_request_path
+        )
+    return _tracer
+
+
+__all__ = [
+    'Span', 'Trace', 'Tracer', 'SpanExporter', 'FileSpanExporter', 'OTLPHttpExporter',
+    'trace_id_for_request', 'traced', 'traced_stream', 'get_tracer'
+]
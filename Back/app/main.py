@@ -4,11 +4,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import asyncio
 import logging
 
 # Import our database and configuration
 from .core.config import settings, validate_config
 from .core.database import startup_database, shutdown_database, check_database_connection
+from .core.metrics import get_loop_lag_monitor
+from .core.tracing import get_tracer
+from .core.logging_config import configure_logging
+from .services.message_persistence_queue import get_message_persistence_queue
+from .services.batch_job_service import get_batch_job_service
+from .services.litellm_pricing_service import preload_litellm
+from .services.llm.tokenizer import get_tokenizer_service
+from .services.health_probe import get_readiness_probe
 
 # Import our security middleware
 from .middleware.security import SecurityHeadersMiddleware, create_security_test_response
@@ -20,9 +29,12 @@ from .api.admin.llm_configs import router as admin_llm_configs_router
 from .api.admin.quotas import router as admin_quotas_router
 from .api.chat import router as chat_router
 from .api.chat_streaming import router as chat_streaming_router  # 🆕 NEW: Streaming chat
+from .api.chat_websocket import router as chat_websocket_router
+from .api.metrics import router as metrics_router
+from .api.health import router as health_router
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATES)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Create our FastAPI application instance
@@ -87,8 +99,10 @@ async def health_check():
     Enhanced health check endpoint.
     Returns API status and database connectivity.
     """
-    # Check database connection
-    db_healthy = await check_database_connection()
+    # Database status from the readiness probe's last ping (no query per
+    # call); checked directly until the probe has run
+    database_check = get_readiness_probe().readiness().get("checks", {}).get("database")
+    db_healthy = database_check["ok"] if database_check else await check_database_connection()
     
     return {
         "status": "healthy" if db_healthy else "degraded",
@@ -158,6 +172,12 @@ async def cors_test():
 # API ROUTERS
 # =============================================================================
 
+# 📈 Prometheus scrape endpoint (/metrics)
+app.include_router(metrics_router)
+
+# 🩺 Liveness and readiness probes (/health/live, /health/ready)
+app.include_router(health_router)
+
 # Include authentication endpoints
 # This adds all /auth/* endpoints to our application
 app.include_router(auth_router)
@@ -221,6 +241,15 @@ app.include_router(
     tags=["Admin Pricing"]
 )
 
+# Include admin diagnostics endpoints
+# This adds /admin/diagnostics/* (runtime logging controls) to our application
+from .api.admin.diagnostics import router as admin_diagnostics_router
+app.include_router(
+    admin_diagnostics_router,
+    prefix="/admin",
+    tags=["Admin Diagnostics"]
+)
+
 # Include user usage analytics endpoints
 # This adds all /usage/* endpoints to our application
 from .api.usage_analytics import router as user_usage_router
@@ -237,6 +266,13 @@ app.include_router(chat_router)
 # This adds streaming functionality to /chat/* endpoints
 app.include_router(chat_streaming_router)
 
+# 🔌 Include the WebSocket chat transport (/chat/ws)
+app.include_router(chat_websocket_router)
+
+# 📦 Include offline batch completion endpoints (/batch-jobs)
+from .api.batch_jobs import router as batch_jobs_router
+app.include_router(batch_jobs_router)
+
 # Include manager endpoints
 # This adds all /manager/* endpoints to our application
 from .api.manager import router as manager_router
@@ -313,6 +349,9 @@ def read_root():
         "version": settings.app_version,
         "documentation": "/docs",
         "health_check": "/health",
+        "liveness": "/health/live",
+        "readiness": "/health/ready",
+        "metrics": "/metrics",
         "environment": settings.environment,
         "available_endpoints": {
             "authentication": {
@@ -447,6 +486,34 @@ async def startup_event():
         logger.error(f"❌ Database initialization failed: {e}")
         raise
     
+    # Start background conversation writes (re-queues anything spooled last run)
+    await get_message_persistence_queue().start()
+    
+    # Pick up batch jobs that were queued or running when the server stopped
+    await get_batch_job_service().resume_unfinished_jobs()
+    
+    # Sample event-loop lag for /metrics
+    if settings.metrics_enabled:
+        get_loop_lag_monitor().start()
+    
+    # Export request spans in the background (when an exporter is configured)
+    get_tracer().start()
+    
+    # Import litellm in a worker thread: startup does not wait for it and
+    # the first chat request finds the pricing data already loaded
+    if settings.preload_litellm:
+        asyncio.get_running_loop().run_in_executor(None, preload_litellm)
+    
+    # Load tiktoken encodings (may download the BPE files) off the event loop;
+    # token counts use the approximation until they are ready
+    warm_encodings = [name.strip() for name in settings.tokenizer_warm_encodings.split(",") if name.strip()]
+    if warm_encodings:
+        asyncio.get_running_loop().run_in_executor(None, get_tokenizer_service().warm_up, warm_encodings)
+    
+    # Readiness checks run in the background from here on; /health/ready
+    # answers 503 until the first one has passed
+    await get_readiness_probe().start()
+    
     logger.info("🎉 Application startup completed successfully!")
 
 @app.on_event("shutdown")
@@ -457,6 +524,18 @@ async def shutdown_event():
     """
     logger.info("🔌 Shutting down AI Dock API...")
     
+    # Report not ready first so load balancers stop sending new requests
+    await get_readiness_probe().stop()
+    
+    await get_loop_lag_monitor().stop()
+    await get_tracer().shutdown()
+    
+    # Finish pending conversation writes before the database goes away
+    await get_message_persistence_queue().shutdown()
+    
+    # Stop batch job runners (pending items resume on the next startup)
+    await get_batch_job_service().shutdown()
+    
     # Clean up database connections
     await shutdown_database()
     
@@ -23,6 +23,8 @@ import time
 import logging
 from typing import Callable, Awaitable
 
+from ..core.metrics import HTTP_REQUESTS, HTTP_REQUEST_DURATION
+
 # Setup logging for security events
 logger = logging.getLogger("security")
 
@@ -98,9 +100,22 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         # Log security event for monitoring
         process_time = time.time() - start_time
         self._log_security_event(request, response, process_time)
+        self._record_metrics(request, response, process_time)
         
         return response
     
+    def _record_metrics(self, request: Request, response: Response, process_time: float) -> None:
+        """
+        Record request count and duration per route template.
+        
+        The template ("/files/{file_id}") rather than the raw path keeps the
+        number of series bounded; unmatched paths (404s, scans) share one label.
+        """
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUESTS.inc(method=request.method, route=route_path, status=response.status_code)
+        HTTP_REQUEST_DURATION.observe(process_time, method=request.method, route=route_path)
+    
     def _add_security_headers(self, response: Response, request: Request) -> None:
         """
         Add comprehensive security headers to the HTTP response.
@@ -286,6 +301,8 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
                 logger.warning(f"🚫 Authorization failure from {client_ip}: {request.url.path}")
             elif response.status_code == 429:
                 logger.warning(f"⏱️ Rate limit exceeded from {client_ip}: {request.url.path}")
+            elif request.url.path == "/health/ready":
+                pass  # Not ready is an answer, logged by the probe when it changes
             else:
                 logger.warning(f"❌ Error response {response.status_code} from {client_ip}: {request.url.path}")
         
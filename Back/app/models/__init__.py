@@ -54,6 +54,7 @@ from .assistant import Assistant
 from .file_upload import FileUpload
 from .folder import Folder
 from .chat import Chat
+from .batch_job import BatchJob, BatchJobItem, BatchJobStatus, BatchJobMode, BatchItemStatus
 
 # Import Base from database for schema operations
 from ..core.database import Base
@@ -80,6 +81,11 @@ __all__ = [
     "FileUpload",
     "Folder",
     "Chat",
+    "BatchJob",
+    "BatchJobItem",
+    "BatchJobStatus",
+    "BatchJobMode",
+    "BatchItemStatus",
 ]
 
 # Model registry information (useful for debugging)
@@ -102,6 +108,8 @@ def get_all_models():
         FileUpload,
         Folder,
         Chat,
+        BatchJob,
+        BatchJobItem,
     ]
 
 def get_model_names():
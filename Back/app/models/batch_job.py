@@ -0,0 +1,183 @@
+# AI Dock Batch Job Models
+# Offline batch completions: a JSONL upload of chat requests run against one LLM configuration
+
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from ..core.database import Base
+
+
+class BatchJobStatus:
+    """Lifecycle states of a batch job."""
+    QUEUED = "queued"          # Accepted, waiting for the runner
+    RUNNING = "running"        # Items are being sent (or the provider batch is processing)
+    COMPLETED = "completed"    # Every item finished (some may have failed)
+    FAILED = "failed"          # The job itself failed (e.g. provider batch rejected)
+    CANCELLED = "cancelled"    # Stopped by the user
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class BatchJobMode:
+    """How a batch job's items are sent."""
+    CONCURRENT = "concurrent"  # Live requests in the batch lane with bounded concurrency
+    PROVIDER = "provider"      # The provider's own batch API (OpenAI / Anthropic)
+
+
+class BatchItemStatus:
+    """Lifecycle states of a single batch item."""
+    PENDING = "pending"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class BatchJob(Base):
+    """
+    Batch Job Model - one uploaded JSONL of chat requests.
+
+    Progress counters are updated as items finish so clients can poll the
+    job instead of holding a connection open.
+    """
+
+    __tablename__ = "batch_jobs"
+
+    # =============================================================================
+    # IDENTIFICATION AND OWNERSHIP
+    # =============================================================================
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=True)
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True, index=True)
+    llm_config_id = Column(Integer, ForeignKey("llm_configurations.id"), nullable=False)
+
+    # =============================================================================
+    # EXECUTION SETTINGS
+    # =============================================================================
+
+    mode = Column(String(20), nullable=False, default=BatchJobMode.CONCURRENT)
+    model = Column(String(100), nullable=True)  # Default model for items that don't set one
+    concurrency = Column(Integer, nullable=False, default=4)
+    provider_batch_id = Column(String(255), nullable=True)  # Set once submitted in provider mode
+
+    # =============================================================================
+    # PROGRESS AND TOTALS
+    # =============================================================================
+
+    status = Column(String(20), nullable=False, default=BatchJobStatus.QUEUED, index=True)
+    total_items = Column(Integer, nullable=False, default=0)
+    completed_items = Column(Integer, nullable=False, default=0)
+    failed_items = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    total_cost = Column(Float, nullable=False, default=0.0)
+    error_message = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    user = relationship("User")
+    llm_config = relationship("LLMConfiguration")
+    items = relationship(
+        "BatchJobItem",
+        back_populates="batch_job",
+        cascade="all, delete-orphan",
+        order_by="BatchJobItem.line_number"
+    )
+
+    def __repr__(self):
+        return f"<BatchJob(id={self.id}, status='{self.status}', {self.processed_items}/{self.total_items})>"
+
+    @property
+    def processed_items(self) -> int:
+        """Items that finished, successfully or not."""
+        return (self.completed_items or 0) + (self.failed_items or 0)
+
+    @property
+    def progress_percentage(self) -> float:
+        if not self.total_items:
+            return 0.0
+        return round(self.processed_items / self.total_items * 100, 1)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in BatchJobStatus.FINISHED
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the job to a dictionary for API responses."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "user_id": self.user_id,
+            "llm_config_id": self.llm_config_id,
+            "mode": self.mode,
+            "model": self.model,
+            "concurrency": self.concurrency,
+            "status": self.status,
+            "total_items": self.total_items,
+            "completed_items": self.completed_items,
+            "failed_items": self.failed_items,
+            "progress_percentage": self.progress_percentage,
+            "total_tokens": self.total_tokens,
+            "total_cost": self.total_cost,
+            "error_message": self.error_message,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None
+        }
+
+
+class BatchJobItem(Base):
+    """
+    Batch Job Item Model - one line of the uploaded JSONL and its result.
+    """
+
+    __tablename__ = "batch_job_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_job_id = Column(Integer, ForeignKey("batch_jobs.id", ondelete="CASCADE"), nullable=False)
+    line_number = Column(Integer, nullable=False)
+    custom_id = Column(String(255), nullable=False)  # From the input line, or "line-<n>"
+
+    # Parsed request: {"messages": [...], "model", "temperature", "max_tokens"}
+    request_data = Column(JSON, nullable=False)
+
+    status = Column(String(20), nullable=False, default=BatchItemStatus.PENDING)
+    response_content = Column(Text, nullable=True)
+    model = Column(String(100), nullable=True)
+    usage = Column(JSON, nullable=True)
+    cost = Column(Float, nullable=True)
+    response_time_ms = Column(Integer, nullable=True)
+    error_message = Column(Text, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    batch_job = relationship("BatchJob", back_populates="items")
+
+    # The runner picks pending items of a job
+    __table_args__ = (
+        Index("idx_batch_job_items_job_status", "batch_job_id", "status"),
+    )
+
+    def __repr__(self):
+        return f"<BatchJobItem(id={self.id}, job={self.batch_job_id}, line={self.line_number}, status='{self.status}')>"
+
+    def to_result_dict(self) -> Dict[str, Any]:
+        """One line of the job's results JSONL."""
+        return {
+            "custom_id": self.custom_id,
+            "line_number": self.line_number,
+            "status": self.status,
+            "response": {
+                "content": self.response_content,
+                "model": self.model,
+                "usage": self.usage,
+                "cost": self.cost,
+                "response_time_ms": self.response_time_ms
+            } if self.status == BatchItemStatus.SUCCEEDED else None,
+            "error": self.error_message
+        }
@@ -6,10 +6,22 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 from typing import Optional, List, Dict, Any
+import hashlib
 
 from ..core.database import Base
 from .project import project_conversations
 
+
+def compute_content_hash(content: Optional[str]) -> str:
+    """SHA-256 hex digest of a message's content, used for duplicate detection."""
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def _default_content_hash(context) -> str:
+    """Column default: fill content_hash from the content being inserted."""
+    return compute_content_hash(context.get_current_parameters().get("content"))
+
+
 class Conversation(Base):
     """
     Conversation model - stores chat conversation metadata
@@ -216,6 +228,9 @@ class ConversationMessage(Base):
     content = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
+    # SHA-256 of content, so duplicate checks probe an index instead of comparing text
+    content_hash = Column(String(64), nullable=True, default=_default_content_hash)
+    
     # Message metadata
     model_used = Column(String(100), nullable=True)  # Model used for this response
     tokens_used = Column(Integer, nullable=True)     # Tokens consumed
@@ -268,6 +283,15 @@ class ConversationMessage(Base):
             "metadata": safe_metadata  # Using safe_metadata instead of the meta_data property
         }
 
+# Index for duplicate detection (same role and content, recently, in one conversation)
+Index(
+    'idx_message_dedup',
+    ConversationMessage.conversation_id,
+    ConversationMessage.role,
+    ConversationMessage.content_hash,
+    ConversationMessage.created_at
+)
+
 # Performance indexes
 # Note: Indexes should be defined after all table definitions to avoid metadata conflicts
 def create_indexes():
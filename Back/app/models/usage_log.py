@@ -117,6 +117,21 @@ class UsageLog(Base):
     cost_currency = Column(String(3), nullable=False, default="USD")
     """Currency for cost (usually USD)"""
     
+    # =============================================================================
+    # RESPONSE CACHE TRACKING
+    # =============================================================================
+    
+    cache_status = Column(String(20), nullable=True, index=True)
+    """
+    Response reuse outcome for deterministic requests:
+    'hit' (served from cache, no upstream call), 'miss' (sent upstream and stored)
+    or 'coalesced' (shared one in-flight upstream call with identical requests).
+    NULL when the request was not eligible for reuse.
+    """
+    
+    cost_saved = Column(Float, nullable=True)
+    """Upstream cost avoided by cache hits or by coalescing (USD)"""
+    
     # =============================================================================
     # PERFORMANCE METRICS
     # =============================================================================
@@ -130,6 +145,9 @@ class UsageLog(Base):
     request_completed_at = Column(DateTime, nullable=True)
     """When response was received"""
     
+    queue_wait_ms = Column(Integer, nullable=True)
+    """Time spent waiting for provider capacity (admission control) in milliseconds"""
+    
     # =============================================================================
     # SUCCESS/FAILURE TRACKING
     # =============================================================================
@@ -256,9 +274,14 @@ class UsageLog(Base):
             },
             "performance": {
                 "response_time_ms": self.response_time_ms,
+                "queue_wait_ms": self.queue_wait_ms,
                 "duration_seconds": self.duration_seconds,
                 "tokens_per_second": self.tokens_per_second
             },
+            "cache": {
+                "status": self.cache_status,
+                "cost_saved": self.cost_saved
+            },
             "success": self.success,
             "error_type": self.error_type,
             "response_content_length": self.response_content_length,
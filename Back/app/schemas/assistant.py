@@ -237,7 +237,11 @@ class AssistantBase(BaseModel):
             model = v['model']
             if not isinstance(model, str) or not model.strip():
                 raise ValueError('Model must be a non-empty string')
-        
+
+        # Validate response cache opt-in flag (only used for temperature=0 requests)
+        if 'response_cache' in v and not isinstance(v['response_cache'], bool):
+            raise ValueError('Response cache flag must be true or false')
+
         return v
 
 
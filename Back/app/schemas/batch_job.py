@@ -0,0 +1,42 @@
+"""
+Batch Job schemas for AI Dock application.
+
+These Pydantic models define the API structure for offline batch completions:
+- Job status and progress responses (for polling)
+- Job listings
+"""
+
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List
+from datetime import datetime
+
+
+class BatchJobResponse(BaseModel):
+    """A batch job and its progress."""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: Optional[str] = None
+    llm_config_id: int
+    mode: str = Field(..., description="'concurrent' (live batch-lane requests) or 'provider' (provider batch API)")
+    model: Optional[str] = None
+    concurrency: int
+    status: str = Field(..., description="queued, running, completed, failed or cancelled")
+
+    total_items: int
+    completed_items: int
+    failed_items: int
+    progress_percentage: float
+    total_tokens: int
+    total_cost: float
+    error_message: Optional[str] = None
+
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+class BatchJobListResponse(BaseModel):
+    """The user's batch jobs, newest first."""
+    jobs: List[BatchJobResponse]
+    total_count: int
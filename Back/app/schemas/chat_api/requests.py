@@ -6,7 +6,7 @@ for better modularity and maintainability.
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 # =============================================================================
 # CHAT MESSAGE SCHEMA
@@ -42,6 +42,11 @@ class ChatRequest(BaseModel):
     temperature: Optional[float] = Field(None, ge=0.0, le=2.0, description="Response randomness (0-2)")
     max_tokens: Optional[int] = Field(None, ge=1, le=32000, description="Maximum response tokens")
     
+    # Scheduling lane (bulk/API clients can mark their calls as background or batch)
+    priority: Optional[Literal["interactive", "background", "batch"]] = Field(
+        None, description="Priority lane; defaults to the role's lane and cannot be higher than it"
+    )
+    
     class Config:
         json_schema_extra = {
             "example": {
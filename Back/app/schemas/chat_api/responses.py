@@ -74,6 +74,7 @@ class CostEstimateResponse(BaseModel):
     """Schema for cost estimation responses."""
     estimated_cost: Optional[float] = Field(description="Estimated cost in USD")
     has_cost_tracking: bool = Field(description="Whether cost tracking is available")
+    estimated_input_tokens: Optional[int] = Field(None, description="Input tokens counted with the model's tokenizer")
     message: str = Field(description="Explanation of estimate")
 
 # =============================================================================
@@ -296,6 +296,9 @@ async def update_last_login(db: AsyncSession, user: User) -> None:
         db: Database session
         user: User object to update
     """
+    # Read before the commit: after a rollback the instance is expired, and
+    # loading an attribute lazily on an async session raises MissingGreenlet
+    user_id = user.id
     try:
         # Update the last_login_at field
         user.last_login_at = datetime.utcnow()
@@ -309,12 +312,12 @@ async def update_last_login(db: AsyncSession, user: User) -> None:
         # Refresh to ensure we have the latest data
         await db.refresh(user)
         
-        logger.info(f"✅ Updated last login for user {user.id}")
+        logger.info(f"✅ Updated last login for user {user_id}")
         
     except Exception as e:
         # If update fails, rollback and log error
         await db.rollback()
-        logger.error(f"❌ Error updating last login for user {user.id}: {e}")
+        logger.error(f"❌ Error updating last login for user {user_id}: {e}")
         # Re-raise to let caller handle the error appropriately
         raise e
 
@@ -0,0 +1,784 @@
+# AI Dock Batch Job Service
+# Runs offline batch completions: JSONL uploads of chat requests against one LLM configuration
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import SyncSessionLocal
+from ..models.batch_job import BatchJob, BatchJobItem, BatchJobStatus, BatchJobMode, BatchItemStatus
+from ..models.llm_config import LLMConfiguration
+from ..models.user import User
+from .usage_service import usage_service
+from .llm.core.priority_lanes import RequestPriority
+from .llm.core.cost_calculator import get_cost_calculator
+from .llm.exceptions import LLMContextWindowError, LLMDepartmentQuotaExceededError, LLMUserNotFoundError
+from .llm.handlers.chat_handler import get_chat_handler
+from .llm.models import ChatResponse, ProviderBatchStatus
+from .llm.usage_logger import get_usage_logger
+
+logger = logging.getLogger(__name__)
+
+VALID_ROLES = ("system", "user", "assistant")
+
+
+class BatchJobInputError(ValueError):
+    """The uploaded JSONL is not a valid batch."""
+    pass
+
+
+# =============================================================================
+# RUN STATE
+# =============================================================================
+
+@dataclass
+class ItemResult:
+    """Outcome of one item, waiting to be flushed to the database."""
+    item_id: int
+    custom_id: str
+    request_data: Dict[str, Any]
+    performance_data: Dict[str, Any]
+    response: Optional[ChatResponse] = None
+    error: Optional[Exception] = None
+
+
+@dataclass
+class JobRun:
+    """State of a job while this process runs it."""
+    job_id: int
+    user_id: int
+    config_id: int
+    config_data: Dict[str, Any]
+    provider: Any
+    model: Optional[str]
+    mode: str
+    concurrency: int
+    provider_batch_id: Optional[str]
+    pending: List[ItemResult] = field(default_factory=list)
+    last_flush: float = field(default_factory=time.monotonic)
+    stop_reason: Optional[str] = None
+    # Flushes write in a worker thread; one at a time keeps the job counters exact
+    flush_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+# =============================================================================
+# BATCH JOB SERVICE
+# =============================================================================
+
+class BatchJobService:
+    """
+    Accepts JSONL batches and runs them in the background.
+
+    - Concurrent mode sends live requests in the batch priority lane, at most
+      ``concurrency`` at a time, through quota checks and admission control
+      like any chat request, so bulk work never crowds out interactive users
+    - Provider mode submits the whole batch to the provider's batch API
+      (OpenAI /batches, Anthropic message batches) and polls for results
+    - Finished items are flushed in groups: item rows and job counters in one
+      transaction, usage logs through the batched usage writer
+    - Unfinished jobs are picked up again after a restart
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.chat_handler = get_chat_handler()
+        self.cost_calculator = get_cost_calculator()
+        self.usage_logger = get_usage_logger()
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    # =============================================================================
+    # INPUT PARSING
+    # =============================================================================
+
+    def parse_jsonl(self, content: bytes) -> List[Dict[str, Any]]:
+        """
+        Parse an uploaded batch file.
+
+        Each non-empty line is one request, either
+        {"custom_id": "...", "messages": [...], "model", "temperature", "max_tokens"}
+        or the OpenAI batch format {"custom_id": "...", "body": {"messages": [...], ...}}.
+
+        Args:
+            content: Raw file content
+
+        Returns:
+            List of {"line_number", "custom_id", "request_data"}
+
+        Raises:
+            BatchJobInputError: If a line is invalid or the file is empty/too large
+        """
+        try:
+            text = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise BatchJobInputError("Batch file must be UTF-8 encoded JSONL")
+
+        items = []
+        custom_ids = set()
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            if len(items) >= settings.batch_jobs_max_items:
+                raise BatchJobInputError(f"Batch exceeds the limit of {settings.batch_jobs_max_items} requests")
+
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise BatchJobInputError(f"Line {line_number}: invalid JSON ({e.msg})")
+            if not isinstance(data, dict):
+                raise BatchJobInputError(f"Line {line_number}: expected a JSON object")
+
+            body = data.get("body", data)
+            request_data = self._parse_request(body, line_number)
+
+            custom_id = str(data.get("custom_id") or f"line-{line_number}")
+            if custom_id in custom_ids:
+                raise BatchJobInputError(f"Line {line_number}: duplicate custom_id '{custom_id}'")
+            custom_ids.add(custom_id)
+
+            items.append({"line_number": line_number, "custom_id": custom_id, "request_data": request_data})
+
+        if not items:
+            raise BatchJobInputError("Batch file contains no requests")
+        return items
+
+    def _parse_request(self, body: Any, line_number: int) -> Dict[str, Any]:
+        messages = body.get("messages") if isinstance(body, dict) else None
+        if not isinstance(messages, list) or not messages:
+            raise BatchJobInputError(f"Line {line_number}: 'messages' must be a non-empty list")
+
+        for message in messages:
+            if (
+                not isinstance(message, dict)
+                or message.get("role") not in VALID_ROLES
+                or not isinstance(message.get("content"), str)
+            ):
+                raise BatchJobInputError(
+                    f"Line {line_number}: each message needs a role ({', '.join(VALID_ROLES)}) and string content"
+                )
+
+        request_data = {"messages": [{"role": m["role"], "content": m["content"]} for m in messages]}
+        for key, expected in (("model", str), ("temperature", (int, float)), ("max_tokens", int)):
+            if body.get(key) is not None:
+                if not isinstance(body[key], expected):
+                    raise BatchJobInputError(f"Line {line_number}: invalid '{key}'")
+                request_data[key] = body[key]
+        return request_data
+
+    # =============================================================================
+    # JOB LIFECYCLE
+    # =============================================================================
+
+    async def create_job(
+        self,
+        db: AsyncSession,
+        user: User,
+        config: LLMConfiguration,
+        items: List[Dict[str, Any]],
+        name: Optional[str] = None,
+        model: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        use_provider_batch: bool = False
+    ) -> BatchJob:
+        """
+        Store a parsed batch and start running it.
+
+        Args:
+            db: Async database session
+            user: User submitting the batch
+            config: LLM configuration to run it against
+            items: Output of parse_jsonl
+            name: Optional display name
+            model: Model for items that don't set one (config default otherwise)
+            concurrency: Parallel requests in concurrent mode
+            use_provider_batch: Submit through the provider's batch API
+
+        Returns:
+            The created BatchJob
+        """
+        concurrency = min(
+            max(concurrency or settings.batch_jobs_default_concurrency, 1),
+            settings.batch_jobs_max_concurrency
+        )
+
+        job = BatchJob(
+            name=name,
+            user_id=user.id,
+            department_id=user.department_id,
+            llm_config_id=config.id,
+            mode=BatchJobMode.PROVIDER if use_provider_batch else BatchJobMode.CONCURRENT,
+            model=model,
+            concurrency=concurrency,
+            status=BatchJobStatus.QUEUED,
+            total_items=len(items)
+        )
+        db.add(job)
+        await db.flush()
+
+        db.add_all([
+            BatchJobItem(
+                batch_job_id=job.id,
+                line_number=item["line_number"],
+                custom_id=item["custom_id"],
+                request_data=item["request_data"]
+            )
+            for item in items
+        ])
+        await db.commit()
+
+        self.logger.info(
+            f"📦 Batch job {job.id} created by user {user.id}: {len(items)} requests, "
+            f"config {config.id}, mode={job.mode}"
+        )
+        self.start_job(job.id)
+        return job
+
+    def start_job(self, job_id: int) -> None:
+        """Run a job in the background (no-op if it is already running here)."""
+        task = self._tasks.get(job_id)
+        if task and not task.done():
+            return
+        self._tasks[job_id] = asyncio.create_task(self._run_job(job_id))
+
+    async def cancel_job(self, db: AsyncSession, job: BatchJob) -> BatchJob:
+        """
+        Cancel a job: stop its runner, cancel the provider batch and mark
+        pending items as cancelled. Finished items keep their results.
+        """
+        if job.is_finished:
+            return job
+
+        task = self._tasks.pop(job.id, None)
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+        if job.provider_batch_id:
+            try:
+                config = await db.get(LLMConfiguration, job.llm_config_id)
+                provider = self.chat_handler.provider_factory.get_provider(config)
+                await provider.cancel_batch(job.provider_batch_id)
+            except Exception as e:
+                self.logger.warning(f"Could not cancel provider batch {job.provider_batch_id}: {e}")
+
+        await db.execute(
+            update(BatchJobItem)
+            .where(BatchJobItem.batch_job_id == job.id, BatchJobItem.status == BatchItemStatus.PENDING)
+            .values(status=BatchItemStatus.CANCELLED, error_message="Batch job cancelled")
+        )
+        await db.refresh(job)
+        job.status = BatchJobStatus.CANCELLED
+        job.completed_at = datetime.utcnow()
+        await db.commit()
+
+        self.logger.info(f"🛑 Batch job {job.id} cancelled")
+        return job
+
+    async def resume_unfinished_jobs(self) -> int:
+        """
+        Restart jobs that were queued or running when the server stopped.
+
+        Returns:
+            Number of jobs resumed
+        """
+        def load_job_ids() -> List[int]:
+            with SyncSessionLocal() as db_session:
+                return [
+                    job_id for (job_id,) in db_session.query(BatchJob.id).filter(
+                        BatchJob.status.in_([BatchJobStatus.QUEUED, BatchJobStatus.RUNNING])
+                    ).all()
+                ]
+
+        try:
+            job_ids = await asyncio.to_thread(load_job_ids)
+        except Exception as e:
+            self.logger.error(f"❌ Could not load unfinished batch jobs: {e}")
+            return 0
+
+        for job_id in job_ids:
+            self.start_job(job_id)
+        if job_ids:
+            self.logger.info(f"📦 Resuming {len(job_ids)} unfinished batch job(s)")
+        return len(job_ids)
+
+    async def shutdown(self) -> None:
+        """Stop running jobs; their pending items are resumed on the next startup."""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"running_jobs": sum(1 for task in self._tasks.values() if not task.done())}
+
+    # =============================================================================
+    # JOB RUNNER
+    # =============================================================================
+
+    # Job bookkeeping uses short sync sessions in worker threads (asyncio.to_thread):
+    # a commit can wait on the database write lock, on SQLite for as long as the
+    # busy timeout, and must not stall the event loop meanwhile
+
+    async def _run_job(self, job_id: int) -> None:
+        run = None
+        try:
+            run = await self._start_run(job_id)
+            if run is None:
+                return
+
+            if run.stop_reason is None:
+                if run.mode == BatchJobMode.PROVIDER:
+                    await self._run_provider_batch(run)
+                else:
+                    await self._run_concurrent(run)
+
+            await self._finish_run(run)
+
+        except asyncio.CancelledError:
+            # Keep what already finished; pending items run again on resume
+            if run is not None:
+                try:
+                    await self._flush(run)
+                except Exception as e:
+                    self.logger.error(f"❌ Could not save results of stopped batch job {job_id}: {e}")
+            self.logger.info(f"⏸️ Batch job {job_id} runner stopped")
+            raise
+        except Exception as e:
+            self.logger.error(f"❌ Batch job {job_id} failed: {e}")
+            await asyncio.to_thread(self._set_job_status, job_id, BatchJobStatus.FAILED, str(e))
+        finally:
+            self._tasks.pop(job_id, None)
+
+    async def _start_run(self, job_id: int) -> Optional[JobRun]:
+        """Load the job, validate its configuration and mark it running."""
+        job = await asyncio.to_thread(self._mark_running, job_id)
+        if job is None:
+            return None
+
+        run = JobRun(
+            job_id=job_id,
+            user_id=job["user_id"],
+            config_id=job["config_id"],
+            config_data=job["config_data"],
+            provider=self.chat_handler._get_provider_from_config(job["config_data"]),
+            model=job["model"],
+            mode=job["mode"],
+            concurrency=job["concurrency"],
+            provider_batch_id=job["provider_batch_id"]
+        )
+        if run.mode == BatchJobMode.PROVIDER and not run.provider.supports_batch_api:
+            run.stop_reason = f"{run.provider.provider_name} has no batch API"
+
+        self.logger.info(f"▶️ Running batch job {job_id} with {run.provider.provider_name}")
+        return run
+
+    def _mark_running(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Validate the job's configuration and mark it running; None if there is nothing to run."""
+        with SyncSessionLocal() as db_session:
+            job = db_session.get(BatchJob, job_id)
+            if job is None or job.is_finished:
+                return None
+
+            config_data = self.chat_handler.config_validator.load_and_validate_config(
+                job.llm_config_id, db_session
+            )
+            job.status = BatchJobStatus.RUNNING
+            job.started_at = job.started_at or datetime.utcnow()
+            db_session.commit()
+
+            return {
+                "user_id": job.user_id,
+                "config_id": job.llm_config_id,
+                "config_data": config_data,
+                "model": job.model,
+                "mode": job.mode,
+                "concurrency": job.concurrency,
+                "provider_batch_id": job.provider_batch_id
+            }
+
+    async def _finish_run(self, run: JobRun) -> None:
+        """Flush remaining results and close the job."""
+        await self._flush(run)
+        status = await asyncio.to_thread(self._close_run, run)
+        self.logger.info(f"🏁 Batch job {run.job_id} {status}")
+
+    def _close_run(self, run: JobRun) -> str:
+        """Fail the items a stopped run left pending and set the job's final status."""
+        with SyncSessionLocal() as db_session:
+            if run.stop_reason:
+                db_session.query(BatchJobItem).filter(
+                    BatchJobItem.batch_job_id == run.job_id,
+                    BatchJobItem.status == BatchItemStatus.PENDING
+                ).update(
+                    {"status": BatchItemStatus.FAILED, "error_message": f"Not run: {run.stop_reason}"},
+                    synchronize_session=False
+                )
+                failed = db_session.query(BatchJobItem).filter(
+                    BatchJobItem.batch_job_id == run.job_id,
+                    BatchJobItem.status == BatchItemStatus.FAILED
+                ).count()
+                db_session.query(BatchJob).filter(BatchJob.id == run.job_id).update(
+                    {"failed_items": failed}, synchronize_session=False
+                )
+            db_session.commit()
+
+        status = BatchJobStatus.FAILED if run.stop_reason else BatchJobStatus.COMPLETED
+        self._set_job_status(run.job_id, status, error_message=run.stop_reason)
+        return status
+
+    def _set_job_status(self, job_id: int, status: str, error_message: Optional[str] = None) -> None:
+        try:
+            with SyncSessionLocal() as db_session:
+                job = db_session.get(BatchJob, job_id)
+                if job is None or job.status == BatchJobStatus.CANCELLED:
+                    return
+                job.status = status
+                job.error_message = error_message
+                if status in BatchJobStatus.FINISHED:
+                    job.completed_at = datetime.utcnow()
+                db_session.commit()
+        except Exception as e:
+            self.logger.error(f"❌ Could not update batch job {job_id} status: {e}")
+
+    def _pending_items(self, job_id: int) -> List[BatchJobItem]:
+        with SyncSessionLocal() as db_session:
+            return db_session.query(BatchJobItem).filter(
+                BatchJobItem.batch_job_id == job_id,
+                BatchJobItem.status == BatchItemStatus.PENDING
+            ).order_by(BatchJobItem.line_number).all()
+
+    # =============================================================================
+    # CONCURRENT MODE
+    # =============================================================================
+
+    async def _run_concurrent(self, run: JobRun) -> None:
+        """Send pending items as live batch-lane requests with bounded concurrency."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in await asyncio.to_thread(self._pending_items, run.job_id):
+            queue.put_nowait(item)
+
+        async def worker() -> None:
+            while run.stop_reason is None:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self._run_item(run, item)
+
+        await asyncio.gather(*(worker() for _ in range(run.concurrency)))
+
+    async def _run_item(self, run: JobRun, item: BatchJobItem) -> None:
+        request_data = item.request_data
+        chat_request = self.chat_handler._create_chat_request(
+            request_data["messages"],
+            request_data.get("model") or run.model,
+            request_data.get("temperature"),
+            request_data.get("max_tokens")
+        )
+        performance_data = {"request_started_at": datetime.utcnow().isoformat(), "streaming": False}
+        result = ItemResult(item.id, item.custom_id, request_data, performance_data)
+
+        try:
+            self.chat_handler.context_window_manager.fit_request(chat_request, run.config_data, None)
+            async with self._db_session() as db_session:
+                quota_check_result = await self.chat_handler.check_quotas(
+                    run.user_id, run.config_id, chat_request, db_session, run.config_data
+                )
+                department = self.chat_handler.get_scheduling_department(
+                    run.user_id, quota_check_result, db_session
+                )
+
+            ticket = await self.chat_handler.acquire_admission(
+                chat_request, run.config_data, department, performance_data, RequestPriority.BATCH
+            )
+            try:
+                response = await run.provider.send_chat_request(chat_request)
+            except BaseException:
+                self.chat_handler.admission_controller.release(ticket)
+                raise
+            self.chat_handler.admission_controller.release(ticket, (response.usage or {}).get("total_tokens"))
+
+            if not response.cost:
+                response.cost = await self.cost_calculator.calculate_actual_cost(response, run.config_data)
+            result.response = response
+
+        except (LLMDepartmentQuotaExceededError, LLMUserNotFoundError) as e:
+            # Every remaining item would fail the same way
+            run.stop_reason = str(e)
+            result.error = e
+        except Exception as e:
+            result.error = e
+
+        performance_data["request_completed_at"] = datetime.utcnow().isoformat()
+        performance_data["response_time_ms"] = (
+            result.response.response_time_ms if result.response else None
+        )
+        await self._add_result(run, result)
+
+    # =============================================================================
+    # PROVIDER BATCH MODE
+    # =============================================================================
+
+    async def _run_provider_batch(self, run: JobRun) -> None:
+        """Submit pending items to the provider's batch API and collect the results."""
+        items = {f"item-{item.id}": item for item in await asyncio.to_thread(self._pending_items, run.job_id)}
+        if not items:
+            return
+
+        if run.provider_batch_id is None:
+            requests = []
+            for custom_id, item in list(items.items()):
+                chat_request = self.chat_handler._create_chat_request(
+                    item.request_data["messages"],
+                    item.request_data.get("model") or run.model,
+                    item.request_data.get("temperature"),
+                    item.request_data.get("max_tokens")
+                )
+                try:
+                    self.chat_handler.context_window_manager.fit_request(chat_request, run.config_data, None)
+                except LLMContextWindowError as e:
+                    # Too large for the model even with its history trimmed: fails on its own
+                    await self._add_result(run, ItemResult(
+                        item.id, item.custom_id, item.request_data,
+                        {"request_started_at": datetime.utcnow().isoformat(), "streaming": False},
+                        error=e
+                    ))
+                    del items[custom_id]
+                    continue
+                requests.append((custom_id, chat_request))
+            if not requests:
+                return
+
+            # The provider runs the whole batch at once: check quotas against its first request
+            try:
+                async with self._db_session() as db_session:
+                    await self.chat_handler.check_quotas(
+                        run.user_id, run.config_id, requests[0][1], db_session, run.config_data
+                    )
+            except (LLMDepartmentQuotaExceededError, LLMUserNotFoundError) as e:
+                run.stop_reason = str(e)
+                return
+
+            run.provider_batch_id = await run.provider.submit_batch(requests)
+            await asyncio.to_thread(self._save_provider_batch_id, run)
+
+        submitted_at = datetime.utcnow().isoformat()
+        while True:
+            batch_status = await run.provider.get_batch_status(run.provider_batch_id)
+            self.logger.info(f"📦 Batch job {run.job_id}: provider {batch_status}")
+            if batch_status.is_finished:
+                break
+            await asyncio.sleep(settings.batch_jobs_poll_seconds)
+
+        for result in await run.provider.get_batch_results(run.provider_batch_id):
+            item = items.pop(result.custom_id, None)
+            if item is None:
+                continue
+            await self._add_result(run, ItemResult(
+                item.id, item.custom_id, item.request_data,
+                {
+                    "request_started_at": submitted_at,
+                    "request_completed_at": datetime.utcnow().isoformat(),
+                    "streaming": False
+                },
+                response=result.response,
+                error=Exception(result.error) if result.error else None
+            ))
+
+        # Items the provider returned nothing for
+        reason = batch_status.error or f"Provider batch {batch_status.status}"
+        for item in items.values():
+            await self._add_result(run, ItemResult(
+                item.id, item.custom_id, item.request_data,
+                {"request_started_at": submitted_at, "streaming": False},
+                error=Exception(reason)
+            ))
+
+        if batch_status.status == ProviderBatchStatus.FAILED and batch_status.completed == 0:
+            run.stop_reason = reason
+
+    def _save_provider_batch_id(self, run: JobRun) -> None:
+        """Remember the provider batch, so a restarted run polls it instead of submitting again."""
+        with SyncSessionLocal() as db_session:
+            db_session.query(BatchJob).filter(BatchJob.id == run.job_id).update(
+                {"provider_batch_id": run.provider_batch_id}, synchronize_session=False
+            )
+            db_session.commit()
+
+    # =============================================================================
+    # RESULT FLUSHING
+    # =============================================================================
+
+    async def _add_result(self, run: JobRun, result: ItemResult) -> None:
+        run.pending.append(result)
+        if (
+            len(run.pending) >= settings.batch_jobs_usage_flush_size
+            or time.monotonic() - run.last_flush >= 2.0
+        ):
+            await self._flush(run)
+
+    async def _flush(self, run: JobRun) -> None:
+        """
+        Persist finished items: item rows and job counters in one transaction,
+        quota usage per successful item, usage logs in one batched write.
+        """
+        results, run.pending = run.pending, []
+        run.last_flush = time.monotonic()
+        if not results:
+            return
+
+        # The commits can wait on the database write lock: keep them off the event loop
+        async with run.flush_lock:
+            usage_entries = await asyncio.to_thread(self._write_results, run, results)
+        await usage_service.log_llm_requests_batch(usage_entries)
+
+    def _write_results(self, run: JobRun, results: List[ItemResult]) -> List[Dict[str, Any]]:
+        """Update item rows, job counters and quotas; returns the usage log entries to write."""
+        provider_name = run.provider.provider_name
+        usage_entries = []
+        completed = failed = tokens = 0
+        cost = 0.0
+
+        with SyncSessionLocal() as db_session:
+            items = {
+                item.id: item for item in db_session.query(BatchJobItem).filter(
+                    BatchJobItem.id.in_([result.item_id for result in results])
+                ).all()
+            }
+
+            for result in results:
+                item = items.get(result.item_id)
+                if item is None or item.status != BatchItemStatus.PENDING:
+                    continue  # Cancelled meanwhile
+
+                item.completed_at = datetime.utcnow()
+                response = result.response
+                if response is not None:
+                    item.status = BatchItemStatus.SUCCEEDED
+                    item.response_content = response.content
+                    item.model = response.model
+                    item.usage = response.usage
+                    item.cost = response.cost
+                    item.response_time_ms = response.response_time_ms
+                    completed += 1
+                    tokens += response.get_total_tokens()
+                    cost += response.cost or 0.0
+                    response_data = self.usage_logger.create_success_response_data(response)
+                else:
+                    item.status = BatchItemStatus.FAILED
+                    item.error_message = str(result.error)
+                    failed += 1
+                    response_data = self.usage_logger.create_error_response_data(
+                        result.error,
+                        result.request_data.get("model") or run.model or run.config_data["default_model"],
+                        provider_name
+                    )
+
+                usage_entries.append({
+                    "user_id": run.user_id,
+                    "llm_config_id": run.config_id,
+                    "request_data": self.usage_logger.create_request_data(
+                        result.request_data["messages"],
+                        {
+                            "temperature": result.request_data.get("temperature"),
+                            "max_tokens": result.request_data.get("max_tokens"),
+                            "model_override": result.request_data.get("model") or run.model,
+                            "priority": RequestPriority.BATCH.value,
+                            "batch_job_id": run.job_id
+                        }
+                    ),
+                    "response_data": response_data,
+                    "performance_data": result.performance_data,
+                    "session_id": f"batch_job_{run.job_id}",
+                    "request_id": f"batch_job_{run.job_id}_{result.custom_id}"
+                })
+
+            job = db_session.get(BatchJob, run.job_id)
+            job.completed_items += completed
+            job.failed_items += failed
+            job.total_tokens += tokens
+            job.total_cost += cost
+            db_session.commit()
+
+            # Quota recording commits per response, so it runs after the item updates.
+            # It increments usage in SQL, so it can run alongside chat-path recordings
+            # in other threads without losing updates
+            for result in results:
+                if result.response is not None and items.get(result.item_id) is not None:
+                    self.chat_handler.quota_manager.record_quota_usage_improved(
+                        run.user_id, run.config_id, result.response, db_session
+                    )
+
+        return usage_entries
+
+    @asynccontextmanager
+    async def _db_session(self):
+        """Short-lived sync session."""
+        with SyncSessionLocal() as db_session:
+            yield db_session
+
+    # =============================================================================
+    # QUERIES
+    # =============================================================================
+
+    async def get_job(self, db: AsyncSession, job_id: int, user: User) -> Optional[BatchJob]:
+        """Get a job owned by the user (admins can see every job)."""
+        job = await db.get(BatchJob, job_id)
+        if job is None or (job.user_id != user.id and not user.is_admin):
+            return None
+        return job
+
+    async def list_jobs(self, db: AsyncSession, user: User, limit: int = 50, offset: int = 0) -> List[BatchJob]:
+        """List the user's jobs, newest first."""
+        result = await db.execute(
+            select(BatchJob)
+            .where(BatchJob.user_id == user.id)
+            .order_by(BatchJob.created_at.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        return list(result.scalars().all())
+
+    async def get_job_items(self, db: AsyncSession, job_id: int) -> List[BatchJobItem]:
+        """All items of a job in input order."""
+        result = await db.execute(
+            select(BatchJobItem)
+            .where(BatchJobItem.batch_job_id == job_id)
+            .order_by(BatchJobItem.line_number)
+        )
+        return list(result.scalars().all())
+
+
+# Global batch job service instance
+_batch_job_service = None
+
+def get_batch_job_service() -> BatchJobService:
+    """
+    Get the global batch job service.
+
+    Returns:
+        Singleton BatchJobService instance
+    """
+    global _batch_job_service
+    if _batch_job_service is None:
+        _batch_job_service = BatchJobService()
+    return _batch_job_service
+
+
+__all__ = [
+    'BatchJobService',
+    'BatchJobInputError',
+    'get_batch_job_service'
+]
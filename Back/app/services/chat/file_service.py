@@ -12,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ...models.user import User
 from ...models.file_upload import FileUpload
 from ...services.file_service import get_file_service
+from ..llm.prompt_cache import ATTACHED_FILES_HEADER, ATTACHED_FILES_FOOTER
 
 logger = logging.getLogger(__name__)
 
@@ -94,7 +95,7 @@ async def process_file_attachments(
         return ""
     
     # Combine all file contents with clear separation
-    full_context = "\\n\\n=== ATTACHED FILES ===\\n\\n" + "\\n\\n".join(file_context_parts) + "\\n\\n=== END ATTACHED FILES ===\\n"
+    full_context = f"\\n\\n{ATTACHED_FILES_HEADER}\\n\\n" + "\\n\\n".join(file_context_parts) + f"\\n\\n{ATTACHED_FILES_FOOTER}\\n"
     
     logger.info(f"✅ DEBUG: Generated file context - Parts: {len(file_context_parts)}, Total length: {len(full_context)}")
     
@@ -12,12 +12,16 @@ import logging
 # Setup logging for conversation service
 logger = logging.getLogger(__name__)
 
-from ..models.conversation import Conversation, ConversationMessage
+from ..models.conversation import Conversation, ConversationMessage, compute_content_hash
 from ..models.user import User
 from ..models.llm_config import LLMConfiguration
 from ..models.project import Project
 from ..core.database import get_async_db
 
+# Messages repeated within this window are treated as duplicates (retries, double submits)
+DUPLICATE_WINDOW = timedelta(minutes=5)
+
+
 class ConversationService:
     """Enhanced conversation service with atomic operations and duplicate prevention"""
     
@@ -168,18 +172,7 @@ class ConversationService:
             
             # 🔧 ENHANCED: Check for potential duplicate messages
             # Look for recent messages with same content and role in last 5 minutes
-            recent_time = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=5)
-            duplicate_check_stmt = select(ConversationMessage).where(
-                and_(
-                    ConversationMessage.conversation_id == conversation_id,
-                    ConversationMessage.role == role,
-                    ConversationMessage.content == content,
-                    ConversationMessage.created_at >= recent_time
-                )
-            ).order_by(desc(ConversationMessage.created_at)).limit(1)
-            
-            duplicate_result = await db.execute(duplicate_check_stmt)
-            existing_message = duplicate_result.scalar_one_or_none()
+            existing_message = await self._find_recent_duplicate(db, conversation_id, role, content)
             
             if existing_message:
                 logger.warning(f"Potential duplicate message detected for conversation {conversation_id}, returning existing message {existing_message.id}")
@@ -190,6 +183,7 @@ class ConversationService:
                 conversation_id=conversation_id,
                 role=role,
                 content=content,
+                content_hash=compute_content_hash(content),
                 model_used=model_used,
                 tokens_used=tokens_used,
                 cost=cost,
@@ -216,6 +210,107 @@ class ConversationService:
             logger.error(f"Failed to save message to conversation {conversation_id}: {e}")
             raise
     
+    async def save_message_exchange(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        messages: List[Dict[str, Any]]
+    ) -> List[ConversationMessage]:
+        """
+        Save several messages (e.g. a user turn and its reply) in one transaction.
+        
+        Either every message is written and the conversation stats updated,
+        or nothing is. Messages that duplicate a recent one are skipped, so
+        replaying the same exchange after a failed acknowledgement is safe.
+        
+        Args:
+            db: Database session
+            conversation_id: Conversation to append to
+            messages: Dicts with role, content and optional model_used,
+                tokens_used, cost, response_time_ms and metadata
+            
+        Returns:
+            The saved (or already existing) messages, in order
+        """
+        try:
+            stmt = select(Conversation).where(Conversation.id == conversation_id)
+            result = await db.execute(stmt)
+            conversation = result.scalar_one_or_none()
+            
+            if not conversation:
+                raise ValueError(f"Conversation {conversation_id} not found")
+            
+            saved: List[ConversationMessage] = []
+            added = 0
+            for msg in messages:
+                role = msg.get("role")
+                content = msg.get("content") or ""
+                if role not in ['user', 'assistant', 'system']:
+                    raise ValueError(f"Invalid role: {role}")
+                
+                existing_message = await self._find_recent_duplicate(db, conversation_id, role, content)
+                if existing_message:
+                    logger.info(f"Skipping duplicate {role} message for conversation {conversation_id} (existing message {existing_message.id})")
+                    saved.append(existing_message)
+                    continue
+                
+                metadata = msg.get("metadata")
+                message = ConversationMessage(
+                    conversation_id=conversation_id,
+                    role=role,
+                    content=content,
+                    content_hash=compute_content_hash(content),
+                    model_used=msg.get("model_used"),
+                    tokens_used=msg.get("tokens_used"),
+                    cost=msg.get("cost"),
+                    response_time_ms=msg.get("response_time_ms"),
+                    message_metadata=metadata if isinstance(metadata, dict) else {}
+                )
+                db.add(message)
+                saved.append(message)
+                added += 1
+            
+            if added:
+                conversation.message_count += added
+                conversation.last_message_at = datetime.utcnow()
+                conversation.updated_at = datetime.utcnow()
+            
+            await db.commit()
+            
+            logger.info(f"Saved {added} of {len(messages)} messages to conversation {conversation_id}")
+            return saved
+            
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Failed to save message exchange to conversation {conversation_id}: {e}")
+            raise
+    
+    async def _find_recent_duplicate(
+        self,
+        db: AsyncSession,
+        conversation_id: int,
+        role: str,
+        content: str
+    ) -> Optional[ConversationMessage]:
+        """
+        Find a message with the same role and content saved in the last few minutes.
+        
+        Compares the stored content hash, so this is a single probe of
+        idx_message_dedup however long the message is.
+        """
+        recent_time = datetime.utcnow().replace(microsecond=0) - DUPLICATE_WINDOW
+        stmt = select(ConversationMessage).where(
+            and_(
+                ConversationMessage.conversation_id == conversation_id,
+                ConversationMessage.role == role,
+                ConversationMessage.content_hash == compute_content_hash(content),
+                ConversationMessage.created_at >= recent_time
+            )
+        ).order_by(desc(ConversationMessage.created_at)).limit(1)
+        
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+    
     async def save_conversation_from_messages(
         self,
         db: AsyncSession,
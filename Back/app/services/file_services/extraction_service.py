@@ -18,22 +18,14 @@ This service implements the Strategy pattern for different file types:
 """
 
 import re
+from importlib.util import find_spec
 from io import BytesIO
 from typing import Tuple, Optional, Dict, Callable
 
-# Text extraction libraries (optional imports)
-try:
-    import PyPDF2
-    PDF_EXTRACTION_AVAILABLE = True
-except ImportError:
-    PDF_EXTRACTION_AVAILABLE = False
-
-try:
-    import docx2txt
-    from docx import Document as DocxDocument
-    DOCX_EXTRACTION_AVAILABLE = True
-except ImportError:
-    DOCX_EXTRACTION_AVAILABLE = False
+# Text extraction libraries (optional, imported on first extraction so
+# they stay off the startup path)
+PDF_EXTRACTION_AVAILABLE = find_spec("PyPDF2") is not None
+DOCX_EXTRACTION_AVAILABLE = find_spec("docx2txt") is not None and find_spec("docx") is not None
 
 # Internal imports
 from ...schemas.file_upload import AllowedFileType
@@ -150,6 +142,7 @@ class TextExtractionService:
             return "", "PDF text extraction not available (PyPDF2 not installed)"
         
         try:
+            import PyPDF2
             pdf_file = BytesIO(content_bytes)
             pdf_reader = PyPDF2.PdfReader(pdf_file)
             
@@ -240,6 +233,7 @@ class TextExtractionService:
     def _try_docx2txt_extraction(self, content_bytes: bytes) -> str:
         """Try extracting text using docx2txt library."""
         try:
+            import docx2txt
             docx_file = BytesIO(content_bytes)
             extracted_text = docx2txt.process(docx_file)
             return extracted_text if extracted_text else ""
@@ -250,6 +244,7 @@ class TextExtractionService:
     def _try_python_docx_extraction(self, content_bytes: bytes) -> str:
         """Try extracting text using python-docx library."""
         try:
+            from docx import Document as DocxDocument
             docx_file = BytesIO(content_bytes)
             doc = DocxDocument(docx_file)
             
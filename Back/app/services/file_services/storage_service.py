@@ -18,6 +18,7 @@ This service implements database-stored files rather than disk storage:
 - Follows integration guide's storage patterns
 """
 
+import asyncio
 import hashlib
 import os
 from datetime import datetime
@@ -108,10 +109,9 @@ class FileStorageService:
                 virtual_file_path=virtual_file_path
             )
             
-            # Save to database
-            db.add(file_record)
-            db.commit()
-            db.refresh(file_record)
+            # Save to database, in a worker thread: the commit can wait on the
+            # database write lock and must not block the event loop meanwhile
+            await asyncio.to_thread(self._save_record, db, file_record)
             
             return file_record, None
             
@@ -134,6 +134,13 @@ class FileStorageService:
     # FILE CONTENT OPERATIONS
     # =============================================================================
     
+    @staticmethod
+    def _save_record(db: Session, file_record: FileUpload) -> None:
+        """Insert and reload a file record (blocking; run in a worker thread)."""
+        db.add(file_record)
+        db.commit()
+        db.refresh(file_record)
+    
     async def _read_file_content_safely(self, file: UploadFile) -> bytes:
         """
         Read file content safely with size limits and error handling.
@@ -0,0 +1,248 @@
+# AI Dock Health Probe
+# Background readiness checks (database, pool headroom, event loop, write queues, providers) served from cache
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional
+
+from sqlalchemy import text
+
+from ..core.config import settings
+from ..core import database
+from ..core.metrics import READINESS, READINESS_CHECK_FAILURES, DB_PING_DURATION
+from .message_persistence_queue import get_message_persistence_queue
+from .llm.core.admission_controller import get_admission_controller
+
+logger = logging.getLogger(__name__)
+
+# Engines whose headroom does not decide readiness: the SQLite writer has a
+# single connection by design and its backlog is checked as queue depth
+_HEADROOM_EXEMPT_ENGINES = {"sqlite_writer"}
+
+
+class ReadinessProbe:
+    """
+    Decides whether this worker should receive traffic.
+
+    The checks run in a background task every `interval_seconds`; the
+    readiness endpoint only returns the last result, so a load balancer
+    polling it costs no database round trip and no pool connection.
+
+    Critical checks (a failing one makes the worker not ready):
+    - database: a SELECT 1 on the async pool answers within the ping timeout
+    - pool_headroom: every pool keeps at least `min_pool_headroom` of its
+      connections free
+    - event_loop: the probe's own sleep wakes up at most `max_loop_lag_ms` late
+    - write_queue: background writes waiting (SQLite writer plus queued
+      conversation turns) stay at or under `max_write_queue_depth`
+
+    The provider check only degrades the status: a configuration paused
+    after a 429 is paused for every worker sharing its API key, so taking
+    this worker out of rotation would not route around it.
+
+    A result older than two intervals plus the ping timeout means the probe
+    itself is not getting scheduled, and counts as not ready.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float = 2.0,
+        db_ping_timeout_seconds: float = 2.0,
+        min_pool_headroom: float = 0.1,
+        max_loop_lag_ms: float = 500.0,
+        max_write_queue_depth: int = 500
+    ):
+        self.interval = max(interval_seconds, 0.1)
+        self.db_ping_timeout = db_ping_timeout_seconds
+        self.min_pool_headroom = min_pool_headroom
+        self.max_loop_lag_ms = max_loop_lag_ms
+        self.max_write_queue_depth = max_write_queue_depth
+        self.started_at = time.time()
+        self.draining = False
+        self.loop_lag_ms = 0.0
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # =========================================================================
+    # CHECKS
+    # =========================================================================
+
+    async def _check_database(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            async def ping():
+                async with database.async_engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            await asyncio.wait_for(ping(), timeout=self.db_ping_timeout)
+        except Exception as e:
+            message = str(e).splitlines()[0] if str(e) else ""
+            return {"ok": False, "error": f"{type(e).__name__}: {message}" if message else type(e).__name__}
+        latency = time.perf_counter() - started
+        DB_PING_DURATION.observe(latency)
+        return {"ok": True, "latency_ms": round(latency * 1000, 1)}
+
+    def _check_pool_headroom(self) -> Dict[str, Any]:
+        pools = {}
+        ok = True
+        for engine_name, engine in database.ENGINES.items():
+            pool_size, max_overflow = database.POOL_LIMITS[engine_name]
+            capacity = pool_size + max_overflow
+            free = max(capacity - engine.pool.checkedout(), 0)
+            headroom = free / capacity if capacity else 1.0
+            pools[engine_name] = {"free": free, "capacity": capacity, "headroom": round(headroom, 2)}
+            if engine_name not in _HEADROOM_EXEMPT_ENGINES and headroom < self.min_pool_headroom:
+                ok = False
+        return {"ok": ok, "min_headroom": self.min_pool_headroom, "pools": pools}
+
+    def _check_event_loop(self) -> Dict[str, Any]:
+        return {
+            "ok": self.loop_lag_ms <= self.max_loop_lag_ms,
+            "lag_ms": round(self.loop_lag_ms, 1),
+            "max_lag_ms": self.max_loop_lag_ms
+        }
+
+    def _check_write_queue(self) -> Dict[str, Any]:
+        persistence = get_message_persistence_queue().get_stats()
+        sqlite_pending = database.sqlite_writer.pending if database.sqlite_writer is not None else 0
+        depth = sqlite_pending + persistence["pending"] + persistence["waiting_retry"]
+        return {
+            "ok": depth <= self.max_write_queue_depth,
+            "depth": depth,
+            "max_depth": self.max_write_queue_depth,
+            "sqlite_writer_pending": sqlite_pending,
+            "conversation_writes_pending": persistence["pending"],
+            "conversation_writes_waiting_retry": persistence["waiting_retry"],
+            "conversation_writer_running": persistence["worker_running"]
+        }
+
+    def _check_providers(self) -> Dict[str, Any]:
+        stats = get_admission_controller().get_stats()
+        paused = {
+            str(config_id): config["paused_for_seconds"]
+            for config_id, config in stats["configs"].items() if config["paused_for_seconds"] > 0
+        }
+        backed_off = {
+            str(config_id): config["concurrency_limit"]
+            for config_id, config in stats["configs"].items()
+            if config["concurrency_limit"] < config["max_concurrency"]
+        }
+        return {"ok": not paused, "paused_for_seconds": paused, "reduced_concurrency": backed_off}
+
+    async def check(self) -> Dict[str, Any]:
+        """Run every check once and cache the result."""
+        checks = {"database": await self._check_database()}
+        for name, run in (
+            ("pool_headroom", self._check_pool_headroom),
+            ("event_loop", self._check_event_loop),
+            ("write_queue", self._check_write_queue),
+            ("providers", self._check_providers),
+        ):
+            try:
+                checks[name] = run()
+            except Exception as e:
+                checks[name] = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+        failed = [name for name, result in checks.items() if not result["ok"]]
+        for name in failed:
+            READINESS_CHECK_FAILURES.inc(check=name)
+        ready = not any(name != "providers" for name in failed)
+
+        was_ready = self._result["ready"] if self._result is not None else None
+        if was_ready is not None and ready != was_ready:
+            if ready:
+                logger.info("🟢 Worker ready again")
+            else:
+                logger.warning(f"🔴 Worker not ready: {', '.join(failed)} failed")
+
+        self._result = {"ready": ready, "failed": failed, "checks": checks}
+        self._checked_at = time.time()
+        READINESS.set(1 if ready and not self.draining else 0)
+        return self._result
+
+    # =========================================================================
+    # RESULTS
+    # =========================================================================
+
+    def readiness(self) -> Dict[str, Any]:
+        """The cached readiness result; costs no I/O."""
+        if self.draining:
+            return {"ready": False, "status": "draining"}
+        if self._result is None:
+            return {"ready": False, "status": "starting"}
+
+        age = time.time() - self._checked_at
+        ready = self._result["ready"]
+        status = "ready" if ready else "not_ready"
+        if age > 2 * self.interval + self.db_ping_timeout:
+            ready, status = False, "stale"
+        elif ready and self._result["failed"]:
+            status = "degraded"
+        return {**self._result, "ready": ready, "status": status, "checked_seconds_ago": round(age, 1)}
+
+    def liveness(self) -> Dict[str, Any]:
+        """Answering at all is the signal: a wedged event loop cannot serve this."""
+        return {"alive": True, "uptime_seconds": round(time.time() - self.started_at, 1)}
+
+    # =========================================================================
+    # LIFECYCLE
+    # =========================================================================
+
+    async def start(self) -> None:
+        """Check once (so readiness is known before the first poll), then keep checking."""
+        self.draining = False
+        await self.check()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"🩺 Readiness probe started ({self.interval:g}s interval): "
+            f"{'ready' if self._result['ready'] else 'not ready'}"
+        )
+
+    async def stop(self) -> None:
+        """Report not ready from now on (shutdown drains traffic first) and stop checking."""
+        self.draining = True
+        READINESS.set(0)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.loop_lag_ms = max(loop.time() - started - self.interval, 0.0) * 1000
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Readiness check failed: {e}")
+
+
+_readiness_probe: Optional[ReadinessProbe] = None
+
+def get_readiness_probe() -> ReadinessProbe:
+    """
+    Get the global readiness probe instance.
+
+    Returns:
+        Singleton ReadinessProbe instance
+    """
+    global _readiness_probe
+    if _readiness_probe is None:
+        _readiness_probe = ReadinessProbe(
+            interval_seconds=settings.health_probe_interval_seconds,
+            db_ping_timeout_seconds=settings.health_db_ping_timeout_seconds,
+            min_pool_headroom=settings.health_min_pool_headroom,
+            max_loop_lag_ms=settings.health_max_loop_lag_ms,
+            max_write_queue_depth=settings.health_max_write_queue_depth
+        )
+    return _readiness_probe
+
+
+__all__ = ['ReadinessProbe', 'get_readiness_probe']
@@ -6,16 +6,41 @@ import asyncio
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import json
+import importlib
+import importlib.util
 from decimal import Decimal
 
-try:
-    import litellm
-    from litellm import get_model_cost_map
-    LITELLM_AVAILABLE = True
-except ImportError:
-    LITELLM_AVAILABLE = False
+# litellm takes seconds to import, so it is only looked up here and imported
+# on first use (or by preload_litellm() in the background after startup)
+LITELLM_AVAILABLE = importlib.util.find_spec("litellm") is not None
+if not LITELLM_AVAILABLE:
     logging.warning("LiteLLM not available - using fallback pricing")
 
+_litellm = None
+
+def _load_litellm():
+    """Import litellm once; every later call returns the loaded module."""
+    global _litellm
+    if _litellm is None:
+        _litellm = importlib.import_module("litellm")
+    return _litellm
+
+def preload_litellm() -> bool:
+    """
+    Import litellm ahead of the first pricing lookup.
+    
+    Meant for a worker thread at startup, so the first chat request does not
+    pay for the import. Returns whether litellm could be loaded.
+    """
+    if not LITELLM_AVAILABLE:
+        return False
+    try:
+        _load_litellm()
+        return True
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"LiteLLM preload failed: {e}")
+        return False
+
 from ..core.database import AsyncSessionLocal
 from ..models.llm_config import LLMConfiguration, LLMProvider
 
@@ -37,6 +62,7 @@ class LiteLLMPricingService:
         self.cache = {}
         self.cache_ttl = timedelta(hours=6)  # Cache pricing for 6 hours
         self.last_cache_update = {}
+        self.context_windows: Dict[str, Dict[str, int]] = {}
         
         if LITELLM_AVAILABLE:
             self.logger.info("LiteLLM pricing service initialized with real-time data")
@@ -59,7 +85,9 @@ class LiteLLMPricingService:
             
         Returns:
             Dict with input_cost_per_1k, output_cost_per_1k, and request_cost
+            (plus cache_read_cost_per_1k/cache_creation_cost_per_1k when known)
         """
+        provider = getattr(provider, "value", provider)  # Accept LLMProvider enums from config data
         cache_key = f"{provider}:{model}"
         
         # Check cache first (unless force refresh)
@@ -108,15 +136,21 @@ class LiteLLMPricingService:
             litellm_model = self._map_to_litellm_model(provider, model)
             
             # Get cost map from LiteLLM
-            cost_map = get_model_cost_map()
+            cost_map = self._get_cost_map()
             
             if litellm_model in cost_map:
                 model_costs = cost_map[litellm_model]
                 
+                # Prompt cache prices are only listed for models that support caching
+                cache_read_cost = model_costs.get("cache_read_input_token_cost")
+                cache_creation_cost = model_costs.get("cache_creation_input_token_cost")
+                
                 return {
                     "input_cost_per_1k": model_costs.get("input_cost_per_token", 0) * 1000,
                     "output_cost_per_1k": model_costs.get("output_cost_per_token", 0) * 1000,
-                    "request_cost": model_costs.get("request_cost", 0)
+                    "request_cost": model_costs.get("request_cost", 0),
+                    "cache_read_cost_per_1k": cache_read_cost * 1000 if cache_read_cost is not None else None,
+                    "cache_creation_cost_per_1k": cache_creation_cost * 1000 if cache_creation_cost is not None else None
                 }
             else:
                 self.logger.warning(f"Model {litellm_model} not found in LiteLLM cost map")
@@ -126,6 +160,75 @@ class LiteLLMPricingService:
             self.logger.error(f"LiteLLM API error: {str(e)}")
             return self._get_fallback_pricing(provider, model)
     
+    def _get_cost_map(self) -> Dict[str, Any]:
+        """
+        Get LiteLLM's model cost map (pricing and context window metadata).
+        
+        litellm.model_cost is loaded once at import; get_model_cost_map()
+        needs a URL and would fetch the map over the network.
+        """
+        return _load_litellm().model_cost
+    
+    # Context windows used when LiteLLM is unavailable or doesn't know the model
+    FALLBACK_CONTEXT_WINDOWS = [
+        # (model name fragment, max_input_tokens, max_output_tokens) - first match wins
+        ("gpt-4.1", 1047576, 32768),
+        ("gpt-4o", 128000, 16384),
+        ("gpt-4-turbo", 128000, 4096),
+        ("gpt-4-32k", 32768, 4096),
+        ("gpt-4", 8192, 4096),
+        ("gpt-3.5", 16385, 4096),
+        ("o1", 200000, 100000),
+        ("o3", 200000, 100000),
+        ("o4", 200000, 100000),
+        ("claude", 200000, 8192),
+        ("gemini", 1000000, 8192),
+    ]
+    DEFAULT_CONTEXT_WINDOW = (8192, 4096)
+    
+    def get_model_context_window(self, provider: Any, model: str) -> Dict[str, int]:
+        """
+        Get the context window limits for a model.
+        
+        Uses the max_input_tokens/max_output_tokens metadata in LiteLLM's cost
+        map, falling back to a small table of known model families.
+        
+        Args:
+            provider: Provider name or LLMProvider enum
+            model: Model name
+            
+        Returns:
+            Dict with max_input_tokens and max_output_tokens
+        """
+        provider = getattr(provider, "value", provider) or ""
+        cache_key = f"{provider}:{model}"
+        if cache_key in self.context_windows:
+            return self.context_windows[cache_key]
+        
+        window = None
+        if LITELLM_AVAILABLE:
+            try:
+                model_info = self._get_cost_map().get(self._map_to_litellm_model(provider, model or ""))
+                if model_info and (model_info.get("max_input_tokens") or model_info.get("max_tokens")):
+                    window = {
+                        "max_input_tokens": int(model_info.get("max_input_tokens") or model_info["max_tokens"]),
+                        "max_output_tokens": int(model_info.get("max_output_tokens") or model_info.get("max_tokens") or self.DEFAULT_CONTEXT_WINDOW[1])
+                    }
+            except Exception as e:
+                self.logger.warning(f"Failed to read context window for {provider}:{model} from LiteLLM: {str(e)}")
+        
+        if window is None:
+            model_lower = (model or "").lower()
+            max_input, max_output = next(
+                ((inp, out) for fragment, inp, out in self.FALLBACK_CONTEXT_WINDOWS if fragment in model_lower),
+                self.DEFAULT_CONTEXT_WINDOW
+            )
+            window = {"max_input_tokens": max_input, "max_output_tokens": max_output}
+        
+        # Model metadata doesn't change at runtime, so this never expires
+        self.context_windows[cache_key] = window
+        return window
+    
     def _map_to_litellm_model(self, provider: str, model: str) -> str:
         """
         Map our model names to LiteLLM format.
@@ -5,14 +5,16 @@
 from .llm_service import LLMService, get_llm_service
 
 # Data models
-from .models import ChatMessage, ChatRequest, ChatResponse, StreamingChunk
+from .models import ChatMessage, ChatRequest, ChatResponse, StreamingChunk, ProviderBatchStatus, BatchItemResult
 
 # Exceptions
 from .exceptions import (
     LLMServiceError,
     LLMProviderError,
     LLMConfigurationError,
+    LLMContextWindowError,
     LLMQuotaExceededError,
+    LLMAdmissionTimeoutError,
     LLMDepartmentQuotaExceededError,
     LLMUserNotFoundError,
     LLMStreamingError,
@@ -38,12 +40,15 @@ __all__ = [
     'ChatRequest', 
     'ChatResponse',
     'StreamingChunk',
+    'ProviderBatchStatus',
+    'BatchItemResult',
     
     # Exceptions
     'LLMServiceError',
     'LLMProviderError',
     'LLMConfigurationError',
     'LLMQuotaExceededError',
+    'LLMAdmissionTimeoutError',
     'LLMDepartmentQuotaExceededError',
     'LLMUserNotFoundError',
     'LLMStreamingError',
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from abc import ABC, abstractmethod
 
+from app.core.metrics import MODEL_CACHE_LOOKUPS
+
 logger = logging.getLogger(__name__)
 
 # =============================================================================
@@ -473,6 +475,7 @@ class ModelCacheManager:
         cache_key = self._generate_cache_key(config_id, show_all_models, extra_params)
         
         cached_data = await self.cache.get(cache_key)
+        MODEL_CACHE_LOOKUPS.inc(result="hit" if cached_data else "miss")
         
         if cached_data:
             logger.debug(f"Cache HIT for key '{cache_key}' (expires in {cached_data.time_until_expiry()})")
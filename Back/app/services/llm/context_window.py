@@ -0,0 +1,381 @@
+# AI Dock LLM Context Window Manager
+# Keeps each request's input tokens within the model's context window
+
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable
+from abc import ABC, abstractmethod
+
+from ...core.config import settings
+from ..litellm_pricing_service import get_pricing_service
+from .exceptions import LLMContextWindowError
+from .models import ChatMessage, ChatRequest
+from .tokenizer import get_tokenizer_service
+
+logger = logging.getLogger(__name__)
+
+# Prepended to the rolling summary that replaces trimmed turns
+SUMMARY_HEADER = (
+    "Summary of earlier messages in this conversation "
+    "(older turns were condensed to fit the context window):"
+)
+
+# Share of the model window kept free to absorb tokenizer estimation error
+CONTEXT_SAFETY_MARGIN = 0.05
+
+# =============================================================================
+# SUMMARIZERS
+# =============================================================================
+
+class SummarizerInterface(ABC):
+    """
+    Abstract interface for condensing trimmed conversation turns.
+
+    Summaries are rolling: each call extends the previous summary with the
+    newly trimmed messages instead of re-reading the whole conversation.
+    """
+
+    @abstractmethod
+    def summarize(
+        self,
+        previous_summary: str,
+        messages: List[ChatMessage],
+        max_tokens: int,
+        count_tokens: Callable[[str], int]
+    ) -> str:
+        """
+        Extend a summary with newly trimmed messages.
+
+        Args:
+            previous_summary: Summary of messages trimmed earlier ("" if none)
+            messages: Messages being trimmed now, oldest first
+            max_tokens: Token budget for the returned summary
+            count_tokens: Token counter for the target model
+
+        Returns:
+            New summary text
+        """
+        pass
+
+
+class ExtractiveSummarizer(SummarizerInterface):
+    """
+    Keeps the opening of each trimmed message, newest lines first to survive.
+
+    Deterministic and free (no extra LLM call), so it can run inline on
+    every request; the same inputs always produce the same summary, which
+    keeps the prompt prefix stable for provider prompt caching.
+    """
+
+    def __init__(self, chars_per_message: int = 300):
+        """
+        Initialize the summarizer.
+
+        Args:
+            chars_per_message: How much of each trimmed message to keep
+        """
+        self.chars_per_message = chars_per_message
+
+    def summarize(
+        self,
+        previous_summary: str,
+        messages: List[ChatMessage],
+        max_tokens: int,
+        count_tokens: Callable[[str], int]
+    ) -> str:
+        lines = previous_summary.splitlines() if previous_summary else []
+        for message in messages:
+            text = " ".join((message.content or "").split())
+            if len(text) > self.chars_per_message:
+                text = text[:self.chars_per_message].rstrip() + "…"
+            if text:
+                lines.append(f"- {message.role}: {text}")
+
+        # Drop the oldest lines until the summary fits its budget
+        line_tokens = [count_tokens(line) + 1 for line in lines]
+        total = sum(line_tokens)
+        start = 0
+        while start < len(lines) - 1 and total > max_tokens:
+            total -= line_tokens[start]
+            start += 1
+        return "\n".join(lines[start:])
+
+
+# =============================================================================
+# CONTEXT WINDOW MANAGER
+# =============================================================================
+
+@dataclass
+class ConversationContextState:
+    """Rolling summary of the leading history messages of one conversation."""
+    summarized_count: int
+    history_digest: str
+    summary: str
+    updated_at: datetime
+
+
+class ContextWindowManager:
+    """
+    Fits chat requests into the model's context window.
+
+    Single Responsibility:
+    - Compute the input token budget per model (LiteLLM window metadata,
+      reserved output tokens, configured per-turn cap)
+    - Keep system/assistant prompts and the current user turn pinned
+    - Fold the oldest turns into a rolling summary when over budget
+    - Cache summaries per conversation id so later turns reuse them
+
+    Trimming goes down to a target well below the budget, and a cached
+    summary is reused until the conversation outgrows it again, so the
+    trimmed prefix stays identical across turns instead of shifting by one
+    message every request.
+    """
+
+    def __init__(self, summarizer: Optional[SummarizerInterface] = None, max_conversations: int = 1000):
+        """
+        Initialize the context window manager.
+
+        Args:
+            summarizer: Summarizer for trimmed turns (extractive by default)
+            max_conversations: Number of conversation summaries to keep
+        """
+        self.logger = logging.getLogger(__name__)
+        self.summarizer = summarizer or ExtractiveSummarizer()
+        self.tokenizer_service = get_tokenizer_service()
+        self.pricing_service = get_pricing_service()
+        self._states: "OrderedDict[int, ConversationContextState]" = OrderedDict()
+        self._max_conversations = max_conversations
+        self._stats = {"requests": 0, "trimmed_requests": 0, "summary_reuses": 0}
+
+    def get_input_budget(self, config_data: Dict[str, Any], model: Optional[str], max_tokens: Optional[int]) -> int:
+        """
+        Get the maximum input tokens for a request.
+
+        Args:
+            config_data: Configuration data
+            model: Model that will serve the request
+            max_tokens: Requested output tokens (reserved out of the window)
+
+        Returns:
+            Input token budget
+        """
+        window = self.pricing_service.get_model_context_window(config_data.get('provider'), model)
+        model_params = config_data.get('model_parameters') or {}
+        reserved_output = max_tokens or model_params.get('max_tokens') or min(window['max_output_tokens'], 4096)
+
+        budget = int(window['max_input_tokens'] * (1 - CONTEXT_SAFETY_MARGIN)) - reserved_output
+        if settings.context_max_input_tokens:
+            budget = min(budget, settings.context_max_input_tokens)
+        return max(budget, 1)
+
+    def fit_request(
+        self,
+        chat_request: ChatRequest,
+        config_data: Dict[str, Any],
+        conversation_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Trim/summarize older turns of a request in place so it fits its budget.
+
+        Args:
+            chat_request: Prepared chat request (messages replaced if trimmed)
+            config_data: Configuration data
+            conversation_id: Conversation the request belongs to, for summary reuse
+
+        Returns:
+            Dictionary describing what was done (for logging)
+
+        Raises:
+            LLMContextWindowError: If the request cannot fit even with all older turns dropped
+        """
+        if not settings.context_window_enabled or not chat_request.messages:
+            return {"trimmed": False}
+
+        self._stats["requests"] += 1
+        provider = config_data.get('provider')
+        model = chat_request.model or config_data.get('default_model')
+        tokenizer = self.tokenizer_service.get_tokenizer(provider, model)
+        budget = self.get_input_budget(config_data, model, chat_request.max_tokens)
+
+        def count(messages: List[ChatMessage]) -> int:
+            return self.tokenizer_service.count_messages(messages, provider, model)
+
+        messages = chat_request.messages
+        input_tokens = count(messages)
+
+        # Pinned: system/assistant prompts and the current user turn
+        last_user = max((i for i, msg in enumerate(messages) if msg.role == "user"), default=len(messages) - 1)
+        system = [msg for msg in messages[:last_user] if msg.role == "system"]
+        history = [msg for msg in messages[:last_user] if msg.role != "system"]
+        current_turn = messages[last_user:]
+
+        state = self._get_state(conversation_id, history)
+        if state is None and input_tokens <= budget:
+            return {"trimmed": False, "input_tokens": input_tokens, "budget": budget}
+
+        def build(summary: str, kept: List[ChatMessage]) -> List[ChatMessage]:
+            summary_messages = [ChatMessage("system", f"{SUMMARY_HEADER}\n{summary}")] if summary else []
+            return system + summary_messages + kept + current_turn
+
+        # Reuse the cached summary while the conversation still fits with it
+        if state is not None:
+            candidate = build(state.summary, history[state.summarized_count:])
+            candidate_tokens = count(candidate)
+            if candidate_tokens <= budget:
+                chat_request.messages = candidate
+                self._stats["summary_reuses"] += 1
+                return {
+                    "trimmed": True,
+                    "summary_reused": True,
+                    "summarized_messages": state.summarized_count,
+                    "input_tokens_before": input_tokens,
+                    "input_tokens": candidate_tokens,
+                    "budget": budget
+                }
+
+        # Fold the oldest history into the summary until we're at the target
+        start = state.summarized_count if state else 0
+        summary = state.summary if state else ""
+        target = int(budget * settings.context_trim_target_ratio)
+
+        # The summary is reserved inside the budget: it only gets what the
+        # pinned prompts and the current turn leave free
+        fixed_tokens = count(system + current_turn)
+        if fixed_tokens > budget:
+            raise LLMContextWindowError(
+                f"The system prompt and current message use {fixed_tokens} input tokens, "
+                f"over the limit of {budget} for this model. Shorten the message or attachments.",
+                input_tokens=fixed_tokens,
+                budget=budget
+            )
+        header_tokens = self.tokenizer_service.count_message(ChatMessage("system", f"{SUMMARY_HEADER}\n"), tokenizer)
+        summary_budget = min(settings.context_summary_max_tokens, max(budget - fixed_tokens - header_tokens, 0))
+
+        history_tokens = [self.tokenizer_service.count_message(msg, tokenizer) for msg in history]
+        pinned_tokens = fixed_tokens + (header_tokens + summary_budget if summary_budget else 0)
+        remaining = sum(history_tokens[start:])
+        cut = start
+        while cut < len(history) and pinned_tokens + remaining > target:
+            remaining -= history_tokens[cut]
+            cut += 1
+        # Kept history starts on a user turn (some providers require it)
+        while cut < len(history) and history[cut].role != "user":
+            remaining -= history_tokens[cut]
+            cut += 1
+
+        if not summary_budget:
+            summary = ""
+        elif cut > start:
+            summary = self.summarizer.summarize(
+                summary,
+                history[start:cut],
+                summary_budget,
+                lambda text: self.tokenizer_service.count_text(text, provider, model)
+            )
+
+        chat_request.messages = build(summary, history[cut:])
+        output_tokens = count(chat_request.messages)
+        if output_tokens > budget and summary:
+            # The summarizer overshot its share (it always keeps one line); drop it
+            summary = ""
+            chat_request.messages = build(summary, history[cut:])
+            output_tokens = count(chat_request.messages)
+        if output_tokens > budget:
+            raise LLMContextWindowError(
+                f"This request needs {output_tokens} input tokens even after trimming the "
+                f"conversation history, over the limit of {budget} for this model.",
+                input_tokens=output_tokens,
+                budget=budget
+            )
+        self._store_state(conversation_id, history[:cut], summary)
+        self._stats["trimmed_requests"] += 1
+
+        self.logger.info(
+            f"✂️ Trimmed conversation {conversation_id}: {cut} older messages summarized, "
+            f"{input_tokens} → {output_tokens} input tokens (budget {budget})"
+        )
+
+        return {
+            "trimmed": True,
+            "summary_reused": False,
+            "summarized_messages": cut,
+            "input_tokens_before": input_tokens,
+            "input_tokens": output_tokens,
+            "budget": budget
+        }
+
+    # =========================================================================
+    # CONVERSATION SUMMARY CACHE
+    # =========================================================================
+
+    @staticmethod
+    def _digest(messages: List[ChatMessage]) -> str:
+        """Digest of the messages a summary covers."""
+        digest = hashlib.blake2b(digest_size=16)
+        for message in messages:
+            digest.update(f"{message.role}\x00{message.content}\x01".encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def _get_state(self, conversation_id: Optional[int], history: List[ChatMessage]) -> Optional[ConversationContextState]:
+        """Get the cached summary if it still matches the start of this history."""
+        if conversation_id is None:
+            return None
+        state = self._states.get(conversation_id)
+        if state is None:
+            return None
+        if state.summarized_count > len(history) or self._digest(history[:state.summarized_count]) != state.history_digest:
+            # History was edited/branched; the summary no longer applies
+            del self._states[conversation_id]
+            return None
+        self._states.move_to_end(conversation_id)
+        return state
+
+    def _store_state(self, conversation_id: Optional[int], summarized: List[ChatMessage], summary: str) -> None:
+        """Remember the rolling summary for a conversation."""
+        if conversation_id is None or not summarized:
+            return
+        self._states[conversation_id] = ConversationContextState(
+            summarized_count=len(summarized),
+            history_digest=self._digest(summarized),
+            summary=summary,
+            updated_at=datetime.utcnow()
+        )
+        self._states.move_to_end(conversation_id)
+        while len(self._states) > self._max_conversations:
+            self._states.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get context window statistics."""
+        return {
+            **self._stats,
+            "cached_summaries": len(self._states),
+            "max_conversations": self._max_conversations
+        }
+
+
+# Global context window manager instance
+_context_window_manager: Optional[ContextWindowManager] = None
+
+def get_context_window_manager() -> ContextWindowManager:
+    """
+    Get the global context window manager instance.
+
+    Returns:
+        Singleton ContextWindowManager instance
+    """
+    global _context_window_manager
+    if _context_window_manager is None:
+        _context_window_manager = ContextWindowManager()
+    return _context_window_manager
+
+
+__all__ = [
+    'SummarizerInterface',
+    'ExtractiveSummarizer',
+    'ConversationContextState',
+    'ContextWindowManager',
+    'get_context_window_manager'
+]
@@ -4,6 +4,9 @@
 from .config_validator import ConfigValidator, get_config_validator
 from .cost_calculator import CostCalculator, get_cost_calculator
 from .response_formatter import ResponseFormatter, get_response_formatter
+from .request_coalescer import RequestCoalescer, get_request_coalescer
+from .priority_lanes import RequestPriority, PriorityLanes, get_priority_lanes
+from .admission_controller import AdmissionController, get_admission_controller
 from .orchestrator import LLMOrchestrator, get_llm_orchestrator
 
 __all__ = [
@@ -13,6 +16,13 @@ __all__ = [
     'get_cost_calculator',
     'ResponseFormatter',
     'get_response_formatter',
+    'RequestCoalescer',
+    'get_request_coalescer',
+    'RequestPriority',
+    'PriorityLanes',
+    'get_priority_lanes',
+    'AdmissionController',
+    'get_admission_controller',
     'LLMOrchestrator',
     'get_llm_orchestrator'
 ]
@@ -0,0 +1,500 @@
+# AI Dock LLM Admission Controller
+# Limits concurrent upstream calls and token throughput per LLM configuration,
+# serving priority lanes in order and sharing each lane fairly between departments
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Mapping
+
+from ..exceptions import LLMAdmissionTimeoutError
+from .priority_lanes import RequestPriority, PriorityLanes, get_priority_lanes
+
+
+# =============================================================================
+# RATE LIMIT HEADERS
+# =============================================================================
+
+# (limit, remaining) header pairs for tokens and requests, per provider
+_TOKEN_HEADERS = [
+    ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens"),            # OpenAI
+    ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining"),  # Anthropic
+]
+_REQUEST_HEADERS = [
+    ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests"),
+    ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining"),
+]
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Seconds to back off after a 429, from retry-after-ms or retry-after.
+
+    Args:
+        headers: Response headers (case-insensitive mapping)
+
+    Returns:
+        Seconds, or None if the provider did not say
+    """
+    retry_ms = _header_number(headers, "retry-after-ms")
+    if retry_ms is not None:
+        return retry_ms / 1000.0
+    return _header_number(headers, "retry-after")
+
+
+# =============================================================================
+# BUDGETS AND TICKETS
+# =============================================================================
+
+# How often held batch calls re-check whether interactive latency recovered
+BATCH_HOLD_RECHECK_SECONDS = 1.0
+
+
+class TokenBucket:
+    """Per-minute budget that refills continuously (limit / 60 per second)."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self._clock = clock
+        self.per_minute = per_minute
+        self.available = per_minute
+        self._updated = clock()
+
+    def refill(self) -> None:
+        now = self._clock()
+        self.available = min(self.per_minute, self.available + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+    def set_limit(self, per_minute: float, remaining: Optional[float]) -> None:
+        """Adopt the limit (and remaining amount) reported by the provider."""
+        self.refill()
+        self.per_minute = per_minute
+        self.available = min(self.available if remaining is None else remaining, per_minute)
+
+    def seconds_until(self, amount: float) -> float:
+        """Seconds until ``amount`` is available (after refilling)."""
+        self.refill()
+        missing = min(amount, self.per_minute) - self.available
+        return max(missing * 60.0 / self.per_minute, 0.0) if self.per_minute else 0.0
+
+
+@dataclass
+class AdmissionTicket:
+    """Permission to make one upstream call; release it when the call ends."""
+    config_id: int
+    department_id: Optional[int]
+    reserved_tokens: int
+    priority: RequestPriority = RequestPriority.INTERACTIVE
+    queue_wait_ms: int = 0
+    released: bool = False
+
+
+@dataclass(order=True)
+class _Waiter:
+    rank: int
+    finish_tag: float
+    seq: int
+    ticket: AdmissionTicket = field(compare=False)
+    start_tag: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class ConfigCapacity:
+    """
+    Admission state of one LLM configuration (one API key).
+
+    - Concurrency: adaptive limit between 1 and the configured maximum;
+      halved on every 429, grown by about one slot per window of successes
+    - Tokens and requests per minute: token buckets, seeded from the
+      configuration's rate_limit_tpm/rpm and corrected by the limits and
+      remaining amounts the provider reports on every response
+    - Waiters are served by priority lane first (interactive, background,
+      batch); lower lanes may only fill their share of the slots
+    - Within a lane, waiters are ordered by start-time fair queueing: each
+      department's requests get virtual finish tags spaced by tokens / weight,
+      so a department sending a burst only delays its own later requests
+    """
+
+    def __init__(
+        self,
+        config_id: int,
+        max_concurrency: int,
+        lanes: Optional[PriorityLanes] = None,
+        clock=time.monotonic
+    ):
+        self.config_id = config_id
+        self.lanes = lanes
+        self._clock = clock
+        self.max_concurrency = max(max_concurrency, 1)
+        self.concurrency_limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.tokens: Optional[TokenBucket] = None
+        self.requests: Optional[TokenBucket] = None
+        self.blocked_until = 0.0
+
+        self.waiters: List[_Waiter] = []
+        self.virtual_time = 0.0
+        self.last_finish: Dict[Optional[int], float] = {}
+        self.wake_handle: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = 0
+        self.rate_limited = 0
+        self.total_wait_ms = 0
+
+    def seed_limits(self, rpm: Optional[int], tpm: Optional[int]) -> None:
+        """Use the configured limits until the provider reports its own."""
+        if tpm and self.tokens is None:
+            self.tokens = TokenBucket(tpm, self._clock)
+        if rpm and self.requests is None:
+            self.requests = TokenBucket(rpm, self._clock)
+
+    def delay_for(self, tokens: int, priority: RequestPriority = RequestPriority.INTERACTIVE) -> Optional[float]:
+        """
+        Seconds until a request of ``tokens`` could start.
+
+        Returns:
+            0 if it can start now, a delay if only time is missing, or None if
+            it is waiting for a concurrency slot (released by another call)
+        """
+        slots = int(self.concurrency_limit)
+        if self.lanes is not None:
+            slots = self.lanes.lane_limit(priority, slots)
+        if self.in_flight >= slots:
+            return None
+        delay = max(self.blocked_until - self._clock(), 0.0)
+        if priority is RequestPriority.BATCH and self.lanes is not None and self.lanes.is_batch_held():
+            delay = max(delay, BATCH_HOLD_RECHECK_SECONDS)
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.seconds_until(tokens))
+        if self.requests is not None:
+            delay = max(delay, self.requests.seconds_until(1))
+        return delay
+
+    def take(self, ticket: AdmissionTicket) -> None:
+        self.in_flight += 1
+        self.admitted += 1
+        if self.tokens is not None:
+            self.tokens.available -= min(ticket.reserved_tokens, self.tokens.per_minute)
+        if self.requests is not None:
+            self.requests.available -= 1
+
+    def tag(self, department_id: Optional[int], tokens: int, weight: float):
+        """Start and finish tags for a new waiter of this department."""
+        start = max(self.virtual_time, self.last_finish.get(department_id, 0.0))
+        finish = start + max(tokens, 1) / max(weight, 0.01)
+        self.last_finish[department_id] = finish
+        return start, finish
+
+
+# =============================================================================
+# ADMISSION CONTROLLER
+# =============================================================================
+
+class AdmissionController:
+    """
+    Gatekeeper for upstream LLM calls, one ConfigCapacity per configuration.
+
+    Single Responsibility:
+    - Admit a call immediately when its configuration has capacity
+    - Otherwise queue it fairly across departments until capacity frees up
+      (a call ends, budgets refill or a rate-limit back-off expires)
+    - Learn each API key's limits from the provider's rate-limit headers
+
+    Capacity is tracked per worker process; the remaining amounts reported by
+    the provider keep workers that share a key from overshooting for long.
+    """
+
+    def __init__(
+        self,
+        max_concurrency_per_config: int = 16,
+        queue_timeout_seconds: float = 60.0,
+        enabled: bool = True,
+        lanes: Optional[PriorityLanes] = None,
+        clock=time.monotonic
+    ):
+        """
+        Initialize the admission controller.
+
+        Args:
+            max_concurrency_per_config: Upper bound for concurrent calls per configuration
+            queue_timeout_seconds: How long a call may wait before it is rejected
+            enabled: If False, every call is admitted immediately
+            lanes: Priority lane policy (None = every call is interactive)
+            clock: Monotonic clock in seconds
+        """
+        self.max_concurrency_per_config = max_concurrency_per_config
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.enabled = enabled
+        self.lanes = lanes
+        self._clock = clock
+        self._capacities: Dict[int, ConfigCapacity] = {}
+        self._seq = itertools.count()
+        self.logger = logging.getLogger(__name__)
+
+    def _capacity(self, config_id: int) -> ConfigCapacity:
+        capacity = self._capacities.get(config_id)
+        if capacity is None:
+            capacity = ConfigCapacity(config_id, self.max_concurrency_per_config, self.lanes, self._clock)
+            self._capacities[config_id] = capacity
+        return capacity
+
+    # =========================================================================
+    # ACQUIRE / RELEASE
+    # =========================================================================
+
+    async def acquire(
+        self,
+        config_id: int,
+        department_id: Optional[int],
+        estimated_tokens: int,
+        weight: float = 1.0,
+        rate_limit_rpm: Optional[int] = None,
+        rate_limit_tpm: Optional[int] = None,
+        priority: RequestPriority = RequestPriority.INTERACTIVE
+    ) -> AdmissionTicket:
+        """
+        Wait for permission to call the provider behind ``config_id``.
+
+        Args:
+            config_id: LLM configuration the call goes to
+            department_id: Department the call is accounted to (fair share unit)
+            estimated_tokens: Prompt tokens plus the maximum completion tokens
+            weight: Department's share of the capacity relative to others
+            rate_limit_rpm: Configured requests-per-minute limit (optional)
+            rate_limit_tpm: Configured tokens-per-minute limit (optional)
+            priority: Lane of the request (interactive goes first)
+
+        Returns:
+            AdmissionTicket (pass it to release() when the call ends)
+
+        Raises:
+            LLMAdmissionTimeoutError: If no capacity freed up within the queue timeout
+        """
+        ticket = AdmissionTicket(config_id, department_id, max(estimated_tokens, 0), priority)
+        if not self.enabled:
+            return ticket
+
+        capacity = self._capacity(config_id)
+        capacity.seed_limits(rate_limit_rpm, rate_limit_tpm)
+
+        # Fast path: nobody is waiting and there is room right now
+        if not capacity.waiters and capacity.delay_for(ticket.reserved_tokens, priority) == 0:
+            capacity.take(ticket)
+            return ticket
+
+        start, finish = capacity.tag(department_id, ticket.reserved_tokens, weight)
+        waiter = _Waiter(
+            rank=priority.rank, finish_tag=finish, seq=next(self._seq), ticket=ticket, start_tag=start,
+            future=asyncio.get_running_loop().create_future(), enqueued_at=self._clock()
+        )
+        heapq.heappush(capacity.waiters, waiter)
+        self._dispatch(capacity)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            queued = len(capacity.waiters)
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as we gave up: hand the slot back
+                self.release(ticket)
+            else:
+                waiter.future.cancel()
+                capacity.waiters.remove(waiter)
+                heapq.heapify(capacity.waiters)
+                self._dispatch(capacity)
+            if isinstance(e, asyncio.TimeoutError):
+                raise LLMAdmissionTimeoutError(
+                    f"No provider capacity within {self.queue_timeout_seconds:g}s "
+                    f"({queued} requests queued for this configuration)",
+                    config_id=config_id
+                )
+            raise
+
+        ticket.queue_wait_ms = int((self._clock() - waiter.enqueued_at) * 1000)
+        capacity.total_wait_ms += ticket.queue_wait_ms
+        return ticket
+
+    def release(self, ticket: Optional[AdmissionTicket], actual_tokens: Optional[int] = None) -> None:
+        """
+        Return a ticket's slot once its upstream call has ended.
+
+        Args:
+            ticket: Ticket from acquire() (None is ignored)
+            actual_tokens: Tokens the call really used; the unused part of the
+                reservation goes back into the budget
+        """
+        if ticket is None or ticket.released or not self.enabled:
+            return
+        ticket.released = True
+
+        capacity = self._capacity(ticket.config_id)
+        capacity.in_flight = max(capacity.in_flight - 1, 0)
+        if capacity.tokens is not None and actual_tokens is not None:
+            unused = min(ticket.reserved_tokens, capacity.tokens.per_minute) - actual_tokens
+            capacity.tokens.available = min(capacity.tokens.available + unused, capacity.tokens.per_minute)
+        if capacity.concurrency_limit < capacity.max_concurrency:
+            # Additive increase: about one extra slot per full window of successes
+            capacity.concurrency_limit = min(
+                capacity.concurrency_limit + 1.0 / capacity.concurrency_limit, capacity.max_concurrency
+            )
+        self._dispatch(capacity)
+
+    # =========================================================================
+    # LEARNING FROM THE PROVIDER
+    # =========================================================================
+
+    def observe_rate_limits(self, config_id: Optional[int], status_code: int, headers: Mapping[str, str]) -> None:
+        """
+        Update a configuration's budgets from a provider response.
+
+        Args:
+            config_id: Configuration the response belongs to
+            status_code: HTTP status of the response
+            headers: Response headers (case-insensitive mapping)
+        """
+        if config_id is None or not self.enabled:
+            return
+        capacity = self._capacity(config_id)
+
+        for limit_header, remaining_header in _TOKEN_HEADERS:
+            limit = _header_number(headers, limit_header)
+            if limit:
+                if capacity.tokens is None:
+                    capacity.tokens = TokenBucket(limit, self._clock)
+                capacity.tokens.set_limit(limit, _header_number(headers, remaining_header))
+                break
+        for limit_header, remaining_header in _REQUEST_HEADERS:
+            limit = _header_number(headers, limit_header)
+            if limit:
+                if capacity.requests is None:
+                    capacity.requests = TokenBucket(limit, self._clock)
+                capacity.requests.set_limit(limit, _header_number(headers, remaining_header))
+                break
+
+        if status_code == 429:
+            retry_after = parse_retry_after(headers) or 1.0
+            capacity.blocked_until = max(capacity.blocked_until, self._clock() + retry_after)
+            # Multiplicative decrease: the key is saturated, so run fewer calls at once
+            capacity.concurrency_limit = max(capacity.concurrency_limit / 2.0, 1.0)
+            capacity.rate_limited += 1
+            self.logger.warning(
+                f"⏳ Config {config_id} rate limited: pausing {retry_after:.1f}s, "
+                f"concurrency limit now {int(capacity.concurrency_limit)}"
+            )
+
+    # =========================================================================
+    # SCHEDULING
+    # =========================================================================
+
+    def _dispatch(self, capacity: ConfigCapacity) -> None:
+        """
+        Admit queued calls in lane and fair order while the configuration has capacity.
+
+        The head is the best waiter of the highest waiting lane. When it
+        cannot start, nothing behind it starts either: lower lanes only get a
+        smaller share, so they could not start in its place.
+        """
+        while capacity.waiters:
+            head = capacity.waiters[0]
+            if head.future.done():
+                heapq.heappop(capacity.waiters)
+                continue
+            delay = capacity.delay_for(head.ticket.reserved_tokens, head.ticket.priority)
+            if delay is None:
+                return  # Woken again by the next release()
+            if delay > 0:
+                self._wake_later(capacity, delay)
+                return
+            heapq.heappop(capacity.waiters)
+            capacity.virtual_time = max(capacity.virtual_time, head.start_tag)
+            capacity.take(head.ticket)
+            head.future.set_result(True)
+
+        if not capacity.waiters:
+            # Idle again: let virtual time restart so old tags do not pile up
+            capacity.last_finish.clear()
+            capacity.virtual_time = 0.0
+
+    def _wake_later(self, capacity: ConfigCapacity, delay: float) -> None:
+        if capacity.wake_handle is not None:
+            capacity.wake_handle.cancel()
+        loop = asyncio.get_running_loop()
+        capacity.wake_handle = loop.call_later(delay, self._dispatch, capacity)
+
+    # =========================================================================
+    # STATISTICS
+    # =========================================================================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get admission statistics per configuration."""
+        configs = {}
+        now = self._clock()
+        for config_id, capacity in self._capacities.items():
+            queued = [waiter for waiter in capacity.waiters if not waiter.future.done()]
+            if capacity.tokens is not None:
+                capacity.tokens.refill()
+            configs[config_id] = {
+                "in_flight": capacity.in_flight,
+                "queued": len(queued),
+                "queued_by_lane": {
+                    lane.value: sum(1 for waiter in queued if waiter.ticket.priority is lane)
+                    for lane in RequestPriority
+                },
+                "concurrency_limit": int(capacity.concurrency_limit),
+                "max_concurrency": capacity.max_concurrency,
+                "paused_for_seconds": round(max(capacity.blocked_until - now, 0.0), 1),
+                "tpm_limit": capacity.tokens.per_minute if capacity.tokens else None,
+                "tokens_available": int(capacity.tokens.available) if capacity.tokens else None,
+                "rpm_limit": capacity.requests.per_minute if capacity.requests else None,
+                "admitted": capacity.admitted,
+                "rate_limited": capacity.rate_limited,
+                "avg_queue_wait_ms": int(capacity.total_wait_ms / capacity.admitted) if capacity.admitted else 0
+            }
+        return {
+            "enabled": self.enabled,
+            "configs": configs,
+            "lanes": self.lanes.get_stats() if self.lanes is not None else None
+        }
+
+
+# Global admission controller instance (shared by all handlers in this worker)
+_admission_controller = None
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Get the global admission controller instance.
+
+    Returns:
+        Singleton AdmissionController instance
+    """
+    global _admission_controller
+    if _admission_controller is None:
+        from app.core.config import settings
+        _admission_controller = AdmissionController(
+            max_concurrency_per_config=settings.admission_max_concurrency_per_config,
+            queue_timeout_seconds=settings.admission_queue_timeout_seconds,
+            enabled=settings.admission_control_enabled,
+            lanes=get_priority_lanes()
+        )
+    return _admission_controller
+
+
+__all__ = [
+    'AdmissionTicket',
+    'AdmissionController',
+    'parse_retry_after',
+    'get_admission_controller'
+]
@@ -37,6 +37,13 @@ class ConfigValidator:
         Raises:
             LLMServiceError: If configuration not found or not active
         """
+        return self.load_and_validate_config(config_id, db_session)
+    
+    def load_and_validate_config(self, config_id: int, db_session: Session) -> Dict[str, Any]:
+        """
+        Synchronous body of get_and_validate_config, for callers that run
+        their database work in a worker thread.
+        """
         self.logger.debug(f"Validating LLM configuration {config_id}")
         
         # Query configuration from database
@@ -81,6 +88,8 @@ class ConfigValidator:
             'cost_per_1k_output_tokens': config.cost_per_1k_output_tokens,
             'cost_per_request': config.cost_per_request,
             'custom_headers': config.custom_headers,
+            'rate_limit_rpm': config.rate_limit_rpm,
+            'rate_limit_tpm': config.rate_limit_tpm,
             'is_active': config.is_active,
             'updated_at': config.updated_at
         }
@@ -5,6 +5,8 @@ from typing import Dict, Any, Optional, List
 import logging
 
 from ..models import ChatRequest, ChatResponse
+from ..prompt_cache import cached_token_cost_adjustment
+from ..tokenizer import get_tokenizer_service
 from ...litellm_pricing_service import get_pricing_service
 
 
@@ -16,6 +18,7 @@ class CostCalculator:
     - Estimate costs before requests
     - Calculate actual costs from responses
     - Handle different pricing models (per-token, per-request)
+    - Price prompt-cache reads/writes at their discounted/premium rates
     """
     
     def __init__(self):
@@ -49,7 +52,11 @@ class CostCalculator:
             
             # Estimate input tokens (rough estimation)
             if cost_per_1k_input:
-                estimated_input_tokens = self._estimate_input_tokens(request.messages)
+                estimated_input_tokens = self._estimate_input_tokens(
+                    request.messages,
+                    config_data.get('provider'),
+                    request.model or config_data.get('default_model')
+                )
                 input_cost = (estimated_input_tokens / 1000) * float(cost_per_1k_input)
                 total_cost += input_cost
                 
@@ -97,6 +104,8 @@ class CostCalculator:
             cost_per_1k_input = config_data.get('cost_per_1k_input_tokens')
             cost_per_1k_output = config_data.get('cost_per_1k_output_tokens')
             cost_per_request = config_data.get('cost_per_request')
+            cache_read_per_1k = None
+            cache_creation_per_1k = None
             
             # 🔧 FIX: If pricing is missing or zero, fetch from LiteLLM
             if not cost_per_1k_input or not cost_per_1k_output or (float(cost_per_1k_input or 0) == 0 and float(cost_per_1k_output or 0) == 0):
@@ -113,6 +122,8 @@ class CostCalculator:
                         cost_per_1k_input = litellm_pricing.get('input_cost_per_1k', cost_per_1k_input)
                         cost_per_1k_output = litellm_pricing.get('output_cost_per_1k', cost_per_1k_output)
                         cost_per_request = litellm_pricing.get('request_cost', cost_per_request)
+                        cache_read_per_1k = litellm_pricing.get('cache_read_cost_per_1k')
+                        cache_creation_per_1k = litellm_pricing.get('cache_creation_cost_per_1k')
                         
                         self.logger.info(f"✅ Updated pricing from LiteLLM: input=${cost_per_1k_input}/1k, output=${cost_per_1k_output}/1k")
                     
@@ -138,6 +149,12 @@ class CostCalculator:
                 
                 self.logger.debug(f"Output tokens: {output_tokens}, cost: ${output_cost:.4f}")
             
+            # Prompt-cache reads/writes are billed at their own rates
+            total_cost += cached_token_cost_adjustment(
+                response.usage, cost_per_1k_input, config_data.get('provider'),
+                cache_read_per_1k, cache_creation_per_1k
+            )
+            
             self.logger.debug(f"Total actual cost: ${total_cost:.4f}")
             return total_cost if total_cost > 0 else None
             
@@ -172,6 +189,8 @@ class CostCalculator:
             cost_per_1k_input = config_data.get('cost_per_1k_input_tokens')
             cost_per_1k_output = config_data.get('cost_per_1k_output_tokens')
             cost_per_request = config_data.get('cost_per_request')
+            cache_read_per_1k = None
+            cache_creation_per_1k = None
             
             # 🔧 FIX: If pricing is missing or zero, fetch from LiteLLM
             if not cost_per_1k_input or not cost_per_1k_output or (float(cost_per_1k_input or 0) == 0 and float(cost_per_1k_output or 0) == 0):
@@ -188,6 +207,8 @@ class CostCalculator:
                         cost_per_1k_input = litellm_pricing.get('input_cost_per_1k', cost_per_1k_input)
                         cost_per_1k_output = litellm_pricing.get('output_cost_per_1k', cost_per_1k_output)
                         cost_per_request = litellm_pricing.get('request_cost', cost_per_request)
+                        cache_read_per_1k = litellm_pricing.get('cache_read_cost_per_1k')
+                        cache_creation_per_1k = litellm_pricing.get('cache_creation_cost_per_1k')
                         
                         self.logger.info(f"✅ Streaming: Updated pricing from LiteLLM: input=${cost_per_1k_input}/1k, output=${cost_per_1k_output}/1k")
                     
@@ -215,6 +236,12 @@ class CostCalculator:
             
             total_cost += input_cost + output_cost
             
+            # Prompt-cache reads/writes are billed at their own rates
+            total_cost += cached_token_cost_adjustment(
+                usage, cost_per_1k_input, config_data.get('provider'),
+                cache_read_per_1k, cache_creation_per_1k
+            )
+            
             self.logger.debug(f"Streaming cost - Input: {input_tokens} tokens (${input_cost:.4f}), "
                             f"Output: {output_tokens} tokens (${output_cost:.4f}), "
                             f"Total: ${total_cost:.4f}")
@@ -225,30 +252,27 @@ class CostCalculator:
             self.logger.warning(f"Failed to calculate streaming cost: {str(e)}")
             return None
     
-    def _estimate_input_tokens(self, messages: List[Dict[str, str]]) -> int:
+    def _estimate_input_tokens(
+        self, 
+        messages: List[Any], 
+        provider: Any = None, 
+        model: Optional[str] = None
+    ) -> int:
         """
-        Rough estimation of input tokens based on message content.
+        Estimate input tokens with the tokenizer for the provider/model.
         
-        This is a simplified estimation. Real tokenization would require
-        provider-specific tokenizers.
+        Uses tiktoken for OpenAI models and an approximation table for
+        Claude; per-message counts are cached, so repeated history is cheap.
         
         Args:
-            messages: List of message dictionaries
+            messages: List of messages (ChatMessage objects or dicts)
+            provider: Provider value or LLMProvider enum
+            model: Model name
             
         Returns:
             Estimated number of input tokens
         """
-        total_chars = 0
-        for message in messages:
-            content = message.get('content', '')
-            total_chars += len(content)
-        
-        # Rough approximation: 4 characters per token on average
-        estimated_tokens = total_chars // 4
-        
-        # Add overhead for message structure
-        estimated_tokens += len(messages) * 10  # ~10 tokens per message for structure
-        
+        estimated_tokens = get_tokenizer_service().count_messages(messages, provider, model)
         return max(estimated_tokens, 1)  # Minimum 1 token
     
     async def get_cost_breakdown(
@@ -275,6 +299,8 @@ class CostCalculator:
                 'input_tokens': usage.get('input_tokens', 0),
                 'output_tokens': usage.get('output_tokens', 0),
                 'total_tokens': usage.get('total_tokens', 0),
+                'cache_read_input_tokens': usage.get('cache_read_input_tokens', 0),
+                'cache_creation_input_tokens': usage.get('cache_creation_input_tokens', 0),
                 'input_cost': 0.0,
                 'output_cost': 0.0,
                 'request_cost': float(config_data.get('cost_per_request', 0)),
@@ -285,6 +311,8 @@ class CostCalculator:
             # Get pricing information from config
             cost_per_1k_input = config_data.get('cost_per_1k_input_tokens')
             cost_per_1k_output = config_data.get('cost_per_1k_output_tokens')
+            cache_read_per_1k = None
+            cache_creation_per_1k = None
             
             # 🔧 FIX: If pricing is missing or zero, fetch from LiteLLM
             if not cost_per_1k_input or not cost_per_1k_output or (float(cost_per_1k_input or 0) == 0 and float(cost_per_1k_output or 0) == 0):
@@ -301,6 +329,8 @@ class CostCalculator:
                         cost_per_1k_input = litellm_pricing.get('input_cost_per_1k', cost_per_1k_input)
                         cost_per_1k_output = litellm_pricing.get('output_cost_per_1k', cost_per_1k_output)
                         breakdown['request_cost'] = float(litellm_pricing.get('request_cost', breakdown['request_cost']))
+                        cache_read_per_1k = litellm_pricing.get('cache_read_cost_per_1k')
+                        cache_creation_per_1k = litellm_pricing.get('cache_creation_cost_per_1k')
                         breakdown['pricing_source'] = 'litellm'
                         
                         self.logger.info(f"✅ Breakdown: Updated pricing from LiteLLM: input=${cost_per_1k_input}/1k, output=${cost_per_1k_output}/1k")
@@ -313,6 +343,11 @@ class CostCalculator:
             if cost_per_1k_input:
                 cost_per_1k_input = float(cost_per_1k_input)
                 breakdown['input_cost'] = (breakdown['input_tokens'] / 1000) * cost_per_1k_input
+                # Prompt-cache reads/writes are billed at their own rates
+                breakdown['input_cost'] += cached_token_cost_adjustment(
+                    usage, cost_per_1k_input, config_data.get('provider'),
+                    cache_read_per_1k, cache_creation_per_1k
+                )
             
             # Calculate output cost
             if cost_per_1k_output:
@@ -3,21 +3,31 @@
 
 from typing import Dict, Any, Optional, List, AsyncGenerator
 from datetime import datetime
+import asyncio
 import logging
+import time
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
+from app.core.metrics import (
+    LLM_REQUESTS, LLM_REQUEST_DURATION, LLM_PROVIDER_LATENCY
+)
 from app.models.llm_config import LLMConfiguration
 
 # Import all atomic components
 from app.services.llm.core.config_validator import get_config_validator
 from app.services.llm.core.cost_calculator import get_cost_calculator
 from app.services.llm.core.response_formatter import get_response_formatter
+from app.services.llm.core.request_coalescer import get_request_coalescer
+from app.services.llm.core.admission_controller import get_admission_controller
+from app.services.llm.core.priority_lanes import RequestPriority, get_priority_lanes
 from app.services.llm.handlers.chat_handler import get_chat_handler
 from app.services.llm.handlers.streaming_handler import get_streaming_handler
 from app.services.llm.logging.request_logger import get_request_logger
 from app.services.llm.logging.error_handler import get_error_handler
 from app.services.llm.quota_manager import get_quota_manager
+from app.services.llm.tokenizer import get_tokenizer_service
+from app.services.llm.context_window import get_context_window_manager
 from app.services.llm.models import ChatResponse
 from app.services.llm.exceptions import LLMServiceError
 
@@ -56,6 +66,15 @@ class LLMOrchestrator:
         # Quota management
         self.quota_manager = get_quota_manager()
         
+        # In-flight request coalescing (shared with the handlers)
+        self.request_coalescer = get_request_coalescer()
+        
+        # Per-configuration admission control and fair queueing (shared with the handlers)
+        self.admission_controller = get_admission_controller()
+        
+        # Interactive/background/batch lane policy (shared with the admission controller)
+        self.priority_lanes = get_priority_lanes()
+        
         self.logger.info("LLM Orchestrator initialized with all atomic components")
     
     # =============================================================================
@@ -75,7 +94,9 @@ class LLMOrchestrator:
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
         assistant_id: Optional[int] = None,
+        conversation_id: Optional[int] = None,
         bypass_quota: bool = False,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
         **kwargs
     ) -> ChatResponse:
         """
@@ -96,7 +117,9 @@ class LLMOrchestrator:
             ip_address: Client IP address (optional)
             user_agent: Client user agent string (optional)
             assistant_id: ID of custom assistant being used (optional)
+            conversation_id: Conversation the request belongs to, for context trimming (optional)
             bypass_quota: If True, skip quota checking (admin only)
+            priority: Scheduling lane (interactive, background or batch)
             **kwargs: Additional provider-specific parameters
             
         Returns:
@@ -105,7 +128,8 @@ class LLMOrchestrator:
         Raises:
             LLMServiceError: If request fails at any stage
         """
-        self.logger.info(f"Orchestrating chat request - User: {user_id}, Config: {config_id}")
+        self.logger.debug(f"Orchestrating chat request - User: {user_id}, Config: {config_id}")
+        started = time.perf_counter()
         
         # Get database session for request processing
         with next(get_db()) as db_session:
@@ -124,14 +148,22 @@ class LLMOrchestrator:
                     ip_address=ip_address,
                     user_agent=user_agent,
                     assistant_id=assistant_id,
+                    conversation_id=conversation_id,
                     bypass_quota=bypass_quota,
+                    priority=priority,
                     **kwargs
                 )
-                
+                    
                 self.logger.info(f"Chat request orchestration completed successfully for user {user_id}")
+                self._record_request_metrics(config_id, response.model, "chat", "success", started)
+                if response.response_time_ms is not None:
+                    LLM_PROVIDER_LATENCY.observe(
+                        response.response_time_ms / 1000, config_id=config_id, model=response.model
+                    )
                 return response
-                
+                    
             except Exception as e:
+                self._record_request_metrics(config_id, model, "chat", "error", started)
                 # Handle error through error handler
                 error_context = {
                     "user_id": user_id,
@@ -140,13 +172,13 @@ class LLMOrchestrator:
                     "session_id": session_id,
                     "request_type": "chat"
                 }
-                
+                    
                 error_result = self.error_handler.handle_request_error(e, error_context)
                 self.logger.error(f"Chat request orchestration failed: {error_result['classification']['user_friendly_message']}")
-                
+                    
                 # Re-raise the original error for the caller
                 raise
-    
+        
     async def process_streaming_request(
         self,
         config_id: int,
@@ -159,7 +191,10 @@ class LLMOrchestrator:
         request_id: Optional[str] = None,
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
+        assistant_id: Optional[int] = None,
+        conversation_id: Optional[int] = None,
         bypass_quota: bool = False,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
         **kwargs
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -179,7 +214,10 @@ class LLMOrchestrator:
             request_id: Unique request identifier for tracing (optional)
             ip_address: Client IP address (optional)
             user_agent: Client user agent (optional)
+            assistant_id: ID of custom assistant being used (optional)
+            conversation_id: Conversation the request belongs to, for context trimming (optional)
             bypass_quota: If True, skip quota checking (admin only)
+            priority: Scheduling lane (interactive, background or batch)
             **kwargs: Additional provider-specific parameters
             
         Yields:
@@ -188,7 +226,10 @@ class LLMOrchestrator:
         Raises:
             LLMServiceError: If request fails at any stage
         """
-        self.logger.info(f"Orchestrating streaming request - User: {user_id}, Config: {config_id}")
+        self.logger.debug(f"Orchestrating streaming request - User: {user_id}, Config: {config_id}")
+        started = time.perf_counter()
+        actual_model = model
+        finished = False
         
         # Get database session for request processing
         with next(get_db()) as db_session:
@@ -206,14 +247,28 @@ class LLMOrchestrator:
                     request_id=request_id,
                     ip_address=ip_address,
                     user_agent=user_agent,
+                    assistant_id=assistant_id,
+                    conversation_id=conversation_id,
                     bypass_quota=bypass_quota,
+                    priority=priority,
                     **kwargs
                 ):
+                    if chunk.get("model"):
+                        actual_model = chunk["model"]
+                    finished = finished or bool(chunk.get("is_final"))
                     yield chunk
-                
+                    
                 self.logger.info(f"Streaming request orchestration completed successfully for user {user_id}")
-                
+                self._record_request_metrics(config_id, actual_model, "stream", "success", started)
+                    
+            except (asyncio.CancelledError, GeneratorExit):
+                # The SSE layer closes the generator once it has the final chunk
+                outcome = "success" if finished else "cancelled"
+                self._record_request_metrics(config_id, actual_model, "stream", outcome, started)
+                raise
+                    
             except Exception as e:
+                self._record_request_metrics(config_id, actual_model, "stream", "error", started)
                 # Handle streaming error through error handler
                 error_context = {
                     "user_id": user_id,
@@ -222,13 +277,28 @@ class LLMOrchestrator:
                     "session_id": session_id,
                     "request_type": "streaming"
                 }
-                
+                    
                 error_result = self.error_handler.handle_streaming_error(e, error_context)
                 self.logger.error(f"Streaming request orchestration failed: {error_result['classification']['user_friendly_message']}")
-                
+                    
                 # Re-raise the original error for the caller
                 raise
-    
+        
+    def _record_request_metrics(
+        self,
+        config_id: int,
+        model: Optional[str],
+        mode: str,
+        outcome: str,
+        started: float
+    ) -> None:
+        """Count the request and observe its duration for /metrics."""
+        model_label = model or "default"
+        LLM_REQUESTS.inc(config_id=config_id, model=model_label, mode=mode, outcome=outcome)
+        LLM_REQUEST_DURATION.observe(
+            time.perf_counter() - started, config_id=config_id, model=model_label, mode=mode
+        )
+        
     # =============================================================================
     # CONFIGURATION AND TESTING COORDINATION
     # =============================================================================
@@ -418,8 +488,15 @@ class LLMOrchestrator:
                 "streaming_handler": "initialized",
                 "request_logger": "initialized",
                 "error_handler": "initialized",
-                "quota_manager": "initialized"
+                "quota_manager": "initialized",
+                "request_coalescer": "initialized",
+                "admission_controller": "initialized"
             },
+            "request_coalescing": self.request_coalescer.get_stats(),
+            "admission": self.admission_controller.get_stats(),
+            "priority_lanes": self.priority_lanes.get_stats(),
+            "tokenizer": get_tokenizer_service().get_stats(),
+            "context_window": get_context_window_manager().get_stats(),
             "timestamp": datetime.utcnow().isoformat()
         }
     
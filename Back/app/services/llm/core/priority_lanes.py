@@ -0,0 +1,221 @@
+# AI Dock LLM Priority Lanes
+# Interactive, background and batch request classes and the shared state that
+# lets interactive traffic go first (provider slots, TTFT guard)
+
+import logging
+import math
+import time
+from collections import deque
+from enum import Enum
+from typing import Dict, Any, Optional, Deque, Tuple
+
+
+# =============================================================================
+# PRIORITY CLASSES
+# =============================================================================
+
+class RequestPriority(str, Enum):
+    """Scheduling class of a chat request (lower rank is served first)."""
+    INTERACTIVE = "interactive"  # A person is waiting on the answer (chat UI)
+    BACKGROUND = "background"    # Automations that should finish soon
+    BATCH = "batch"              # Bulk jobs that only need to finish eventually
+
+    @property
+    def rank(self) -> int:
+        return _RANKS[self]
+
+
+_RANKS = {
+    RequestPriority.INTERACTIVE: 0,
+    RequestPriority.BACKGROUND: 1,
+    RequestPriority.BATCH: 2,
+}
+
+
+def parse_role_lanes(spec: str) -> Dict[str, RequestPriority]:
+    """
+    Parse a "role:lane,role:lane" mapping (unknown lanes are ignored).
+
+    Args:
+        spec: Mapping string, e.g. "analyst:background,integration:batch"
+
+    Returns:
+        Dict of role name -> RequestPriority
+    """
+    lanes: Dict[str, RequestPriority] = {}
+    for item in (spec or "").split(","):
+        role, _, lane = item.partition(":")
+        try:
+            lanes[role.strip().lower()] = RequestPriority(lane.strip().lower())
+        except ValueError:
+            continue
+    return lanes
+
+
+def resolve_request_priority(user, requested: Optional[str] = None) -> RequestPriority:
+    """
+    Pick the lane of a request from the user's role and the client's choice.
+
+    The role's lane (settings.priority_role_lanes, interactive by default) is
+    the highest lane the user may use; a client can ask for a lower one, e.g.
+    an integration marking its bulk calls as batch, but never a higher one.
+
+    Args:
+        user: Authenticated User
+        requested: Lane asked for by the client (optional)
+
+    Returns:
+        RequestPriority to schedule the request with
+    """
+    from app.core.config import settings
+
+    role_name = ""
+    try:
+        role_name = (user.role.name if user.role else "") or ""
+    except Exception:
+        pass  # Detached user: fall back to the default lane
+    allowed = parse_role_lanes(settings.priority_role_lanes).get(
+        role_name.lower(), RequestPriority.INTERACTIVE
+    )
+
+    try:
+        chosen = RequestPriority(requested) if requested else allowed
+    except ValueError:
+        chosen = allowed
+    return chosen if chosen.rank >= allowed.rank else allowed
+
+
+# =============================================================================
+# TIME-TO-FIRST-TOKEN MONITOR
+# =============================================================================
+
+class TTFTMonitor:
+    """Rolling window of interactive time-to-first-token samples."""
+
+    def __init__(self, window_seconds: float = 60.0, min_samples: int = 20, clock=time.monotonic):
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self._clock = clock
+        self._samples: Deque[Tuple[float, int]] = deque()
+
+    def record(self, ttft_ms: int) -> None:
+        self._samples.append((self._clock(), ttft_ms))
+        self._expire()
+
+    def p95(self) -> Optional[int]:
+        """95th percentile of the window, or None with too few samples."""
+        self._expire()
+        if len(self._samples) < self.min_samples:
+            return None
+        values = sorted(ms for _, ms in self._samples)
+        return values[min(math.ceil(len(values) * 0.95) - 1, len(values) - 1)]
+
+    def _expire(self) -> None:
+        cutoff = self._clock() - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+
+
+# =============================================================================
+# PRIORITY LANES
+# =============================================================================
+
+class PriorityLanes:
+    """
+    Shared lane policy for the admission controller and the orchestrator.
+
+    - Lower lanes may only fill a share of each configuration's provider
+      slots; the rest stays free for interactive requests, which never wait
+      behind background or batch work
+    - While the interactive p95 time-to-first-token is above the target,
+      batch calls are held in the queue until it recovers
+
+    Lanes do not gate database connections: a request holds a pool
+    connection only around its queries, not for its lifetime, so a
+    per-request count would not track pool use. Pool capacity is sized
+    by the connection budget instead.
+    """
+
+    def __init__(
+        self,
+        background_share: float = 0.75,
+        batch_share: float = 0.5,
+        ttft_p95_target_ms: int = 0,
+        ttft_window_seconds: float = 60.0
+    ):
+        """
+        Initialize the lane policy.
+
+        Args:
+            background_share: Share of capacity background requests may use
+            batch_share: Share of capacity batch requests may use
+            ttft_p95_target_ms: Interactive p95 TTFT above which batch is held (0 = never)
+            ttft_window_seconds: Window for the TTFT percentile
+        """
+        self.shares = {
+            RequestPriority.INTERACTIVE: 1.0,
+            RequestPriority.BACKGROUND: min(max(background_share, 0.0), 1.0),
+            RequestPriority.BATCH: min(max(batch_share, 0.0), 1.0),
+        }
+        self.ttft_p95_target_ms = ttft_p95_target_ms
+        self.ttft = TTFTMonitor(ttft_window_seconds)
+        self.logger = logging.getLogger(__name__)
+
+    def lane_limit(self, priority: RequestPriority, capacity: int) -> int:
+        """Slots out of ``capacity`` that requests of ``priority`` may occupy."""
+        if priority is RequestPriority.INTERACTIVE:
+            return capacity
+        return max(int(capacity * self.shares[priority]), 1)
+
+    def record_ttft(self, priority: RequestPriority, ttft_ms: int) -> None:
+        """Record the time to first token of a streamed request."""
+        if priority is RequestPriority.INTERACTIVE:
+            self.ttft.record(ttft_ms)
+
+    def is_batch_held(self) -> bool:
+        """Whether batch calls should wait because interactive latency is degraded."""
+        if not self.ttft_p95_target_ms:
+            return False
+        p95 = self.ttft.p95()
+        return p95 is not None and p95 > self.ttft_p95_target_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lane statistics for health endpoints."""
+        return {
+            "shares": {lane.value: share for lane, share in self.shares.items()},
+            "interactive_ttft_p95_ms": self.ttft.p95(),
+            "ttft_p95_target_ms": self.ttft_p95_target_ms or None,
+            "batch_held": self.is_batch_held()
+        }
+
+
+# Global lane policy instance
+_priority_lanes = None
+
+def get_priority_lanes() -> PriorityLanes:
+    """
+    Get the global priority lane policy.
+
+    Returns:
+        Singleton PriorityLanes instance
+    """
+    global _priority_lanes
+    if _priority_lanes is None:
+        from app.core.config import settings
+        _priority_lanes = PriorityLanes(
+            background_share=settings.priority_background_share,
+            batch_share=settings.priority_batch_share,
+            ttft_p95_target_ms=settings.priority_ttft_p95_target_ms,
+            ttft_window_seconds=settings.priority_ttft_window_seconds
+        )
+    return _priority_lanes
+
+
+__all__ = [
+    'RequestPriority',
+    'PriorityLanes',
+    'TTFTMonitor',
+    'parse_role_lanes',
+    'resolve_request_priority',
+    'get_priority_lanes'
+]
@@ -0,0 +1,344 @@
+# AI Dock LLM Request Coalescer
+# Shares one upstream provider call between identical in-flight requests
+
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, AsyncGenerator, Awaitable, Callable, Tuple
+
+from ..models import ChatResponse
+
+
+class InFlightRequest:
+    """
+    One upstream call and the subscribers waiting on it.
+
+    Streaming chunks are appended to a broadcast buffer so every subscriber
+    (including ones that join late) reads the full stream from the start.
+    When the final chunk (or the result) is published, the subscribers still
+    attached are snapshotted as the receivers, and the upstream cost is split
+    across exactly them. Subscribers that left before that are not billed for
+    the call. When every subscriber of a stream has gone away, the upstream
+    call is cancelled.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.subscribers = 1
+        self.departed = 0
+        self.left_early = 0
+        self.receiver_count: Optional[int] = None
+        self.abandoned = False
+        self.chunks: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.result: Optional[ChatResponse] = None
+        self.task: Optional[asyncio.Task] = None
+        self._condition = asyncio.Condition()
+
+    @property
+    def is_shared(self) -> bool:
+        """True if more than one request was served by this upstream call."""
+        return self.subscribers > 1
+
+    @property
+    def receivers(self) -> int:
+        """Subscribers that split the cost (snapshotted when the result is published)."""
+        if self.receiver_count is not None:
+            return self.receiver_count
+        return max(self.subscribers - self.left_early, 1)
+
+    @property
+    def final_usage(self) -> Dict[str, Any]:
+        """Usage reported by the upstream stream, merged across its chunks."""
+        usage: Dict[str, Any] = {}
+        for chunk in self.chunks:
+            usage.update(chunk.get("usage") or {})
+        return usage
+
+    def publish_result(self) -> None:
+        """Snapshot the receivers: called when the final chunk or the result becomes available."""
+        if self.receiver_count is None:
+            self.receiver_count = max(self.subscribers - self.left_early, 1)
+
+    def subscribe(self) -> "Subscription":
+        """
+        Read the broadcast buffer from the beginning until the stream ends.
+
+        Returns:
+            Subscription: Async iterator over the provider chunks, in order
+        """
+        return Subscription(self)
+
+    async def _read(self, subscription: "Subscription") -> AsyncGenerator[Dict[str, Any], None]:
+        index = 0
+        try:
+            while True:
+                async with self._condition:
+                    while index >= len(self.chunks) and not self.done:
+                        await self._condition.wait()
+                    new_chunks = self.chunks[index:]
+                    finished = self.done
+
+                for chunk in new_chunks:
+                    yield chunk
+                index += len(new_chunks)
+
+                if finished and index >= len(self.chunks):
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            self._leave(subscription)
+
+    def _leave(self, subscription: "Subscription") -> None:
+        """Account for a departing subscriber (once per subscription)."""
+        if subscription.left:
+            return
+        subscription.left = True
+        self.departed += 1
+        # Once the result is published the receivers are fixed, even for
+        # subscribers that go away before reading the final chunk
+        subscription.counted = self.receiver_count is not None
+        if not subscription.counted:
+            self.left_early += 1
+        # Every subscriber is gone: stop paying for the upstream stream
+        if self.departed >= self.subscribers and not self.done and self.task is not None:
+            self.abandoned = True
+            subscription.cancelled_upstream = True
+            self.task.cancel()
+
+
+class Subscription:
+    """
+    One subscriber's read position on a flight's broadcast buffer.
+
+    Once closed, it tells how the subscriber left, which decides what it is
+    billed: `counted` if it is one of the receivers that split the upstream
+    cost, `cancelled_upstream` if its departure cancelled the upstream call.
+    Iterating raises the upstream error if the shared call failed.
+    """
+
+    def __init__(self, flight: InFlightRequest):
+        self.flight = flight
+        self.left = False
+        self.counted = False
+        self.cancelled_upstream = False
+        self._reader = flight._read(self)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    def __anext__(self) -> Awaitable[Dict[str, Any]]:
+        return self._reader.__anext__()
+
+    async def aclose(self) -> None:
+        await self._reader.aclose()
+        # A reader closed before its first chunk never ran its cleanup
+        self.flight._leave(self)
+
+
+class RequestCoalescer:
+    """
+    Registry of in-flight upstream calls keyed by canonical request hash.
+
+    Single Responsibility:
+    - Let the first request for a key (the leader) start the upstream call
+    - Attach identical requests that arrive while it runs as followers
+    - Fan streaming chunks and final results out to all subscribers
+
+    The upstream call runs in its own task, so a leader whose client goes
+    away does not cut off the followers.
+    """
+
+    def __init__(self, max_buffered_chunks: int = 20000):
+        """
+        Initialize the coalescer.
+
+        Args:
+            max_buffered_chunks: Streams longer than this stop accepting new followers
+        """
+        self.logger = logging.getLogger(__name__)
+        self._inflight: Dict[str, InFlightRequest] = {}
+        self._max_buffered_chunks = max_buffered_chunks
+        self._stats = {
+            "upstream_calls": 0,
+            "coalesced_requests": 0
+        }
+
+    def join(self, key: str) -> Tuple[InFlightRequest, bool]:
+        """
+        Join an in-flight call for this key, or register a new one.
+
+        This is synchronous on purpose: registering and joining happen within
+        one event loop step, so two identical requests can never both lead.
+
+        Args:
+            key: Canonical request hash (mode-specific)
+
+        Returns:
+            Tuple of (in-flight request, True if the caller is the leader)
+        """
+        flight = self._inflight.get(key)
+        if flight is not None and not flight.done and not flight.abandoned:
+            flight.subscribers += 1
+            self._stats["coalesced_requests"] += 1
+            self.logger.info(f"🔗 Coalesced request onto in-flight call {key[:12]} ({flight.subscribers} subscribers)")
+            return flight, False
+
+        flight = InFlightRequest(key)
+        self._inflight[key] = flight
+        self._stats["upstream_calls"] += 1
+        return flight, True
+
+    def _close(self, flight: InFlightRequest) -> None:
+        """Stop accepting followers for a flight (freezes its subscriber count)."""
+        if self._inflight.get(flight.key) is flight:
+            del self._inflight[flight.key]
+
+    def start_stream(
+        self,
+        flight: InFlightRequest,
+        producer: Callable[[], AsyncGenerator[Dict[str, Any], None]]
+    ) -> None:
+        """
+        Start pumping an upstream stream into the flight's broadcast buffer.
+
+        Args:
+            flight: Flight returned by join() with leader=True
+            producer: Factory returning the provider chunk generator
+        """
+        async def pump():
+            stream = producer()
+            try:
+                async for chunk in stream:
+                    if chunk.get("is_final") or len(flight.chunks) >= self._max_buffered_chunks:
+                        self._close(flight)
+                    async with flight._condition:
+                        flight.chunks.append(chunk)
+                        if chunk.get("is_final"):
+                            flight.publish_result()
+                        flight._condition.notify_all()
+                    if chunk.get("is_final"):
+                        break
+            except BaseException as e:
+                flight.error = e
+            finally:
+                await stream.aclose()
+                self._close(flight)
+                async with flight._condition:
+                    flight.done = True
+                    flight._condition.notify_all()
+
+        flight.task = asyncio.create_task(pump())
+
+    async def run_request(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[ChatResponse]]
+    ) -> Tuple[ChatResponse, InFlightRequest, bool]:
+        """
+        Run a non-streaming upstream call once for all identical requests.
+
+        Args:
+            key: Canonical request hash
+            call: Factory returning the provider coroutine
+
+        Returns:
+            Tuple of (response, flight, is_leader). Every subscriber receives
+            its own copy of the response so per-user cost changes never leak
+            between requests.
+        """
+        flight, is_leader = self.join(key)
+
+        if is_leader:
+            async def execute():
+                try:
+                    flight.result = await call()
+                    flight.publish_result()
+                    return flight.result
+                finally:
+                    self._close(flight)
+                    flight.done = True
+
+            flight.task = asyncio.create_task(execute())
+
+        try:
+            shared = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # This caller logs no usage: it takes no share of the cost, unless the
+            # result was already published (the receivers are fixed by then)
+            if flight.receiver_count is None:
+                flight.left_early += 1
+            raise
+
+        response = ChatResponse(
+            content=shared.content,
+            model=shared.model,
+            provider=shared.provider,
+            usage=dict(shared.usage or {}),
+            cost=shared.cost,
+            response_time_ms=shared.response_time_ms,
+            raw_response=dict(shared.raw_response or {})
+        )
+
+        return response, flight, is_leader
+
+    @staticmethod
+    def apportion(response: ChatResponse, flight: InFlightRequest, is_leader: bool) -> ChatResponse:
+        """
+        Split the upstream cost of a shared call across its receivers, the
+        subscribers attached when the result was published (each of them logs
+        its share as usage), so the logged shares add up to the upstream cost.
+
+        Args:
+            response: This subscriber's response (modified in place)
+            flight: The shared flight
+            is_leader: Whether this subscriber started the upstream call
+
+        Returns:
+            The same response with apportioned cost and coalescing metadata
+        """
+        if not flight.is_shared:
+            return response
+
+        total_cost = response.cost
+        if total_cost is not None:
+            response.cost = total_cost / flight.receivers
+
+        response.raw_response = {
+            **(response.raw_response or {}),
+            "coalesced": True,
+            "coalesced_subscribers": flight.receivers,
+            "coalesced_leader": is_leader,
+            "upstream_cost": total_cost
+        }
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics."""
+        total = self._stats["upstream_calls"] + self._stats["coalesced_requests"]
+        return {
+            "in_flight": len(self._inflight),
+            "upstream_calls": self._stats["upstream_calls"],
+            "coalesced_requests": self._stats["coalesced_requests"],
+            "coalesced_rate": f"{(self._stats['coalesced_requests'] / total) if total else 0:.2%}"
+        }
+
+
+# Global request coalescer instance (shared by all handlers in this worker)
+_request_coalescer = None
+
+def get_request_coalescer() -> RequestCoalescer:
+    """
+    Get the global request coalescer instance.
+
+    Returns:
+        Singleton RequestCoalescer instance
+    """
+    global _request_coalescer
+    if _request_coalescer is None:
+        _request_coalescer = RequestCoalescer()
+    return _request_coalescer
+
+
+__all__ = ['InFlightRequest', 'Subscription', 'RequestCoalescer', 'get_request_coalescer']
@@ -5,6 +5,7 @@ from typing import Dict, Any, Optional
 from datetime import datetime
 import logging
 
+from app.core.logging_config import hot_path_debug_enabled
 from ..models import ChatResponse
 
 
@@ -57,7 +58,8 @@ class ResponseFormatter:
         if additional_metadata:
             formatted_chunk.update(additional_metadata)
         
-        self.logger.debug(f"Formatted streaming chunk {chunk_index} for {provider_name}")
+        if hot_path_debug_enabled():
+            self.logger.debug("Formatted streaming chunk %d for %s", chunk_index, provider_name)
         return formatted_chunk
     
     def format_final_response(
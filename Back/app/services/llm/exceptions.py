@@ -31,11 +31,28 @@ class LLMConfigurationError(LLMServiceError):
     pass
 
 
+class LLMContextWindowError(LLMConfigurationError):
+    """Error when the pinned prompts and current turn alone exceed the input token budget."""
+    
+    def __init__(self, message: str, input_tokens: int, budget: int):
+        super().__init__(message)
+        self.input_tokens = input_tokens
+        self.budget = budget
+
+
 class LLMQuotaExceededError(LLMServiceError):
     """Error when usage quota is exceeded."""
     pass
 
 
+class LLMAdmissionTimeoutError(LLMQuotaExceededError):
+    """Error when a request waited too long for provider capacity."""
+    
+    def __init__(self, message: str, config_id: int):
+        super().__init__(message)
+        self.config_id = config_id
+
+
 class LLMDepartmentQuotaExceededError(LLMServiceError):
     """Error when department quota is exceeded."""
     
@@ -86,7 +103,9 @@ __all__ = [
     'LLMServiceError',
     'LLMProviderError', 
     'LLMConfigurationError',
+    'LLMContextWindowError',
     'LLMQuotaExceededError',
+    'LLMAdmissionTimeoutError',
     'LLMDepartmentQuotaExceededError',
     'LLMUserNotFoundError',
     'LLMStreamingError',
@@ -1,15 +1,24 @@
 # AI Dock LLM Base Handler
 # Base class with shared request handling logic
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 import logging
+import time
 from sqlalchemy.orm import Session
 
+from app.core.metrics import QUOTA_CHECK_DURATION
+from app.core.tracing import traced
 from ..models import ChatMessage, ChatRequest
 from ..core.config_validator import get_config_validator
 from ..quota_manager import get_quota_manager, LLMQuotaManager
 from ..provider_factory import get_provider_factory, LLMProviderFactory
+from ..response_cache import get_response_cache_manager, is_deterministic_request, build_request_hash
+from ..core.request_coalescer import get_request_coalescer
+from ..core.admission_controller import get_admission_controller, AdmissionTicket
+from ..core.priority_lanes import RequestPriority, get_priority_lanes
+from ..context_window import get_context_window_manager
+from ..tokenizer import get_tokenizer_service
 from ..exceptions import LLMServiceError, LLMDepartmentQuotaExceededError, LLMUserNotFoundError
 
 
@@ -30,7 +39,13 @@ class BaseRequestHandler:
         self.config_validator = get_config_validator()
         self.quota_manager = get_quota_manager()
         self.provider_factory = get_provider_factory()
+        self.response_cache = get_response_cache_manager()
+        self.request_coalescer = get_request_coalescer()
+        self.context_window_manager = get_context_window_manager()
+        self.admission_controller = get_admission_controller()
+        self.priority_lanes = get_priority_lanes()
     
+    @traced("validate_and_prepare_request")
     async def validate_and_prepare_request(
         self,
         config_id: int,
@@ -40,11 +55,15 @@ class BaseRequestHandler:
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         db_session: Optional[Session] = None,
+        conversation_id: Optional[int] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
         Validate configuration and prepare request data.
         
+        Older turns are trimmed/summarized here so the request fits the
+        model's context window before cache keys, quotas or providers see it.
+        
         Args:
             config_id: ID of the LLM configuration
             messages: List of message dictionaries
@@ -53,6 +72,7 @@ class BaseRequestHandler:
             temperature: Optional temperature override
             max_tokens: Optional max tokens override
             db_session: Database session
+            conversation_id: Conversation the request belongs to (for summary reuse)
             **kwargs: Additional request parameters
             
         Returns:
@@ -66,6 +86,9 @@ class BaseRequestHandler:
         # Create chat request object
         chat_request = self._create_chat_request(messages, model, temperature, max_tokens, **kwargs)
         
+        # Keep input tokens within the model's context window
+        self.context_window_manager.fit_request(chat_request, config_data, conversation_id)
+        
         # Get provider instance
         provider = self._get_provider_from_config(config_data)
         
@@ -75,6 +98,7 @@ class BaseRequestHandler:
             'provider': provider
         }
     
+    @traced("check_quotas")
     async def check_quotas(
         self,
         user_id: int,
@@ -106,17 +130,190 @@ class BaseRequestHandler:
             self.logger.info(f"Bypassing quota check for user {user_id} (admin override)")
             return None
         
+        started = time.perf_counter()
+        outcome = "allowed"
         try:
             return await self.quota_manager.check_quotas_before_request(
                 user_id, config_id, request, db_session, config_data
             )
         except (LLMDepartmentQuotaExceededError, LLMUserNotFoundError):
             # Re-raise quota and user errors - these should block the request
+            outcome = "blocked"
             raise
         except Exception as e:
             # Only catch unexpected errors and allow request to proceed with logging
+            outcome = "error"
             self.logger.error(f"Unexpected error during quota check (allowing request): {str(e)}")
             return None
+        finally:
+            QUOTA_CHECK_DURATION.observe(time.perf_counter() - started, outcome=outcome)
+    
+    def get_response_cache_key(
+        self,
+        chat_request: ChatRequest,
+        config_data: Dict[str, Any],
+        assistant_id: Optional[int],
+        db_session: Optional[Session]
+    ) -> Optional[str]:
+        """
+        Get the response cache key if this request may be served from cache.
+        
+        Caching is opt-in per assistant and limited to deterministic requests,
+        so most requests return None here and go straight to the provider.
+        
+        Args:
+            chat_request: Prepared chat request
+            config_data: Configuration data
+            assistant_id: Assistant used for the request (optional)
+            db_session: Database session
+            
+        Returns:
+            Cache key string, or None if the request is not cacheable
+        """
+        if not self.response_cache.is_request_cacheable(chat_request, config_data):
+            return None
+        
+        if not self.response_cache.is_enabled_for_assistant(assistant_id, db_session):
+            return None
+        
+        return self.response_cache.build_cache_key(chat_request, config_data)
+    
+    def get_coalescing_key(
+        self,
+        chat_request: ChatRequest,
+        config_data: Dict[str, Any],
+        streaming: bool
+    ) -> Optional[str]:
+        """
+        Get the in-flight coalescing key if identical requests may share an upstream call.
+        
+        Only deterministic requests are coalesced; streaming and regular
+        requests never share a call because their chunk shapes differ.
+        
+        Args:
+            chat_request: Prepared chat request
+            config_data: Configuration data
+            streaming: Whether this is a streaming request
+            
+        Returns:
+            Coalescing key string, or None if the request must run on its own
+        """
+        from app.core.config import settings
+        
+        if not settings.request_coalescing_enabled:
+            return None
+        
+        if not is_deterministic_request(chat_request, config_data):
+            return None
+        
+        mode = "stream" if streaming else "chat"
+        return f"{mode}:{build_request_hash(chat_request, config_data)}"
+    
+    def get_scheduling_department(
+        self,
+        user_id: int,
+        quota_check_result,
+        db_session: Optional[Session]
+    ) -> Tuple[Optional[int], float]:
+        """
+        Get the department a request is queued under and its scheduling weight.
+        
+        Args:
+            user_id: User making the request
+            quota_check_result: Result of check_quotas (None if bypassed)
+            db_session: Database session
+            
+        Returns:
+            Tuple of (department_id, weight); the weight comes from the
+            department's settings["scheduling_weight"] and defaults to 1.0
+        """
+        department_id = getattr(quota_check_result, "department_id", None)
+        if db_session is None:
+            return department_id, 1.0
+        
+        try:
+            from app.models.user import User
+            from app.models.department import Department
+            
+            if department_id is None:
+                department_id = db_session.query(User.department_id).filter(User.id == user_id).scalar()
+            if department_id is None:
+                return None, 1.0
+            
+            dept_settings = db_session.query(Department.settings).filter(Department.id == department_id).scalar()
+            weight = float((dept_settings or {}).get("scheduling_weight", 1.0))
+            return department_id, weight if weight > 0 else 1.0
+        except Exception as e:
+            self.logger.warning(f"Could not load scheduling weight for user {user_id}: {e}")
+            return department_id, 1.0
+    
+    def release_connection(self, db_session: Optional[Session]) -> None:
+        """
+        End the session's transaction before the provider call.
+        
+        Validation and quota checks are done by now; committing hands the
+        connection back to the pool instead of holding it for the whole
+        generation. Loaded objects stay usable (expire_on_commit=False) and
+        the session checks out a connection again when logging at the end.
+        """
+        if db_session is None:
+            return
+        try:
+            db_session.commit()
+        except Exception as e:
+            self.logger.warning(f"Could not release DB connection before provider call: {e}")
+            db_session.rollback()
+    
+    @traced("acquire_admission")
+    async def acquire_admission(
+        self,
+        chat_request: ChatRequest,
+        config_data: Dict[str, Any],
+        department: Tuple[Optional[int], float],
+        performance_data: Dict[str, Any],
+        priority: RequestPriority = RequestPriority.INTERACTIVE
+    ) -> AdmissionTicket:
+        """
+        Wait for a provider slot and budget before calling the provider.
+        
+        The reservation is the prompt plus the maximum completion, so a burst
+        of long requests cannot overrun the configuration's tokens per minute.
+        The time spent waiting is recorded as performance_data["queue_wait_ms"].
+        
+        Args:
+            chat_request: Prepared chat request
+            config_data: Configuration data
+            department: (department_id, weight) from get_scheduling_department
+            performance_data: Performance data of the request (updated in place)
+            priority: Lane of the request
+            
+        Returns:
+            AdmissionTicket to release when the upstream call ends
+            
+        Raises:
+            LLMAdmissionTimeoutError: If no capacity freed up in time
+        """
+        from app.core.config import settings
+        
+        model = chat_request.model or config_data.get('default_model')
+        estimated_tokens = get_tokenizer_service().count_messages(
+            chat_request.messages, config_data.get('provider'), model
+        ) + (chat_request.max_tokens or settings.admission_default_output_tokens)
+        
+        department_id, weight = department
+        ticket = await self.admission_controller.acquire(
+            config_data['id'], department_id, estimated_tokens, weight,
+            rate_limit_rpm=config_data.get('rate_limit_rpm'),
+            rate_limit_tpm=config_data.get('rate_limit_tpm'),
+            priority=priority
+        )
+        performance_data["queue_wait_ms"] = ticket.queue_wait_ms
+        if ticket.queue_wait_ms:
+            self.logger.info(
+                f"⏳ {priority.value.capitalize()} request waited {ticket.queue_wait_ms}ms "
+                f"for config {config_data['id']} capacity"
+            )
+        return ticket
     
     def prepare_logging_data(
         self,
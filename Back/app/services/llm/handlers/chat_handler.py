@@ -7,7 +7,8 @@ import logging
 from sqlalchemy.orm import Session
 
 from .base_handler import BaseRequestHandler
-from ..models import ChatResponse
+from ..core.priority_lanes import RequestPriority
+from ..models import ChatRequest, ChatResponse
 from ..core.cost_calculator import get_cost_calculator
 from ..core.response_formatter import get_response_formatter
 from ..usage_logger import get_usage_logger
@@ -46,7 +47,9 @@ class ChatHandler(BaseRequestHandler):
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
         assistant_id: Optional[int] = None,
+        conversation_id: Optional[int] = None,
         bypass_quota: bool = False,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
         **kwargs
     ) -> ChatResponse:
         """
@@ -65,7 +68,9 @@ class ChatHandler(BaseRequestHandler):
             ip_address: Client IP address (optional)
             user_agent: Client user agent string (optional)
             assistant_id: ID of custom assistant being used (optional)
+            conversation_id: Conversation the request belongs to, for context trimming (optional)
             bypass_quota: If True, skip quota checking (admin only)
+            priority: Scheduling lane (interactive, background or batch)
             **kwargs: Additional provider-specific parameters
             
         Returns:
@@ -83,7 +88,8 @@ class ChatHandler(BaseRequestHandler):
         self._validate_request_parameters(messages, user_id, config_id)
         
         prepared_data = await self.validate_and_prepare_request(
-            config_id, messages, user_id, model, temperature, max_tokens, db_session, **kwargs
+            config_id, messages, user_id, model, temperature, max_tokens, db_session,
+            conversation_id=conversation_id, **kwargs
         )
         
         config_data = prepared_data['config_data']
@@ -94,35 +100,64 @@ class ChatHandler(BaseRequestHandler):
         self.logger.info(f"🔍 CHAT HANDLER: model_override='{model}', config_default='{config_data.get('default_model')}', chat_request.model='{chat_request.model}'")
         
         # =============================================================================
-        # STEP 2: CHECK QUOTAS
+        # STEP 2: PREPARE LOGGING DATA
         # =============================================================================
         
-        quota_check_result = await self.check_quotas(
-            user_id, config_id, chat_request, db_session, config_data, bypass_quota
+        logging_data = self.prepare_logging_data(
+            messages, temperature, max_tokens, model, bypass_quota, streaming=False,
+            priority=priority.value, **kwargs
         )
         
+        request_data = logging_data['request_data']
+        performance_data = logging_data['performance_data']
+        
         # =============================================================================
-        # STEP 3: PREPARE LOGGING DATA
+        # STEP 3: SERVE FROM RESPONSE CACHE (deterministic, opted-in requests only)
         # =============================================================================
         
-        logging_data = self.prepare_logging_data(
-            messages, temperature, max_tokens, model, bypass_quota, streaming=False, **kwargs
-        )
+        cache_key = self.get_response_cache_key(chat_request, config_data, assistant_id, db_session)
         
-        request_data = logging_data['request_data']
-        performance_data = logging_data['performance_data']
+        if cache_key:
+            cached = await self.response_cache.get_response(cache_key)
+            if cached:
+                return await self._serve_cached_response(
+                    cached, user_id, config_id, request_data, performance_data,
+                    session_id, request_id, ip_address, user_agent
+                )
         
         # =============================================================================
-        # STEP 4: SEND REQUEST TO PROVIDER
+        # STEP 4: CHECK QUOTAS
+        # =============================================================================
+        
+        quota_check_result = await self.check_quotas(
+            user_id, config_id, chat_request, db_session, config_data, bypass_quota
+        )
+        
+        # =============================================================================
+        # STEP 5: SEND REQUEST TO PROVIDER
         # =============================================================================
         
         self._log_request_start(
             user_id, config_id, provider.provider_name, config_data['name'], streaming=False
         )
         
+        department = self.get_scheduling_department(user_id, quota_check_result, db_session)
+        self.release_connection(db_session)
+        
         try:
-            # Send the actual request to the provider
-            response = await provider.send_chat_request(chat_request)
+            # Send the actual request to the provider (shared with identical in-flight requests)
+            coalesce_key = self.get_coalescing_key(chat_request, config_data, streaming=False)
+            flight, is_leader = None, True
+            
+            if coalesce_key:
+                response, flight, is_leader = await self.request_coalescer.run_request(
+                    coalesce_key,
+                    lambda: self._send_admitted(provider, chat_request, config_data, department, performance_data, priority)
+                )
+            else:
+                response = await self._send_admitted(
+                    provider, chat_request, config_data, department, performance_data, priority
+                )
             
             # Record completion timing
             performance_data.update({
@@ -131,13 +166,25 @@ class ChatHandler(BaseRequestHandler):
             })
             
             # =============================================================================
-            # STEP 5: LOG SUCCESS AND RECORD QUOTA USAGE
+            # STEP 6: POPULATE CACHE, APPORTION SHARED COST, LOG AND RECORD QUOTA
             # =============================================================================
             
+            if not response.cost:
+                response.cost = await self.cost_calculator.calculate_actual_cost(response, config_data)
+            
+            if cache_key and is_leader:
+                await self.response_cache.store_response(cache_key, response)
+            
+            cache_status = "miss" if cache_key else None
+            if flight is not None and flight.is_shared:
+                self.request_coalescer.apportion(response, flight, is_leader)
+                cache_status = "coalesced"
+            
             await self._log_successful_request(
                 user_id, config_id, request_data, response, performance_data,
                 session_id, request_id, ip_address, user_agent,
-                quota_check_result, bypass_quota, db_session, config_data
+                quota_check_result, bypass_quota, db_session, config_data,
+                cache_status=cache_status
             )
             
             self.logger.info(f"Chat request completed successfully for user {user_id}")
@@ -145,7 +192,7 @@ class ChatHandler(BaseRequestHandler):
             
         except Exception as e:
             # =============================================================================
-            # STEP 6: HANDLE ERRORS AND LOG FAILED REQUESTS
+            # STEP 7: HANDLE ERRORS AND LOG FAILED REQUESTS
             # =============================================================================
             
             await self._handle_request_error(
@@ -158,6 +205,31 @@ class ChatHandler(BaseRequestHandler):
             self.logger.error(f"Chat request failed for user {user_id}: {str(e)}")
             raise
     
+    async def _send_admitted(
+        self,
+        provider,
+        chat_request: ChatRequest,
+        config_data: Dict[str, Any],
+        department,
+        performance_data: Dict[str, Any],
+        priority: RequestPriority = RequestPriority.INTERACTIVE
+    ) -> ChatResponse:
+        """
+        Send a request to the provider once the admission controller lets it through.
+        
+        Coalesced followers never get here, so only real upstream calls take slots.
+        """
+        ticket = await self.acquire_admission(
+            chat_request, config_data, department, performance_data, priority
+        )
+        try:
+            response = await provider.send_chat_request(chat_request)
+        except BaseException:
+            self.admission_controller.release(ticket)
+            raise
+        self.admission_controller.release(ticket, (response.usage or {}).get("total_tokens"))
+        return response
+    
     async def estimate_request_cost(
         self,
         config_id: int,
@@ -210,7 +282,8 @@ class ChatHandler(BaseRequestHandler):
         quota_check_result,
         bypass_quota: bool,
         db_session: Session,
-        config_data: Dict[str, Any]
+        config_data: Dict[str, Any],
+        cache_status: Optional[str] = None
     ):
         """
         Log successful request with quota recording.
@@ -229,16 +302,18 @@ class ChatHandler(BaseRequestHandler):
             bypass_quota: Whether quota was bypassed
             db_session: Database session
             config_data: Configuration data
+            cache_status: Response cache outcome for cacheable requests (optional)
         """
         # Calculate actual cost if not already set
         if not response.cost:
-            response.cost = self.cost_calculator.calculate_actual_cost(response, config_data)
+            response.cost = await self.cost_calculator.calculate_actual_cost(response, config_data)
         
         # Create response data for logging
         response_data = self.usage_logger.create_success_response_data(
             response,
             quota_check_passed=quota_check_result is not None,
-            quota_details=quota_check_result.quota_details if quota_check_result else {}
+            quota_details=quota_check_result.quota_details if quota_check_result else {},
+            cache_status=cache_status
         )
         
         # Log the request with quota recording
@@ -249,6 +324,59 @@ class ChatHandler(BaseRequestHandler):
         
         self.logger.debug(f"Successfully logged chat request for user {user_id}")
     
+    async def _serve_cached_response(
+        self,
+        cached,
+        user_id: int,
+        config_id: int,
+        request_data: Dict,
+        performance_data: Dict,
+        session_id: Optional[str],
+        request_id: Optional[str],
+        ip_address: Optional[str],
+        user_agent: Optional[str]
+    ) -> ChatResponse:
+        """
+        Return a cached response and log it as a zero-cost cache hit.
+        
+        Cache hits never reach the provider, so no quota usage is recorded;
+        the UsageLog row carries the avoided cost in cost_saved instead.
+        
+        Args:
+            cached: CachedResponse from the response cache
+            user_id: User ID
+            config_id: Configuration ID
+            request_data: Request data for logging
+            performance_data: Performance metrics
+            session_id: Session identifier
+            request_id: Request identifier
+            ip_address: Client IP
+            user_agent: Client user agent
+            
+        Returns:
+            ChatResponse rebuilt from the cache entry
+        """
+        started_at = datetime.fromisoformat(performance_data["request_started_at"])
+        response_time_ms = int((datetime.utcnow() - started_at).total_seconds() * 1000)
+        response = cached.to_chat_response(response_time_ms)
+        
+        performance_data.update({
+            "request_completed_at": datetime.utcnow().isoformat(),
+            "response_time_ms": response_time_ms
+        })
+        
+        response_data = self.usage_logger.create_success_response_data(
+            response, cache_status="hit"
+        )
+        
+        await self.usage_logger.log_llm_request_with_quota(
+            user_id, config_id, request_data, response_data, performance_data,
+            session_id, request_id, ip_address, user_agent, response, bypass_quota=True
+        )
+        
+        self.logger.info(f"⚡ Served chat request for user {user_id} from response cache")
+        return response
+    
     async def _handle_request_error(
         self,
         error: Exception,
@@ -2,16 +2,20 @@
 # Atomic component for streaming chat request handling
 
 import asyncio
-from typing import Dict, Any, Optional, List, AsyncGenerator
+from typing import Dict, Any, Optional, List, AsyncGenerator, Tuple
 from datetime import datetime
 import logging
 from sqlalchemy.orm import Session
 
+from app.core.metrics import LLM_TTFT, LLM_PROVIDER_LATENCY
+from app.core.tracing import get_tracer, traced
 from .base_handler import BaseRequestHandler
-from ..models import ChatResponse
+from ..core.priority_lanes import RequestPriority
+from ..models import ChatRequest, ChatResponse
 from ..core.cost_calculator import get_cost_calculator
 from ..core.response_formatter import get_response_formatter
 from ..usage_logger import get_usage_logger
+from ..tokenizer import get_tokenizer_service
 from ..exceptions import LLMServiceError, LLMProviderError
 
 
@@ -31,6 +35,7 @@ class StreamingHandler(BaseRequestHandler):
         self.cost_calculator = get_cost_calculator()
         self.response_formatter = get_response_formatter()
         self.usage_logger = get_usage_logger()
+        self.tokenizer_service = get_tokenizer_service()
         self.logger = logging.getLogger(__name__)
     
     async def handle_streaming_request(
@@ -46,7 +51,10 @@ class StreamingHandler(BaseRequestHandler):
         request_id: Optional[str] = None,
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
+        assistant_id: Optional[int] = None,
+        conversation_id: Optional[int] = None,
         bypass_quota: bool = False,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
         **kwargs
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -64,7 +72,10 @@ class StreamingHandler(BaseRequestHandler):
             request_id: Unique request identifier for tracing (optional)
             ip_address: Client IP address (optional)
             user_agent: Client user agent (optional)
+            assistant_id: ID of custom assistant being used (optional)
+            conversation_id: Conversation the request belongs to, for context trimming (optional)
             bypass_quota: If True, skip quota checking (admin only)
+            priority: Scheduling lane (interactive, background or batch)
             **kwargs: Additional provider-specific parameters
             
         Yields:
@@ -82,7 +93,8 @@ class StreamingHandler(BaseRequestHandler):
         self._validate_request_parameters(messages, user_id, config_id)
         
         prepared_data = await self.validate_and_prepare_request(
-            config_id, messages, user_id, model, temperature, max_tokens, db_session, **kwargs
+            config_id, messages, user_id, model, temperature, max_tokens, db_session,
+            conversation_id=conversation_id, **kwargs
         )
         
         config_data = prepared_data['config_data']
@@ -90,26 +102,43 @@ class StreamingHandler(BaseRequestHandler):
         provider = prepared_data['provider']
         
         # =============================================================================
-        # STEP 2: CHECK QUOTAS
+        # STEP 2: PREPARE LOGGING DATA
         # =============================================================================
         
-        quota_check_result = await self.check_quotas(
-            user_id, config_id, chat_request, db_session, config_data, bypass_quota
+        logging_data = self.prepare_logging_data(
+            messages, temperature, max_tokens, model, bypass_quota, streaming=True,
+            priority=priority.value, **kwargs
         )
         
+        request_data = logging_data['request_data']
+        performance_data = logging_data['performance_data']
+        
         # =============================================================================
-        # STEP 3: PREPARE LOGGING DATA
+        # STEP 3: REPLAY FROM RESPONSE CACHE (deterministic, opted-in requests only)
         # =============================================================================
         
-        logging_data = self.prepare_logging_data(
-            messages, temperature, max_tokens, model, bypass_quota, streaming=True, **kwargs
-        )
+        cache_key = self.get_response_cache_key(chat_request, config_data, assistant_id, db_session)
         
-        request_data = logging_data['request_data']
-        performance_data = logging_data['performance_data']
+        if cache_key:
+            cached = await self.response_cache.get_response(cache_key)
+            if cached:
+                async for chunk in self._replay_cached_response(
+                    cached, user_id, config_id, request_data, performance_data,
+                    session_id, request_id, ip_address, user_agent
+                ):
+                    yield chunk
+                return
+        
+        # =============================================================================
+        # STEP 4: CHECK QUOTAS
+        # =============================================================================
+        
+        quota_check_result = await self.check_quotas(
+            user_id, config_id, chat_request, db_session, config_data, bypass_quota
+        )
         
         # =============================================================================
-        # STEP 4: START STREAMING FROM PROVIDER
+        # STEP 5: START STREAMING FROM PROVIDER
         # =============================================================================
         
         self._log_request_start(
@@ -117,19 +146,51 @@ class StreamingHandler(BaseRequestHandler):
         )
         
         # Initialize streaming state
-        accumulated_content = ""
+        content_parts: List[str] = []  # Joined once, not concatenated per chunk
         accumulated_usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
         actual_model = chat_request.model or config_data['default_model']  # Track actual model used
         chunk_count = 0
         streaming_start_time = datetime.utcnow()
+        completed = False
+        cancellation = None
+        chunk_source = None
+        
+        # Identical in-flight deterministic streams share one upstream call
+        coalesce_key = self.get_coalescing_key(chat_request, config_data, streaming=True)
+        flight, is_leader = None, True
+        department = self.get_scheduling_department(user_id, quota_check_result, db_session)
+        self.release_connection(db_session)
+        provider_span = get_tracer().start_span(
+            "provider_stream", provider=provider.provider_name, model=actual_model, coalescing=bool(coalesce_key)
+        )
         
         try:
+            if coalesce_key:
+                flight, is_leader = self.request_coalescer.join(coalesce_key)
+                if is_leader:
+                    self.request_coalescer.start_stream(
+                        flight,
+                        lambda: self._stream_admitted(provider, chat_request, config_data, department, performance_data, priority)
+                    )
+                chunk_source = flight.subscribe()
+            else:
+                chunk_source = self._stream_admitted(
+                    provider, chat_request, config_data, department, performance_data, priority
+                )
+            
             # Stream from provider with error handling
-            async for chunk_data in self._stream_from_provider(provider, chat_request):
+            async for chunk_data in chunk_source:
                 
                 chunk_count += 1
                 chunk_content = chunk_data.get("content", "")
-                accumulated_content += chunk_content
+                
+                if chunk_count == 1:
+                    # Interactive TTFT decides whether batch work has to wait
+                    ttft_ms = int((datetime.utcnow() - streaming_start_time).total_seconds() * 1000)
+                    self.priority_lanes.record_ttft(priority, ttft_ms)
+                    LLM_TTFT.observe(ttft_ms / 1000, config_id=config_id, model=chunk_data.get("model") or actual_model)
+                    provider_span.add_event("first_token", ttft_ms=ttft_ms)
+                content_parts.append(chunk_content)
                 
                 # Update usage data if available
                 if "usage" in chunk_data:
@@ -146,6 +207,11 @@ class StreamingHandler(BaseRequestHandler):
                     streaming_duration_ms = int(
                         (datetime.utcnow() - streaming_start_time).total_seconds() * 1000
                     )
+                    LLM_PROVIDER_LATENCY.observe(streaming_duration_ms / 1000, config_id=config_id, model=actual_model)
+                    provider_span.set_attribute("chunks", chunk_count)
+                    provider_span.set_attribute("total_tokens", accumulated_usage.get("total_tokens"))
+                    provider_span.end()
+                    accumulated_content = "".join(content_parts)
                     
                     # Create final response for logging (FIXED: Added await)
                     final_response = await self._create_final_response(
@@ -153,19 +219,32 @@ class StreamingHandler(BaseRequestHandler):
                         provider.provider_name, streaming_duration_ms
                     )
                     
+                    if cache_key and is_leader:
+                        await self.response_cache.store_response(cache_key, final_response)
+                    
+                    cache_status = "miss" if cache_key else None
+                    if flight is not None and flight.is_shared:
+                        self.request_coalescer.apportion(final_response, flight, is_leader)
+                        cache_status = "coalesced"
+                    
                     # Start background logging task (fire and forget)
                     asyncio.create_task(
                         self._log_streaming_success_background(
                             user_id, config_id, request_data, final_response, performance_data,
                             session_id, request_id, ip_address, user_agent,
-                            quota_check_result, bypass_quota, db_session, chunk_count, config_data
+                            quota_check_result, bypass_quota, db_session, chunk_count, config_data,
+                            cache_status=cache_status
                         )
                     )
                     
+                    completed = True
+                    
                     # Format and yield final chunk
                     final_chunk = self.response_formatter.format_streaming_final_chunk(
                         accumulated_content, final_response, chunk_count, streaming_duration_ms
                     )
+                    if chunk_count == 1:
+                        final_chunk["queue_wait_ms"] = performance_data.get("queue_wait_ms", 0)
                     
                     yield self.response_formatter.add_request_metadata(
                         final_chunk, request_id, session_id, user_id, config_id
@@ -174,8 +253,10 @@ class StreamingHandler(BaseRequestHandler):
                     break
                 else:
                     # Format and yield regular chunk
+                    # The first chunk tells the client how long it waited for a provider slot
                     formatted_chunk = self.response_formatter.format_streaming_chunk(
-                        chunk_data, chunk_count - 1, provider.provider_name
+                        chunk_data, chunk_count - 1, provider.provider_name,
+                        {"queue_wait_ms": performance_data.get("queue_wait_ms", 0)} if chunk_count == 1 else None
                     )
                     
                     yield self.response_formatter.add_request_metadata(
@@ -184,9 +265,19 @@ class StreamingHandler(BaseRequestHandler):
                 
             self.logger.info(f"Streaming completed successfully for user {user_id}: {chunk_count} chunks sent")
             
+        except (asyncio.CancelledError, GeneratorExit) as e:
+            # =============================================================================
+            # STEP 6: CLIENT WENT AWAY - STOP THE PROVIDER (USAGE IS LOGGED BELOW)
+            # =============================================================================
+            
+            if not completed:
+                provider_span.set_attribute("cancelled", True)
+                cancellation = e
+            raise
+            
         except Exception as e:
             # =============================================================================
-            # STEP 5: HANDLE STREAMING ERRORS
+            # STEP 6: HANDLE STREAMING ERRORS
             # =============================================================================
             
             streaming_duration_ms = int(
@@ -199,13 +290,152 @@ class StreamingHandler(BaseRequestHandler):
                     e, user_id, config_id, request_data, performance_data,
                     model, provider, config_data, session_id, request_id,
                     ip_address, user_agent, quota_check_result, chunk_count,
-                    accumulated_content, streaming_duration_ms
+                    "".join(content_parts), streaming_duration_ms
                 )
             )
             
             # Re-raise the error for the caller to handle
+            provider_span.record_error(e)
             self.logger.error(f"Streaming request failed for user {user_id}: {str(e)}")
             raise
+        
+        finally:
+            provider_span.end()
+            # Close the provider stream (and its upstream HTTP response) right away
+            # instead of leaving it to garbage collection
+            if chunk_source is not None:
+                await chunk_source.aclose()
+            
+            # Logged once the chunk source is closed: how a coalesced subscriber
+            # left its flight decides what it is billed
+            if cancellation is not None:
+                streaming_duration_ms = int(
+                    (datetime.utcnow() - streaming_start_time).total_seconds() * 1000
+                )
+                accumulated_content = "".join(content_parts)
+                partial_usage, cost_split = self._cancelled_stream_usage(
+                    chunk_source, flight, chat_request, accumulated_content,
+                    accumulated_usage, config_data, actual_model
+                )
+                
+                asyncio.create_task(
+                    self._log_streaming_error_background(
+                        cancellation, user_id, config_id, request_data, performance_data,
+                        actual_model, provider, config_data, session_id, request_id,
+                        ip_address, user_agent, quota_check_result, chunk_count,
+                        accumulated_content, streaming_duration_ms,
+                        status="cancelled", partial_usage=partial_usage, cost_split=cost_split,
+                        bypass_quota=bypass_quota, db_session=db_session
+                    )
+                )
+                
+                self.logger.info(
+                    f"🛑 Streaming cancelled by client for user {user_id} after {chunk_count} chunks "
+                    f"(~{partial_usage['total_tokens'] if partial_usage else 0} tokens billed)"
+                )
+    
+    def _cancelled_stream_usage(
+        self,
+        chunk_source,
+        flight,
+        chat_request,
+        accumulated_content: str,
+        accumulated_usage: Dict[str, int],
+        config_data: Dict[str, Any],
+        actual_model: str
+    ) -> Tuple[Optional[Dict[str, int]], int]:
+        """
+        Decide what a stream whose client went away is billed.
+        
+        - A coalesced subscriber that is one of the flight's receivers (the
+          final chunk was published before it left) is billed its share of
+          the finished upstream call
+        - One that left a shared flight before that is billed nothing: the
+          upstream call is billed to the receivers or, if everyone left, to
+          the subscriber whose departure cancelled it
+        - Any other stream is billed on its estimated partial usage
+        
+        Returns:
+            Tuple of (usage to bill or None, number of subscribers splitting its cost)
+        """
+        if flight is not None:
+            if chunk_source.counted:
+                usage = flight.final_usage
+                if not usage.get("total_tokens"):
+                    usage = self._estimate_partial_usage(
+                        chat_request, accumulated_content, accumulated_usage, config_data, actual_model
+                    )
+                return usage, flight.receivers
+            if flight.is_shared and not chunk_source.cancelled_upstream:
+                return None, 1
+        
+        return self._estimate_partial_usage(
+            chat_request, accumulated_content, accumulated_usage, config_data, actual_model
+        ), 1
+    
+    def _estimate_partial_usage(
+        self,
+        chat_request,
+        accumulated_content: str,
+        accumulated_usage: Dict[str, int],
+        config_data: Dict[str, Any],
+        actual_model: str
+    ) -> Dict[str, int]:
+        """
+        Estimate the tokens consumed by a stream that was cut off.
+        
+        Providers only report usage in the final chunk, so a cancelled stream
+        is billed on the prompt plus the content generated so far.
+        
+        Args:
+            chat_request: The chat request sent to the provider
+            accumulated_content: Content received before cancellation
+            accumulated_usage: Usage reported by the provider so far (usually empty)
+            config_data: Configuration data
+            actual_model: Model serving the request
+            
+        Returns:
+            Usage dict with input, output and total tokens
+        """
+        if accumulated_usage.get("total_tokens"):
+            return dict(accumulated_usage)
+        
+        provider = config_data.get('provider')
+        input_tokens = self.tokenizer_service.count_messages(chat_request.messages, provider, actual_model)
+        output_tokens = self.tokenizer_service.count_text(accumulated_content, provider, actual_model)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
+    
+    async def _stream_admitted(
+        self,
+        provider,
+        chat_request: ChatRequest,
+        config_data: Dict[str, Any],
+        department,
+        performance_data: Dict[str, Any],
+        priority: RequestPriority = RequestPriority.INTERACTIVE
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Stream from the provider once the admission controller lets the call through.
+        
+        The slot is held until the stream ends, fails or is closed by the consumer.
+        """
+        ticket = await self.acquire_admission(
+            chat_request, config_data, department, performance_data, priority
+        )
+        used_tokens = None
+        stream = self._stream_from_provider(provider, chat_request)
+        try:
+            async for chunk in stream:
+                if chunk.get("usage"):
+                    used_tokens = chunk["usage"].get("total_tokens")
+                yield chunk
+        finally:
+            await stream.aclose()
+            self.admission_controller.release(ticket, used_tokens)
     
     async def _stream_from_provider(self, provider, request) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -218,15 +448,15 @@ class StreamingHandler(BaseRequestHandler):
         Yields:
             Dict[str, Any]: Streaming chunks
         """
-        self.logger.info(f"🌊 Attempting to stream from provider: {provider.provider_name}")
-        self.logger.debug(f"Provider type: {type(provider)}")
-        self.logger.debug(f"Provider methods: {[m for m in dir(provider) if 'stream' in m.lower()]}")
-        
         # Prioritize native streaming, fallback to simulated streaming
         if hasattr(provider, 'stream_chat_request'):
-            self.logger.info(f"Using native streaming for {provider.provider_name}")
-            async for chunk in provider.stream_chat_request(request):
-                yield chunk
+            self.logger.debug("Using native streaming for %s", provider.provider_name)
+            stream = provider.stream_chat_request(request)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
         elif hasattr(provider, 'simulate_streaming_response'):
             self.logger.info(f"Using simulated streaming for {provider.provider_name}")
             
@@ -285,6 +515,86 @@ class StreamingHandler(BaseRequestHandler):
                 if not is_final:
                     await asyncio.sleep(0.05)
     
+    async def _replay_cached_response(
+        self,
+        cached,
+        user_id: int,
+        config_id: int,
+        request_data: Dict,
+        performance_data: Dict,
+        session_id: Optional[str],
+        request_id: Optional[str],
+        ip_address: Optional[str],
+        user_agent: Optional[str],
+        chunk_size: int = 256
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Replay a cached response through the normal streaming formatter.
+        
+        Clients see the same chunk/final-chunk shape as a live stream. The
+        request is logged as a zero-cost cache hit and no quota is recorded.
+        
+        Args:
+            cached: CachedResponse from the response cache
+            user_id: User ID
+            config_id: Configuration ID
+            request_data: Request data
+            performance_data: Performance metrics
+            session_id: Session identifier
+            request_id: Request identifier
+            ip_address: Client IP
+            user_agent: Client user agent
+            chunk_size: Characters per replayed chunk
+            
+        Yields:
+            Dict[str, Any]: Formatted streaming chunks
+        """
+        streaming_start_time = datetime.utcnow()
+        content = cached.content
+        chunk_count = 0
+        
+        for i in range(0, len(content), chunk_size):
+            chunk_count += 1
+            formatted_chunk = self.response_formatter.format_streaming_chunk(
+                {"content": content[i:i + chunk_size], "is_final": False, "model": cached.model},
+                chunk_count - 1, cached.provider, {"cached": True}
+            )
+            yield self.response_formatter.add_request_metadata(
+                formatted_chunk, request_id, session_id, user_id, config_id
+            )
+        
+        chunk_count += 1
+        streaming_duration_ms = int((datetime.utcnow() - streaming_start_time).total_seconds() * 1000)
+        final_response = cached.to_chat_response(streaming_duration_ms)
+        
+        performance_data.update({
+            "request_completed_at": datetime.utcnow().isoformat(),
+            "response_time_ms": streaming_duration_ms,
+            "chunks_sent": chunk_count
+        })
+        
+        response_data = self.usage_logger.create_success_response_data(
+            final_response, streaming=True, chunks_sent=chunk_count, cache_status="hit"
+        )
+        
+        asyncio.create_task(
+            self.usage_logger.log_streaming_usage_background(
+                user_id, config_id, request_data, response_data, performance_data,
+                session_id, request_id, ip_address, user_agent, final_response, True, None
+            )
+        )
+        
+        final_chunk = self.response_formatter.format_streaming_final_chunk(
+            content, final_response, chunk_count, streaming_duration_ms
+        )
+        final_chunk["cached"] = True
+        
+        yield self.response_formatter.add_request_metadata(
+            final_chunk, request_id, session_id, user_id, config_id
+        )
+        
+        self.logger.info(f"⚡ Replayed cached response for user {user_id}: {chunk_count} chunks")
+    
     async def _create_final_response(
         self,
         accumulated_content: str,
@@ -320,6 +630,7 @@ class StreamingHandler(BaseRequestHandler):
             response_time_ms=streaming_duration_ms
         )
     
+    @traced("usage_logging")
     async def _log_streaming_success_background(
         self,
         user_id: int,
@@ -335,7 +646,8 @@ class StreamingHandler(BaseRequestHandler):
         bypass_quota: bool,
         db_session: Session,
         chunk_count: int,
-        config_data: Dict[str, Any]
+        config_data: Dict[str, Any],
+        cache_status: Optional[str] = None
     ):
         """
         Background task for logging successful streaming requests.
@@ -355,6 +667,7 @@ class StreamingHandler(BaseRequestHandler):
             db_session: Database session
             chunk_count: Number of chunks sent
             config_data: Configuration data
+            cache_status: Response cache outcome for cacheable requests (optional)
         """
         try:
             # Update performance data
@@ -370,7 +683,8 @@ class StreamingHandler(BaseRequestHandler):
                 streaming=True,
                 chunks_sent=chunk_count,
                 quota_check_passed=quota_check_result is not None,
-                quota_details=quota_check_result.quota_details if quota_check_result else {}
+                quota_details=quota_check_result.quota_details if quota_check_result else {},
+                cache_status=cache_status
             )
             
             # Log the streaming request
@@ -384,6 +698,7 @@ class StreamingHandler(BaseRequestHandler):
         except Exception as e:
             self.logger.error(f"Failed to log streaming success: {str(e)}")
     
+    @traced("usage_logging")
     async def _log_streaming_error_background(
         self,
         error: Exception,
@@ -401,10 +716,18 @@ class StreamingHandler(BaseRequestHandler):
         quota_check_result,
         chunk_count: int,
         partial_content: str,
-        streaming_duration_ms: int
+        streaming_duration_ms: int,
+        status: str = "error",
+        partial_usage: Optional[Dict[str, int]] = None,
+        cost_split: int = 1,
+        bypass_quota: bool = False,
+        db_session: Optional[Session] = None
     ):
         """
-        Background task for logging streaming errors.
+        Background task for logging streaming errors and cancellations.
+        
+        Cancelled streams are logged with the partial usage they consumed, and
+        that usage is recorded against quotas like a completed request.
         
         Args:
             error: Exception that occurred
@@ -423,6 +746,11 @@ class StreamingHandler(BaseRequestHandler):
             chunk_count: Number of chunks sent before error
             partial_content: Content received before error
             streaming_duration_ms: Duration before error
+            status: "error", or "cancelled" when the client disconnected
+            partial_usage: Tokens consumed before the stream stopped (optional)
+            cost_split: Coalesced subscribers sharing that cost (the logged cost is divided by it)
+            bypass_quota: Whether quota was bypassed
+            db_session: Database session for recording partial quota usage (optional)
         """
         try:
             # Update performance data
@@ -430,26 +758,41 @@ class StreamingHandler(BaseRequestHandler):
                 "request_completed_at": datetime.utcnow().isoformat(),
                 "response_time_ms": streaming_duration_ms,
                 "chunks_sent": chunk_count,
-                "error_during_streaming": True,
+                "error_during_streaming": status != "cancelled",
+                "cancelled": status == "cancelled",
                 "partial_content_length": len(partial_content)
             })
             
+            model = model or config_data['default_model']
+            partial_response = None
+            if partial_usage and partial_usage.get("total_tokens"):
+                partial_response = await self._create_final_response(
+                    partial_content, partial_usage, model, config_data,
+                    provider.provider_name, streaming_duration_ms
+                )
+                if cost_split > 1 and partial_response.cost:
+                    partial_response.cost = partial_response.cost / cost_split
+            
             # Create error response data
             response_data = self.usage_logger.create_error_response_data(
                 error,
-                model or config_data['default_model'],
+                model,
                 provider.provider_name,
                 streaming=True,
                 chunks_sent=chunk_count,
                 partial_content=partial_content,
-                quota_check_passed=False,
-                quota_details=quota_check_result.quota_details if quota_check_result else {}
+                quota_check_passed=quota_check_result is not None and status == "cancelled",
+                quota_details=quota_check_result.quota_details if quota_check_result else {},
+                status=status,
+                token_usage=partial_response.usage if partial_response else None,
+                cost=partial_response.cost if partial_response else None
             )
             
-            # Log the failed streaming request
+            # Log the failed/cancelled streaming request
             await self.usage_logger.log_streaming_usage_background(
                 user_id, config_id, request_data, response_data, performance_data,
-                session_id, request_id, ip_address, user_agent, None, False, None
+                session_id, request_id, ip_address, user_agent, partial_response, bypass_quota,
+                db_session if partial_response else None
             )
             
             self.logger.debug(f"Successfully logged streaming error for user {user_id}")
@@ -6,6 +6,7 @@ import logging
 
 from ...models.llm_config import LLMConfiguration
 from .core.orchestrator import get_llm_orchestrator
+from .core.priority_lanes import RequestPriority
 from .models import ChatResponse
 from .exceptions import LLMServiceError
 
@@ -47,7 +48,9 @@ class LLMService:
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
         assistant_id: Optional[int] = None,
+        conversation_id: Optional[int] = None,
         bypass_quota: bool = False,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
         **kwargs
     ) -> ChatResponse:
         """
@@ -68,7 +71,9 @@ class LLMService:
             ip_address: Client IP address (optional)
             user_agent: Client user agent string (optional)
             assistant_id: ID of custom assistant being used (optional)
+            conversation_id: Conversation the request belongs to, for context trimming (optional)
             bypass_quota: If True, skip quota checking (admin only)
+            priority: Scheduling lane (interactive, background or batch)
             **kwargs: Additional provider-specific parameters
             
         Returns:
@@ -91,7 +96,9 @@ class LLMService:
             ip_address=ip_address,
             user_agent=user_agent,
             assistant_id=assistant_id,
+            conversation_id=conversation_id,
             bypass_quota=bypass_quota,
+            priority=priority,
             **kwargs
         )
     
@@ -107,7 +114,10 @@ class LLMService:
         request_id: Optional[str] = None,
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
+        assistant_id: Optional[int] = None,
+        conversation_id: Optional[int] = None,
         bypass_quota: bool = False,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
         **kwargs
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -127,7 +137,10 @@ class LLMService:
             request_id: Unique request identifier for tracing (optional)
             ip_address: Client IP address (optional)
             user_agent: Client user agent (optional)
+            assistant_id: ID of custom assistant being used (optional)
+            conversation_id: Conversation the request belongs to, for context trimming (optional)
             bypass_quota: If True, skip quota checking (admin only)
+            priority: Scheduling lane (interactive, background or batch)
             **kwargs: Additional provider-specific parameters
             
         Yields:
@@ -146,7 +159,10 @@ class LLMService:
             request_id=request_id,
             ip_address=ip_address,
             user_agent=user_agent,
+            assistant_id=assistant_id,
+            conversation_id=conversation_id,
             bypass_quota=bypass_quota,
+            priority=priority,
             **kwargs
         ):
             yield chunk
@@ -230,10 +230,82 @@ class StreamingChunk:
         return f"StreamingChunk(index={self.chunk_index}, content='{self.content[:30]}...'{final_marker})"
 
 
+class ProviderBatchStatus:
+    """
+    Progress of a job submitted to a provider batch API (normalized across providers).
+    """
+    
+    # Normalized states
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    
+    def __init__(
+        self,
+        batch_id: str,
+        status: str,
+        total: int = 0,
+        completed: int = 0,
+        failed: int = 0,
+        error: Optional[str] = None
+    ):
+        """
+        Initialize a batch status.
+        
+        Args:
+            batch_id: Provider's batch identifier
+            status: One of the normalized states above
+            total: Requests in the batch
+            completed: Requests that succeeded so far
+            failed: Requests that failed so far
+            error: Provider error for a failed batch
+        """
+        self.batch_id = batch_id
+        self.status = status
+        self.total = total
+        self.completed = completed
+        self.failed = failed
+        self.error = error
+    
+    @property
+    def is_finished(self) -> bool:
+        """Whether the provider is done with the batch (results can be fetched)."""
+        return self.status != self.IN_PROGRESS
+    
+    def __repr__(self) -> str:
+        return f"ProviderBatchStatus(id='{self.batch_id}', status='{self.status}', {self.completed}/{self.total})"
+
+
+class BatchItemResult:
+    """
+    Outcome of one request of a provider batch: a response or an error.
+    """
+    
+    def __init__(self, custom_id: str, response: Optional[ChatResponse] = None, error: Optional[str] = None):
+        """
+        Initialize a batch item result.
+        
+        Args:
+            custom_id: Identifier the request was submitted with
+            response: Parsed response if the request succeeded
+            error: Error message if it failed
+        """
+        self.custom_id = custom_id
+        self.response = response
+        self.error = error
+    
+    def __repr__(self) -> str:
+        outcome = "ok" if self.response is not None else f"error='{self.error}'"
+        return f"BatchItemResult(custom_id='{self.custom_id}', {outcome})"
+
+
 # Export all models for easy importing
 __all__ = [
     'ChatMessage',
     'ChatRequest', 
     'ChatResponse',
-    'StreamingChunk'
+    'StreamingChunk',
+    'ProviderBatchStatus',
+    'BatchItemResult'
 ]
@@ -0,0 +1,273 @@
+# AI Dock Provider Prompt Caching
+# Cache breakpoint placement and cached-token accounting for provider-side prompt caches
+
+import re
+from typing import Dict, Any, Optional, List, Tuple
+
+from ...core.config import settings
+from .tokenizer import get_tokenizer_service
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Header/footer that process_file_attachments wraps attachment context in
+ATTACHED_FILES_HEADER = "=== ATTACHED FILES ==="
+ATTACHED_FILES_FOOTER = "=== END ATTACHED FILES ==="
+
+# Anthropic accepts at most 4 cache_control breakpoints per request
+ANTHROPIC_MAX_BREAKPOINTS = 4
+
+# Haiku models need a longer prefix before Anthropic will cache it
+ANTHROPIC_HAIKU_MIN_CACHE_TOKENS = 2048
+
+# Cache pricing relative to the normal input price, used when neither the
+# LLM configuration nor LiteLLM provides explicit cached-token prices
+CACHE_PRICE_MULTIPLIERS = {
+    "anthropic": {"read": 0.1, "write": 1.25},
+    "openai": {"read": 0.5, "write": 1.0},
+}
+
+# Trailing whitespace (and the escaped "\n" the chat endpoint inserts) before attachments
+_TRAILING_SEPARATOR = re.compile(r"(?:\s|\\n)+$")
+
+
+# =============================================================================
+# PROMPT LAYOUT
+# =============================================================================
+
+def estimate_prompt_tokens(text: str) -> int:
+    """Token count used to decide whether a prefix is worth caching."""
+    return get_tokenizer_service().count_text(text, "anthropic")
+
+
+def split_attachment_context(content: str) -> Tuple[str, Optional[str]]:
+    """
+    Split a user message into the typed text and the attached file context.
+
+    Args:
+        content: User message content, possibly with attachments appended
+
+    Returns:
+        Tuple of (message text, attachment context or None)
+    """
+    if not content:
+        return content, None
+
+    index = content.find(ATTACHED_FILES_HEADER)
+    if index < 0:
+        return content, None
+
+    question = _TRAILING_SEPARATOR.sub("", content[:index])
+    return question, content[index:]
+
+
+def order_attachments_first(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Move attached file context in front of the text of the last user message.
+
+    Attachments are large and repeat across regenerations and reworded
+    questions, while the typed text changes. Putting them first extends the
+    stable prefix that OpenAI's automatic prompt cache can match. Earlier
+    messages are never touched, so the history prefix stays byte-identical.
+
+    Args:
+        messages: Provider-format message dicts (not modified)
+
+    Returns:
+        New message list
+    """
+    messages = list(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].get("role") != "user":
+            continue
+        question, attachments = split_attachment_context(messages[i].get("content"))
+        if attachments:
+            content = f"{attachments}\n\n{question}" if question else attachments
+            messages[i] = {**messages[i], "content": content}
+        break
+    return messages
+
+
+def min_cacheable_tokens(model: Optional[str]) -> int:
+    """Minimum prefix length (in tokens) the provider will cache for this model."""
+    if model and "haiku" in model.lower():
+        return max(settings.prompt_cache_min_tokens, ANTHROPIC_HAIKU_MIN_CACHE_TOKENS)
+    return settings.prompt_cache_min_tokens
+
+
+def _cached_text_block(text: str) -> Dict[str, Any]:
+    """Text content block marked as a cache breakpoint."""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def apply_anthropic_cache_breakpoints(
+    system_message: Optional[str],
+    messages: List[Dict[str, Any]],
+    model: Optional[str]
+) -> Tuple[Any, List[Dict[str, Any]]]:
+    """
+    Place Anthropic cache_control breakpoints on the stable parts of a prompt.
+
+    Breakpoints go, in prefix order, on:
+    1. The system prompt (assistant instructions rarely change)
+    2. The last message before the current user turn (conversation history)
+    3. The attached file context of the current user turn, moved in front
+       of the typed text so regenerations and reworded questions reuse it
+
+    A breakpoint is only placed once the prefix it closes is long enough for
+    Anthropic to cache; shorter prompts are sent unchanged.
+
+    Args:
+        system_message: System prompt, if any
+        messages: Anthropic-format messages with string content (not modified)
+        model: Model name (Haiku has a higher minimum)
+
+    Returns:
+        Tuple of (system value for the payload, messages for the payload)
+    """
+    if not settings.prompt_cache_enabled:
+        return system_message, messages
+
+    threshold = min_cacheable_tokens(model)
+    breakpoints = 0
+    prefix_tokens = estimate_prompt_tokens(system_message)
+
+    system_value: Any = system_message
+    if system_message and prefix_tokens >= threshold:
+        system_value = [_cached_text_block(system_message)]
+        breakpoints += 1
+
+    messages = list(messages)
+    last_user_index = next(
+        (i for i in range(len(messages) - 1, -1, -1) if messages[i].get("role") == "user"),
+        None
+    )
+    if last_user_index is None:
+        return system_value, messages
+
+    # Conversation history up to (not including) the current user turn
+    history_tokens = prefix_tokens + sum(
+        estimate_prompt_tokens(msg.get("content")) for msg in messages[:last_user_index]
+    )
+    if last_user_index > 0 and history_tokens >= threshold and breakpoints < ANTHROPIC_MAX_BREAKPOINTS:
+        previous = messages[last_user_index - 1]
+        if isinstance(previous.get("content"), str) and previous["content"]:
+            messages[last_user_index - 1] = {
+                **previous,
+                "content": [_cached_text_block(previous["content"])]
+            }
+            breakpoints += 1
+
+    # Attachment context of the current user turn
+    current = messages[last_user_index]
+    question, attachments = split_attachment_context(current.get("content"))
+    if attachments:
+        attachment_tokens = history_tokens + estimate_prompt_tokens(attachments)
+        if attachment_tokens >= threshold and breakpoints < ANTHROPIC_MAX_BREAKPOINTS:
+            blocks = [_cached_text_block(attachments)]
+        else:
+            blocks = [{"type": "text", "text": attachments}]
+        if question:
+            blocks.append({"type": "text", "text": question})
+        messages[last_user_index] = {**current, "content": blocks}
+
+    return system_value, messages
+
+
+# =============================================================================
+# USAGE AND PRICING
+# =============================================================================
+
+def normalize_anthropic_usage(raw_usage: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Convert Anthropic usage to our usage format.
+
+    Anthropic reports cache reads and writes separately from input_tokens;
+    our input_tokens is the full prompt size so quotas stay comparable
+    across providers, with the cached parts broken out alongside.
+    """
+    raw_usage = raw_usage or {}
+    cache_read = raw_usage.get("cache_read_input_tokens") or 0
+    cache_creation = raw_usage.get("cache_creation_input_tokens") or 0
+    input_tokens = (raw_usage.get("input_tokens") or 0) + cache_read + cache_creation
+    output_tokens = raw_usage.get("output_tokens") or 0
+
+    usage = {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens
+    }
+    if cache_read:
+        usage["cache_read_input_tokens"] = cache_read
+    if cache_creation:
+        usage["cache_creation_input_tokens"] = cache_creation
+    return usage
+
+
+def normalize_openai_usage(raw_usage: Dict[str, Any]) -> Dict[str, int]:
+    """Convert OpenAI usage (prompt_tokens already includes cached tokens) to our usage format."""
+    raw_usage = raw_usage or {}
+    usage = {
+        "input_tokens": raw_usage.get("prompt_tokens", 0),
+        "output_tokens": raw_usage.get("completion_tokens", 0),
+        "total_tokens": raw_usage.get("total_tokens", 0)
+    }
+    cached = (raw_usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    if cached:
+        usage["cache_read_input_tokens"] = cached
+    return usage
+
+
+def cached_token_cost_adjustment(
+    usage: Dict[str, Any],
+    cost_per_1k_input: Optional[float],
+    provider: Any,
+    cache_read_cost_per_1k: Optional[float] = None,
+    cache_creation_cost_per_1k: Optional[float] = None
+) -> float:
+    """
+    Correction to apply to a cost that billed every input token at the normal rate.
+
+    Cache reads are cheaper than normal input (negative adjustment), Anthropic
+    cache writes are more expensive (positive adjustment).
+
+    Args:
+        usage: Usage dict with input_tokens and optional cache token counts
+        cost_per_1k_input: Normal input price per 1k tokens
+        provider: Provider value ("openai", "anthropic", ...) or LLMProvider
+        cache_read_cost_per_1k: Explicit cache read price, if known
+        cache_creation_cost_per_1k: Explicit cache write price, if known
+
+    Returns:
+        Cost delta in USD
+    """
+    cache_read = (usage or {}).get("cache_read_input_tokens") or 0
+    cache_creation = (usage or {}).get("cache_creation_input_tokens") or 0
+    if not cost_per_1k_input or not (cache_read or cache_creation):
+        return 0.0
+
+    base_rate = float(cost_per_1k_input)
+    provider = getattr(provider, "value", provider) or ""  # Accept LLMProvider enums too
+    multipliers = CACHE_PRICE_MULTIPLIERS.get(provider.lower(), {"read": 1.0, "write": 1.0})
+
+    read_rate = float(cache_read_cost_per_1k) if cache_read_cost_per_1k is not None else base_rate * multipliers["read"]
+    write_rate = float(cache_creation_cost_per_1k) if cache_creation_cost_per_1k is not None else base_rate * multipliers["write"]
+
+    return (
+        (cache_read / 1000) * (read_rate - base_rate) +
+        (cache_creation / 1000) * (write_rate - base_rate)
+    )
+
+
+__all__ = [
+    'ATTACHED_FILES_HEADER',
+    'ATTACHED_FILES_FOOTER',
+    'split_attachment_context',
+    'order_attachments_first',
+    'apply_anthropic_cache_breakpoints',
+    'normalize_anthropic_usage',
+    'normalize_openai_usage',
+    'cached_token_cost_adjustment'
+]
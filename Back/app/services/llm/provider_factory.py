@@ -4,6 +4,7 @@
 from typing import Dict, Type
 import logging
 
+from app.core.config import settings
 from app.models.llm_config import LLMConfiguration, LLMProvider
 from .exceptions import LLMServiceError
 from .providers.base import BaseLLMProvider
@@ -66,8 +67,13 @@ class LLMProviderFactory:
                 del self._provider_cache[config.id]
         
         # Create new provider instance
-        provider_class = self._get_provider_class(config.provider)
-        provider = provider_class(config)
+        if settings.mock_llm_provider_enabled:
+            # Offline development/testing: every configuration answers with the mock
+            from app.services.mock_llm_provider import MockLLMProvider
+            provider = MockLLMProvider(config)
+        else:
+            provider_class = self._get_provider_class(config.provider)
+            provider = provider_class(config)
         
         # Cache it for future use
         self._provider_cache[config.id] = provider
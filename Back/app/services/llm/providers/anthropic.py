@@ -5,11 +5,13 @@ import httpx
 import time
 import json
 import asyncio
-from typing import Dict, Any, Optional, AsyncGenerator
+from typing import Dict, Any, Optional, AsyncGenerator, List, Tuple
 
 from app.models.llm_config import LLMProvider
 from ..exceptions import LLMProviderError, LLMConfigurationError, LLMQuotaExceededError
-from ..models import ChatRequest, ChatResponse, ChatMessage
+from ..models import ChatRequest, ChatResponse, ChatMessage, ProviderBatchStatus, BatchItemResult
+from ..prompt_cache import apply_anthropic_cache_breakpoints, normalize_anthropic_usage
+from ..tokenizer import get_tokenizer_service
 from .base import BaseLLMProvider
 
 
@@ -39,46 +41,7 @@ class AnthropicProvider(BaseLLMProvider):
         """
         self._validate_configuration()
         
-        # Claude requires at least max_tokens to be specified
-        max_tokens = (
-            request.max_tokens or 
-            (self.config.model_parameters or {}).get("max_tokens") or 
-            4000  # Default fallback
-        )
-        
-        # Build request payload in Anthropic format
-        payload = {
-            "model": request.model or self.config.default_model,
-            "max_tokens": max_tokens,
-            "messages": []
-        }
-        
-        # Convert messages to Anthropic format
-        # Note: Anthropic doesn't support 'system' role in messages array
-        # System messages need to be handled differently
-        system_message = None
-        for msg in request.messages:
-            if msg.role == "system":
-                # Store system message separately
-                system_message = msg.content
-            else:
-                payload["messages"].append({
-                    "role": msg.role,
-                    "content": msg.content
-                })
-        
-        # Add system message if present
-        if system_message:
-            payload["system"] = system_message
-        
-        # Add optional parameters
-        if request.temperature is not None:
-            payload["temperature"] = request.temperature
-        elif self.config.model_parameters and "temperature" in self.config.model_parameters:
-            payload["temperature"] = self.config.model_parameters["temperature"]
-        
-        # Add any extra parameters
-        payload.update(request.extra_params)
+        payload = self._build_payload(request)
         
         # Record start time
         start_time = time.time()
@@ -93,8 +56,7 @@ class AnthropicProvider(BaseLLMProvider):
                 url = f"{endpoint_base}/v1/messages"
                 
                 # Add debug logging for the URL and headers
-                self.logger.debug(f"Making POST request to: {url}")
-                self.logger.debug(f"Request headers: {client.headers}")
+                self.logger.debug("Making POST request to: %s", url)
                 
                 response = await client.post(
                     url,
@@ -139,11 +101,59 @@ class AnthropicProvider(BaseLLMProvider):
                         error_details={"network_error": str(e)}
                     )
     
+    def _build_payload(self, request: ChatRequest) -> Dict[str, Any]:
+        """Build a Messages API request body (shared by live and batch requests)."""
+        # Claude requires at least max_tokens to be specified
+        max_tokens = (
+            request.max_tokens or 
+            (self.config.model_parameters or {}).get("max_tokens") or 
+            4000  # Default fallback
+        )
+        
+        # Build request payload in Anthropic format
+        payload = {
+            "model": request.model or self.config.default_model,
+            "max_tokens": max_tokens,
+            "messages": []
+        }
+        
+        # Convert messages to Anthropic format
+        # Note: Anthropic doesn't support 'system' role in messages array
+        # System messages need to be handled differently
+        # (several system messages - e.g. assistant prompt + conversation summary - are joined)
+        system_parts = []
+        for msg in request.messages:
+            if msg.role == "system":
+                # Store system message separately
+                system_parts.append(msg.content)
+            else:
+                payload["messages"].append({
+                    "role": msg.role,
+                    "content": msg.content
+                })
+        
+        # Add system message if present, with prompt cache breakpoints on stable prefixes
+        system_message = "\n\n".join(system_parts) or None
+        system_value, payload["messages"] = apply_anthropic_cache_breakpoints(
+            system_message, payload["messages"], payload["model"]
+        )
+        if system_value:
+            payload["system"] = system_value
+        
+        # Add optional parameters
+        if request.temperature is not None:
+            payload["temperature"] = request.temperature
+        elif self.config.model_parameters and "temperature" in self.config.model_parameters:
+            payload["temperature"] = self.config.model_parameters["temperature"]
+        
+        # Add any extra parameters
+        payload.update(request.extra_params)
+        return payload
+    
     async def _process_claude_success_response(self, response: httpx.Response, response_time_ms: int) -> ChatResponse:
         """Process successful Anthropic API response."""
         try:
             data = response.json()
-            self.logger.info(f"Anthropic API response data: {data}")
         except Exception as e:
             self.logger.error(f"Failed to parse Anthropic response as JSON: {e}")
             self.logger.error(f"Response text: {response.text}")
@@ -152,7 +162,10 @@ class AnthropicProvider(BaseLLMProvider):
                 provider=self.provider_name,
                 error_details={"response_text": response.text}
             )
-        
+        return self._message_to_response(data, response_time_ms)
+    
+    def _message_to_response(self, data: Dict[str, Any], response_time_ms: Optional[int]) -> ChatResponse:
+        """Convert a Messages API response body into our unified response."""
         # Claude response format:
         # {
         #   "content": [{"text": "Hello! How can I help?", "type": "text"}],
@@ -163,29 +176,21 @@ class AnthropicProvider(BaseLLMProvider):
         # Extract content (Claude returns array of content blocks)
         content = ""
         if data.get("content"):
-            self.logger.info(f"Processing content blocks: {data.get('content')}")
             for block in data["content"]:
                 if block.get("type") == "text":
                     content += block.get("text", "")
         else:
-            self.logger.warning(f"No content found in Anthropic response: {data}")
+            self.logger.warning(f"No content found in Anthropic response (keys: {sorted(data)})")
         
         model = data.get("model", "unknown")
-        self.logger.info(f"Extracted content length: {len(content)}, model: {model}")
         
-        # Extract usage information
+        # Extract usage information (including prompt cache reads/writes)
         usage = {}
         if "usage" in data:
-            usage = {
-                "input_tokens": data["usage"].get("input_tokens", 0),
-                "output_tokens": data["usage"].get("output_tokens", 0),
-                "total_tokens": data["usage"].get("input_tokens", 0) + data["usage"].get("output_tokens", 0)
-            }
-            self.logger.info(f"Usage data: {usage}")
+            usage = normalize_anthropic_usage(data["usage"])
         
         # Calculate cost
         cost = self._calculate_actual_cost(usage)
-        self.logger.info(f"Calculated cost: {cost}")
         
         chat_response = ChatResponse(
             content=content,
@@ -197,7 +202,8 @@ class AnthropicProvider(BaseLLMProvider):
             raw_response=data
         )
         
-        self.logger.info(f"Created ChatResponse: content_length={len(chat_response.content)}, model={chat_response.model}")
+        self.logger.debug("Created ChatResponse: content_length=%d, model=%s, usage=%s, cost=%s",
+                          len(chat_response.content), chat_response.model, usage, cost)
         return chat_response
     
     async def _handle_claude_error_response(self, response: httpx.Response) -> None:
@@ -258,9 +264,10 @@ class AnthropicProvider(BaseLLMProvider):
         if not self.config.has_cost_tracking:
             return None
         
-        # Similar to OpenAI estimation
-        total_chars = sum(len(msg.content) for msg in request.messages)
-        estimated_input_tokens = total_chars // 4
+        # Count input tokens with the model's tokenizer
+        estimated_input_tokens = get_tokenizer_service().count_messages(
+            request.messages, self.config.provider, request.model or self.config.default_model
+        )
         
         # Claude typically generates fewer tokens than requested max
         max_tokens = request.max_tokens or self.config.model_parameters.get("max_tokens", 4000)
@@ -302,41 +309,9 @@ class AnthropicProvider(BaseLLMProvider):
         """
         self._validate_configuration()
         
-        # Build Anthropic streaming request
-        max_tokens = (
-            request.max_tokens or 
-            (self.config.model_parameters or {}).get("max_tokens") or 
-            4000
-        )
-        
-        payload = {
-            "model": request.model or self.config.default_model,
-            "max_tokens": max_tokens,
-            "messages": [],
-            "stream": True  # Enable native streaming
-        }
-        
-        # Convert messages to Anthropic format
-        system_message = None
-        for msg in request.messages:
-            if msg.role == "system":
-                system_message = msg.content
-            else:
-                payload["messages"].append({
-                    "role": msg.role,
-                    "content": msg.content
-                })
-        
-        if system_message:
-            payload["system"] = system_message
-        
-        # Add optional parameters
-        if request.temperature is not None:
-            payload["temperature"] = request.temperature
-        elif self.config.model_parameters and "temperature" in self.config.model_parameters:
-            payload["temperature"] = self.config.model_parameters["temperature"]
-        
-        payload.update(request.extra_params)
+        # Same request body as a live request, with native streaming enabled
+        payload = self._build_payload(request)
+        payload["stream"] = True
         
         start_time = time.time()
         
@@ -359,7 +334,7 @@ class AnthropicProvider(BaseLLMProvider):
                         await self._handle_claude_error_response(response)
                     
                     # Process Anthropic SSE streaming response
-                    accumulated_content = ""
+                    content_parts: List[str] = []
                     model_name = payload["model"]
                     usage_data = {}
                     chunk_count = 0
@@ -395,7 +370,7 @@ class AnthropicProvider(BaseLLMProvider):
                                     if delta.get("type") == "text_delta":
                                         text_content = delta.get("text", "")
                                         if text_content:
-                                            accumulated_content += text_content
+                                            content_parts.append(text_content)
                                             
                                             # Yield content chunk
                                             yield {
@@ -416,15 +391,12 @@ class AnthropicProvider(BaseLLMProvider):
                                     # End of stream - send final chunk with usage/cost
                                     response_time_ms = int((time.time() - start_time) * 1000)
                                     
-                                    # Calculate final usage
-                                    final_usage = {
-                                        "input_tokens": usage_data.get("input_tokens", 0),
-                                        "output_tokens": usage_data.get("output_tokens", 0),
-                                        "total_tokens": usage_data.get("input_tokens", 0) + usage_data.get("output_tokens", 0)
-                                    }
+                                    # Calculate final usage (including prompt cache reads/writes)
+                                    final_usage = normalize_anthropic_usage(usage_data)
                                     
                                     # Calculate cost
                                     cost = self._calculate_actual_cost(final_usage)
+                                    accumulated_content = "".join(content_parts)
                                     
                                     # Final chunk
                                     yield {
@@ -536,6 +508,124 @@ class AnthropicProvider(BaseLLMProvider):
                 "provider": self.provider_name
             }
     
+    # =============================================================================
+    # MESSAGE BATCHES SUPPORT FOR ANTHROPIC
+    # =============================================================================
+    
+    supports_batch_api = True
+    batch_cost_multiplier = 0.5  # Message batches cost half the live rate
+    
+    async def submit_batch(self, requests: List[Tuple[str, ChatRequest]]) -> str:
+        """
+        Create a message batch.
+        
+        POST /v1/messages/batches {"requests": [{"custom_id": "...", "params": {...}}]}
+        """
+        self._validate_configuration()
+        
+        payload = {
+            "requests": [
+                {"custom_id": custom_id, "params": self._build_payload(request)}
+                for custom_id, request in requests
+            ]
+        }
+        
+        async with self._get_http_client() as client:
+            response = await self._batch_call(client.post(self._batches_url(), json=payload))
+        
+        batch_id = response.json()["id"]
+        self.logger.info(f"Submitted Anthropic message batch {batch_id} with {len(requests)} requests")
+        return batch_id
+    
+    async def get_batch_status(self, batch_id: str) -> ProviderBatchStatus:
+        """Get batch progress: GET /v1/messages/batches/{batch_id}."""
+        data = await self._get_batch(batch_id)
+        counts = data.get("request_counts") or {}
+        failed = counts.get("errored", 0) + counts.get("canceled", 0) + counts.get("expired", 0)
+        completed = counts.get("succeeded", 0)
+        
+        if data.get("processing_status") != "ended":
+            status = ProviderBatchStatus.IN_PROGRESS
+        elif data.get("cancel_initiated_at"):
+            status = ProviderBatchStatus.CANCELLED
+        else:
+            status = ProviderBatchStatus.COMPLETED
+        
+        return ProviderBatchStatus(
+            batch_id=batch_id,
+            status=status,
+            total=completed + failed + counts.get("processing", 0),
+            completed=completed,
+            failed=failed
+        )
+    
+    async def get_batch_results(self, batch_id: str) -> List[BatchItemResult]:
+        """
+        Read the results JSONL of an ended batch.
+        
+        Each line is {"custom_id", "result": {"type": "succeeded", "message": {...}}}
+        or a result of type errored/canceled/expired.
+        """
+        data = await self._get_batch(batch_id)
+        if not data.get("results_url"):
+            return []
+        
+        async with self._get_http_client() as client:
+            response = await self._batch_call(client.get(data["results_url"]))
+        
+        results = []
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            result = item.get("result") or {}
+            if result.get("type") == "succeeded":
+                results.append(BatchItemResult(
+                    item.get("custom_id", ""),
+                    response=self._batch_response(self._message_to_response(result["message"], None))
+                ))
+            else:
+                error = (result.get("error") or {}).get("error") or result.get("error") or {}
+                results.append(BatchItemResult(
+                    item.get("custom_id", ""),
+                    error=error.get("message") or f"Request {result.get('type', 'failed')}"
+                ))
+        return results
+    
+    async def cancel_batch(self, batch_id: str) -> None:
+        """Cancel a batch: POST /v1/messages/batches/{batch_id}/cancel."""
+        async with self._get_http_client() as client:
+            await self._batch_call(client.post(f"{self._batches_url()}/{batch_id}/cancel"))
+    
+    def _batches_url(self) -> str:
+        return f"{self.config.api_endpoint.rstrip('/')}/v1/messages/batches"
+    
+    async def _get_batch(self, batch_id: str) -> Dict[str, Any]:
+        async with self._get_http_client() as client:
+            response = await self._batch_call(client.get(f"{self._batches_url()}/{batch_id}"))
+        return response.json()
+    
+    async def _batch_call(self, call) -> httpx.Response:
+        """Await a batch API call, mapping errors like live requests."""
+        try:
+            response = await call
+        except httpx.TimeoutException:
+            raise LLMProviderError(
+                "Batch API request timed out",
+                provider=self.provider_name,
+                error_details={"timeout": True}
+            )
+        except httpx.RequestError as e:
+            raise LLMProviderError(
+                f"Network error: {str(e)}",
+                provider=self.provider_name,
+                error_details={"network_error": str(e)}
+            )
+        
+        if response.status_code != 200:
+            await self._handle_claude_error_response(response)
+        return response
+    
     def get_known_models(self) -> list:
         """
         Get known Claude models since Anthropic doesn't have a public models endpoint.
@@ -2,14 +2,16 @@
 # Abstract base class for all LLM providers
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, AsyncGenerator, List
+from typing import Dict, Any, Optional, AsyncGenerator, List, Tuple
+import asyncio
 import logging
 import httpx
 import time
 
 from app.models.llm_config import LLMConfiguration
-from ..models import ChatRequest, ChatResponse
+from ..models import ChatRequest, ChatResponse, ProviderBatchStatus, BatchItemResult
 from ..exceptions import LLMProviderError
+from ..prompt_cache import cached_token_cost_adjustment
 
 class BaseLLMProvider(ABC):
     """
@@ -132,21 +134,41 @@ class BaseLLMProvider(ABC):
             headers=headers,
             timeout=60.0, # Generous timeout for slow models
             # http2=True # Enable HTTP/2 for potential performance improvements
+            event_hooks={"response": [self._observe_rate_limits]}
+        )
+
+    async def _observe_rate_limits(self, response: httpx.Response) -> None:
+        """
+        Report rate-limit headers of every response to the admission controller.
+
+        Runs as an httpx response hook, before the body is read, so streamed
+        responses are covered as soon as their headers arrive.
+        """
+        from ..core.admission_controller import get_admission_controller
+        get_admission_controller().observe_rate_limits(
+            getattr(self.config, "id", None), response.status_code, response.headers
         )
 
     def _calculate_actual_cost(self, usage: Dict[str, int]) -> Optional[float]:
         """
         Calculate the actual cost of a request based on token usage.
         
+        Prompt-cache reads and writes are priced at their cached rates rather
+        than the normal input rate.
+        
         Args:
-            usage: A dictionary containing 'input_tokens' and 'output_tokens'.
+            usage: A dictionary containing 'input_tokens' and 'output_tokens',
+                   plus optional 'cache_read_input_tokens'/'cache_creation_input_tokens'.
             
         Returns:
             The calculated cost as a float, or None if cost tracking is disabled.
         """
         if not self.config.has_cost_tracking:
             return None
-        return self.config.calculate_request_cost(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        cost = self.config.calculate_request_cost(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        return cost + cached_token_cost_adjustment(
+            usage, self.config.cost_per_1k_input_tokens, self.config.provider
+        )
 
     async def simulate_streaming_response(self, request: ChatRequest) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -201,5 +223,46 @@ class BaseLLMProvider(ABC):
                 "model": "unknown", "provider": self.provider_name
             }
 
+    # =============================================================================
+    # PROVIDER BATCH API (OPTIONAL)
+    # =============================================================================
+
+    # Providers with an asynchronous batch endpoint (cheaper, results within hours)
+    # set this and implement the four methods below
+    supports_batch_api: bool = False
+    # Batch requests are usually billed below the live rate
+    batch_cost_multiplier: float = 1.0
+
+    async def submit_batch(self, requests: List[Tuple[str, ChatRequest]]) -> str:
+        """
+        Submit requests to the provider's batch API.
+        
+        Args:
+            requests: (custom_id, request) pairs; custom ids are letters,
+                      digits, '-' and '_' (at most 64 characters)
+            
+        Returns:
+            The provider's batch id
+        """
+        raise LLMProviderError(f"{self.provider_name} has no batch API", provider=self.provider_name)
+
+    async def get_batch_status(self, batch_id: str) -> ProviderBatchStatus:
+        """Get the progress of a submitted batch."""
+        raise LLMProviderError(f"{self.provider_name} has no batch API", provider=self.provider_name)
+
+    async def get_batch_results(self, batch_id: str) -> List[BatchItemResult]:
+        """Get the results of a finished batch, one per request."""
+        raise LLMProviderError(f"{self.provider_name} has no batch API", provider=self.provider_name)
+
+    async def cancel_batch(self, batch_id: str) -> None:
+        """Ask the provider to stop a submitted batch."""
+        raise LLMProviderError(f"{self.provider_name} has no batch API", provider=self.provider_name)
+
+    def _batch_response(self, response: ChatResponse) -> ChatResponse:
+        """Price a response that came back from the batch API."""
+        if response.cost is not None:
+            response.cost *= self.batch_cost_multiplier
+        return response
+
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(config='{self.config.name}')"
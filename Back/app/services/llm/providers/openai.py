@@ -4,11 +4,14 @@
 import httpx
 import json
 import time
-from typing import Dict, Any, Optional
+import uuid
+from typing import Dict, Any, Optional, List, Tuple
 
 from app.models.llm_config import LLMProvider
 from ..exceptions import LLMProviderError, LLMConfigurationError, LLMQuotaExceededError
-from ..models import ChatRequest, ChatResponse, ChatMessage
+from ..models import ChatRequest, ChatResponse, ChatMessage, ProviderBatchStatus, BatchItemResult
+from ..prompt_cache import order_attachments_first, normalize_openai_usage
+from ..tokenizer import get_tokenizer_service
 from .base import BaseLLMProvider
 
 
@@ -38,25 +41,7 @@ class OpenAIProvider(BaseLLMProvider):
         """
         self._validate_configuration()
         
-        # Build request payload in OpenAI format
-        payload = {
-            "model": request.model or self.config.default_model,
-            "messages": [msg.to_dict() for msg in request.messages]
-        }
-        
-        # Add optional parameters
-        if request.temperature is not None:
-            payload["temperature"] = request.temperature
-        elif self.config.model_parameters and "temperature" in self.config.model_parameters:
-            payload["temperature"] = self.config.model_parameters["temperature"]
-        
-        if request.max_tokens is not None:
-            payload["max_tokens"] = request.max_tokens
-        elif self.config.model_parameters and "max_tokens" in self.config.model_parameters:
-            payload["max_tokens"] = self.config.model_parameters["max_tokens"]
-        
-        # Add any extra parameters from request
-        payload.update(request.extra_params)
+        payload = self._build_payload(request)
         
         # Record start time for performance tracking
         start_time = time.time()
@@ -64,9 +49,9 @@ class OpenAIProvider(BaseLLMProvider):
         # Make the API request
         async with self._get_http_client() as client:
             try:
-                # 🔍 ENHANCED LOGGING: Log exactly what model is being sent to OpenAI API
-                self.logger.info(f"🔍 SENDING TO OPENAI API: model='{payload['model']}', config_default='{self.config.default_model}', request_model_override='{request.model}'")
-                self.logger.info(f"🔍 Full OpenAI payload: {payload}")
+                # Payloads carry user content, so only the model choice is logged
+                self.logger.debug("🔍 Sending to OpenAI API: model='%s', config_default='%s', request_model_override='%s'",
+                                  payload['model'], self.config.default_model, request.model)
                 
                 response = await client.post(
                     f"{self.config.api_endpoint}/chat/completions",
@@ -94,25 +79,45 @@ class OpenAIProvider(BaseLLMProvider):
                     error_details={"network_error": str(e)}
                 )
     
+    def _build_payload(self, request: ChatRequest) -> Dict[str, Any]:
+        """Build a chat completions request body (shared by live and batch requests)."""
+        # Attachments go before the typed text so OpenAI's automatic prefix cache can reuse them
+        payload = {
+            "model": request.model or self.config.default_model,
+            "messages": order_attachments_first([msg.to_dict() for msg in request.messages])
+        }
+        
+        # Add optional parameters
+        if request.temperature is not None:
+            payload["temperature"] = request.temperature
+        elif self.config.model_parameters and "temperature" in self.config.model_parameters:
+            payload["temperature"] = self.config.model_parameters["temperature"]
+        
+        if request.max_tokens is not None:
+            payload["max_tokens"] = request.max_tokens
+        elif self.config.model_parameters and "max_tokens" in self.config.model_parameters:
+            payload["max_tokens"] = self.config.model_parameters["max_tokens"]
+        
+        # Add any extra parameters from request
+        payload.update(request.extra_params)
+        return payload
+    
     async def _process_success_response(self, response: httpx.Response, response_time_ms: int) -> ChatResponse:
         """Process successful OpenAI API response."""
-        data = response.json()
-        
+        return self._completion_to_response(response.json(), response_time_ms)
+    
+    def _completion_to_response(self, data: Dict[str, Any], response_time_ms: Optional[int]) -> ChatResponse:
+        """Convert a chat completion body into our unified response."""
         # Extract response content
         content = data["choices"][0]["message"]["content"]
         model = data["model"]
         
-        # 🔍 ENHANCED LOGGING: Log what model OpenAI actually used
-        self.logger.info(f"🔍 RECEIVED FROM OPENAI API: model='{model}', content_length={len(content)} chars")
+        self.logger.debug("🔍 Received from OpenAI API: model='%s', content_length=%d chars", model, len(content))
         
-        # Extract usage information
+        # Extract usage information (including automatically cached prompt tokens)
         usage = {}
         if "usage" in data:
-            usage = {
-                "input_tokens": data["usage"].get("prompt_tokens", 0),
-                "output_tokens": data["usage"].get("completion_tokens", 0),
-                "total_tokens": data["usage"].get("total_tokens", 0)
-            }
+            usage = normalize_openai_usage(data["usage"])
         
         # Calculate cost
         cost = self._calculate_actual_cost(usage)
@@ -185,10 +190,10 @@ class OpenAIProvider(BaseLLMProvider):
         if not self.config.has_cost_tracking:
             return None
         
-        # Rough estimation: count characters and estimate tokens
-        # 1 token ≈ 4 characters for English text
-        total_chars = sum(len(msg.content) for msg in request.messages)
-        estimated_input_tokens = total_chars // 4
+        # Count input tokens with the model's tokenizer
+        estimated_input_tokens = get_tokenizer_service().count_messages(
+            request.messages, self.config.provider, request.model or self.config.default_model
+        )
         
         # Estimate output tokens (conservative guess)
         max_tokens = request.max_tokens or self.config.model_parameters.get("max_tokens", 1000)
@@ -247,8 +252,9 @@ class OpenAIProvider(BaseLLMProvider):
         """
         Estimate token usage from accumulated content during streaming.
         
-        Since OpenAI doesn't provide usage data in streaming responses,
-        we need to estimate it for cost calculation.
+        OpenAI reports streaming usage only when stream_options.include_usage
+        is honoured; OpenAI-compatible endpoints that ignore it fall back to
+        this estimate for cost calculation.
         
         Args:
             content: The accumulated response content
@@ -257,12 +263,17 @@ class OpenAIProvider(BaseLLMProvider):
         Returns:
             Dictionary with estimated token counts
         """
-        # Estimate input tokens from original messages
-        input_chars = sum(len(str(msg.get("content", ""))) for msg in payload.get("messages", []))
-        estimated_input_tokens = max(1, input_chars // 4)  # ~4 chars per token
+        tokenizer_service = get_tokenizer_service()
+        
+        # Count input tokens from original messages
+        estimated_input_tokens = max(1, tokenizer_service.count_messages(
+            payload.get("messages", []), self.config.provider, payload.get("model")
+        ))
         
-        # Estimate output tokens from response content
-        estimated_output_tokens = max(1, len(content) // 4)
+        # Count output tokens from response content
+        estimated_output_tokens = max(1, tokenizer_service.count_text(
+            content, self.config.provider, payload.get("model")
+        ))
         
         return {
             "input_tokens": estimated_input_tokens,
@@ -289,8 +300,9 @@ class OpenAIProvider(BaseLLMProvider):
         # Build OpenAI streaming request
         payload = {
             "model": request.model or self.config.default_model,
-            "messages": [msg.to_dict() for msg in request.messages],
-            "stream": True  # Enable streaming
+            "messages": order_attachments_first([msg.to_dict() for msg in request.messages]),
+            "stream": True,  # Enable streaming
+            "stream_options": {"include_usage": True}  # Real usage (incl. cached tokens) in the last chunk
         }
         
         # Add optional parameters
@@ -324,8 +336,9 @@ class OpenAIProvider(BaseLLMProvider):
                         await self._handle_error_response(response)
                     
                     # Process streaming response
-                    accumulated_content = ""
+                    content_parts: List[str] = []
                     model_name = payload["model"]
+                    reported_usage = None
                     
                     async for line in response.aiter_lines():
                         if line.startswith("data: "):
@@ -335,8 +348,8 @@ class OpenAIProvider(BaseLLMProvider):
                                 # Streaming finished
                                 response_time_ms = int((time.time() - start_time) * 1000)
                                 
-                                # Calculate final usage and cost
-                                final_usage = self._estimate_usage_from_content(accumulated_content, payload)
+                                # Calculate final usage and cost (estimate if the endpoint sent no usage)
+                                final_usage = reported_usage or self._estimate_usage_from_content("".join(content_parts), payload)
                                 final_cost = self._calculate_actual_cost(final_usage)
                                 
                                 yield {
@@ -354,6 +367,10 @@ class OpenAIProvider(BaseLLMProvider):
                                 # Parse JSON chunk
                                 chunk_data = json.loads(data_str)
                                 
+                                # Usage arrives in a final chunk with no choices
+                                if chunk_data.get("usage"):
+                                    reported_usage = normalize_openai_usage(chunk_data["usage"])
+                                
                                 # Extract content from OpenAI chunk format
                                 choices = chunk_data.get("choices", [])
                                 if choices:
@@ -361,7 +378,7 @@ class OpenAIProvider(BaseLLMProvider):
                                     content = delta.get("content", "")
                                     
                                     if content:
-                                        accumulated_content += content
+                                        content_parts.append(content)
                                         
                                         # Yield content chunk
                                         yield {
@@ -388,6 +405,159 @@ class OpenAIProvider(BaseLLMProvider):
                     error_details={"network_error": str(e), "streaming": True}
                 )
 
+    # =============================================================================
+    # BATCH API SUPPORT FOR OPENAI
+    # =============================================================================
+    
+    supports_batch_api = True
+    batch_cost_multiplier = 0.5  # Batch API requests cost half the live rate
+    
+    # OpenAI batch states -> normalized states
+    _BATCH_STATES = {
+        "validating": ProviderBatchStatus.IN_PROGRESS,
+        "in_progress": ProviderBatchStatus.IN_PROGRESS,
+        "finalizing": ProviderBatchStatus.IN_PROGRESS,
+        "cancelling": ProviderBatchStatus.IN_PROGRESS,
+        "completed": ProviderBatchStatus.COMPLETED,
+        "expired": ProviderBatchStatus.FAILED,
+        "failed": ProviderBatchStatus.FAILED,
+        "cancelled": ProviderBatchStatus.CANCELLED,
+    }
+    
+    async def submit_batch(self, requests: List[Tuple[str, ChatRequest]]) -> str:
+        """
+        Upload the requests as a JSONL file and create a batch from it.
+        
+        POST /files (purpose=batch), then
+        POST /batches {"input_file_id", "endpoint": "/v1/chat/completions", "completion_window": "24h"}
+        """
+        self._validate_configuration()
+        
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._build_payload(request)
+            })
+            for custom_id, request in requests
+        ]
+        
+        # Multipart body built by hand: the client's JSON Content-Type header
+        # would otherwise win over the multipart one
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="purpose"\r\n\r\nbatch\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="batch.jsonl"\r\n'
+            f'Content-Type: application/jsonl\r\n\r\n'
+        ).encode() + "\n".join(lines).encode() + f'\r\n--{boundary}--\r\n'.encode()
+        
+        async with self._get_http_client() as client:
+            response = await self._batch_call(
+                client.post(
+                    f"{self.config.api_endpoint}/files",
+                    content=body,
+                    headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+                )
+            )
+            input_file_id = response.json()["id"]
+            
+            response = await self._batch_call(
+                client.post(
+                    f"{self.config.api_endpoint}/batches",
+                    json={
+                        "input_file_id": input_file_id,
+                        "endpoint": "/v1/chat/completions",
+                        "completion_window": "24h"
+                    }
+                )
+            )
+        
+        batch_id = response.json()["id"]
+        self.logger.info(f"Submitted OpenAI batch {batch_id} with {len(requests)} requests")
+        return batch_id
+    
+    async def get_batch_status(self, batch_id: str) -> ProviderBatchStatus:
+        """Get batch progress: GET /batches/{batch_id}."""
+        data = await self._get_batch(batch_id)
+        counts = data.get("request_counts") or {}
+        errors = (data.get("errors") or {}).get("data") or []
+        
+        return ProviderBatchStatus(
+            batch_id=batch_id,
+            status=self._BATCH_STATES.get(data.get("status"), ProviderBatchStatus.IN_PROGRESS),
+            total=counts.get("total", 0),
+            completed=counts.get("completed", 0),
+            failed=counts.get("failed", 0),
+            error=errors[0].get("message") if errors else None
+        )
+    
+    async def get_batch_results(self, batch_id: str) -> List[BatchItemResult]:
+        """
+        Read the output and error files of a finished batch.
+        
+        Each output line is {"custom_id", "response": {"status_code", "body"}, "error"}.
+        """
+        data = await self._get_batch(batch_id)
+        results = []
+        
+        async with self._get_http_client() as client:
+            for file_id in (data.get("output_file_id"), data.get("error_file_id")):
+                if not file_id:
+                    continue
+                response = await self._batch_call(
+                    client.get(f"{self.config.api_endpoint}/files/{file_id}/content")
+                )
+                for line in response.text.splitlines():
+                    if line.strip():
+                        results.append(self._batch_line_to_result(json.loads(line)))
+        
+        return results
+    
+    async def cancel_batch(self, batch_id: str) -> None:
+        """Cancel a batch: POST /batches/{batch_id}/cancel."""
+        async with self._get_http_client() as client:
+            await self._batch_call(client.post(f"{self.config.api_endpoint}/batches/{batch_id}/cancel"))
+    
+    async def _get_batch(self, batch_id: str) -> Dict[str, Any]:
+        async with self._get_http_client() as client:
+            response = await self._batch_call(client.get(f"{self.config.api_endpoint}/batches/{batch_id}"))
+        return response.json()
+    
+    async def _batch_call(self, call) -> httpx.Response:
+        """Await a batch API call, mapping errors like live requests."""
+        try:
+            response = await call
+        except httpx.TimeoutException:
+            raise LLMProviderError(
+                "Batch API request timed out",
+                provider=self.provider_name,
+                error_details={"timeout": True}
+            )
+        except httpx.RequestError as e:
+            raise LLMProviderError(
+                f"Network error: {str(e)}",
+                provider=self.provider_name,
+                error_details={"network_error": str(e)}
+            )
+        
+        if response.status_code != 200:
+            await self._handle_error_response(response)
+        return response
+    
+    def _batch_line_to_result(self, line: Dict[str, Any]) -> BatchItemResult:
+        custom_id = line.get("custom_id", "")
+        response = line.get("response") or {}
+        
+        if line.get("error") or response.get("status_code") != 200:
+            error = line.get("error") or (response.get("body") or {}).get("error") or {}
+            message = error.get("message") if isinstance(error, dict) else str(error)
+            return BatchItemResult(custom_id, error=message or f"HTTP {response.get('status_code')}")
+        
+        return BatchItemResult(
+            custom_id, response=self._batch_response(self._completion_to_response(response["body"], None))
+        )
+
 
 # Export OpenAI provider
 __all__ = ['OpenAIProvider']
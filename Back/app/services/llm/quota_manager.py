@@ -1,18 +1,21 @@
 # AI Dock LLM Quota Manager
 # Handles quota checking and enforcement for LLM requests
 
+import asyncio
 from typing import Dict, Any, Tuple
 from decimal import Decimal
 import logging
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, update
 
+from app.core.database import SyncSessionLocal
 from app.models.user import User
 from app.models.department import Department
 from ..quota_service import get_quota_service, QuotaService, QuotaCheckResult
 from .exceptions import LLMDepartmentQuotaExceededError, LLMUserNotFoundError
 from .models import ChatRequest, ChatResponse
 from .provider_factory import get_provider_factory
+from .tokenizer import get_tokenizer_service
 
 
 class LLMQuotaManager:
@@ -93,7 +96,7 @@ class LLMQuotaManager:
             LLMDepartmentQuotaExceededError: If quota is exceeded
             LLMUserNotFoundError: If user/department not found
         """
-        self.logger.info(f"Checking quotas for user {user_id}, config {config_id}")
+        self.logger.debug(f"Checking quotas for user {user_id}, config {config_id}")
         
         # Get user and department
         user, department = await self.get_user_with_department(user_id, db_session)
@@ -106,9 +109,12 @@ class LLMQuotaManager:
         provider = self.provider_factory.get_provider(temp_config)
         estimated_cost = provider.estimate_cost(request)
         
-        # Estimate tokens (rough calculation)
-        total_chars = sum(len(msg.content) for msg in request.messages)
-        estimated_tokens = total_chars // 4  # Rough estimate: 1 token ≈ 4 chars
+        # Count input tokens with the model's tokenizer (history counts are cached)
+        estimated_tokens = get_tokenizer_service().count_messages(
+            request.messages,
+            config_data.get('provider'),
+            request.model or config_data.get('default_model')
+        )
         
         # Add estimated output tokens
         model_params = config_data.get('model_parameters') or {}
@@ -133,7 +139,7 @@ class LLMQuotaManager:
                 quota_check_result=quota_result
             )
         
-        self.logger.info(f"Quota check passed for user {user_id}")
+        self.logger.debug(f"Quota check passed for user {user_id}")
         return quota_result
     
     # =============================================================================
@@ -150,8 +156,8 @@ class LLMQuotaManager:
         """
         Record actual usage against department quotas (RELIABLE).
         
-        This version fixes quota recording by using direct database operations
-        without async complications.
+        Usage is added with an atomic UPDATE in the database, so recordings
+        running concurrently (each in its own session) don't lose updates.
         
         Args:
             user_id: User who made the request
@@ -162,7 +168,7 @@ class LLMQuotaManager:
         Returns:
             Dictionary with quota update results
         """
-        self.logger.info(f"🎯 Recording quota usage for user {user_id} (IMPROVED)")
+        self.logger.debug(f"🎯 Recording quota usage for user {user_id} (IMPROVED)")
         
         try:
             # Get user and department with explicit error handling
@@ -193,7 +199,7 @@ class LLMQuotaManager:
             ).all()
             
             if not applicable_quotas:
-                self.logger.info(f"No applicable quotas for department {department.name}")
+                self.logger.debug(f"No applicable quotas for department {department.name}")
                 return {"success": True, "updated_quotas": []}
             
             # Extract usage data
@@ -214,22 +220,36 @@ class LLMQuotaManager:
                     usage_amount = Decimal('1')
                 
                 if usage_amount > 0:
-                    old_usage = quota.current_usage
-                    quota.current_usage += usage_amount
+                    # Increment in SQL: recordings run concurrently in worker threads,
+                    # each with its own session, so a read-modify-write in Python
+                    # would lose updates
+                    new_usage = Decimal(str(db_session.execute(
+                        update(DepartmentQuota)
+                        .where(DepartmentQuota.id == quota.id)
+                        .values(current_usage=DepartmentQuota.current_usage + usage_amount)
+                        .returning(DepartmentQuota.current_usage)
+                        .execution_options(synchronize_session=False)
+                    ).scalar_one()))
+                    old_usage = new_usage - usage_amount
                     
                     # Update status if exceeded
-                    if quota.current_usage >= quota.limit_value:
-                        quota.status = QuotaStatus.EXCEEDED
+                    if new_usage >= quota.limit_value:
+                        db_session.execute(
+                            update(DepartmentQuota)
+                            .where(DepartmentQuota.id == quota.id)
+                            .values(status=QuotaStatus.EXCEEDED)
+                            .execution_options(synchronize_session=False)
+                        )
                     
                     updated_quotas.append({
                         "quota_id": quota.id,
                         "quota_name": quota.name,
                         "usage_before": float(old_usage),
-                        "usage_after": float(quota.current_usage),
+                        "usage_after": float(new_usage),
                         "usage_added": float(usage_amount)
                     })
                     
-                    self.logger.info(f"✅ Updated quota {quota.name}: {old_usage} → {quota.current_usage}")
+                    self.logger.debug(f"✅ Updated quota {quota.name}: {old_usage} → {new_usage}")
             
             # Commit changes
             db_session.commit()
@@ -247,6 +267,34 @@ class LLMQuotaManager:
             self.logger.error(f"❌ Quota recording error: {str(e)}")
             return {"success": False, "error": str(e)}
     
+    async def record_quota_usage_in_thread(
+        self,
+        user_id: int,
+        config_id: int,
+        response: ChatResponse
+    ) -> Dict[str, Any]:
+        """
+        Record usage against department quotas without blocking the event loop.
+        
+        The commit can wait on the database write lock (on SQLite, for as long
+        as the busy timeout), so record_quota_usage_improved runs in a worker
+        thread. It gets a session of its own there: request sessions are not
+        thread-safe, and streaming logs can outlive the request's session.
+        
+        Args:
+            user_id: User who made the request
+            config_id: LLM configuration used
+            response: The chat response with actual usage data
+            
+        Returns:
+            Dictionary with quota update results
+        """
+        def record() -> Dict[str, Any]:
+            with SyncSessionLocal() as db_session:
+                return self.record_quota_usage_improved(user_id, config_id, response, db_session)
+        
+        return await asyncio.to_thread(record)
+    
     async def record_quota_usage(
         self,
         user_id: int,
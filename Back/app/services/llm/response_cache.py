@@ -0,0 +1,474 @@
+# AI Dock LLM Response Cache
+# Exact-match caching of deterministic (temperature=0) chat responses
+
+import json
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+from abc import ABC, abstractmethod
+
+from .models import ChatRequest, ChatResponse
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CANONICAL REQUEST HASHING
+# =============================================================================
+
+def is_deterministic_request(chat_request: ChatRequest, config_data: Dict[str, Any]) -> bool:
+    """
+    Check whether a request has an effective temperature of 0.
+
+    Args:
+        chat_request: Prepared chat request
+        config_data: Configuration data (for default temperature)
+
+    Returns:
+        True if the provider should return the same answer for the same input
+    """
+    temperature = chat_request.temperature
+    if temperature is None:
+        temperature = (config_data.get('model_parameters') or {}).get('temperature')
+    return temperature is not None and float(temperature) == 0.0
+
+def build_request_hash(chat_request: ChatRequest, config_data: Dict[str, Any]) -> str:
+    """
+    Hash everything that can change a deterministic provider answer.
+
+    The configuration's updated_at is included so edits to a config (new key,
+    endpoint or parameters) never match responses produced before the edit.
+
+    Args:
+        chat_request: Prepared chat request
+        config_data: Configuration data
+
+    Returns:
+        Hex SHA-256 digest of the canonical request
+    """
+    canonical = {
+        "config_id": config_data.get('id'),
+        "config_updated_at": str(config_data.get('updated_at')),
+        "model": chat_request.model or config_data.get('default_model'),
+        "messages": [[msg.role, msg.content] for msg in chat_request.messages],
+        "temperature": chat_request.temperature,
+        "max_tokens": chat_request.max_tokens,
+        "extra_params": chat_request.extra_params
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+# =============================================================================
+# CACHE DATA STRUCTURES
+# =============================================================================
+
+@dataclass
+class CachedResponse:
+    """A provider response stored for exact-match replay."""
+    content: str
+    model: str
+    provider: str
+    usage: Dict[str, int]
+    cost: Optional[float]
+    cache_key: str
+    cached_at: datetime
+    expires_at: datetime
+    hit_count: int = 0
+
+    def is_expired(self) -> bool:
+        """Check if cache entry has expired."""
+        return datetime.utcnow() > self.expires_at
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate memory footprint of the cached content."""
+        return len(self.content.encode('utf-8'))
+
+    def to_chat_response(self, response_time_ms: int) -> ChatResponse:
+        """
+        Rebuild a ChatResponse for a cache hit.
+
+        The replayed response is free: cost is zero and the original usage
+        is kept only in raw_response so callers can report what was saved.
+        """
+        return ChatResponse(
+            content=self.content,
+            model=self.model,
+            provider=self.provider,
+            usage={"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+            cost=0.0,
+            response_time_ms=response_time_ms,
+            raw_response={
+                "cache_hit": True,
+                "cache_key": self.cache_key,
+                "cached_at": self.cached_at.isoformat(),
+                "original_usage": self.usage,
+                "original_cost": self.cost
+            }
+        )
+
+# =============================================================================
+# ABSTRACT CACHE INTERFACE
+# =============================================================================
+
+class ResponseCacheInterface(ABC):
+    """Abstract interface for response caching implementations."""
+
+    @abstractmethod
+    async def get(self, cache_key: str) -> Optional[CachedResponse]:
+        """Get a cached response by key."""
+        pass
+
+    @abstractmethod
+    async def set(self, cache_key: str, data: CachedResponse, ttl_seconds: int) -> bool:
+        """Store a response with TTL."""
+        pass
+
+    @abstractmethod
+    async def delete(self, cache_key: str) -> bool:
+        """Delete a cached response by key."""
+        pass
+
+    @abstractmethod
+    async def clear_all(self) -> int:
+        """Clear all cached responses. Returns number of items cleared."""
+        pass
+
+    @abstractmethod
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        pass
+
+# =============================================================================
+# IN-MEMORY LRU IMPLEMENTATION
+# =============================================================================
+
+class InMemoryResponseCache(ResponseCacheInterface):
+    """
+    Size-bounded in-memory LRU cache for chat responses.
+
+    Features:
+    - LRU eviction by entry count and by total content bytes
+    - Lazy TTL expiry (checked on access and on insert)
+    - Statistics tracking for hit rate reporting
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 50 * 1024 * 1024):
+        """
+        Initialize in-memory response cache.
+
+        Args:
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of cached content in bytes
+        """
+        self._cache: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._current_bytes = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "deletes": 0,
+            "evictions": 0,
+            "expired_cleanups": 0
+        }
+
+    def _remove(self, cache_key: str) -> None:
+        """Remove an entry and keep the byte counter in sync (lock must be held)."""
+        data = self._cache.pop(cache_key, None)
+        if data is not None:
+            self._current_bytes -= data.size_bytes
+
+    def _evict_if_needed(self) -> None:
+        """Drop expired entries, then least-recently-used ones until within bounds."""
+        expired_keys = [key for key, data in self._cache.items() if data.is_expired()]
+        for key in expired_keys:
+            self._remove(key)
+            self._stats["expired_cleanups"] += 1
+
+        while self._cache and (
+            len(self._cache) > self._max_entries or self._current_bytes > self._max_bytes
+        ):
+            oldest_key = next(iter(self._cache))
+            self._remove(oldest_key)
+            self._stats["evictions"] += 1
+
+    async def get(self, cache_key: str) -> Optional[CachedResponse]:
+        """Get a cached response by key, refreshing its LRU position."""
+        async with self._lock:
+            data = self._cache.get(cache_key)
+
+            if data is None:
+                self._stats["misses"] += 1
+                return None
+
+            if data.is_expired():
+                self._remove(cache_key)
+                self._stats["misses"] += 1
+                self._stats["expired_cleanups"] += 1
+                return None
+
+            self._cache.move_to_end(cache_key)
+            self._stats["hits"] += 1
+            return data
+
+    async def set(self, cache_key: str, data: CachedResponse, ttl_seconds: int) -> bool:
+        """Store a response with TTL, evicting older entries if needed."""
+        if data.size_bytes > self._max_bytes:
+            logger.debug(f"Response too large to cache ({data.size_bytes} bytes)")
+            return False
+
+        async with self._lock:
+            data.expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+            data.cache_key = cache_key
+
+            self._remove(cache_key)
+            self._cache[cache_key] = data
+            self._current_bytes += data.size_bytes
+            self._stats["sets"] += 1
+
+            self._evict_if_needed()
+            return True
+
+    async def delete(self, cache_key: str) -> bool:
+        """Delete a cached response by key."""
+        async with self._lock:
+            if cache_key in self._cache:
+                self._remove(cache_key)
+                self._stats["deletes"] += 1
+                return True
+            return False
+
+    async def clear_all(self) -> int:
+        """Clear all cached responses."""
+        async with self._lock:
+            count = len(self._cache)
+            self._cache.clear()
+            self._current_bytes = 0
+            logger.info(f"Cleared all {count} response cache entries")
+            return count
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        async with self._lock:
+            total_requests = self._stats["hits"] + self._stats["misses"]
+            hit_rate = (self._stats["hits"] / total_requests) if total_requests > 0 else 0
+
+            return {
+                "cache_type": "in_memory_lru",
+                "entries": len(self._cache),
+                "max_entries": self._max_entries,
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "hit_rate": f"{hit_rate:.2%}",
+                "sets": self._stats["sets"],
+                "deletes": self._stats["deletes"],
+                "evictions": self._stats["evictions"],
+                "expired_cleanups": self._stats["expired_cleanups"],
+                "memory_usage_mb": self._current_bytes / (1024 * 1024),
+                "max_memory_mb": self._max_bytes / (1024 * 1024)
+            }
+
+# =============================================================================
+# CACHE MANAGER
+# =============================================================================
+
+class ResponseCacheManager:
+    """
+    Decides which requests are cacheable and maps them to cache keys.
+
+    Only deterministic requests (effective temperature of 0) from assistants
+    that opted in are cached. The key is a canonical hash of everything that
+    can change the provider's answer: configuration, model, messages (which
+    include the system prompt) and generation parameters.
+    """
+
+    def __init__(
+        self,
+        cache_impl: ResponseCacheInterface,
+        default_ttl_seconds: int = 3600,
+        enabled: bool = True
+    ):
+        """
+        Initialize response cache manager.
+
+        Args:
+            cache_impl: Cache implementation to use
+            default_ttl_seconds: Default TTL for cached responses
+            enabled: Global switch for the response cache
+        """
+        self.cache = cache_impl
+        self.default_ttl = default_ttl_seconds
+        self.enabled = enabled
+
+        logger.info(f"Initialized ResponseCacheManager with {type(cache_impl).__name__} (TTL: {default_ttl_seconds}s, enabled: {enabled})")
+
+    def is_enabled_for_assistant(self, assistant_id: Optional[int], db_session) -> bool:
+        """
+        Check whether an assistant opted in to response caching.
+
+        Args:
+            assistant_id: Assistant used for the request (None for general chat)
+            db_session: Synchronous database session
+
+        Returns:
+            True if the assistant has model_preferences["response_cache"] set
+        """
+        if not self.enabled or not assistant_id or db_session is None:
+            return False
+
+        try:
+            from app.models.assistant import Assistant
+
+            assistant = db_session.get(Assistant, assistant_id)
+            if not assistant or not assistant.is_active:
+                return False
+            return bool(assistant.get_model_preference("response_cache", False))
+        except Exception as e:
+            logger.warning(f"Could not read response cache flag for assistant {assistant_id}: {e}")
+            return False
+
+    def is_request_cacheable(self, chat_request: ChatRequest, config_data: Dict[str, Any]) -> bool:
+        """
+        Check whether a request is deterministic enough to cache.
+
+        Args:
+            chat_request: Prepared chat request
+            config_data: Configuration data (for default temperature)
+
+        Returns:
+            True if the effective temperature is 0
+        """
+        return is_deterministic_request(chat_request, config_data)
+
+    def build_cache_key(self, chat_request: ChatRequest, config_data: Dict[str, Any]) -> str:
+        """
+        Build the canonical cache key for a request.
+
+        Args:
+            chat_request: Prepared chat request
+            config_data: Configuration data
+
+        Returns:
+            Hex SHA-256 digest of the canonical request
+        """
+        return build_request_hash(chat_request, config_data)
+
+    async def get_response(self, cache_key: str) -> Optional[CachedResponse]:
+        """
+        Look up a cached response and account for the saved cost.
+
+        Args:
+            cache_key: Key from build_cache_key
+
+        Returns:
+            Cached response or None on miss
+        """
+        cached = await self.cache.get(cache_key)
+
+        if cached:
+            cached.hit_count += 1
+            logger.info(f"⚡ Response cache HIT (key {cache_key[:12]}, hits: {cached.hit_count})")
+        else:
+            logger.debug(f"Response cache MISS (key {cache_key[:12]})")
+
+        return cached
+
+    async def store_response(
+        self,
+        cache_key: str,
+        response: ChatResponse,
+        ttl_seconds: Optional[int] = None
+    ) -> bool:
+        """
+        Store a successful provider response.
+
+        Args:
+            cache_key: Key from build_cache_key
+            response: Response returned by the provider
+            ttl_seconds: TTL override (uses default if None)
+
+        Returns:
+            True if stored
+        """
+        if not response or not response.content:
+            return False
+
+        ttl = ttl_seconds or self.default_ttl
+        now = datetime.utcnow()
+
+        cached = CachedResponse(
+            content=response.content,
+            model=response.model,
+            provider=response.provider,
+            usage=dict(response.usage or {}),
+            cost=response.cost,
+            cache_key=cache_key,
+            cached_at=now,
+            expires_at=now + timedelta(seconds=ttl)
+        )
+
+        return await self.cache.set(cache_key, cached, ttl)
+
+    async def get_cache_stats(self) -> Dict[str, Any]:
+        """Get comprehensive cache statistics."""
+        base_stats = await self.cache.get_stats()
+
+        return {
+            **base_stats,
+            "enabled": self.enabled,
+            "default_ttl_seconds": self.default_ttl
+        }
+
+# =============================================================================
+# CACHE FACTORY AND SINGLETON
+# =============================================================================
+
+# Global response cache manager instance
+_response_cache_manager: Optional[ResponseCacheManager] = None
+
+def get_response_cache_manager() -> ResponseCacheManager:
+    """
+    Get or create the global response cache manager.
+
+    Returns:
+        Global ResponseCacheManager instance
+    """
+    global _response_cache_manager
+
+    if _response_cache_manager is None:
+        from app.core.config import get_settings
+        settings = get_settings()
+
+        _response_cache_manager = ResponseCacheManager(
+            cache_impl=InMemoryResponseCache(
+                max_entries=settings.response_cache_max_entries,
+                max_bytes=settings.response_cache_max_bytes
+            ),
+            default_ttl_seconds=settings.response_cache_ttl_seconds,
+            enabled=settings.response_cache_enabled
+        )
+
+    return _response_cache_manager
+
+def reset_response_cache_manager():
+    """Reset the global response cache manager (useful for testing)."""
+    global _response_cache_manager
+    _response_cache_manager = None
+
+# Export main classes and functions
+__all__ = [
+    'is_deterministic_request',
+    'build_request_hash',
+    'CachedResponse',
+    'ResponseCacheInterface',
+    'InMemoryResponseCache',
+    'ResponseCacheManager',
+    'get_response_cache_manager',
+    'reset_response_cache_manager'
+]
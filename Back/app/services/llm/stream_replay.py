@@ -0,0 +1,661 @@
+# AI Dock Stream Replay Buffer
+# Keeps recently emitted SSE frames per request_id so dropped connections can resume
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple, AsyncGenerator
+
+from ...core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sent first on every stream: how long the browser waits before reconnecting
+RETRY_FRAME_TEMPLATE = "retry: %d\n\n"
+
+
+class StreamReplayUnavailableError(Exception):
+    """The frames a client asked to resume from are no longer buffered."""
+    pass
+
+
+# =============================================================================
+# REPLAY BUFFER INTERFACE
+# =============================================================================
+
+class ReplayBufferInterface(ABC):
+    """
+    Abstract interface for per-request SSE frame buffers.
+
+    Frames are stored with sequential event ids starting at 0; the id is
+    written into the frame (``id: N``) so EventSource sends it back as
+    Last-Event-ID when it reconnects.
+    """
+
+    # True when other workers can attach to (and detach from) this buffer's streams
+    shared = False
+
+    @abstractmethod
+    async def create(self, request_id: str, owner_id: int) -> bool:
+        """Register a new stream. Returns False if the request_id is already in use."""
+        pass
+
+    @abstractmethod
+    async def append(self, request_id: str, frame: str) -> int:
+        """Store a frame (without id line) and return its event id."""
+        pass
+
+    @abstractmethod
+    async def finish(self, request_id: str) -> None:
+        """Mark a stream as complete; its frames expire after the replay window."""
+        pass
+
+    @abstractmethod
+    async def get_owner(self, request_id: str) -> Optional[int]:
+        """Get the user that owns a buffered stream, or None if it is not buffered."""
+        pass
+
+    @abstractmethod
+    async def read(self, request_id: str, after_id: int) -> Tuple[List[str], int, bool]:
+        """
+        Read frames after an event id.
+
+        Args:
+            request_id: Stream identifier
+            after_id: Last event id the client has (-1 for the whole stream)
+
+        Returns:
+            Tuple of (frames, last event id returned, stream finished)
+
+        Raises:
+            StreamReplayUnavailableError: If the stream or the requested frames were evicted
+        """
+        pass
+
+    @abstractmethod
+    async def wait(self, request_id: str, after_id: int, timeout: float) -> None:
+        """Wait until frames after after_id exist, the stream finishes, or timeout."""
+        pass
+
+    @abstractmethod
+    async def attach(self, request_id: str) -> int:
+        """Register a reading client. Returns the number of attached clients."""
+        pass
+
+    @abstractmethod
+    async def detach(self, request_id: str) -> int:
+        """Unregister a reading client. Returns the number still attached."""
+        pass
+
+    @abstractmethod
+    async def get_listeners(self, request_id: str) -> int:
+        """Get the number of attached clients."""
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer statistics."""
+        pass
+
+
+# =============================================================================
+# IN-MEMORY REPLAY BUFFER
+# =============================================================================
+
+@dataclass
+class ReplayStream:
+    """Frames of one stream held in memory."""
+    owner_id: int
+    frames: List[str] = field(default_factory=list)
+    first_id: int = 0  # Event id of frames[0]
+    next_id: int = 0
+    size_bytes: int = 0
+    listeners: int = 0
+    done: bool = False
+    finished_at: Optional[float] = None
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def notify(self) -> None:
+        """Wake up readers waiting for new frames."""
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class InMemoryReplayBuffer(ReplayBufferInterface):
+    """
+    Replay buffer for a single worker.
+
+    Memory is capped per stream (oldest frames are dropped first) and in
+    total: least recently used finished streams are evicted first, then the
+    backlog of least recently used live streams is dropped (their current
+    readers keep streaming, only resuming from before that point fails).
+    Finished streams are dropped once the replay window has passed.
+    """
+
+    def __init__(self, ttl_seconds: int, max_stream_bytes: int, max_total_bytes: int):
+        """
+        Initialize the buffer.
+
+        Args:
+            ttl_seconds: How long finished streams stay resumable
+            max_stream_bytes: Frame bytes kept per stream
+            max_total_bytes: Frame bytes kept across all streams
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_stream_bytes = max_stream_bytes
+        self.max_total_bytes = max_total_bytes
+        self._streams: "OrderedDict[str, ReplayStream]" = OrderedDict()
+        self._total_bytes = 0
+        self._stats = {"streams": 0, "frames": 0, "evicted_streams": 0, "dropped_frames": 0}
+
+    async def create(self, request_id: str, owner_id: int) -> bool:
+        self._expire()
+        if request_id in self._streams:
+            return False
+        self._streams[request_id] = ReplayStream(owner_id=owner_id)
+        self._stats["streams"] += 1
+        return True
+
+    async def append(self, request_id: str, frame: str) -> int:
+        stream = self._streams.get(request_id)
+        if stream is None:
+            return -1  # Evicted while still generating; keep streaming without replay
+
+        event_id = stream.next_id
+        stream.next_id += 1
+        frame = f"id: {event_id}\n{frame}"
+        stream.frames.append(frame)
+        stream.size_bytes += len(frame)
+        self._total_bytes += len(frame)
+        self._stats["frames"] += 1
+
+        # Per-stream cap: drop the oldest frames (resuming before them becomes impossible)
+        if stream.size_bytes > self.max_stream_bytes:
+            self._drop_backlog(stream, self.max_stream_bytes)
+
+        if self._total_bytes > self.max_total_bytes:
+            self._evict(keep=request_id)
+
+        stream.notify()
+        return event_id
+
+    async def finish(self, request_id: str) -> None:
+        stream = self._streams.get(request_id)
+        if stream is None:
+            return
+        stream.done = True
+        stream.finished_at = time.monotonic()
+        stream.notify()
+
+    async def get_owner(self, request_id: str) -> Optional[int]:
+        self._expire()
+        stream = self._streams.get(request_id)
+        return stream.owner_id if stream else None
+
+    async def read(self, request_id: str, after_id: int) -> Tuple[List[str], int, bool]:
+        stream = self._streams.get(request_id)
+        if stream is None:
+            raise StreamReplayUnavailableError(f"Stream {request_id} is no longer buffered")
+        self._streams.move_to_end(request_id)
+
+        if after_id + 1 < stream.first_id:
+            raise StreamReplayUnavailableError(
+                f"Frames {after_id + 1}-{stream.first_id - 1} of stream {request_id} were dropped"
+            )
+
+        frames = stream.frames[after_id + 1 - stream.first_id:]
+        return frames, after_id + len(frames), stream.done
+
+    async def wait(self, request_id: str, after_id: int, timeout: float) -> None:
+        # No timer needed: appends, finishing and eviction all wake readers up
+        stream = self._streams.get(request_id)
+        if stream is None or stream.next_id - 1 > after_id or stream.done:
+            return
+        await stream.changed.wait()
+
+    async def attach(self, request_id: str) -> int:
+        stream = self._streams.get(request_id)
+        if stream is None:
+            return 0
+        stream.listeners += 1
+        return stream.listeners
+
+    async def detach(self, request_id: str) -> int:
+        stream = self._streams.get(request_id)
+        if stream is None:
+            return 0
+        stream.listeners = max(stream.listeners - 1, 0)
+        return stream.listeners
+
+    async def get_listeners(self, request_id: str) -> int:
+        stream = self._streams.get(request_id)
+        return stream.listeners if stream else 0
+
+    def _remove(self, request_id: str) -> None:
+        stream = self._streams.pop(request_id)
+        self._total_bytes -= stream.size_bytes
+        stream.notify()
+
+    def _drop_backlog(self, stream: ReplayStream, max_bytes: int) -> None:
+        """Drop a stream's oldest frames (always keeping the newest) until it fits max_bytes."""
+        dropped_bytes = 0
+        count = 0
+        while count < len(stream.frames) - 1 and stream.size_bytes - dropped_bytes > max_bytes:
+            dropped_bytes += len(stream.frames[count])
+            count += 1
+        if count:
+            del stream.frames[:count]
+            stream.first_id += count
+            stream.size_bytes -= dropped_bytes
+            self._total_bytes -= dropped_bytes
+            self._stats["dropped_frames"] += count
+
+    def _expire(self) -> None:
+        """Drop finished streams whose replay window has passed."""
+        now = time.monotonic()
+        expired = [
+            request_id for request_id, stream in self._streams.items()
+            if stream.done and stream.finished_at is not None and now - stream.finished_at > self.ttl_seconds
+        ]
+        for request_id in expired:
+            self._remove(request_id)
+
+    def _evict(self, keep: str) -> None:
+        """Free memory in least recently used order until under the total cap."""
+        self._expire()
+        for request_id in list(self._streams.keys()):
+            if self._total_bytes <= self.max_total_bytes:
+                return
+            if self._streams[request_id].done:
+                self._remove(request_id)
+                self._stats["evicted_streams"] += 1
+        for request_id, stream in list(self._streams.items()):
+            if self._total_bytes <= self.max_total_bytes:
+                return
+            if request_id != keep:
+                self._drop_backlog(stream, 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "buffered_streams": len(self._streams),
+            "buffered_bytes": self._total_bytes,
+            "max_total_bytes": self.max_total_bytes,
+            **self._stats
+        }
+
+
+# =============================================================================
+# REDIS REPLAY BUFFER
+# =============================================================================
+
+# Create a stream's meta hash with its owner, counters and TTL in one step, so
+# readers never see an owner without counters and a crash never leaves a key
+# without a TTL. Returns 0 if the stream already exists
+# KEYS: meta  ARGV: owner id, TTL
+_CREATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('HSET', KEYS[1], 'owner_id', ARGV[1], 'first_id', 0, 'next_id', 0, 'size', 0, 'listeners', 0, 'done', 0)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# Assign the next event id, store the frame and trim the stream to its byte
+# cap in one step, so readers never see the counters and the list disagree
+# KEYS: meta, frames  ARGV: frame, max stream bytes, frames TTL
+_APPEND_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -1 end
+local event_id = redis.call('HINCRBY', KEYS[1], 'next_id', 1) - 1
+local frame = 'id: ' .. event_id .. '\\n' .. ARGV[1]
+redis.call('RPUSH', KEYS[2], frame)
+local size = redis.call('HINCRBY', KEYS[1], 'size', string.len(frame))
+while size > tonumber(ARGV[2]) and redis.call('LLEN', KEYS[2]) > 1 do
+    local dropped = redis.call('LPOP', KEYS[2])
+    size = redis.call('HINCRBY', KEYS[1], 'size', -string.len(dropped))
+    redis.call('HINCRBY', KEYS[1], 'first_id', 1)
+end
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return event_id
+"""
+
+# Read first_id, done and the frames after an event id as one snapshot
+# KEYS: meta, frames  ARGV: after_id
+_READ_SCRIPT = """
+local meta = redis.call('HMGET', KEYS[1], 'first_id', 'done')
+if not meta[1] then return false end
+local start = tonumber(ARGV[1]) + 1 - tonumber(meta[1])
+local frames = {}
+if start >= 0 then frames = redis.call('LRANGE', KEYS[2], start, -1) end
+return {meta[1], meta[2], frames}
+"""
+
+
+class RedisReplayBuffer(ReplayBufferInterface):
+    """
+    Replay buffer shared by all workers through Redis (or a compatible server).
+
+    A client can resume on any worker: frames live in a Redis list and the
+    reading worker polls for new ones. Creates, appends and reads are Lua
+    scripts, so each is atomic against the others. Each stream's keys expire with the
+    replay window; configure Redis with an LRU maxmemory-policy to cap
+    total memory.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        redis_client,
+        ttl_seconds: int,
+        max_stream_bytes: int,
+        key_prefix: str = "stream_replay:",
+        poll_interval_seconds: float = 0.1
+    ):
+        """
+        Initialize the Redis buffer.
+
+        Args:
+            redis_client: redis.asyncio client (decode_responses=True)
+            ttl_seconds: How long finished streams stay resumable
+            max_stream_bytes: Frame bytes kept per stream
+            key_prefix: Prefix for Redis keys
+            poll_interval_seconds: How often waiting readers check for new frames
+        """
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.max_stream_bytes = max_stream_bytes
+        self.key_prefix = key_prefix
+        self.poll_interval_seconds = poll_interval_seconds
+        # Generating streams keep their keys alive well past the replay window
+        self._live_ttl_seconds = max(ttl_seconds, 3600)
+        self._create_script = redis_client.register_script(_CREATE_SCRIPT)
+        self._append_script = redis_client.register_script(_APPEND_SCRIPT)
+        self._read_script = redis_client.register_script(_READ_SCRIPT)
+        self._stats = {"streams": 0, "frames": 0, "errors": 0}
+
+    def _keys(self, request_id: str) -> Tuple[str, str]:
+        return f"{self.key_prefix}{request_id}:meta", f"{self.key_prefix}{request_id}:frames"
+
+    async def create(self, request_id: str, owner_id: int) -> bool:
+        meta_key, _ = self._keys(request_id)
+        created = await self._create_script(keys=[meta_key], args=[owner_id, self._live_ttl_seconds])
+        if not int(created):
+            return False
+        self._stats["streams"] += 1
+        return True
+
+    async def append(self, request_id: str, frame: str) -> int:
+        meta_key, frames_key = self._keys(request_id)
+        try:
+            event_id = int(await self._append_script(
+                keys=[meta_key, frames_key],
+                args=[frame, self.max_stream_bytes, self._live_ttl_seconds]
+            ))
+            if event_id >= 0:
+                self._stats["frames"] += 1
+            return event_id
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"⚠️ Failed to buffer frame for stream {request_id}: {e}")
+            return -1
+
+    async def finish(self, request_id: str) -> None:
+        meta_key, frames_key = self._keys(request_id)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(meta_key, "done", 1)
+                pipe.expire(meta_key, self.ttl_seconds)
+                pipe.expire(frames_key, self.ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"⚠️ Failed to finish replay buffer for stream {request_id}: {e}")
+
+    async def get_owner(self, request_id: str) -> Optional[int]:
+        meta_key, _ = self._keys(request_id)
+        owner = await self.redis.hget(meta_key, "owner_id")
+        return int(owner) if owner is not None else None
+
+    async def read(self, request_id: str, after_id: int) -> Tuple[List[str], int, bool]:
+        meta_key, frames_key = self._keys(request_id)
+        snapshot = await self._read_script(keys=[meta_key, frames_key], args=[after_id])
+        if not snapshot:
+            raise StreamReplayUnavailableError(f"Stream {request_id} is no longer buffered")
+
+        first_id, done, frames = int(snapshot[0]), snapshot[1], snapshot[2]
+        if after_id + 1 < first_id:
+            raise StreamReplayUnavailableError(
+                f"Frames {after_id + 1}-{first_id - 1} of stream {request_id} were dropped"
+            )
+        return frames, after_id + len(frames), done == "1"
+
+    async def wait(self, request_id: str, after_id: int, timeout: float) -> None:
+        meta_key, _ = self._keys(request_id)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            meta = await self.redis.hmget(meta_key, "next_id", "done")
+            if meta[0] is None or int(meta[0]) - 1 > after_id or meta[1] == "1":
+                return
+            await asyncio.sleep(self.poll_interval_seconds)
+
+    async def attach(self, request_id: str) -> int:
+        meta_key, _ = self._keys(request_id)
+        return await self.redis.hincrby(meta_key, "listeners", 1)
+
+    async def detach(self, request_id: str) -> int:
+        meta_key, _ = self._keys(request_id)
+        return max(await self.redis.hincrby(meta_key, "listeners", -1), 0)
+
+    async def get_listeners(self, request_id: str) -> int:
+        meta_key, _ = self._keys(request_id)
+        return max(int(await self.redis.hget(meta_key, "listeners") or 0), 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", **self._stats}
+
+
+# =============================================================================
+# STREAM REPLAY MANAGER
+# =============================================================================
+
+class StreamReplayManager:
+    """
+    Runs generations detached from client connections, buffering their frames.
+
+    Single Responsibility:
+    - Pump a stream's frames into the replay buffer from a background task
+    - Serve clients from the buffer, starting after their Last-Event-ID
+    - Keep generating for a grace period after the last client drops, and
+      cancel the upstream call if nobody resumes in time
+
+    Only the worker running a generation can cancel it. With a shared
+    buffer a client may resume on another worker and leave from there, so
+    the owning worker also polls the listener count every grace period and
+    cancels after two checks in a row find no listeners (between one and
+    two grace periods after the last client left).
+    """
+
+    def __init__(self, buffer: ReplayBufferInterface, grace_seconds: float, retry_ms: int):
+        """
+        Initialize the manager.
+
+        Args:
+            buffer: Replay buffer backend
+            grace_seconds: How long a stream keeps generating without clients
+            retry_ms: Reconnection delay advertised to EventSource clients
+        """
+        self.buffer = buffer
+        self.grace_seconds = grace_seconds
+        self.retry_frame = RETRY_FRAME_TEMPLATE % retry_ms
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stats = {"started": 0, "resumed": 0, "abandoned": 0}
+
+    async def start(self, request_id: str, owner_id: int, frames: AsyncGenerator[str, None]) -> bool:
+        """
+        Start generating a stream in the background.
+
+        Args:
+            request_id: Client-supplied request identifier
+            owner_id: User that may read (and resume) the stream
+            frames: SSE frame generator for the response
+
+        Returns:
+            False if a stream with this request_id already exists
+        """
+        if not await self.buffer.create(request_id, owner_id):
+            await frames.aclose()
+            return False
+
+        async def pump():
+            try:
+                async for frame in frames:
+                    await self.buffer.append(request_id, frame)
+            except asyncio.CancelledError:
+                logger.info(f"🛑 Stream {request_id} abandoned by all clients, generation cancelled")
+            except Exception as e:
+                logger.error(f"❌ Stream {request_id} generation failed: {e}")
+            finally:
+                await self.buffer.finish(request_id)
+                self._tasks.pop(request_id, None)
+
+        task = asyncio.create_task(pump())
+        self._tasks[request_id] = task
+        if self.buffer.shared:
+            asyncio.create_task(self._watch_listeners(request_id, task))
+        self._stats["started"] += 1
+        return True
+
+    async def get_owner(self, request_id: str) -> Optional[int]:
+        """Get the owner of a buffered stream, or None if it is not buffered."""
+        return await self.buffer.get_owner(request_id)
+
+    async def subscribe(self, request_id: str, last_event_id: Optional[int] = None) -> AsyncGenerator[str, None]:
+        """
+        Serve a stream's frames from the buffer.
+
+        Args:
+            request_id: Stream identifier
+            last_event_id: Last event id the client received (None for the whole stream)
+
+        Yields:
+            str: SSE frames with id lines
+
+        Raises:
+            StreamReplayUnavailableError: If the requested frames were evicted
+        """
+        after_id = -1 if last_event_id is None else last_event_id
+        if last_event_id is not None:
+            self._stats["resumed"] += 1
+            logger.info(f"🔁 Resuming stream {request_id} after event {last_event_id}")
+
+        await self.buffer.attach(request_id)
+        try:
+            yield self.retry_frame
+            while True:
+                frames, after_id, done = await self.buffer.read(request_id, after_id)
+                for frame in frames:
+                    yield frame
+                if done and not frames:
+                    return
+                if not frames:
+                    await self.buffer.wait(request_id, after_id, timeout=1.0)
+        finally:
+            remaining = await self.buffer.detach(request_id)
+            task = self._tasks.get(request_id)
+            if remaining == 0 and task is not None and not task.done():
+                asyncio.get_running_loop().call_later(
+                    self.grace_seconds,
+                    lambda: asyncio.ensure_future(self._cancel_if_abandoned(request_id))
+                )
+
+    async def _cancel_if_abandoned(self, request_id: str) -> None:
+        """Cancel a stream's generation if no client came back during the grace period."""
+        task = self._tasks.get(request_id)
+        if task is None or task.done():
+            return
+        if await self.buffer.get_listeners(request_id) == 0:
+            self._stats["abandoned"] += 1
+            task.cancel()
+
+    async def _watch_listeners(self, request_id: str, task: asyncio.Task) -> None:
+        """Cancel a generation whose clients all left, wherever they were attached."""
+        was_abandoned = False
+        while not task.done():
+            await asyncio.sleep(max(self.grace_seconds, 1.0))
+            if task.done():
+                return
+            try:
+                abandoned = await self.buffer.get_listeners(request_id) == 0
+            except Exception as e:
+                logger.warning(f"⚠️ Could not check listeners of stream {request_id}: {e}")
+                continue
+            if abandoned and was_abandoned:
+                self._stats["abandoned"] += 1
+                task.cancel()
+                return
+            was_abandoned = abandoned
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get replay statistics."""
+        return {
+            **self._stats,
+            "generating": len(self._tasks),
+            "grace_seconds": self.grace_seconds,
+            "buffer": self.buffer.get_stats()
+        }
+
+
+# Global stream replay manager instance
+_stream_replay_manager: Optional[StreamReplayManager] = None
+
+def get_stream_replay_manager() -> StreamReplayManager:
+    """
+    Get the global stream replay manager instance.
+
+    Uses Redis when redis_url is configured and the redis package is
+    installed, so clients can resume on any worker; in-memory otherwise.
+
+    Returns:
+        Singleton StreamReplayManager instance
+    """
+    global _stream_replay_manager
+    if _stream_replay_manager is None:
+        buffer: ReplayBufferInterface = InMemoryReplayBuffer(
+            ttl_seconds=settings.stream_resume_ttl_seconds,
+            max_stream_bytes=settings.stream_resume_max_stream_bytes,
+            max_total_bytes=settings.stream_resume_max_total_bytes
+        )
+
+        if settings.redis_url:
+            try:
+                import redis.asyncio as redis
+                buffer = RedisReplayBuffer(
+                    redis.from_url(settings.redis_url, decode_responses=True),
+                    ttl_seconds=settings.stream_resume_ttl_seconds,
+                    max_stream_bytes=settings.stream_resume_max_stream_bytes
+                )
+                logger.info("Using Redis replay buffer for stream resume")
+            except ImportError:
+                logger.info("Redis not available, using in-memory replay buffer")
+            except Exception as e:
+                logger.warning(f"Failed to initialize Redis replay buffer, falling back to in-memory: {e}")
+
+        _stream_replay_manager = StreamReplayManager(
+            buffer,
+            grace_seconds=settings.stream_resume_grace_seconds,
+            retry_ms=settings.stream_resume_retry_ms
+        )
+    return _stream_replay_manager
+
+
+__all__ = [
+    'StreamReplayUnavailableError',
+    'ReplayBufferInterface',
+    'InMemoryReplayBuffer',
+    'RedisReplayBuffer',
+    'StreamReplayManager',
+    'get_stream_replay_manager'
+]
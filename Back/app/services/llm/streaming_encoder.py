@@ -0,0 +1,307 @@
+# AI Dock Streaming Frame Encoder
+# Turns provider streaming chunks into Server-Sent Events frames with minimal per-token work
+
+import asyncio
+import json
+import time
+from typing import Dict, Any, Optional, List, Callable, AsyncIterator, AsyncGenerator
+
+try:
+    import orjson
+except ImportError:  # Optional fast JSON backend
+    orjson = None
+
+
+# =============================================================================
+# JSON BACKEND
+# =============================================================================
+
+if orjson is not None:
+    def dumps(value: Any) -> str:
+        """Serialize a value to compact JSON (orjson backend)."""
+        return orjson.dumps(value).decode("utf-8")
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(value: Any) -> str:
+        """Serialize a value to compact JSON (stdlib backend)."""
+        return _encoder.encode(value)
+
+
+# =============================================================================
+# FRAME TEMPLATES
+# =============================================================================
+
+DONE_FRAME = "data: [DONE]\n\n"
+ERROR_FRAME = "data: [ERROR]\n\n"
+
+# Middle frames only carry what the client needs to render the next piece of
+# text; the index and the JSON-escaped content are the only per-token work
+_CONTENT_FRAME = 'data: {"chunk_id":"chunk_%03d","chunk_index":%d,"content":%s,"is_final":false}\n\n'
+
+
+def encode_event(payload: Dict[str, Any]) -> str:
+    """
+    Encode an arbitrary payload (errors, control messages) as an SSE frame.
+
+    Args:
+        payload: JSON-serializable dictionary
+
+    Returns:
+        SSE frame string
+    """
+    return f"data: {dumps(payload)}\n\n"
+
+
+# =============================================================================
+# STREAMING FRAME ENCODER
+# =============================================================================
+
+class StreamingFrameEncoder:
+    """
+    Encodes one streamed response as SSE frames.
+
+    - The first frame carries model/provider/timestamp, the final frame
+      carries usage/cost/response time; frames in between only carry content
+    - Content is accumulated in a list and joined once, instead of repeated
+      string concatenation
+    - Optionally coalesces tokens into fewer frames, flushing once
+      ``coalesce_bytes`` of content are buffered or ``coalesce_ms`` have
+      passed since the first buffered token (see encode_stream for the
+      timer that flushes while the provider is silent)
+
+    The first frame is never held back, so time-to-first-token is unaffected.
+    """
+
+    def __init__(
+        self,
+        coalesce_bytes: int = 0,
+        coalesce_ms: int = 0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the encoder.
+
+        Args:
+            coalesce_bytes: Flush a frame once this much content is buffered (0 = off)
+            coalesce_ms: Flush a frame once the oldest buffered token is this old (0 = off)
+            clock: Monotonic clock in seconds (injectable for benchmarks)
+        """
+        self.coalesce_bytes = max(coalesce_bytes or 0, 0)
+        self.coalesce_seconds = max(coalesce_ms or 0, 0) / 1000.0
+        self._clock = clock
+
+        self.frame_index = 0
+        self.chunks_received = 0
+        self.last_chunk: Dict[str, Any] = {}
+
+        self._parts: List[str] = []        # All content, for the final response text
+        self._pending: List[str] = []      # Content not yet sent to the client
+        self._pending_bytes = 0
+        self._pending_since: Optional[float] = None
+
+    @property
+    def coalescing(self) -> bool:
+        """Whether tokens may be held back to build larger frames."""
+        return bool(self.coalesce_bytes or self.coalesce_seconds)
+
+    @property
+    def content(self) -> str:
+        """All content received so far."""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    @property
+    def has_content(self) -> bool:
+        """Whether any non-empty content was received."""
+        return bool(self._parts)
+
+    def encode_chunk(self, chunk_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Add a streaming chunk and return the frame to send, if any.
+
+        Args:
+            chunk_data: Chunk dict from llm_service.stream_chat_request
+
+        Returns:
+            SSE frame string, or None if the content was buffered
+        """
+        self.chunks_received += 1
+        self.last_chunk = chunk_data
+        content = chunk_data.get("content") or ""
+        if content:
+            self._parts.append(content)
+
+        if chunk_data.get("is_final"):
+            self._pending.append(content)
+            return self._final_frame(chunk_data)
+
+        if self.frame_index == 0:
+            return self._first_frame(chunk_data, content)
+
+        if not self.coalescing:
+            return self._content_frame(content)
+
+        if not content:
+            return None
+        if self._pending_since is None:
+            self._pending_since = self._clock()
+        self._pending.append(content)
+        self._pending_bytes += len(content)
+
+        if (
+            (self.coalesce_bytes and self._pending_bytes >= self.coalesce_bytes) or
+            (self.coalesce_seconds and self._clock() - self._pending_since >= self.coalesce_seconds)
+        ):
+            return self.flush()
+        return None
+
+    def flush_due_in(self) -> Optional[float]:
+        """
+        Seconds until buffered content must be flushed by the time bound.
+
+        Returns:
+            Seconds (0 if overdue), or None if nothing is waiting on a timer
+        """
+        if self._pending_since is None or not self.coalesce_seconds:
+            return None
+        return max(self._pending_since + self.coalesce_seconds - self._clock(), 0.0)
+
+    def flush(self) -> Optional[str]:
+        """
+        Send any buffered content as a frame.
+
+        Returns:
+            SSE frame string, or None if nothing was buffered
+        """
+        if not self._pending:
+            return None
+        return self._content_frame(self._take_pending())
+
+    # =========================================================================
+    # FRAME BUILDERS
+    # =========================================================================
+
+    def _take_pending(self) -> str:
+        """Remove and return the buffered content."""
+        content = "".join(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_since = None
+        return content
+
+    def _next_index(self) -> int:
+        index = self.frame_index
+        self.frame_index += 1
+        return index
+
+    def _content_frame(self, content: str) -> str:
+        index = self._next_index()
+        return _CONTENT_FRAME % (index, index, dumps(content))
+
+    def _first_frame(self, chunk_data: Dict[str, Any], content: str) -> str:
+        index = self._next_index()
+        return encode_event({
+            "chunk_id": f"chunk_{index:03d}",
+            "chunk_index": index,
+            "content": content,
+            "is_final": False,
+            "model": chunk_data.get("model"),
+            "provider": chunk_data.get("provider"),
+            "queue_wait_ms": chunk_data.get("queue_wait_ms"),
+            "timestamp": chunk_data.get("timestamp", "")
+        })
+
+    def _final_frame(self, chunk_data: Dict[str, Any]) -> str:
+        index = self._next_index()
+        payload = {
+            "chunk_id": f"chunk_{index:03d}",
+            "chunk_index": index,
+            "content": self._take_pending(),
+            "is_final": True,
+            "usage": chunk_data.get("usage"),
+            "cost": chunk_data.get("cost"),
+            "response_time_ms": chunk_data.get("response_time_ms"),
+            "timestamp": chunk_data.get("timestamp", "")
+        }
+        if index == 0:
+            payload["model"] = chunk_data.get("model")
+            payload["provider"] = chunk_data.get("provider")
+            payload["queue_wait_ms"] = chunk_data.get("queue_wait_ms")
+        return encode_event(payload)
+
+
+# =============================================================================
+# STREAM DRIVER
+# =============================================================================
+
+async def encode_stream(
+    chunks: AsyncIterator[Dict[str, Any]],
+    encoder: StreamingFrameEncoder
+) -> AsyncGenerator[str, None]:
+    """
+    Encode a chunk stream into SSE frames, honoring the coalescing bounds.
+
+    Without a time bound this is a plain loop. With one, the next chunk is
+    awaited only until buffered content is due, so a pause in generation
+    never holds text back for longer than ``coalesce_ms``.
+
+    Args:
+        chunks: Chunk stream from llm_service.stream_chat_request
+        encoder: Encoder for this response
+
+    Yields:
+        str: SSE frames (not including the [DONE] marker)
+    """
+    iterator = chunks.__aiter__()
+    next_chunk: Optional[asyncio.Future] = None
+    try:
+        while True:
+            due_in = encoder.flush_due_in()
+            if due_in is None and next_chunk is None:
+                try:
+                    chunk_data = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+            else:
+                if next_chunk is None:
+                    next_chunk = asyncio.ensure_future(iterator.__anext__())
+                done, _ = await asyncio.wait((next_chunk,), timeout=due_in)
+                if not done:
+                    frame = encoder.flush()
+                    if frame is not None:
+                        yield frame
+                    continue
+                finished, next_chunk = next_chunk, None
+                try:
+                    chunk_data = finished.result()
+                except StopAsyncIteration:
+                    break
+
+            frame = encoder.encode_chunk(chunk_data)
+            if frame is not None:
+                yield frame
+            if chunk_data.get("is_final"):
+                break
+
+        # Send anything still buffered if the stream ended without a final chunk
+        frame = encoder.flush()
+        if frame is not None:
+            yield frame
+    finally:
+        if next_chunk is not None:
+            # Stream abandoned mid-read: cancelling the read stops the provider
+            next_chunk.cancel()
+        elif hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+
+__all__ = [
+    'DONE_FRAME',
+    'ERROR_FRAME',
+    'dumps',
+    'encode_event',
+    'StreamingFrameEncoder',
+    'encode_stream'
+]
@@ -0,0 +1,452 @@
+# AI Dock LLM Tokenizer Service
+# Local token counting for quota reservations, cost estimates and context budgeting
+
+import os
+import re
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Callable, Iterable
+from abc import ABC, abstractmethod
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# TOKENIZER IMPLEMENTATIONS
+# =============================================================================
+
+class TokenizerInterface(ABC):
+    """
+    Abstract interface for token counters.
+
+    Implementations only need to count tokens in a piece of text; message
+    framing overhead and caching are handled by TokenizerService.
+    """
+
+    # Tokens added per message for role/framing, and once per request to prime the reply
+    message_overhead: int = 3
+    reply_overhead: int = 3
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Stable identifier, used as part of the token count cache key."""
+        pass
+
+    @abstractmethod
+    def count_text(self, text: str) -> int:
+        """Count the tokens in a piece of text."""
+        pass
+
+
+class TiktokenTokenizer(TokenizerInterface):
+    """
+    Exact BPE token counts for OpenAI models using tiktoken.
+
+    tiktoken downloads its encoding files on first use (unless they are in
+    TIKTOKEN_CACHE_DIR) and builds the BPE ranks, so construction blocks and
+    must not run on the event loop; TokenizerService loads encodings in a
+    worker thread. If loading fails (offline deployment) the constructor
+    raises and TokenizerService falls back to the approximation table.
+    """
+
+    def __init__(self, encoding_name: str):
+        if not TIKTOKEN_AVAILABLE:
+            raise RuntimeError("tiktoken is not installed")
+        self._encoding = tiktoken.get_encoding(encoding_name)
+        self._name = f"tiktoken:{encoding_name}"
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def count_text(self, text: str) -> int:
+        # disallowed_special=() so user text containing "<|endoftext|>" is counted, not rejected
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+class ApproximateTokenizer(TokenizerInterface):
+    """
+    Character-class approximation of a BPE tokenizer.
+
+    Used for Claude (whose tokenizer is not published) and as the fallback
+    for every other model. Text is split the way BPE pre-tokenizers split it
+    (letter runs, digit groups, punctuation, whitespace, other scripts) and
+    each piece is weighted from a per-model-family table. This tracks real
+    tokenizers far better than chars/4 for code and non-English text.
+    """
+
+    # Kana, CJK ideographs, Hangul
+    _CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+
+    # Pre-tokenization: ASCII letter runs, up to 3 digits, CJK characters,
+    # other non-ASCII runs, whitespace runs, single punctuation
+    _PIECES = re.compile(
+        r"[A-Za-z]+"
+        r"|\d{1,3}"
+        f"|(?P<cjk>[{_CJK}])"
+        f"|[^\\x00-\\x7f\\s{_CJK}]+"
+        r"|\s+"
+        r"|[^\sA-Za-z\d]"
+    )
+
+    def __init__(self, name: str, table: Dict[str, float]):
+        """
+        Initialize the approximation.
+
+        Args:
+            name: Identifier for this table (e.g. "approx:claude")
+            table: Weights - word_chars_per_token, cjk_tokens_per_char,
+                   other_tokens_per_char, punctuation_tokens, newline_tokens
+        """
+        self._name = name
+        self._table = table
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def count_text(self, text: str) -> int:
+        table = self._table
+        tokens = 0.0
+        for match in self._PIECES.finditer(text):
+            piece = match.group()
+            first = piece[0]
+            if match.group("cjk"):
+                tokens += table["cjk_tokens_per_char"]
+            elif first.isascii():
+                if first.isalpha():
+                    # Common words are one token; long identifiers split into chunks
+                    tokens += 1 + (len(piece) - 1) // table["word_chars_per_token"]
+                elif first.isdigit():
+                    tokens += 1
+                elif first.isspace():
+                    # Single spaces merge into the next word; newlines/indentation don't
+                    if piece != " ":
+                        tokens += table["newline_tokens"] if "\n" in piece else 1
+                else:
+                    tokens += table["punctuation_tokens"]
+            else:
+                tokens += len(piece) * table["other_tokens_per_char"]
+        return max(1, round(tokens)) if text else 0
+
+
+# Approximation tables per model family
+APPROXIMATION_TABLES: Dict[str, Dict[str, float]] = {
+    # Claude's vocabulary splits long words and non-Latin text a bit more than cl100k
+    "claude": {
+        "word_chars_per_token": 5,
+        "cjk_tokens_per_char": 1.2,
+        "other_tokens_per_char": 0.6,
+        "punctuation_tokens": 1.0,
+        "newline_tokens": 1.0
+    },
+    # Used for OpenAI models when tiktoken encodings cannot be loaded, and unknown providers
+    "default": {
+        "word_chars_per_token": 6,
+        "cjk_tokens_per_char": 1.0,
+        "other_tokens_per_char": 0.5,
+        "punctuation_tokens": 1.0,
+        "newline_tokens": 1.0
+    }
+}
+
+
+def openai_encoding_for_model(model: Optional[str]) -> str:
+    """
+    Pick the tiktoken encoding for an OpenAI model name.
+
+    Args:
+        model: OpenAI model name
+
+    Returns:
+        tiktoken encoding name
+    """
+    model = (model or "").lower()
+    if TIKTOKEN_AVAILABLE:
+        try:
+            return tiktoken.encoding_name_for_model(model)
+        except KeyError:
+            pass
+    # Newer model families use o200k_base; anything older uses cl100k_base
+    if model.startswith(("gpt-4o", "gpt-4.1", "gpt-4.5", "gpt-5", "o1", "o3", "o4", "chatgpt-4o")):
+        return "o200k_base"
+    return "cl100k_base"
+
+
+# =============================================================================
+# TOKENIZER SERVICE
+# =============================================================================
+
+class TokenizerService:
+    """
+    Chooses a tokenizer per provider/model and caches per-message counts.
+
+    Conversation history is resent on every turn, so token counts are cached
+    per (tokenizer, message content) in an LRU. Only the new turn is
+    tokenized; earlier messages are cache hits.
+
+    tiktoken encodings are loaded by warm_up() at startup or, for encodings
+    not warmed, in a background thread on first use. Until an encoding is
+    loaded its requests are counted with the approximation.
+    """
+
+    def __init__(self, max_cached_messages: int = 10000):
+        """
+        Initialize the tokenizer service.
+
+        Args:
+            max_cached_messages: Number of per-message token counts to keep
+        """
+        self.logger = logging.getLogger(__name__)
+        self._max_cached_messages = max_cached_messages
+        self._counts: "OrderedDict[tuple, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tokenizers: Dict[str, TokenizerInterface] = {}
+        self._failed_encodings: set = set()
+        self._loading_encodings: set = set()
+        self._factories: Dict[str, Callable[[Optional[str]], TokenizerInterface]] = {
+            "openai": self._openai_tokenizer,
+            "anthropic": lambda model: self._approximate_tokenizer("claude")
+        }
+        self._stats = {"hits": 0, "misses": 0}
+
+    # =========================================================================
+    # TOKENIZER SELECTION
+    # =========================================================================
+
+    def register_tokenizer(self, provider: str, factory: Callable[[Optional[str]], TokenizerInterface]) -> None:
+        """
+        Plug in a tokenizer for a provider.
+
+        Args:
+            provider: Provider value ("openai", "google", ...)
+            factory: Called with the model name, returns a tokenizer
+        """
+        self._factories[provider.lower()] = factory
+        self.logger.info(f"🔤 Registered tokenizer for provider '{provider}'")
+
+    def get_tokenizer(self, provider: Any, model: Optional[str] = None) -> TokenizerInterface:
+        """
+        Get the tokenizer for a provider/model.
+
+        Args:
+            provider: Provider value or LLMProvider enum
+            model: Model name
+
+        Returns:
+            Tokenizer instance (falls back to the default approximation)
+        """
+        provider = (getattr(provider, "value", provider) or "").lower()
+        factory = self._factories.get(provider)
+        if factory is None:
+            return self._approximate_tokenizer("default")
+        return factory(model)
+
+    def _approximate_tokenizer(self, table_name: str) -> TokenizerInterface:
+        """Get (or create) the approximation tokenizer for a table."""
+        key = f"approx:{table_name}"
+        tokenizer = self._tokenizers.get(key)
+        if tokenizer is None:
+            tokenizer = ApproximateTokenizer(key, APPROXIMATION_TABLES[table_name])
+            self._tokenizers[key] = tokenizer
+        return tokenizer
+
+    def _openai_tokenizer(self, model: Optional[str]) -> TokenizerInterface:
+        """Get the tiktoken tokenizer for an OpenAI model, or the approximation until it is loaded."""
+        encoding_name = openai_encoding_for_model(model)
+        tokenizer = self._tokenizers.get(f"tiktoken:{encoding_name}")
+        if tokenizer is not None:
+            return tokenizer
+        if TIKTOKEN_AVAILABLE and encoding_name not in self._failed_encodings:
+            self._load_in_background(encoding_name)
+        return self._approximate_tokenizer("default")
+
+    def load_encoding(self, encoding_name: str) -> bool:
+        """
+        Load a tiktoken encoding (blocking: may download the BPE file).
+
+        Args:
+            encoding_name: tiktoken encoding name, e.g. "cl100k_base"
+
+        Returns:
+            Whether the encoding is available
+        """
+        key = f"tiktoken:{encoding_name}"
+        if key in self._tokenizers:
+            return True
+        if encoding_name in self._failed_encodings:
+            return False
+
+        started = time.perf_counter()
+        try:
+            tokenizer = TiktokenTokenizer(encoding_name)
+        except Exception as e:
+            # Don't retry the download on every request
+            self._failed_encodings.add(encoding_name)
+            self.logger.warning(f"⚠️ tiktoken encoding {encoding_name} unavailable, using approximation: {str(e)}")
+            return False
+        self._tokenizers[key] = tokenizer
+        self.logger.info(f"🔤 Loaded tiktoken encoding {encoding_name} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return True
+
+    def _load_in_background(self, encoding_name: str) -> None:
+        """Start loading an encoding in a daemon thread, once."""
+        with self._lock:
+            if encoding_name in self._loading_encodings:
+                return
+            self._loading_encodings.add(encoding_name)
+
+        def load():
+            try:
+                self.load_encoding(encoding_name)
+            finally:
+                with self._lock:
+                    self._loading_encodings.discard(encoding_name)
+
+        threading.Thread(target=load, name=f"tiktoken-{encoding_name}", daemon=True).start()
+
+    def warm_up(self, encoding_names: Iterable[str]) -> Dict[str, bool]:
+        """
+        Load encodings ahead of the first request (blocking; run it in a worker thread).
+
+        Args:
+            encoding_names: tiktoken encoding names
+
+        Returns:
+            Whether each encoding is available
+        """
+        if not TIKTOKEN_AVAILABLE:
+            return {name: False for name in encoding_names}
+        return {name: self.load_encoding(name) for name in encoding_names}
+
+    # =========================================================================
+    # COUNTING
+    # =========================================================================
+
+    def count_text(self, text: str, provider: Any = None, model: Optional[str] = None) -> int:
+        """
+        Count tokens in a piece of text (uncached).
+
+        Args:
+            text: Text to count
+            provider: Provider value or LLMProvider enum
+            model: Model name
+
+        Returns:
+            Token count
+        """
+        if not text:
+            return 0
+        return self.get_tokenizer(provider, model).count_text(text)
+
+    def count_message(self, message: Any, tokenizer: TokenizerInterface) -> int:
+        """
+        Count tokens for one message, including framing overhead (cached).
+
+        Args:
+            message: ChatMessage or message dict
+            tokenizer: Tokenizer from get_tokenizer()
+
+        Returns:
+            Token count for the message
+        """
+        content = _message_text(message)
+        digest = hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        key = (tokenizer.name, digest)
+
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached is not None:
+                self._counts.move_to_end(key)
+                self._stats["hits"] += 1
+                return cached + tokenizer.message_overhead
+
+        count = tokenizer.count_text(content)
+
+        with self._lock:
+            self._stats["misses"] += 1
+            self._counts[key] = count
+            while len(self._counts) > self._max_cached_messages:
+                self._counts.popitem(last=False)
+
+        return count + tokenizer.message_overhead
+
+    def count_messages(self, messages: Iterable[Any], provider: Any = None, model: Optional[str] = None) -> int:
+        """
+        Count the input tokens for a list of messages.
+
+        Args:
+            messages: ChatMessage objects or message dicts
+            provider: Provider value or LLMProvider enum
+            model: Model name
+
+        Returns:
+            Estimated prompt tokens, including message framing
+        """
+        tokenizer = self.get_tokenizer(provider, model)
+        messages = list(messages)
+        if not messages:
+            return 0
+        return sum(self.count_message(msg, tokenizer) for msg in messages) + tokenizer.reply_overhead
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get token count cache statistics."""
+        total = self._stats["hits"] + self._stats["misses"]
+        return {
+            "cached_messages": len(self._counts),
+            "max_cached_messages": self._max_cached_messages,
+            "hits": self._stats["hits"],
+            "misses": self._stats["misses"],
+            "hit_rate": f"{(self._stats['hits'] / total) if total else 0:.2%}",
+            "loaded_tokenizers": sorted(self._tokenizers.keys()),
+            "loading_encodings": sorted(self._loading_encodings),
+            "failed_encodings": sorted(self._failed_encodings),
+            "tiktoken_available": TIKTOKEN_AVAILABLE
+        }
+
+
+def _message_text(message: Any) -> str:
+    """Text of a ChatMessage, message dict, or content-block message."""
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return content or ""
+
+
+# Global tokenizer service instance
+_tokenizer_service: Optional[TokenizerService] = None
+
+def get_tokenizer_service() -> TokenizerService:
+    """
+    Get the global tokenizer service instance.
+
+    Returns:
+        Singleton TokenizerService instance
+    """
+    global _tokenizer_service
+    if _tokenizer_service is None:
+        from app.core.config import settings
+        if settings.tiktoken_cache_dir:
+            # Read by tiktoken when it loads an encoding
+            os.environ.setdefault("TIKTOKEN_CACHE_DIR", settings.tiktoken_cache_dir)
+        _tokenizer_service = TokenizerService()
+    return _tokenizer_service
+
+
+__all__ = [
+    'TokenizerInterface',
+    'TiktokenTokenizer',
+    'ApproximateTokenizer',
+    'APPROXIMATION_TABLES',
+    'TokenizerService',
+    'get_tokenizer_service'
+]
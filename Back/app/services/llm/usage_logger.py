@@ -60,7 +60,8 @@ class LLMUsageLogger:
             user_agent: Client user agent (optional)
             final_response: ChatResponse object for quota recording (optional)
             bypass_quota: Whether quota was bypassed (optional)
-            db_session: Database session for quota operations (optional)
+            db_session: Request's database session; quota usage is only recorded
+                when one is given, in a worker thread with a session of its own
             
         Returns:
             Dictionary with logging and quota results
@@ -72,7 +73,7 @@ class LLMUsageLogger:
         
         # Log usage with isolated session
         try:
-            self.logger.info(f"🔍 Starting isolated usage logging for user {user_id}, request_id {request_id}")
+            self.logger.debug(f"🔍 Starting isolated usage logging for user {user_id}, request_id {request_id}")
             
             await usage_service.log_llm_request_isolated(
                 user_id=user_id,
@@ -101,10 +102,10 @@ class LLMUsageLogger:
         # Record quota usage if applicable
         if final_response and not bypass_quota and db_session:
             try:
-                self.logger.info(f"🎯 Starting quota recording for user {user_id}")
+                self.logger.debug(f"🎯 Starting quota recording for user {user_id}")
                 
-                quota_result = self.quota_manager.record_quota_usage_improved(
-                    user_id, config_id, final_response, db_session
+                quota_result = await self.quota_manager.record_quota_usage_in_thread(
+                    user_id, config_id, final_response
                 )
                 
                 if quota_result["success"]:
@@ -155,7 +156,7 @@ class LLMUsageLogger:
             db_session: Database session for quota operations (optional)
         """
         try:
-            self.logger.info(f"🚀 Background logging task started for streaming user {user_id}")
+            self.logger.debug(f"🚀 Background logging task started for streaming user {user_id}")
             
             # Use the comprehensive logging method
             results = await self.log_llm_request_with_quota(
@@ -259,7 +260,8 @@ class LLMUsageLogger:
         streaming: bool = False,
         chunks_sent: int = 0,
         quota_check_passed: bool = False,
-        quota_details: Dict = None
+        quota_details: Dict = None,
+        cache_status: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create standardized success response data for logging.
@@ -270,10 +272,18 @@ class LLMUsageLogger:
             chunks_sent: Number of chunks sent (for streaming)
             quota_check_passed: Whether quota check passed
             quota_details: Quota check details
+            cache_status: Response reuse outcome ('hit', 'miss', 'coalesced' or None)
             
         Returns:
             Standardized response data dictionary
         """
+        raw_metadata = response.raw_response or {}
+        cost_saved = None
+        if cache_status == "hit":
+            cost_saved = raw_metadata.get("original_cost")
+        elif cache_status == "coalesced" and raw_metadata.get("upstream_cost") is not None:
+            cost_saved = raw_metadata["upstream_cost"] - (response.cost or 0.0)
+        
         return {
             "success": True,
             "content": response.content,
@@ -287,9 +297,11 @@ class LLMUsageLogger:
             "http_status_code": 200,
             "streaming": streaming,
             "chunks_sent": chunks_sent if streaming else None,
-            "raw_metadata": response.raw_response or {},
+            "raw_metadata": raw_metadata,
             "quota_check_passed": quota_check_passed,
-            "quota_details": quota_details or {}
+            "quota_details": quota_details or {},
+            "cache_status": cache_status,
+            "cost_saved": cost_saved
         }
     
     def create_error_response_data(
@@ -301,7 +313,10 @@ class LLMUsageLogger:
         chunks_sent: int = 0,
         partial_content: str = "",
         quota_check_passed: bool = False,
-        quota_details: Dict = None
+        quota_details: Dict = None,
+        status: str = "error",
+        token_usage: Optional[Dict[str, int]] = None,
+        cost: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Create standardized error response data for logging.
@@ -315,17 +330,25 @@ class LLMUsageLogger:
             partial_content: Partial content received before error
             quota_check_passed: Whether quota check passed
             quota_details: Quota check details
+            status: "error", or "cancelled" for streams the client abandoned
+            token_usage: Tokens consumed before the request stopped (optional)
+            cost: Cost of the consumed tokens (optional)
             
         Returns:
             Standardized error response data dictionary
         """
         # Determine error type and status code
         error_type = type(error).__name__
+        error_message = str(error)
         http_status_code = None
         
         from .exceptions import LLMProviderError, LLMDepartmentQuotaExceededError
         
-        if isinstance(error, LLMProviderError):
+        if status == "cancelled":
+            error_type = "cancelled"
+            error_message = f"Client disconnected after {chunks_sent} chunks"
+            http_status_code = 499  # Client Closed Request
+        elif isinstance(error, LLMProviderError):
             http_status_code = error.status_code
         elif isinstance(error, LLMDepartmentQuotaExceededError):
             http_status_code = 429  # Too Many Requests
@@ -336,15 +359,15 @@ class LLMUsageLogger:
             "content_length": len(partial_content),
             "model": model,
             "provider": provider,
-            "token_usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
-            "cost": None,
+            "token_usage": token_usage or {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+            "cost": cost,
             "error_type": error_type,
-            "error_message": str(error),
+            "error_message": error_message,
             "http_status_code": http_status_code,
             "streaming": streaming,
             "chunks_sent": chunks_sent if streaming else None,
             "partial_response": len(partial_content) > 0,
-            "raw_metadata": {},
+            "raw_metadata": {"status": status},
             "quota_check_passed": quota_check_passed,
             "quota_details": quota_details or {}
         }
@@ -45,6 +45,7 @@ from .llm.llm_service import LLMService, get_llm_service
 from .llm.exceptions import (
     LLMServiceError, 
     LLMConfigurationError,
+    LLMContextWindowError,
     LLMProviderError,
     LLMQuotaExceededError,
     LLMDepartmentQuotaExceededError,
@@ -61,6 +62,7 @@ __all__ = [
     # Exceptions  
     'LLMServiceError',
     'LLMConfigurationError', 
+    'LLMContextWindowError',
     'LLMProviderError',
     'LLMQuotaExceededError',
     'LLMDepartmentQuotaExceededError',
@@ -0,0 +1,330 @@
+# AI Dock Message Persistence Queue
+# Saves streamed conversation turns off the response path, with retries and a disk spool
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, Optional, List
+
+from ..core.config import settings
+from ..core.database import get_write_session
+from .conversation_service import conversation_service
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# PERSISTENCE JOB
+# =============================================================================
+
+@dataclass
+class PersistenceJob:
+    """One conversation exchange (usually a user message and its reply) to save."""
+    conversation_id: int
+    messages: List[Dict[str, Any]]
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+
+
+# =============================================================================
+# MESSAGE PERSISTENCE QUEUE
+# =============================================================================
+
+class MessagePersistenceQueue:
+    """
+    In-process queue that writes conversation exchanges in the background.
+
+    - Each job is written in one transaction (ConversationService.save_message_exchange),
+      so a conversation never ends up with a question but no answer
+    - Failed writes are retried with exponential backoff
+    - Jobs that are still pending at shutdown, or that exhausted their
+      retries, are appended to a JSON-lines spool file and re-queued on the
+      next startup, so a database outage or a restart does not lose turns
+    - Replays are safe: the exchange write skips messages that duplicate
+      one saved in the last few minutes
+    """
+
+    def __init__(
+        self,
+        spool_path: Optional[str] = None,
+        max_attempts: int = 5,
+        retry_base_seconds: float = 0.5,
+        retry_max_seconds: float = 30.0
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            spool_path: File for jobs that could not be written (None = no spool)
+            max_attempts: Write attempts per job before it is spooled
+            retry_base_seconds: First retry delay, doubled on every attempt
+            retry_max_seconds: Upper bound for the retry delay
+        """
+        self.spool_path = spool_path
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._retry_tasks: Dict[str, asyncio.Task] = {}
+        self._waiting_retry: Dict[str, PersistenceJob] = {}
+        self._in_progress: Optional[PersistenceJob] = None
+        self._closing = False
+
+        self._stats = {
+            "enqueued": 0,
+            "saved": 0,
+            "retries": 0,
+            "spooled": 0,
+            "recovered": 0
+        }
+
+    # =========================================================================
+    # PUBLIC API
+    # =========================================================================
+
+    def enqueue(self, conversation_id: int, messages: List[Dict[str, Any]]) -> str:
+        """
+        Queue an exchange for saving. Never blocks and never touches the database.
+
+        Args:
+            conversation_id: Conversation to append to
+            messages: Message dicts in the format of save_message_exchange
+
+        Returns:
+            Job id
+        """
+        job = PersistenceJob(conversation_id=conversation_id, messages=messages)
+        self._stats["enqueued"] += 1
+
+        if self._closing:
+            # Too late to write it in this process; the next startup will
+            self._spool([job])
+            return job.job_id
+
+        self._ensure_worker()
+        self._queue.put_nowait(job)
+        logger.debug(f"💾 Queued {len(messages)} messages for conversation {conversation_id} (job {job.job_id})")
+        return job.job_id
+
+    async def start(self) -> None:
+        """Start the worker and re-queue jobs left in the spool by an earlier run."""
+        self._closing = False
+        self._ensure_worker()
+
+        recovered = self._read_spool()
+        for job in recovered:
+            job.attempts = 0
+            self._queue.put_nowait(job)
+        if recovered:
+            self._stats["recovered"] += len(recovered)
+            logger.info(f"💾 Recovered {len(recovered)} spooled conversation writes")
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued job has been handled.
+
+        Args:
+            timeout: Seconds to wait (None = no limit)
+
+        Returns:
+            True if the queue emptied in time
+        """
+        if self._queue is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Flush what can be written within ``timeout`` and spool the rest.
+
+        Args:
+            timeout: Seconds to keep writing before spooling
+        """
+        self._closing = True
+        for task in self._retry_tasks.values():
+            task.cancel()
+        self._retry_tasks.clear()
+
+        await self.drain(timeout)
+
+        leftover: List[PersistenceJob] = list(self._waiting_retry.values())
+        self._waiting_retry.clear()
+        if self._in_progress is not None:
+            # Interrupted mid-write: the transaction rolls back, so write it again later
+            leftover.append(self._in_progress)
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                leftover.append(self._queue.get_nowait())
+                self._queue.task_done()
+
+        if leftover:
+            self._spool(leftover)
+            logger.warning(f"💾 Spooled {len(leftover)} unsaved conversation writes for the next startup")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue statistics for health endpoints."""
+        return {
+            **self._stats,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "waiting_retry": len(self._waiting_retry),
+            "worker_running": self._worker_task is not None and not self._worker_task.done(),
+            "spool_path": self.spool_path
+        }
+
+    # =========================================================================
+    # WORKER
+    # =========================================================================
+
+    def _ensure_worker(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._worker())
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._in_progress = job
+            try:
+                await self._process(job)
+            finally:
+                self._in_progress = None
+                self._queue.task_done()
+
+    async def _process(self, job: PersistenceJob) -> None:
+        job.attempts += 1
+        try:
+            async with get_write_session() as session:
+                await conversation_service.save_message_exchange(
+                    db=session,
+                    conversation_id=job.conversation_id,
+                    messages=job.messages
+                )
+            self._stats["saved"] += 1
+            logger.info(f"💾 Saved {len(job.messages)} messages to conversation {job.conversation_id}")
+        except ValueError as e:
+            # Conversation deleted or invalid data: retrying will not help
+            logger.error(f"❌ Dropping conversation write {job.job_id}: {e}")
+        except Exception as e:
+            if job.attempts >= self.max_attempts or self._closing:
+                logger.error(
+                    f"❌ Conversation write {job.job_id} failed after {job.attempts} attempts, spooling: {e}"
+                )
+                self._spool([job])
+                return
+            delay = min(self.retry_base_seconds * (2 ** (job.attempts - 1)), self.retry_max_seconds)
+            logger.warning(
+                f"⚠️ Conversation write {job.job_id} failed (attempt {job.attempts}), retrying in {delay:.1f}s: {e}"
+            )
+            self._stats["retries"] += 1
+            self._schedule_retry(job, delay)
+
+    def _schedule_retry(self, job: PersistenceJob, delay: float) -> None:
+        async def requeue():
+            await asyncio.sleep(delay)
+            self._waiting_retry.pop(job.job_id, None)
+            self._retry_tasks.pop(job.job_id, None)
+            self._queue.put_nowait(job)
+
+        self._waiting_retry[job.job_id] = job
+        self._retry_tasks[job.job_id] = asyncio.create_task(requeue())
+
+    # =========================================================================
+    # SPOOL
+    # =========================================================================
+
+    def _spool(self, jobs: List[PersistenceJob]) -> None:
+        if not self.spool_path:
+            logger.error(f"❌ Losing {len(jobs)} conversation writes (no spool configured)")
+            return
+        payload = "".join(json.dumps(asdict(job), default=str) + "\n" for job in jobs).encode("utf-8")
+        try:
+            # Conversation content: owner-only. One O_APPEND write keeps lines
+            # whole when several workers spool to the same file
+            fd = os.open(self.spool_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, payload)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._stats["spooled"] += len(jobs)
+        except OSError as e:
+            logger.error(f"❌ Could not spool {len(jobs)} conversation writes: {e}")
+
+    def _read_spool(self) -> List[PersistenceJob]:
+        if not self.spool_path:
+            return []
+        # Claim the spool by renaming it: when several workers start at once,
+        # exactly one of them recovers its jobs
+        claimed_path = f"{self.spool_path}.{os.getpid()}.recovering"
+        try:
+            os.rename(self.spool_path, claimed_path)
+        except FileNotFoundError:
+            return []
+        except OSError as e:
+            logger.error(f"❌ Could not claim conversation write spool: {e}")
+            return []
+
+        jobs: List[PersistenceJob] = []
+        try:
+            with open(claimed_path, "r", encoding="utf-8") as spool:
+                for line in spool:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        jobs.append(PersistenceJob(**json.loads(line)))
+                    except (TypeError, ValueError) as e:
+                        logger.error(f"❌ Skipping unreadable spooled conversation write: {e}")
+            os.remove(claimed_path)
+        except OSError as e:
+            logger.error(f"❌ Could not read conversation write spool {claimed_path}: {e}")
+        return jobs
+
+
+# =============================================================================
+# SINGLETON INSTANCE
+# =============================================================================
+
+_message_persistence_queue: Optional[MessagePersistenceQueue] = None
+
+def get_message_persistence_queue() -> MessagePersistenceQueue:
+    """
+    Get the global message persistence queue instance.
+
+    Returns:
+        Singleton MessagePersistenceQueue instance
+    """
+    global _message_persistence_queue
+    if _message_persistence_queue is None:
+        _message_persistence_queue = MessagePersistenceQueue(
+            spool_path=settings.message_persistence_spool_path or None,
+            max_attempts=settings.message_persistence_max_attempts,
+            retry_base_seconds=settings.message_persistence_retry_base_seconds
+        )
+    return _message_persistence_queue
+
+
+__all__ = [
+    'PersistenceJob',
+    'MessagePersistenceQueue',
+    'get_message_persistence_queue'
+]
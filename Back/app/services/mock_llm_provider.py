@@ -4,27 +4,52 @@
 import asyncio
 import time
 import random
-from typing import Dict, Any, Optional
+import uuid
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
-from .llm_service import BaseLLMProvider, ChatRequest, ChatResponse, ChatMessage
+from .llm.exceptions import LLMProviderError
+from .llm.models import ChatRequest, ChatResponse, ChatMessage, ProviderBatchStatus, BatchItemResult
+from .llm.providers.base import BaseLLMProvider
 
 class MockLLMProvider(BaseLLMProvider):
     """
     Mock LLM provider for development and testing.
-    
+
     This provider simulates realistic LLM responses without making external API calls.
     Perfect for:
     - Development when API quotas are exceeded
     - Testing without incurring costs
     - Demonstrating the application's functionality
     - Learning LLM integration patterns
+
+    Enable it for every configuration with MOCK_LLM_PROVIDER_ENABLED=true.
+    A message containing MOCK_ERROR_MARKER fails, to exercise error paths.
     """
-    
+
+    MOCK_ERROR_MARKER = "[mock-error]"
+
+    # Simulated batch jobs (class level: providers are re-created when configs change)
+    _batches: Dict[str, Dict[str, Any]] = {}
+
+    def __init__(self, config, min_latency_ms: Optional[int] = None, max_latency_ms: Optional[int] = None):
+        """
+        Initialize the mock provider.
+
+        Args:
+            config: LLM configuration the mock stands in for
+            min_latency_ms: Shortest simulated response time (default from settings)
+            max_latency_ms: Longest simulated response time (default from settings)
+        """
+        from app.core.config import settings
+        super().__init__(config)
+        self.min_latency_ms = settings.mock_llm_min_latency_ms if min_latency_ms is None else min_latency_ms
+        self.max_latency_ms = settings.mock_llm_max_latency_ms if max_latency_ms is None else max_latency_ms
+
     @property
     def provider_name(self) -> str:
         return "Mock Provider (Development)"
-    
+
     # Collection of realistic mock responses
     MOCK_RESPONSES = [
         "Hello! I'm a mock LLM response. This simulates how a real AI assistant would respond to your message.",
@@ -36,11 +61,15 @@ class MockLLMProvider(BaseLLMProvider):
         "Perfect! Your chat interface is working correctly. This simulated response shows that messages are being processed through the backend service layer.",
         "Excellent work on building this AI gateway! This mock provider lets you test all features without external dependencies or API costs.",
     ]
-    
+
+    def _validate_configuration(self):
+        """The mock needs no API key or endpoint."""
+        return None
+
     async def send_chat_request(self, request: ChatRequest) -> ChatResponse:
         """
         Simulate sending a chat request to an LLM.
-        
+
         This method:
         1. Validates the request (just like a real provider)
         2. Simulates realistic response time
@@ -48,34 +77,154 @@ class MockLLMProvider(BaseLLMProvider):
         4. Returns properly formatted ChatResponse
         """
         self._validate_configuration()
-        
-        # Simulate realistic API response time (200-1500ms)
-        response_time_ms = random.randint(200, 1500)
+
+        # Simulate realistic API response time
+        response_time_ms = random.randint(self.min_latency_ms, max(self.min_latency_ms, self.max_latency_ms))
         await asyncio.sleep(response_time_ms / 1000)
-        
+
         # Get the last user message for context
         user_messages = [msg for msg in request.messages if msg.role == "user"]
         last_message = user_messages[-1].content.lower() if user_messages else ""
-        
+
+        if self.MOCK_ERROR_MARKER in last_message:
+            raise LLMProviderError(
+                "Simulated provider error",
+                provider=self.provider_name,
+                status_code=500
+            )
+
         # Generate contextual response
         mock_content = self._generate_contextual_response(last_message)
-        
+
         # Simulate realistic token usage
         # Input tokens = roughly message length / 4
-        input_tokens = sum(len(msg.content) for msg in request.messages) // 4
-        
-        # Output tokens = response length / 4  
-        output_tokens = len(mock_content) // 4
-        
+        input_tokens = max(1, sum(len(msg.content) for msg in request.messages) // 4)
+
+        # Output tokens = response length / 4
+        output_tokens = max(1, len(mock_content) // 4)
+
         usage = {
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
             "total_tokens": input_tokens + output_tokens
         }
-        
+
         # Simulate cost calculation (much cheaper than real APIs!)
         cost = self._calculate_actual_cost(usage) or 0.001  # Minimal mock cost
-        
+
         return ChatResponse(
             content=mock_content,
-            model=request.model or self.config
\ No newline at end of file
+            model=request.model or self.config.default_model or "mock-model",
+            provider=self.provider_name,
+            usage=usage,
+            cost=cost,
+            response_time_ms=response_time_ms,
+            raw_response={"mock": True, "generated_at": datetime.utcnow().isoformat()}
+        )
+
+    def _generate_contextual_response(self, last_message: str) -> str:
+        """
+        Pick a response that fits the user's message.
+
+        Args:
+            last_message: Lower-cased content of the last user message
+
+        Returns:
+            Mock response text
+        """
+        if not last_message:
+            return random.choice(self.MOCK_RESPONSES)
+        if any(greeting in last_message for greeting in ("hello", "hi ", "hey")):
+            return self.MOCK_RESPONSES[0]
+        if "test" in last_message:
+            return self.MOCK_RESPONSES[1]
+        if "?" in last_message:
+            return self.MOCK_RESPONSES[3]
+
+        # Echo a short excerpt so different inputs give different outputs
+        excerpt = last_message[:80] + ("..." if len(last_message) > 80 else "")
+        return f"{random.choice(self.MOCK_RESPONSES)} (You said: \"{excerpt}\")"
+
+    async def test_connection(self) -> Dict[str, Any]:
+        """The mock is always reachable."""
+        return {
+            "success": True,
+            "message": "Mock provider is always available",
+            "response_time_ms": 0,
+            "model": self.config.default_model
+        }
+
+    def estimate_cost(self, request: ChatRequest) -> Optional[float]:
+        """Estimate cost with the same length-based token guess as responses."""
+        input_tokens = request.get_total_content_length() // 4
+        return self._calculate_actual_cost({"input_tokens": input_tokens, "output_tokens": 50}) or 0.001
+
+    # =============================================================================
+    # SIMULATED BATCH API
+    # =============================================================================
+
+    supports_batch_api = True
+
+    async def submit_batch(self, requests: List[Tuple[str, ChatRequest]]) -> str:
+        """Start processing the requests in the background and return a batch id."""
+        batch_id = f"mock_batch_{uuid.uuid4().hex[:16]}"
+        batch = {
+            "total": len(requests),
+            "results": [],
+            "cancelled": False,
+            "created_at": time.time()
+        }
+        batch["task"] = asyncio.create_task(self._run_batch(batch, requests))
+        self._batches[batch_id] = batch
+
+        self.logger.info(f"🧪 Mock batch {batch_id} submitted with {len(requests)} requests")
+        return batch_id
+
+    async def _run_batch(self, batch: Dict[str, Any], requests: List[Tuple[str, ChatRequest]]) -> None:
+        semaphore = asyncio.Semaphore(8)
+
+        async def run_one(custom_id: str, request: ChatRequest) -> None:
+            async with semaphore:
+                try:
+                    response = await self.send_chat_request(request)
+                    batch["results"].append(BatchItemResult(custom_id, response=response))
+                except Exception as e:
+                    batch["results"].append(BatchItemResult(custom_id, error=str(e)))
+
+        await asyncio.gather(*(run_one(custom_id, request) for custom_id, request in requests))
+
+    async def get_batch_status(self, batch_id: str) -> ProviderBatchStatus:
+        batch = self._get_batch(batch_id)
+        results = batch["results"]
+
+        if batch["cancelled"]:
+            status = ProviderBatchStatus.CANCELLED
+        elif batch["task"].done():
+            status = ProviderBatchStatus.COMPLETED
+        else:
+            status = ProviderBatchStatus.IN_PROGRESS
+
+        return ProviderBatchStatus(
+            batch_id=batch_id,
+            status=status,
+            total=batch["total"],
+            completed=sum(1 for result in results if result.response is not None),
+            failed=sum(1 for result in results if result.response is None)
+        )
+
+    async def get_batch_results(self, batch_id: str) -> List[BatchItemResult]:
+        return list(self._get_batch(batch_id)["results"])
+
+    async def cancel_batch(self, batch_id: str) -> None:
+        batch = self._get_batch(batch_id)
+        batch["cancelled"] = True
+        batch["task"].cancel()
+
+    def _get_batch(self, batch_id: str) -> Dict[str, Any]:
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            raise LLMProviderError(f"Unknown mock batch: {batch_id}", provider=self.provider_name, status_code=404)
+        return batch
+
+
+__all__ = ['MockLLMProvider']
@@ -127,7 +127,7 @@ class QuotaService:
         Returns:
             QuotaCheckResult indicating if request is allowed and why
         """
-        self.logger.info(f"Checking quotas for department {department_id}, LLM config {llm_config_id}")
+        self.logger.debug(f"Checking quotas for department {department_id}, LLM config {llm_config_id}")
         
         try:
             # Reset any expired quotas first
@@ -137,7 +137,7 @@ class QuotaService:
             quotas = await self._get_applicable_quotas(department_id, llm_config_id)
             
             if not quotas:
-                self.logger.info(f"No quotas found for department {department_id}, allowing request")
+                self.logger.debug(f"No quotas found for department {department_id}, allowing request")
                 return QuotaCheckResult(
                     allowed=True,
                     department_id=department_id,
@@ -156,7 +156,7 @@ class QuotaService:
                     return violation
             
             # All quotas passed
-            self.logger.info(f"All quota checks passed for department {department_id}")
+            self.logger.debug(f"All quota checks passed for department {department_id}")
             return QuotaCheckResult(
                 allowed=True,
                 department_id=department_id,
@@ -14,7 +14,8 @@ from ..models.usage_log import UsageLog
 from ..models.user import User
 from ..models.department import Department
 from ..models.llm_config import LLMConfiguration
-from ..core.database import AsyncSessionLocal
+from ..core.database import AsyncSessionLocal, get_async_read_session, insert_objects
+from ..core.metrics import LLM_TOKENS, LLM_COST, USAGE_LOGS, USAGE_LOG_FAILURES
 
 class UsageService:
     """
@@ -198,6 +199,7 @@ class UsageService:
                     response_time_ms=response_time_ms,
                     request_started_at=request_started_at,
                     request_completed_at=request_completed_at,
+                    queue_wait_ms=performance_data.get("queue_wait_ms"),
                     
                     # Success/failure tracking
                     success=success,
@@ -221,7 +223,7 @@ class UsageService:
                 session.add(usage_log)
                 try:
                     await session.commit()
-                    self.logger.info(f"💾 DEBUG: Successfully committed usage log to database for request {request_id}")
+                    self.logger.debug(f"💾 Successfully committed usage log to database for request {request_id}")
                 except Exception as commit_error:
                     self.logger.error(f"❌ DEBUG: Database commit failed for request {request_id}: {str(commit_error)}")
                     await session.rollback()
@@ -230,6 +232,7 @@ class UsageService:
                 # Mark successful creation BEFORE any potential errors
                 main_log_created = True
                 main_log = usage_log
+                self._record_usage_metrics([usage_log])
                 
                 actual_cost_display = f"${actual_cost:.4f}" if actual_cost is not None else "$0.0000"
                 estimated_cost_display = f"${estimated_cost:.4f}" if estimated_cost is not None else "None"
@@ -279,6 +282,7 @@ class UsageService:
                             
                     except Exception as emergency_error:
                         self.logger.error(f"Emergency logging also failed: {str(emergency_error)}")
+                        USAGE_LOG_FAILURES.inc()
                         raise main_error  # Re-raise the original error
                 else:
                     # Main log was successfully created, don't create emergency log
@@ -310,6 +314,7 @@ class UsageService:
     # =============================================================================
     # ANALYTICS AND REPORTING METHODS
     # =============================================================================
+    # These only read, so they use the read replica when one is configured
     
     async def get_user_usage_summary(
         self,
@@ -333,7 +338,7 @@ class UsageService:
         if not end_date:
             end_date = datetime.utcnow()
         
-        async with AsyncSessionLocal() as session:
+        async with get_async_read_session() as session:
             # 🔧 FIX: Add cache-busting parameter to prevent query caching
             # This ensures fresh data by making each query unique
             cache_buster = datetime.utcnow().microsecond
@@ -501,7 +506,7 @@ class UsageService:
         if not end_date:
             end_date = datetime.utcnow()
         
-        async with AsyncSessionLocal() as session:
+        async with get_async_read_session() as session:
             # 🔧 FIX: Add cache-busting parameter to prevent query caching
             # This ensures fresh data by making each query unique
             cache_buster = datetime.utcnow().microsecond
@@ -569,7 +574,7 @@ class UsageService:
         if not end_date:
             end_date = datetime.utcnow()
         
-        async with AsyncSessionLocal() as session:
+        async with get_async_read_session() as session:
             # 🔧 FIX: Add cache-busting parameter to prevent query caching
             # This ensures fresh data by making each query unique
             cache_buster = datetime.utcnow().microsecond
@@ -674,6 +679,152 @@ class UsageService:
             "quota_utilization_percent": 0  # Will be calculated in AID-005-B
         }
 
+    def _record_usage_metrics(self, usage_logs: List[UsageLog]) -> None:
+        """
+        Add committed usage logs to the token and cost counters on /metrics.
+        
+        Every LLM request ends up here (chat, streaming, cancelled streams and
+        batch jobs alike), so counting at this point avoids double counting.
+        """
+        for usage_log in usage_logs:
+            labels = {"config_id": usage_log.llm_config_id, "model": usage_log.model or "unknown"}
+            LLM_TOKENS.inc(usage_log.input_tokens or 0, direction="input", **labels)
+            LLM_TOKENS.inc(usage_log.output_tokens or 0, direction="output", **labels)
+            if usage_log.actual_cost:
+                LLM_COST.inc(usage_log.actual_cost, **labels)
+            USAGE_LOGS.inc(success="true" if usage_log.success else "false")
+    
+    def _build_usage_log(
+        self,
+        user: Optional[User],
+        llm_config: Optional[LLMConfiguration],
+        user_id: int,
+        llm_config_id: int,
+        request_data: Dict[str, Any],
+        response_data: Dict[str, Any],
+        performance_data: Dict[str, Any],
+        session_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None
+    ) -> UsageLog:
+        """
+        Build a UsageLog row from the logging payload (not added to any session).
+        
+        Args:
+            user: User with role loaded, or None if it no longer exists
+            llm_config: Configuration used, or None if it no longer exists
+            (remaining arguments as in log_llm_request_isolated)
+            
+        Returns:
+            UsageLog ready to be added to a session
+        """
+        user_email = user.email if user else "unknown"
+        user_role = user.role.name if user and user.role else "unknown"
+        department_id = user.department_id if user else None
+        
+        # Parse all the data safely
+        messages_count = request_data.get("messages_count", 0)
+        total_chars = request_data.get("total_chars", 0)
+        request_parameters = request_data.get("parameters", {})
+        
+        success = response_data.get("success", False)
+        content_length = response_data.get("content_length", 0)
+        model = response_data.get("model", "unknown")
+        provider = response_data.get("provider", "unknown")
+        token_usage = response_data.get("token_usage", {})
+        actual_cost = response_data.get("cost")  # LiteLLM calculated cost
+        error_type = response_data.get("error_type")
+        error_message = response_data.get("error_message")
+        http_status_code = response_data.get("http_status_code")
+        raw_metadata = response_data.get("raw_metadata", {})
+        cache_status = response_data.get("cache_status")
+        cost_saved = response_data.get("cost_saved")
+        
+        # Calculate estimated cost using config pricing for comparison
+        estimated_cost = None
+        if llm_config and token_usage.get("total_tokens", 0) > 0:
+            try:
+                input_tokens = token_usage.get("input_tokens", 0)
+                output_tokens = token_usage.get("output_tokens", 0)
+        
+                config_input_cost = float(llm_config.cost_per_1k_input_tokens or 0)
+                config_output_cost = float(llm_config.cost_per_1k_output_tokens or 0)
+                config_request_cost = float(llm_config.cost_per_request or 0)
+        
+                if config_input_cost > 0 or config_output_cost > 0:
+                    estimated_cost = (
+                        (input_tokens / 1000 * config_input_cost) +
+                        (output_tokens / 1000 * config_output_cost) +
+                        config_request_cost
+                    )
+            except Exception as cost_calc_error:
+                self.logger.warning(f"Failed to calculate estimated cost: {str(cost_calc_error)}")
+                estimated_cost = None
+        
+        # Parse performance data safely
+        request_started_at = None
+        request_completed_at = None
+        try:
+            if performance_data.get("request_started_at"):
+                if isinstance(performance_data["request_started_at"], str):
+                    request_started_at = datetime.fromisoformat(
+                        performance_data["request_started_at"].replace("Z", "+00:00")
+                    )
+                else:
+                    request_started_at = performance_data["request_started_at"]
+        
+            if performance_data.get("request_completed_at"):
+                if isinstance(performance_data["request_completed_at"], str):
+                    request_completed_at = datetime.fromisoformat(
+                        performance_data["request_completed_at"].replace("Z", "+00:00")
+                    )
+                else:
+                    request_completed_at = performance_data["request_completed_at"]
+        except Exception as time_error:
+            self.logger.warning(f"Failed to parse timestamps: {str(time_error)}")
+        
+        response_time_ms = performance_data.get("response_time_ms")
+        response_content = response_data.get("content", "")
+        response_preview = response_content[:500] if response_content else None
+        
+        return UsageLog(
+            user_id=user_id,
+            department_id=department_id,
+            user_email=user_email,
+            user_role=user_role,
+            llm_config_id=llm_config_id,
+            llm_config_name=llm_config.name if llm_config else "unknown",
+            provider=provider,
+            model=model,
+            request_messages_count=messages_count,
+            request_total_chars=total_chars,
+            request_parameters=request_parameters,
+            input_tokens=token_usage.get("input_tokens", 0),
+            output_tokens=token_usage.get("output_tokens", 0),
+            total_tokens=token_usage.get("total_tokens", 0),
+            estimated_cost=estimated_cost,  # Config-based estimate for comparison
+            actual_cost=actual_cost,         # LiteLLM calculated cost is the actual cost
+            cost_currency="USD",
+            cache_status=cache_status,
+            cost_saved=cost_saved,
+            response_time_ms=response_time_ms,
+            request_started_at=request_started_at,
+            request_completed_at=request_completed_at,
+            queue_wait_ms=performance_data.get("queue_wait_ms"),
+            success=success,
+            error_type=error_type,
+            error_message=error_message,
+            http_status_code=http_status_code,
+            response_content_length=content_length,
+            response_preview=response_preview,
+            session_id=session_id,
+            request_id=request_id,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            raw_response_metadata=raw_metadata
+        )
+    
     async def log_llm_request_isolated(
         self,
         user_id: int,
@@ -697,160 +848,113 @@ class UsageService:
         rolled back with the main transaction when exceptions occurred.
         
         Key differences from other logging methods:
-        - Uses AsyncSessionLocal() directly (new session)
+        - Uses AsyncSessionLocal() for lookups and its own insert transaction
         - Commits immediately within its own transaction
         - Does not depend on external session parameter
         - Cannot be rolled back by calling code
         - Includes comprehensive error handling
         """
         try:
-            self.logger.info(f"🔧 [ISOLATED LOG] Starting isolated usage logging for user {user_id}, request {request_id}")
+            self.logger.debug(f"🔧 [ISOLATED LOG] Starting isolated usage logging for user {user_id}, request {request_id}")
             
             # 🔑 KEY FIX: Create completely separate database session
             async with AsyncSessionLocal() as isolated_session:
-                try:
-                    # Load user and related data using the isolated session with eager loading
-                    from sqlalchemy.orm import selectinload
-                    from sqlalchemy import select
-                    
-                    user_query = select(User).options(
-                        selectinload(User.role),
-                        selectinload(User.department)
-                    ).where(User.id == user_id)
-                    user_result = await isolated_session.execute(user_query)
-                    user = user_result.scalar_one_or_none()
-                    
-                    user_email = user.email if user else "unknown"
-                    user_role = user.role.name if user and user.role else "unknown"
-                    department_id = user.department_id if user else None
-                    
-                    # Load LLM configuration using the isolated session
-                    llm_config = await isolated_session.get(LLMConfiguration, llm_config_id)
-                    
-                    # Parse all the data safely (same logic as other methods)
-                    messages_count = request_data.get("messages_count", 0)
-                    total_chars = request_data.get("total_chars", 0)
-                    request_parameters = request_data.get("parameters", {})
-                    
-                    success = response_data.get("success", False)
-                    content_length = response_data.get("content_length", 0)
-                    model = response_data.get("model", "unknown")
-                    provider = response_data.get("provider", "unknown")
-                    token_usage = response_data.get("token_usage", {})
-                    actual_cost = response_data.get("cost")  # LiteLLM calculated cost
-                    error_type = response_data.get("error_type")
-                    error_message = response_data.get("error_message")
-                    http_status_code = response_data.get("http_status_code")
-                    raw_metadata = response_data.get("raw_metadata", {})
-                    
-                    # Calculate estimated cost using config pricing for comparison
-                    estimated_cost = None
-                    if llm_config and token_usage.get("total_tokens", 0) > 0:
-                        try:
-                            input_tokens = token_usage.get("input_tokens", 0)
-                            output_tokens = token_usage.get("output_tokens", 0)
-                            
-                            config_input_cost = float(llm_config.cost_per_1k_input_tokens or 0)
-                            config_output_cost = float(llm_config.cost_per_1k_output_tokens or 0)
-                            config_request_cost = float(llm_config.cost_per_request or 0)
-                            
-                            if config_input_cost > 0 or config_output_cost > 0:
-                                estimated_cost = (
-                                    (input_tokens / 1000 * config_input_cost) +
-                                    (output_tokens / 1000 * config_output_cost) +
-                                    config_request_cost
-                                )
-                        except Exception as cost_calc_error:
-                            self.logger.warning(f"[ISOLATED LOG] Failed to calculate estimated cost: {str(cost_calc_error)}")
-                            estimated_cost = None
-                    
-                    # Parse performance data safely
-                    request_started_at = None
-                    request_completed_at = None
-                    try:
-                        if performance_data.get("request_started_at"):
-                            if isinstance(performance_data["request_started_at"], str):
-                                request_started_at = datetime.fromisoformat(
-                                    performance_data["request_started_at"].replace("Z", "+00:00")
-                                )
-                            else:
-                                request_started_at = performance_data["request_started_at"]
-                        
-                        if performance_data.get("request_completed_at"):
-                            if isinstance(performance_data["request_completed_at"], str):
-                                request_completed_at = datetime.fromisoformat(
-                                    performance_data["request_completed_at"].replace("Z", "+00:00")
-                                )
-                            else:
-                                request_completed_at = performance_data["request_completed_at"]
-                    except Exception as time_error:
-                        self.logger.warning(f"[ISOLATED LOG] Failed to parse timestamps: {str(time_error)}")
-                    
-                    response_time_ms = performance_data.get("response_time_ms")
-                    response_content = response_data.get("content", "")
-                    response_preview = response_content[:500] if response_content else None
-                    
-                    # Create usage log entry
-                    usage_log = UsageLog(
-                        user_id=user_id,
-                        department_id=department_id,
-                        user_email=user_email,
-                        user_role=user_role,
-                        llm_config_id=llm_config_id,
-                        llm_config_name=llm_config.name if llm_config else "unknown",
-                        provider=provider,
-                        model=model,
-                        request_messages_count=messages_count,
-                        request_total_chars=total_chars,
-                        request_parameters=request_parameters,
-                        input_tokens=token_usage.get("input_tokens", 0),
-                        output_tokens=token_usage.get("output_tokens", 0),
-                        total_tokens=token_usage.get("total_tokens", 0),
-                        estimated_cost=estimated_cost,  # Config-based estimate for comparison
-                        actual_cost=actual_cost,         # LiteLLM calculated cost is the actual cost
-                        cost_currency="USD",
-                        response_time_ms=response_time_ms,
-                        request_started_at=request_started_at,
-                        request_completed_at=request_completed_at,
-                        success=success,
-                        error_type=error_type,
-                        error_message=error_message,
-                        http_status_code=http_status_code,
-                        response_content_length=content_length,
-                        response_preview=response_preview,
-                        session_id=session_id,
-                        request_id=request_id,
-                        ip_address=ip_address,
-                        user_agent=user_agent,
-                        raw_response_metadata=raw_metadata
-                    )
-                    
-                    # 🔑 KEY FIX: Add to isolated session and commit immediately
-                    isolated_session.add(usage_log)
-                    await isolated_session.commit()
-                    
-                    actual_cost_display = f"${actual_cost:.4f}" if actual_cost is not None else "$0.0000"
-                    estimated_cost_display = f"${estimated_cost:.4f}" if estimated_cost is not None else "None"
-                    self.logger.info(
-                        f"✅ [ISOLATED LOG] Usage logged successfully: user={user_email}, provider={provider}, "
-                        f"model={model}, tokens={usage_log.total_tokens}, "
-                        f"actual_cost={actual_cost_display}, estimated_cost={estimated_cost_display}, "
-                        f"success={success}, request_id={request_id}, log_id={usage_log.id}"
-                    )
-                    
-                except Exception as isolated_error:
-                    # Even if the isolated session fails, rollback and re-raise
-                    await isolated_session.rollback()
-                    self.logger.error(f"❌ [ISOLATED LOG] Isolated session error for user {user_id}: {str(isolated_error)}")
-                    raise isolated_error
+                # Load user and related data using the isolated session with eager loading
+                from sqlalchemy.orm import selectinload
+                from sqlalchemy import select
+                
+                user_query = select(User).options(
+                    selectinload(User.role),
+                    selectinload(User.department)
+                ).where(User.id == user_id)
+                user_result = await isolated_session.execute(user_query)
+                user = user_result.scalar_one_or_none()
+                
+                # Load LLM configuration using the isolated session
+                llm_config = await isolated_session.get(LLMConfiguration, llm_config_id)
+                
+                usage_log = self._build_usage_log(
+                    user, llm_config, user_id, llm_config_id,
+                    request_data, response_data, performance_data,
+                    session_id, request_id, ip_address, user_agent
+                )
+            user_email = usage_log.user_email
+            provider, model, success = usage_log.provider, usage_log.model, usage_log.success
+            actual_cost, estimated_cost = usage_log.actual_cost, usage_log.estimated_cost
+            
+            # 🔑 KEY FIX: Insert in its own transaction, committed immediately
+            # (group-committed through the single writer on SQLite)
+            await insert_objects([usage_log])
+            self._record_usage_metrics([usage_log])
+            
+            actual_cost_display = f"${actual_cost:.4f}" if actual_cost is not None else "$0.0000"
+            estimated_cost_display = f"${estimated_cost:.4f}" if estimated_cost is not None else "None"
+            self.logger.info(
+                f"✅ [ISOLATED LOG] Usage logged successfully: user={user_email}, provider={provider}, "
+                f"model={model}, tokens={usage_log.total_tokens}, "
+                f"actual_cost={actual_cost_display}, estimated_cost={estimated_cost_display}, "
+                f"success={success}, request_id={request_id}, log_id={usage_log.id}"
+            )
                     
         except Exception as e:
+            USAGE_LOG_FAILURES.inc()
             self.logger.error(f"❌ [ISOLATED LOG] Failed to log usage for user {user_id}: {str(e)}")
             import traceback
             self.logger.error(f"❌ [ISOLATED LOG] Traceback: {traceback.format_exc()}")
             # 🔧 IMPORTANT: Don't re-raise - usage logging should never break the main flow
             # This ensures that even if usage logging completely fails, the user still gets their chat response
 
+    async def log_llm_requests_batch(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        Write many usage logs in one transaction (batched writer).
+        
+        Used by bulk workloads such as batch jobs, where one isolated session
+        and commit per request would dominate the cost. Users and configurations
+        are loaded once per batch. Like log_llm_request_isolated, failures are
+        logged and never raised.
+        
+        Args:
+            entries: Keyword arguments of log_llm_request_isolated, one dict per request
+            
+        Returns:
+            Number of usage logs written
+        """
+        if not entries:
+            return 0
+        
+        try:
+            async with AsyncSessionLocal() as batch_session:
+                user_ids = {entry["user_id"] for entry in entries}
+                config_ids = {entry["llm_config_id"] for entry in entries}
+                
+                user_result = await batch_session.execute(
+                    select(User).options(selectinload(User.role)).where(User.id.in_(user_ids))
+                )
+                users = {user.id: user for user in user_result.scalars().all()}
+                config_result = await batch_session.execute(
+                    select(LLMConfiguration).where(LLMConfiguration.id.in_(config_ids))
+                )
+                configs = {config.id: config for config in config_result.scalars().all()}
+                
+                usage_logs = [
+                    self._build_usage_log(
+                        users.get(entry["user_id"]),
+                        configs.get(entry["llm_config_id"]),
+                        **entry
+                    )
+                    for entry in entries
+                ]
+            await insert_objects(usage_logs)
+            self._record_usage_metrics(usage_logs)
+            
+            self.logger.info(f"✅ [BATCH LOG] {len(entries)} usage logs written in one transaction")
+            return len(entries)
+            
+        except Exception as e:
+            USAGE_LOG_FAILURES.inc(len(entries))
+            self.logger.error(f"❌ [BATCH LOG] Failed to log {len(entries)} usage entries: {str(e)}")
+            return 0
+
     def log_llm_request_sync(
         self,
         db_session,
@@ -968,6 +1072,7 @@ class UsageService:
                 response_time_ms=response_time_ms,
                 request_started_at=request_started_at,
                 request_completed_at=request_completed_at,
+                queue_wait_ms=performance_data.get("queue_wait_ms"),
                 success=success,
                 error_type=error_type,
                 error_message=error_message,
@@ -982,6 +1087,7 @@ class UsageService:
             )
             db_session.add(usage_log)
             db_session.commit()
+            self._record_usage_metrics([usage_log])
             actual_cost_display = f"${actual_cost:.4f}" if actual_cost is not None else "$0.0000"
             estimated_cost_display = f"${estimated_cost:.4f}" if estimated_cost is not None else "None"
             self.logger.info(
@@ -992,6 +1098,7 @@ class UsageService:
             )
         except Exception as e:
             db_session.rollback()
+            USAGE_LOG_FAILURES.inc()
             self.logger.error(f"[SYNC LOG] Failed to log usage for user {user_id}: {str(e)}")
             import traceback
             self.logger.error(traceback.format_exc())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+AI Dock - Message Content Hash Migration Script
+Adds conversation_messages.content_hash, backfills it for existing rows and
+creates the duplicate-detection index
+"""
+
+import logging
+import sys
+import os
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import sync_engine
+from app.models.conversation import compute_content_hash
+
+BATCH_SIZE = 1000
+
+def has_content_hash_column() -> bool:
+    """Check whether conversation_messages already has the content_hash column."""
+    columns = {col["name"] for col in inspect(sync_engine).get_columns("conversation_messages")}
+    return "content_hash" in columns
+
+def count_missing_hashes() -> int:
+    """Count messages that still need a content hash."""
+    with sync_engine.connect() as connection:
+        return connection.execute(text(
+            "SELECT COUNT(*) FROM conversation_messages WHERE content_hash IS NULL"
+        )).scalar()
+
+def migrate_message_content_hash():
+    """
+    Add and backfill content_hash, then index it.
+
+    Rows are hashed in batches of BATCH_SIZE, each in its own transaction,
+    so the migration can be interrupted and re-run on a live database.
+    """
+    print("🔄 AI Dock Message Content Hash Migration")
+    print("=" * 50)
+
+    if not has_content_hash_column():
+        print("   Adding column conversation_messages.content_hash (VARCHAR(64))")
+        with sync_engine.begin() as connection:
+            connection.execute(text(
+                "ALTER TABLE conversation_messages ADD COLUMN content_hash VARCHAR(64)"
+            ))
+
+    total = 0
+    while True:
+        with sync_engine.begin() as connection:
+            rows = connection.execute(text(
+                "SELECT id, content FROM conversation_messages "
+                "WHERE content_hash IS NULL ORDER BY id LIMIT :limit"
+            ), {"limit": BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+            connection.execute(
+                text("UPDATE conversation_messages SET content_hash = :content_hash WHERE id = :id"),
+                [{"id": row.id, "content_hash": compute_content_hash(row.content)} for row in rows]
+            )
+        total += len(rows)
+        print(f"   Backfilled {total} message(s)")
+
+    print("   Creating index idx_message_dedup")
+    with sync_engine.begin() as connection:
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_message_dedup "
+            "ON conversation_messages (conversation_id, role, content_hash, created_at)"
+        ))
+
+    print(f"\n✅ Migration completed: hashed {total} existing message(s)")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)  # Reduce noise
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--migrate":
+        try:
+            migrate_message_content_hash()
+        except Exception as e:
+            print(f"\n❌ Migration failed: {str(e)}")
+            sys.exit(1)
+    else:
+        if not has_content_hash_column():
+            print("⚠️  conversation_messages is missing the content_hash column")
+            print("To migrate, run: python migrate_message_content_hash.py --migrate")
+        else:
+            missing = count_missing_hashes()
+            if missing:
+                print(f"⚠️  {missing} message(s) have no content hash yet")
+                print("To backfill, run: python migrate_message_content_hash.py --migrate")
+            else:
+                print("✅ conversation_messages already has content hashes")
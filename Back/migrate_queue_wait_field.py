@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+AI Dock - Queue Wait Field Migration Script
+Adds the queue_wait_ms column (admission control wait time) to existing usage_logs tables
+"""
+
+import logging
+import sys
+import os
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import sync_engine
+
+def has_queue_wait_column() -> bool:
+    """Check whether usage_logs already has the queue_wait_ms column."""
+    columns = {col["name"] for col in inspect(sync_engine).get_columns("usage_logs")}
+    return "queue_wait_ms" in columns
+
+def migrate_queue_wait_field():
+    """
+    Add usage_logs.queue_wait_ms.
+
+    Existing rows keep NULL: they were logged before requests were queued.
+    """
+    print("🔄 AI Dock Queue Wait Field Migration")
+    print("=" * 50)
+
+    if has_queue_wait_column():
+        print("✅ usage_logs already has the queue_wait_ms column")
+        return
+
+    print("   Adding column usage_logs.queue_wait_ms (INTEGER)")
+    with sync_engine.begin() as connection:
+        connection.execute(text("ALTER TABLE usage_logs ADD COLUMN queue_wait_ms INTEGER"))
+
+    print("\n✅ Migration completed: added 1 column")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)  # Reduce noise
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--migrate":
+        try:
+            migrate_queue_wait_field()
+        except Exception as e:
+            print(f"\n❌ Migration failed: {str(e)}")
+            sys.exit(1)
+    else:
+        if not has_queue_wait_column():
+            print("⚠️  usage_logs is missing the queue_wait_ms column")
+            print("To migrate, run: python migrate_queue_wait_field.py --migrate")
+        else:
+            print("✅ usage_logs already has the queue_wait_ms column")
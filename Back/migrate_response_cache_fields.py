@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+AI Dock - Response Cache Field Migration Script
+Adds the cache_status and cost_saved columns to existing usage_logs tables
+"""
+
+import logging
+import sys
+import os
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import sync_engine
+
+# Columns added to usage_logs for response cache tracking
+NEW_COLUMNS = {
+    "cache_status": "VARCHAR(20)",
+    "cost_saved": "FLOAT",
+}
+
+def get_missing_columns() -> list:
+    """Return the response cache columns not yet present in usage_logs."""
+    existing = {col["name"] for col in inspect(sync_engine).get_columns("usage_logs")}
+    return [name for name in NEW_COLUMNS if name not in existing]
+
+def migrate_response_cache_fields():
+    """
+    Add response cache columns and index to usage_logs.
+
+    Base.metadata.create_all() only creates missing tables, so databases
+    created before the response cache need these columns added explicitly.
+    Existing rows keep NULL (not cacheable), which is the correct value.
+    """
+    print("🔄 AI Dock Response Cache Field Migration")
+    print("=" * 50)
+
+    missing = get_missing_columns()
+    if not missing:
+        print("✅ usage_logs already has all response cache columns")
+        return
+
+    with sync_engine.begin() as connection:
+        for name in missing:
+            print(f"   Adding column usage_logs.{name} ({NEW_COLUMNS[name]})")
+            connection.execute(text(f"ALTER TABLE usage_logs ADD COLUMN {name} {NEW_COLUMNS[name]}"))
+
+        if "cache_status" in missing:
+            print("   Creating index ix_usage_logs_cache_status")
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_usage_logs_cache_status ON usage_logs (cache_status)"
+            ))
+
+    print(f"\n✅ Migration completed: added {len(missing)} column(s)")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)  # Reduce noise
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--migrate":
+        try:
+            migrate_response_cache_fields()
+        except Exception as e:
+            print(f"\n❌ Migration failed: {str(e)}")
+            sys.exit(1)
+    else:
+        missing = get_missing_columns()
+        if missing:
+            print(f"⚠️  usage_logs is missing columns: {', '.join(missing)}")
+            print("To migrate, run: python migrate_response_cache_fields.py --migrate")
+        else:
+            print("✅ usage_logs already has all response cache columns")
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+AI Dock Logging Benchmark
+Measures what logging costs per chat request: records and bytes written and time spent
+inside the logging machinery, for /chat/send and /chat/stream against the mock provider
+from load_test.py
+
+Each mode runs in its own process because settings and logger state are fixed at import:
+    default         LOG_LEVEL=INFO, hot-path debug off
+    hot-path-debug  per-message / per-chunk detail logs on (app logger at DEBUG)
+    sampled         INFO lines of app.* sampled at 10% (per request)
+    json            default with LOG_FORMAT=json
+
+Examples:
+    python scripts/logging_benchmark.py --requests 200
+    python scripts/logging_benchmark.py --modes default --output after.json
+    git stash && python scripts/logging_benchmark.py --modes default --output before.json && git stash pop
+    python scripts/logging_benchmark.py --modes default --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent))
+
+MODES = {
+    "default": {"LOG_LEVEL": "INFO", "LOG_HOT_PATH_DEBUG": "false"},
+    "hot-path-debug": {"LOG_LEVEL": "INFO", "LOG_HOT_PATH_DEBUG": "true"},
+    "sampled": {"LOG_LEVEL": "INFO", "LOG_HOT_PATH_DEBUG": "false", "LOG_SAMPLE_RATES": "app=0.1"},
+    "json": {"LOG_LEVEL": "INFO", "LOG_HOT_PATH_DEBUG": "false", "LOG_FORMAT": "json"},
+}
+
+SCENARIOS = ("chat_send", "chat_stream")
+
+
+# =============================================================================
+# MEASUREMENT (child process)
+# =============================================================================
+
+class CountingStream:
+    """File wrapper that counts what the log handlers write."""
+
+    def __init__(self, target):
+        self.target = target
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        self.bytes += len(text.encode("utf-8", "replace"))
+        self.lines += text.count("\n")
+        return self.target.write(text)
+
+    def flush(self) -> None:
+        self.target.flush()
+
+
+class LoggingTimer:
+    """Times Logger._log, i.e. record creation, filters, formatting and the write."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self._original = logging.Logger._log
+
+    def install(self) -> None:
+        original = self._original
+        timer = self
+
+        def timed_log(logger, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(logger, *args, **kwargs)
+            finally:
+                timer.seconds += time.perf_counter() - started
+                timer.calls += 1
+
+        logging.Logger._log = timed_log
+
+    def reset(self) -> None:
+        self.seconds = 0.0
+        self.calls = 0
+
+
+def redirect_root_handlers(stream: CountingStream) -> None:
+    """Point the app's own handlers (formatter and filters included) at the counting stream."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(stream)
+
+
+async def _run_single(port: int, seed_data: Dict[str, Any], scenario: str, requests: int) -> int:
+    """Send `requests` sequential requests of one scenario; returns the error count."""
+    import httpx
+    import random
+    from load_test import VirtualUser, Metrics
+
+    metrics = Metrics()
+    metrics.recording = True
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60.0) as client:
+        user = VirtualUser(0, client, seed_data, metrics, random.Random(0))
+        user.token = await user._login(user.email)
+        for _ in range(requests):
+            await user.timed(scenario, getattr(user, scenario))
+    return metrics.errors[scenario]
+
+
+def measure(args) -> Dict[str, Any]:
+    from load_test import install_mock_provider, ServerThread, ServerMonitor, seed_database
+
+    install_mock_provider(argparse.Namespace(
+        seed=42, error_rate=0.0, output_tokens=args.output_tokens, tokens_per_second=100000.0, ttft_ms=0.0
+    ))
+    monitor = ServerMonitor()
+    server = ServerThread(args.port, monitor)
+    server.start()
+
+    sink = open(os.devnull, "w") if not args.log_file else open(args.log_file, "a")
+    stream = CountingStream(sink)
+    timer = LoggingTimer()
+    try:
+        seed_data = seed_database(1)
+        redirect_root_handlers(stream)
+        timer.install()
+
+        # Warm-up: first requests pay for imports, caches and token counting setup
+        for scenario in SCENARIOS:
+            asyncio.run(_run_single(args.port, seed_data, scenario, 2))
+
+        results = {}
+        for scenario in SCENARIOS:
+            stream.bytes = stream.lines = 0
+            timer.reset()
+            cpu_started = time.process_time()
+            wall_started = time.perf_counter()
+            errors = asyncio.run(_run_single(args.port, seed_data, scenario, args.requests))
+            wall = time.perf_counter() - wall_started
+            cpu = time.process_time() - cpu_started
+            # Usage logging runs in background tasks; let them finish inside the window
+            time.sleep(0.5)
+            results[scenario] = {
+                "requests": args.requests,
+                "errors": errors,
+                "log_lines_per_request": round(stream.lines / args.requests, 2),
+                "log_calls_per_request": round(timer.calls / args.requests, 2),
+                "log_bytes_per_request": round(stream.bytes / args.requests, 1),
+                "logging_ms_per_request": round(timer.seconds * 1000 / args.requests, 3),
+                "cpu_ms_per_request": round(cpu * 1000 / args.requests, 2),
+                "wall_ms_per_request": round(wall * 1000 / args.requests, 2),
+            }
+        return results
+    finally:
+        server.stop()
+        sink.close()
+
+
+# =============================================================================
+# ORCHESTRATION (parent process)
+# =============================================================================
+
+def run_mode(mode: str, args) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="aidock-logbench-") as temp_dir:
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": f"sqlite:///{temp_dir}/logging_benchmark.db",
+            "ENVIRONMENT": "development",
+            "DEBUG": "false",
+            "MOCK_LLM_PROVIDER_ENABLED": "false",
+            "MESSAGE_PERSISTENCE_SPOOL_PATH": "",
+            "TRACING_EXPORTER": "none",
+        })
+        env.setdefault("SECRET_KEY", "logging-benchmark-secret-key-that-is-long-enough-0123")
+        env.update(MODES[mode])
+
+        command = [
+            sys.executable, __file__, "--child",
+            "--requests", str(args.requests),
+            "--output-tokens", str(args.output_tokens),
+            "--port", str(args.port),
+        ]
+        if args.log_file:
+            command += ["--log-file", args.log_file]
+        completed = subprocess.run(command, env=env, cwd=str(project_root), capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Mode '{mode}' failed:\n{completed.stderr[-2000:]}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=str(project_root), text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_table(report: Dict[str, Any]) -> None:
+    print(f"\n{'mode':<16} {'scenario':<12} {'lines/req':>10} {'bytes/req':>10} {'log ms/req':>11} {'cpu ms/req':>11} {'errors':>7}")
+    for mode, scenarios in report["modes"].items():
+        for scenario, entry in scenarios.items():
+            print(
+                f"{mode:<16} {scenario:<12} {entry['log_lines_per_request']:>10} {entry['log_bytes_per_request']:>10} "
+                f"{entry['logging_ms_per_request']:>11} {entry['cpu_ms_per_request']:>11} {entry['errors']:>7}"
+            )
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\n📉 Against baseline {baseline.get('git_revision')}:")
+    for mode, scenarios in report["modes"].items():
+        before_mode = baseline.get("modes", {}).get(mode)
+        if not before_mode:
+            continue
+        for scenario, entry in scenarios.items():
+            before = before_mode.get(scenario)
+            if not before:
+                continue
+            changes = []
+            for key in ("log_lines_per_request", "log_bytes_per_request", "logging_ms_per_request", "cpu_ms_per_request"):
+                if before[key]:
+                    changes.append(f"{key.replace('_per_request', '')} {before[key]} → {entry[key]} ({(entry[key] - before[key]) / before[key]:+.0%})")
+            print(f"   {mode}/{scenario}: " + ", ".join(changes))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-request logging cost of the AI Dock chat endpoints")
+    parser.add_argument("--requests", type=int, default=100, help="Sequential requests per scenario")
+    parser.add_argument("--modes", default="default,hot-path-debug,sampled", help=f"Comma-separated, from: {', '.join(MODES)}")
+    parser.add_argument("--output-tokens", type=int, default=60, help="Mock tokens (stream chunks) per response")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--log-file", help="Append the captured logs here instead of discarding them")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier report (e.g. from the previous revision) to compare against")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args)))
+        return
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"Unknown mode(s): {', '.join(unknown)}")
+
+    report = {"git_revision": git_revision(), "requests": args.requests, "modes": {}}
+    for mode in modes:
+        print(f"🏃 {mode}: {args.requests} x {', '.join(SCENARIOS)}")
+        report["modes"][mode] = run_mode(mode, args)
+
+    print_table(report)
+    if args.baseline:
+        print_comparison(report, json.loads(Path(args.baseline).read_text()))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
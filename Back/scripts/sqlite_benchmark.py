@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+AI Dock SQLite Benchmark
+Concurrent chat-and-log throughput on a SQLite database, with the SQLite performance
+profile and the single writer switched on and off
+
+Each mode runs in its own process because settings and engines are fixed at import:
+    defaults        SQLite defaults (rollback journal), every writer contends for the lock
+    pragmas         WAL, synchronous=NORMAL, cache_size, mmap_size, busy_timeout
+    single-writer   pragmas plus background writes queued for one writer connection
+
+Two phases per mode, against the mock provider from load_test.py:
+    chat        --users virtual users send /chat/send (one usage log each) while
+                --readers users poll /usage/my-stats and /conversations/
+    log_burst   --burst-writes usage logs written --burst-concurrency at a time inside
+                the server's event loop while readers query usage_logs
+
+Both phases isolate the write path. The full mixed traffic (streams, uploads, quota
+writes per response, logins) is measured by load_test.py; its event-loop lag is the
+number that shows a write blocking the loop.
+
+Examples:
+    python scripts/sqlite_benchmark.py
+    python scripts/sqlite_benchmark.py --users 40 --duration 20 --output sqlite.json
+    python scripts/sqlite_benchmark.py --modes defaults,single-writer --baseline sqlite.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent))
+
+MODES = {
+    "defaults": {"SQLITE_PERFORMANCE_MODE": "false", "SQLITE_SINGLE_WRITER": "false"},
+    "pragmas": {"SQLITE_PERFORMANCE_MODE": "true", "SQLITE_SINGLE_WRITER": "false"},
+    "single-writer": {"SQLITE_PERFORMANCE_MODE": "true", "SQLITE_SINGLE_WRITER": "true"},
+}
+
+
+# =============================================================================
+# MEASUREMENT (child process)
+# =============================================================================
+
+def latency_summary(values: List[float]) -> Dict[str, Any]:
+    from load_test import summarize
+    return summarize(values)
+
+
+async def _chat_phase(args, seed_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Chat writers and API readers for --duration seconds."""
+    import httpx
+    from load_test import VirtualUser, Metrics
+
+    metrics = Metrics()
+    limits = httpx.Limits(max_connections=(args.users + args.readers) * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120.0, limits=limits) as client:
+        users = [VirtualUser(i, client, seed_data, metrics, random.Random(i)) for i in range(args.users)]
+        readers = [VirtualUser(i, client, seed_data, metrics, random.Random(1000 + i)) for i in range(args.readers)]
+        for user in users + readers:
+            user.token = await user._login(user.email)
+
+        async def read(user):
+            path = "/usage/my-stats" if user.rng.random() < 0.5 else "/conversations/"
+            response = await client.get(path, headers=user._headers())
+            return response.status_code == 200, response.text, None
+
+        async def loop_user(user, scenario, call, deadline):
+            while time.perf_counter() < deadline:
+                await user.timed(scenario, call)
+
+        metrics.recording = True
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(
+            *(loop_user(user, "chat_send", user.chat_send, deadline) for user in users),
+            *(loop_user(user, "read", lambda user=user: read(user), deadline) for user in readers)
+        )
+        elapsed = time.perf_counter() - started
+        metrics.recording = False
+
+    chats = metrics.requests["chat_send"]
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "chat_requests": chats,
+        "chat_errors": metrics.errors["chat_send"],
+        "chat_per_second": round(chats / elapsed, 2),
+        "chat_latency_ms": latency_summary(metrics.latency_ms["chat_send"]),
+        "read_requests": metrics.requests["read"],
+        "read_errors": metrics.errors["read"],
+        "read_latency_ms": latency_summary(metrics.latency_ms["read"]),
+        "error_samples": dict(metrics.error_samples),
+        "successful_chats": chats - metrics.errors["chat_send"],
+    }
+
+
+async def _log_burst(args, seed_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Concurrent usage-log writes plus readers, run inside the server's event loop."""
+    from sqlalchemy import text
+    from app.core.database import AsyncSessionLocal
+    from app.core.metrics import USAGE_LOG_FAILURES
+    from app.services.usage_service import usage_service
+
+    failures_before = USAGE_LOG_FAILURES.get()
+    semaphore = asyncio.Semaphore(args.burst_concurrency)
+    write_ms: List[float] = []
+    read_ms: List[float] = []
+    done = asyncio.Event()
+
+    async def write(index: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await usage_service.log_llm_request_isolated(
+                user_id=1,
+                llm_config_id=seed_data["config_id"],
+                request_data={"messages_count": 2, "total_chars": 200, "parameters": {}},
+                response_data={
+                    "success": True, "content_length": 400, "model": "load-test-small", "provider": "openai",
+                    "token_usage": {"input_tokens": 50, "output_tokens": 100, "total_tokens": 150}, "cost": 0.0003
+                },
+                performance_data={"response_time_ms": 100},
+                request_id=f"sqlite-burst-{os.getpid()}-{index}"
+            )
+            write_ms.append((time.perf_counter() - started) * 1000)
+
+    async def reader() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as session:
+                await session.execute(text("SELECT COUNT(*), SUM(total_tokens) FROM usage_logs"))
+            read_ms.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.01)
+
+    readers = [asyncio.create_task(reader()) for _ in range(args.readers)]
+    started = time.perf_counter()
+    await asyncio.gather(*(write(index) for index in range(args.burst_writes)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*readers)
+
+    return {
+        "writes": args.burst_writes,
+        "failed_writes": int(USAGE_LOG_FAILURES.get() - failures_before),
+        "writes_per_second": round(args.burst_writes / elapsed, 1),
+        "write_latency_ms": latency_summary(write_ms),
+        "reads": len(read_ms),
+        "read_latency_ms": latency_summary(read_ms),
+    }
+
+
+def _count_usage_logs() -> int:
+    from sqlalchemy import text
+    from app.core.database import SyncSessionLocal
+
+    with SyncSessionLocal() as session:
+        return session.execute(text("SELECT COUNT(*) FROM usage_logs")).scalar()
+
+
+def measure(args) -> Dict[str, Any]:
+    from load_test import install_mock_provider, ServerThread, ServerMonitor, seed_database
+
+    class LoopCapturingMonitor(ServerMonitor):
+        """Also remembers the server's event loop so the burst can run on it."""
+
+        async def run(self) -> None:
+            self.loop = asyncio.get_running_loop()
+            await super().run()
+
+    install_mock_provider(argparse.Namespace(
+        seed=42, error_rate=0.0, output_tokens=args.output_tokens, tokens_per_second=100000.0, ttft_ms=args.ttft_ms
+    ))
+    monitor = LoopCapturingMonitor()
+    server = ServerThread(args.port, monitor)
+    server.start()
+    try:
+        seed_data = seed_database(max(args.users, args.readers))
+
+        monitor.recording = True
+        chat = asyncio.run(_chat_phase(args, seed_data))
+        monitor.recording = False
+        # Usage logs may still be in flight in background tasks
+        time.sleep(1.0)
+        written = _count_usage_logs()
+        chat["usage_logs_written"] = written
+        chat["usage_logs_missing"] = max(chat.pop("successful_chats") - written, 0)
+        chat["event_loop_lag_ms"] = latency_summary(monitor.lag_ms)
+
+        burst = asyncio.run_coroutine_threadsafe(_log_burst(args, seed_data), monitor.loop).result()
+
+        from app.core.database import get_pool_status
+        return {"chat": chat, "log_burst": burst, "sqlite_writer": get_pool_status()["sqlite_writer"]}
+    finally:
+        server.stop()
+
+
+# =============================================================================
+# ORCHESTRATION (parent process)
+# =============================================================================
+
+def run_mode(mode: str, args) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="aidock-sqlitebench-") as temp_dir:
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": f"sqlite:///{temp_dir}/sqlite_benchmark.db",
+            "DATABASE_READ_URL": "",
+            "ENVIRONMENT": "development",
+            "DEBUG": "false",
+            "LOG_LEVEL": "WARNING",
+            "MOCK_LLM_PROVIDER_ENABLED": "false",
+            "MESSAGE_PERSISTENCE_SPOOL_PATH": "",
+            "TRACING_EXPORTER": "none",
+            "RESPONSE_CACHE_ENABLED": "false",
+        })
+        env.setdefault("SECRET_KEY", "sqlite-benchmark-secret-key-that-is-long-enough-0123")
+        env.update(MODES[mode])
+
+        command = [
+            sys.executable, __file__, "--child",
+            "--users", str(args.users),
+            "--readers", str(args.readers),
+            "--duration", str(args.duration),
+            "--burst-writes", str(args.burst_writes),
+            "--burst-concurrency", str(args.burst_concurrency),
+            "--output-tokens", str(args.output_tokens),
+            "--ttft-ms", str(args.ttft_ms),
+            "--port", str(args.port),
+        ]
+        completed = subprocess.run(command, env=env, cwd=str(project_root), capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Mode '{mode}' failed:\n{completed.stderr[-2000:]}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=str(project_root), text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_table(report: Dict[str, Any]) -> None:
+    print(f"\n{'mode':<14} {'chat/s':>8} {'chat p95':>9} {'read p95':>9} {'errors':>7} {'logs lost':>10} {'loop lag p99':>13}")
+    for mode, entry in report["modes"].items():
+        chat = entry["chat"]
+        print(
+            f"{mode:<14} {chat['chat_per_second']:>8} {chat['chat_latency_ms']['p95']:>9} "
+            f"{chat['read_latency_ms']['p95']:>9} {chat['chat_errors'] + chat['read_errors']:>7} "
+            f"{chat['usage_logs_missing']:>10} {chat['event_loop_lag_ms']['p99']:>13}"
+        )
+    print(f"\n{'mode':<14} {'logs/s':>8} {'write p95':>10} {'read p95':>9} {'failed':>7}")
+    for mode, entry in report["modes"].items():
+        burst = entry["log_burst"]
+        print(
+            f"{mode:<14} {burst['writes_per_second']:>8} {burst['write_latency_ms']['p95']:>10} "
+            f"{burst['read_latency_ms']['p95']:>9} {burst['failed_writes']:>7}"
+        )
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\n📉 Against baseline {baseline.get('git_revision')}:")
+    for mode, entry in report["modes"].items():
+        before = baseline.get("modes", {}).get(mode)
+        if not before:
+            continue
+        pairs = (
+            ("chat/s", entry["chat"]["chat_per_second"], before["chat"]["chat_per_second"]),
+            ("chat p95", entry["chat"]["chat_latency_ms"]["p95"], before["chat"]["chat_latency_ms"]["p95"]),
+            ("logs/s", entry["log_burst"]["writes_per_second"], before["log_burst"]["writes_per_second"]),
+        )
+        changes = [
+            f"{name} {old} → {new} ({(new - old) / old:+.0%})"
+            for name, new, old in pairs if old
+        ]
+        print(f"   {mode}: " + ", ".join(changes))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent chat-and-log throughput of AI Dock on SQLite")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent chat users (each chat writes a usage log)")
+    parser.add_argument("--readers", type=int, default=5, help="Concurrent readers during both phases")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds of chat traffic")
+    parser.add_argument("--burst-writes", type=int, default=1000, help="Usage logs written in the burst phase")
+    parser.add_argument("--burst-concurrency", type=int, default=50, help="Burst writes in flight at once")
+    parser.add_argument("--output-tokens", type=int, default=60)
+    parser.add_argument("--ttft-ms", type=float, default=0.0, help="Mock time to first token")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma-separated, from: {', '.join(MODES)}")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args)))
+        return
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"Unknown mode(s): {', '.join(unknown)}")
+
+    report = {"git_revision": git_revision(), "users": args.users, "readers": args.readers, "modes": {}}
+    for mode in modes:
+        print(f"🏃 {mode}: {args.users} chat users + {args.readers} readers for {args.duration:g}s, then {args.burst_writes} log writes")
+        report["modes"][mode] = run_mode(mode, args)
+
+    print_table(report)
+    if args.baseline:
+        print_comparison(report, json.loads(Path(args.baseline).read_text()))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
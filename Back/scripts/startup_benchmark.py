@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+AI Dock Startup Benchmark
+Import time of app.main and time from process start to readiness, with
+budgets so CI can fail a change that slows the cold start down
+
+Two measurements, each repeated --runs times (medians are reported):
+    imports     `python -X importtime -c "import app.main"`: total import time,
+                the slowest top-level imports, and modules that must stay off the
+                boot path (--forbid, imported lazily on first use)
+    readiness   uvicorn started on a temporary SQLite database until --path
+                (default /health/ready) answers 200:
+                    cold            empty database, tables are created
+                    warm            existing database, schema revision matches (fast boot)
+                    warm-no-fast    existing database with DB_FAST_BOOT=false
+
+Exits with status 1 when a budget is exceeded or a forbidden module is imported.
+
+Examples:
+    python scripts/startup_benchmark.py
+    python scripts/startup_benchmark.py --runs 5 --output startup.json
+    python scripts/startup_benchmark.py --max-import-seconds 3 --max-ready-seconds 6 --baseline startup.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Heavy optional libraries that are imported on first use, not at boot
+DEFAULT_FORBIDDEN = "litellm,PyPDF2,pdfplumber,docx,docx2txt"
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def base_env(database_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "DATABASE_READ_URL": "",
+        "ENVIRONMENT": "development",
+        "DEBUG": "false",
+        "LOG_LEVEL": "WARNING",
+        "MESSAGE_PERSISTENCE_SPOOL_PATH": "",
+        "TRACING_EXPORTER": "none",
+    })
+    env.setdefault("SECRET_KEY", "startup-benchmark-secret-key-that-is-long-enough-0123")
+    return env
+
+
+# =============================================================================
+# IMPORT TIME
+# =============================================================================
+
+def profile_imports(env: Dict[str, str]) -> Tuple[float, List[Tuple[str, float]], set]:
+    """
+    Import app.main once with -X importtime.
+
+    Returns (total seconds, [(top-level module, cumulative seconds)], every module imported).
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, cwd=str(project_root), capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import app.main failed:\n{completed.stderr[-2000:]}")
+
+    total = 0.0
+    top_level: List[Tuple[str, float]] = []
+    modules = set()
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        modules.add(name)
+        # importtime indents nested imports by two spaces per level
+        if indent == 1:
+            top_level.append((name, cumulative_us / 1e6))
+            if name == "app.main":
+                total = cumulative_us / 1e6
+        elif indent == 3:
+            top_level.append((name, cumulative_us / 1e6))
+    return total, top_level, modules
+
+
+def measure_imports(args, env: Dict[str, str]) -> Dict[str, Any]:
+    forbidden = [name.strip() for name in args.forbid.split(",") if name.strip()]
+    totals = []
+    slowest: Dict[str, List[float]] = {}
+    imported_forbidden = set()
+    for _ in range(args.runs):
+        total, top_level, modules = profile_imports(env)
+        totals.append(total)
+        for name, seconds in top_level:
+            if name != "app.main":
+                slowest.setdefault(name, []).append(seconds)
+        imported_forbidden |= {name for name in forbidden if name in modules}
+
+    ranked = sorted(((name, statistics.median(values)) for name, values in slowest.items()), key=lambda item: -item[1])
+    return {
+        "import_seconds": round(statistics.median(totals), 3),
+        "import_seconds_runs": [round(value, 3) for value in totals],
+        "slowest_imports": [{"module": name, "seconds": round(seconds, 3)} for name, seconds in ranked[:args.top]],
+        "forbidden_imported": sorted(imported_forbidden),
+    }
+
+
+# =============================================================================
+# TIME TO READINESS
+# =============================================================================
+
+def wait_until_ready(port: int, path: str, process: subprocess.Popen, timeout: float) -> float:
+    """Poll `path` until it answers 200; returns seconds since the process started."""
+    started = time.perf_counter()
+    url = f"http://127.0.0.1:{port}{path}"
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode} before becoming ready")
+        try:
+            with urllib.request.urlopen(url, timeout=1.0) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except Exception:
+            pass
+        time.sleep(0.02)
+    raise RuntimeError(f"Server not ready after {timeout:g}s")
+
+
+def boot_once(args, env: Dict[str, str]) -> float:
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"
+    ]
+    process = subprocess.Popen(
+        command, env=env, cwd=str(project_root), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    try:
+        return wait_until_ready(args.port, args.path, process, args.timeout)
+    except RuntimeError as e:
+        process.kill()
+        raise RuntimeError(f"{e}:\n{process.communicate()[1][-2000:]}")
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def measure_readiness(args) -> Dict[str, Any]:
+    runs: Dict[str, List[float]] = {"cold": [], "warm": [], "warm-no-fast": []}
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix="aidock-startupbench-") as temp_dir:
+            env = base_env(f"{temp_dir}/startup_benchmark.db")
+            runs["cold"].append(boot_once(args, env))
+            runs["warm"].append(boot_once(args, env))
+            runs["warm-no-fast"].append(boot_once(args, dict(env, DB_FAST_BOOT="false")))
+    return {
+        f"{boot}_ready_seconds": round(statistics.median(values), 3)
+        for boot, values in runs.items()
+    }
+
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=str(project_root), text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    imports = report["imports"]
+    print(f"\n📦 import app.main: {imports['import_seconds']}s (runs: {imports['import_seconds_runs']})")
+    for entry in imports["slowest_imports"]:
+        print(f"   {entry['seconds']:>7.3f}s  {entry['module']}")
+    if imports["forbidden_imported"]:
+        print(f"   ❌ imported at boot: {', '.join(imports['forbidden_imported'])}")
+
+    readiness = report["readiness"]
+    print(f"\n🚦 time to {report['path']} 200:")
+    for key, value in readiness.items():
+        print(f"   {key.replace('_ready_seconds', ''):<14} {value:>7.3f}s")
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\n📉 Against baseline {baseline.get('git_revision')}:")
+    pairs = [("import", report["imports"]["import_seconds"], baseline.get("imports", {}).get("import_seconds"))]
+    for key, value in report["readiness"].items():
+        pairs.append((key.replace("_ready_seconds", ""), value, baseline.get("readiness", {}).get(key)))
+    for name, new, old in pairs:
+        if old:
+            print(f"   {name}: {old}s → {new}s ({(new - old) / old:+.0%})")
+
+
+def check_budgets(report: Dict[str, Any], args) -> List[str]:
+    failures = []
+    if report["imports"]["forbidden_imported"]:
+        failures.append(f"modules imported at boot: {', '.join(report['imports']['forbidden_imported'])}")
+    if args.max_import_seconds and report["imports"]["import_seconds"] > args.max_import_seconds:
+        failures.append(f"import app.main took {report['imports']['import_seconds']}s (budget {args.max_import_seconds:g}s)")
+    warm = report["readiness"]["warm_ready_seconds"]
+    if args.max_ready_seconds and warm > args.max_ready_seconds:
+        failures.append(f"warm boot took {warm}s to become ready (budget {args.max_ready_seconds:g}s)")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import time and time to readiness of the AI Dock backend")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions of each measurement (medians are reported)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN, help="Comma-separated modules that must not be imported at boot")
+    parser.add_argument("--max-import-seconds", type=float, default=0.0, help="Fail above this import time (0 = no budget)")
+    parser.add_argument("--max-ready-seconds", type=float, default=0.0, help="Fail above this warm-boot time to readiness (0 = no budget)")
+    parser.add_argument("--path", default="/health/ready", help="Endpoint that answers 200 once the server is ready")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up on a boot after this many seconds")
+    parser.add_argument("--port", type=int, default=8769)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    print(f"🏃 Profiling imports and boots ({args.runs} runs each)")
+    with tempfile.TemporaryDirectory(prefix="aidock-startupbench-") as temp_dir:
+        imports = measure_imports(args, base_env(f"{temp_dir}/imports.db"))
+    report = {
+        "git_revision": git_revision(), "runs": args.runs, "path": args.path,
+        "imports": imports, "readiness": measure_readiness(args)
+    }
+
+    print_report(report)
+    if args.baseline:
+        print_comparison(report, json.loads(Path(args.baseline).read_text()))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Report written to {args.output}")
+
+    failures = check_budgets(report, args)
+    if failures:
+        print("\n❌ Startup budget exceeded:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("\n✅ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+AI Dock Streaming Benchmark
+Measures total stream duration and socket writes per response for SSE delivery modes
+"""
+
+import argparse
+import asyncio
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, AsyncGenerator, List
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from app.api.chat_streaming import StreamingChunk
+from app.services.llm.streaming_encoder import StreamingFrameEncoder, encode_stream, DONE_FRAME
+
+
+# =============================================================================
+# SYNTHETIC PROVIDER
+# =============================================================================
+
+async def fake_provider_stream(tokens: int, interval_ms: float) -> AsyncGenerator[Dict[str, Any], None]:
+    """Yield chunks like llm_service.stream_chat_request, at a fixed model speed."""
+    for i in range(tokens):
+        await asyncio.sleep(interval_ms / 1000.0)
+        yield {
+            "content": f"token{i} ",
+            "is_final": False,
+            "model": "benchmark-model",
+            "provider": "Benchmark",
+            "timestamp": "2024-01-01T00:00:00Z"
+        }
+    yield {
+        "content": "",
+        "is_final": True,
+        "usage": {"input_tokens": 10, "output_tokens": tokens, "total_tokens": tokens + 10},
+        "cost": 0.001,
+        "response_time_ms": int(tokens * interval_ms),
+        "timestamp": "2024-01-01T00:00:00Z"
+    }
+
+
+# =============================================================================
+# DELIVERY MODES
+# =============================================================================
+
+async def legacy_frames(tokens: int, interval_ms: float, delay_ms: int) -> AsyncGenerator[str, None]:
+    """The previous delivery loop: one Pydantic model per token plus fixed pacing."""
+    chunk_index = 0
+    accumulated = ""
+    async for chunk_data in fake_provider_stream(tokens, interval_ms):
+        chunk = StreamingChunk(
+            chunk_id=f"chunk_{chunk_index:03d}",
+            chunk_index=chunk_index,
+            content=chunk_data.get("content", ""),
+            is_final=chunk_data.get("is_final", False),
+            model=chunk_data.get("model") if chunk_index == 0 else None,
+            provider=chunk_data.get("provider") if chunk_index == 0 else None,
+            usage=chunk_data.get("usage") if chunk_data.get("is_final") else None,
+            cost=chunk_data.get("cost") if chunk_data.get("is_final") else None,
+            response_time_ms=chunk_data.get("response_time_ms") if chunk_data.get("is_final") else None,
+            timestamp=chunk_data.get("timestamp", "")
+        )
+        yield f"data: {chunk.model_dump_json()}\n\n"
+        accumulated += chunk_data.get("content", "")
+        if delay_ms:
+            await asyncio.sleep(delay_ms / 1000.0)
+        chunk_index += 1
+        if chunk_data.get("is_final"):
+            break
+    yield DONE_FRAME
+
+
+async def encoded_frames(tokens: int, interval_ms: float, coalesce_bytes: int, coalesce_ms: int) -> AsyncGenerator[str, None]:
+    """The current delivery loop: frame encoder at model speed, optional coalescing."""
+    encoder = StreamingFrameEncoder(coalesce_bytes=coalesce_bytes, coalesce_ms=coalesce_ms)
+    async for frame in encode_stream(fake_provider_stream(tokens, interval_ms), encoder):
+        yield frame
+    yield DONE_FRAME
+
+
+# =============================================================================
+# SERVER AND MEASUREMENT
+# =============================================================================
+
+class SendCounter:
+    """Counts send syscalls made by sockets bound to the benchmark server port."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.calls = 0
+        self._original_send = socket.socket.send
+
+    def install(self) -> None:
+        counter = self
+
+        def counting_send(sock, data, *args):
+            if sock.family in (socket.AF_INET, socket.AF_INET6):
+                try:
+                    if sock.getsockname()[1] == counter.port:
+                        counter.calls += 1
+                except OSError:
+                    pass
+            return counter._original_send(sock, data, *args)
+
+        socket.socket.send = counting_send
+
+    def uninstall(self) -> None:
+        socket.socket.send = self._original_send
+
+
+def build_app(args: argparse.Namespace) -> Starlette:
+    async def legacy(request):
+        return StreamingResponse(
+            legacy_frames(args.tokens, args.token_interval_ms, args.legacy_delay_ms),
+            media_type="text/event-stream"
+        )
+
+    async def encoded(request):
+        coalesce_bytes = int(request.query_params.get("coalesce_bytes", 0))
+        coalesce_ms = int(request.query_params.get("coalesce_ms", 0))
+        return StreamingResponse(
+            encoded_frames(args.tokens, args.token_interval_ms, coalesce_bytes, coalesce_ms),
+            media_type="text/event-stream"
+        )
+
+    return Starlette(routes=[Route("/legacy", legacy), Route("/encoded", encoded)])
+
+
+async def measure(client: httpx.AsyncClient, counter: SendCounter, url: str) -> Dict[str, Any]:
+    """Stream one response and collect duration, frame and syscall counts."""
+    counter.calls = 0
+    frames = 0
+    started = time.perf_counter()
+    first_frame_at = None
+    async with client.stream("GET", url) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                frames += 1
+                if first_frame_at is None:
+                    first_frame_at = time.perf_counter()
+    duration = time.perf_counter() - started
+    return {
+        "duration_s": duration,
+        "first_frame_ms": ((first_frame_at or started) - started) * 1000,
+        "frames": frames,
+        "send_syscalls": counter.calls
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    config = uvicorn.Config(build_app(args), host="127.0.0.1", port=args.port, log_level="warning")
+    server = uvicorn.Server(config)
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    counter = SendCounter(args.port)
+    counter.install()
+
+    modes: List[tuple] = []
+    if not args.skip_legacy:
+        modes.append((f"legacy (pydantic, {args.legacy_delay_ms} ms pacing)", "/legacy"))
+    modes.append(("encoder, model speed", "/encoded"))
+    for spec in args.coalesce:
+        coalesce_bytes, coalesce_ms = (int(part) for part in spec.split("/"))
+        modes.append((
+            f"encoder, coalesce {coalesce_bytes} B / {coalesce_ms} ms",
+            f"/encoded?coalesce_bytes={coalesce_bytes}&coalesce_ms={coalesce_ms}"
+        ))
+
+    print(f"\n📊 {args.tokens} tokens at {args.token_interval_ms} ms/token "
+          f"(model time {args.tokens * args.token_interval_ms / 1000:.2f} s)\n")
+    print(f"{'mode':<46} {'duration':>10} {'first frame':>12} {'frames':>8} {'send()':>8}")
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=None) as client:
+            for label, path in modes:
+                result = await measure(client, counter, path)
+                print(
+                    f"{label:<46} {result['duration_s']:>9.2f}s {result['first_frame_ms']:>10.1f}ms "
+                    f"{result['frames']:>8} {result['send_syscalls']:>8}"
+                )
+    finally:
+        counter.uninstall()
+        server.should_exit = True
+        await server_task
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark SSE stream delivery modes")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens per response")
+    parser.add_argument("--token-interval-ms", type=float, default=10.0, help="Simulated model speed")
+    parser.add_argument("--legacy-delay-ms", type=int, default=100, help="Pacing of the legacy loop")
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the (slow) legacy mode")
+    parser.add_argument(
+        "--coalesce", nargs="*", default=["64/50", "256/100"],
+        help="Coalescing settings to compare, as BYTES/MS"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
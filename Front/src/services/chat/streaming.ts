@@ -11,6 +11,9 @@ import {
 import { coreChatService } from './core';
 import { createChatServiceError, logChatError } from './errors';
 
+// 🔁 How many times a dropped stream may resume before falling back
+const MAX_STREAM_RECONNECTS = 3;
+
 /**
  * Streaming Chat Service - handles real-time chat streaming
  * 🎓 Learning: EventSource API for Server-Sent Events (SSE)
@@ -116,6 +119,12 @@ export class StreamingChatService {
     if (request.stream_delay_ms !== undefined) {
       streamUrl.searchParams.set('stream_delay_ms', request.stream_delay_ms.toString());
     }
+    if (request.coalesce_bytes !== undefined) {
+      streamUrl.searchParams.set('coalesce_bytes', request.coalesce_bytes.toString());
+    }
+    if (request.coalesce_ms !== undefined) {
+      streamUrl.searchParams.set('coalesce_ms', request.coalesce_ms.toString());
+    }
     if (request.include_usage_in_stream !== undefined) {
       streamUrl.searchParams.set('include_usage_in_stream', request.include_usage_in_stream.toString());
     }
@@ -146,6 +155,7 @@ export class StreamingChatService {
     let eventSource: EventSource | null = null;
     let accumulatedContent = '';
     let receivedChunks: StreamingChatChunk[] = [];
+    let reconnectAttempts = 0;
     
     try {
       // 🚀 Create EventSource connection with all data in URL
@@ -153,6 +163,7 @@ export class StreamingChatService {
       
       // 📡 Handle incoming streaming chunks
       eventSource.onmessage = (event) => {
+        reconnectAttempts = 0;
         try {
           // Handle completion and error markers
           if (event.data === '[DONE]') {
@@ -260,6 +271,14 @@ export class StreamingChatService {
       
       // 🚨 Handle connection errors
       eventSource.onerror = (error) => {
+        // 🔁 The browser reconnects with Last-Event-ID and the backend resumes
+        // the same generation from its replay buffer, so let it try a few times
+        if (eventSource?.readyState === EventSource.CONNECTING && reconnectAttempts < MAX_STREAM_RECONNECTS) {
+          reconnectAttempts++;
+          console.warn('🔁 Streaming connection dropped, resuming:', { requestId, attempt: reconnectAttempts });
+          return;
+        }
+        
         logChatError('EventSource error', error);
         
         const streamingError: StreamingError = {
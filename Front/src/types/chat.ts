@@ -213,6 +213,8 @@ export interface StreamingChatRequest extends ChatRequest {
   
   stream_timeout?: number;  // Optional timeout for streaming connection
   stream_delay_ms?: number; // Optional delay between chunks for testing
+  coalesce_bytes?: number;  // Flush a frame once this much content is buffered
+  coalesce_ms?: number;     // Flush buffered content after this many milliseconds
   include_usage_in_stream?: boolean; // Include token usage in streaming chunks
 }
 